@@ -12,13 +12,17 @@ Run::
 
 from __future__ import annotations
 
+import itertools
 import json
+import os
 import platform
+import sys
 import timeit
+import types
 from functools import wraps
 from pathlib import Path
 
-from conditional_method import __version__, cfg, cfg_attr
+from conditional_method import __version__, cfg, cfg_attr, reselect
 
 RESULTS_PATH = Path(__file__).parent / "results" / "results.json"
 
@@ -119,6 +123,137 @@ def cfg_class_select():
     return lambda: make()
 
 
+def cfg_class_select_resolved():
+    """`cfg_class_select` resolved in one pass by `@cfg.resolve_class`."""
+
+    def make():
+        env = "production"
+
+        @cfg.resolve_class
+        class Worker:
+            @cfg(condition=env == "production", lazy=True)
+            def work(self):
+                return "prod"
+
+            @cfg(condition=env == "development", lazy=True)
+            def work(self):
+                return "dev"
+
+        return Worker
+
+    return lambda: make()
+
+
+def is_production(f):
+    return os.environ.get("BENCH_ENVIRONMENT", "production") == "production"
+
+
+def is_development(f):
+    return os.environ.get("BENCH_ENVIRONMENT", "production") == "development"
+
+
+def _callable_worker(lazy):
+    # Callable conditions reading the environment, as in
+    # examples/fastapi_auth.py.
+    class Worker:
+        @cfg(condition=is_production, lazy=lazy)
+        def work(self):
+            return "prod"
+
+        @cfg(condition=is_development, lazy=lazy)
+        def work(self):
+            return "dev"
+
+    return Worker
+
+
+def cfg_class_select_callable():
+    return lambda: _callable_worker(False)
+
+
+def _gated(pure):
+    # One callable condition gating 10 names, as when one `is_production`
+    # guards every method of a service package.
+    funcs = []
+    for i in range(10):
+
+        def f():
+            return 1
+
+        f.__qualname__ = f"Gated.m{i}"
+        funcs.append(f)
+
+    def run():
+        for f in funcs:
+            cfg(f, condition=is_production, pure=pure)
+
+    return run
+
+
+def cfg_gated_10_callable():
+    return _gated(False)
+
+
+def cfg_gated_10_pure():
+    """`cfg_gated_10_callable` with the condition declared pure=True."""
+    return _gated(True)
+
+
+# The same checks as native conditions: evaluated by the extension, with no
+# Python call per decoration.
+NATIVE_DEVELOPMENT = cfg.env("BENCH_ENVIRONMENT") == "development"
+NATIVE_PRODUCTION = ~NATIVE_DEVELOPMENT
+
+
+def cfg_native_condition_decorate():
+    """`cfg_callable_decorate` with a native condition."""
+
+    def make():
+        @cfg(condition=NATIVE_PRODUCTION)
+        def f():
+            return 1
+
+        return f
+
+    return lambda: make()
+
+
+def cfg_class_select_native():
+    """`cfg_class_select_callable` with native conditions."""
+
+    def make():
+        class Worker:
+            @cfg(condition=NATIVE_PRODUCTION)
+            def work(self):
+                return "prod"
+
+            @cfg(condition=NATIVE_DEVELOPMENT)
+            def work(self):
+                return "dev"
+
+        return Worker
+
+    return lambda: make()
+
+
+def condition_eval_callable():
+    return lambda: is_production(None)
+
+
+def condition_eval_native():
+    return lambda: NATIVE_PRODUCTION()
+
+
+def cfg_class_select_lazy():
+    """Class creation only: lazy candidates are never evaluated."""
+    return lambda: _callable_worker(True)
+
+
+def cfg_class_select_lazy_first_use():
+    """Class creation plus the first access that resolves the selection."""
+    return lambda: _callable_worker(True)().work()
+
+
 def cfg_attr_true_single():
     def make():
         @cfg_attr(condition=True, decorators=[add_prefix("p")])
@@ -152,6 +287,88 @@ def cfg_attr_false():
     return lambda: make()
 
 
+def _alternating_decorate(names):
+    """One decoration per op over ``names`` distinct qualnames, alternating
+    condition=True/False (each name flips between passes), so every other op
+    resets the selection caches while earlier winners are still cached."""
+    funcs = []
+    for i in range(names):
+
+        def f():
+            return 1
+
+        f.__qualname__ = f"Alt{i}.work"
+        funcs.append(f)
+    pairs = [(f, i % 2 == 0) for i, f in enumerate(funcs)]
+    pairs += [(f, i % 2 == 1) for i, f in enumerate(funcs)]
+    it = itertools.cycle(pairs)
+
+    def run():
+        f, condition = next(it)
+        cfg(f, condition=condition)
+
+    return run
+
+
+def cfg_alternating_1k():
+    return _alternating_decorate(1_000)
+
+
+def cfg_alternating_10k():
+    return _alternating_decorate(10_000)
+
+
+def cfg_disabled_variants():
+    """One decoration per op over 1 000 names with three disabled variants
+    and one enabled one each, decorated in that order as a module defining
+    them would: the variants before the winner all get the name's raiser."""
+    decorations = []
+    for i in range(1_000):
+        for condition in (False, False, False, True):
+
+            def f():
+                return 1
+
+            f.__qualname__ = f"Variant{i}.work"
+            decorations.append((f, condition))
+    it = itertools.cycle(decorations)
+
+    def run():
+        f, condition = next(it)
+        cfg(f, condition=condition)
+
+    return run
+
+
+def reselect_1_of_1k():
+    """Flip one flag and re-select: 1 000 tracked module-level names, one
+    per flag, each with a default and a flag-gated candidate."""
+    module = types.ModuleType("bench_reselect")
+    sys.modules[module.__name__] = module
+    flags = dict.fromkeys(range(1_000), False)
+    for i in flags:
+
+        def default():
+            return "default"
+
+        def flagged():
+            return "flagged"
+
+        for f in (default, flagged):
+            f.__module__ = module.__name__
+            f.__qualname__ = f.__name__ = f"handler{i}"
+        setattr(module, f"handler{i}", cfg(default, condition=True))
+        cfg(flagged, condition=lambda f, i=i: flags[i], depends_on=i)
+    keys = itertools.cycle(flags)
+
+    def run():
+        key = next(keys)
+        flags[key] = not flags[key]
+        reselect(changed_keys=[key])
+
+    return run
+
+
 def call_plain():
     def f():
         return 1
@@ -174,9 +391,23 @@ SCENARIOS = {
     "cfg_false_decorate": cfg_false_decorate,
     "cfg_callable_decorate": cfg_callable_decorate,
     "cfg_class_select": cfg_class_select,
+    "cfg_class_select_resolved": cfg_class_select_resolved,
+    "cfg_class_select_callable": cfg_class_select_callable,
+    "cfg_gated_10_callable": cfg_gated_10_callable,
+    "cfg_gated_10_pure": cfg_gated_10_pure,
+    "cfg_native_condition_decorate": cfg_native_condition_decorate,
+    "cfg_class_select_native": cfg_class_select_native,
+    "condition_eval_callable": condition_eval_callable,
+    "condition_eval_native": condition_eval_native,
+    "cfg_class_select_lazy": cfg_class_select_lazy,
+    "cfg_class_select_lazy_first_use": cfg_class_select_lazy_first_use,
     "cfg_attr_true_single": cfg_attr_true_single,
     "cfg_attr_true_multi": cfg_attr_true_multi,
     "cfg_attr_false": cfg_attr_false,
+    "cfg_alternating_1k": cfg_alternating_1k,
+    "cfg_alternating_10k": cfg_alternating_10k,
+    "cfg_disabled_variants": cfg_disabled_variants,
+    "reselect_1_of_1k": reselect_1_of_1k,
     "call_plain": call_plain,
     "call_through_cfg": call_through_cfg,
 }
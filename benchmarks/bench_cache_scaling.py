@@ -0,0 +1,152 @@
+"""Benchmark: decorating many distinct names.
+
+Large applications decorate tens of thousands of distinct qualnames, and
+every winner stays in the selection cache while its function is alive.  A
+cache write must stay amortized O(1) however many entries the cache holds,
+so the total time of ``N`` decorations should grow linearly with ``N`` (a
+flat time per decoration in the table).
+
+The harness decorates ``N`` distinct, live winners for each ``N`` up to
+100k under each cache policy (see ``set_cache_policy``), and also with a
+bounded ``max_size``.  For the default policy it also measures the memory
+a decoration allocates (traced with ``tracemalloc``: the cache entry, the
+winner's weakref and the qualname key) and the time of a false decoration
+that reuses a cached winner, which is one cache lookup.  Results are
+written to benchmarks/results/results_cache_scaling.json and tables are
+printed.
+
+Run:  python benchmarks/bench_cache_scaling.py
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+
+from conditional_method import __version__, _c, cache_policy, cfg, set_cache_policy
+
+RESULTS_PATH = Path(__file__).parent / "results" / "results_cache_scaling.json"
+
+SIZES = [10_000, 25_000, 50_000, 100_000]
+REPEAT = 3
+POLICIES = [
+    ("sweep", {"policy": "sweep"}),
+    ("clock", {"policy": "clock"}),
+    ("clock, max_size=10000", {"policy": "clock", "max_size": 10_000}),
+]
+
+
+def _functions(n: int) -> list:
+    funcs = []
+    for i in range(n):
+
+        def f():
+            return 1
+
+        f.__qualname__ = f"Scale.m{i}"
+        funcs.append(f)
+    return funcs
+
+
+def run(n: int) -> float:
+    # Build the functions up front (and keep them alive) so only
+    # decoration is timed and every winner stays live in the cache.
+    funcs = _functions(n)
+    _c._cm_cache.clear()
+    start = time.perf_counter()
+    for f in funcs:
+        cfg(f, condition=True)
+    elapsed = time.perf_counter() - start
+    _c._cm_cache.clear()
+    return elapsed
+
+
+def footprint(n: int) -> dict:
+    funcs = _functions(n)
+    losers = _functions(n)
+    _c._cm_cache.clear()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for f in funcs:
+            cfg(f, condition=True)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for f in losers:
+            cfg(f, condition=False)
+        best = min(best, time.perf_counter() - start)
+    _c._cm_cache.clear()
+    return {
+        "decorations": n,
+        "bytes_per_decoration": allocated / n,
+        "ns_per_hit": best / n * 1e9,
+    }
+
+
+def bench(label: str, n: int) -> dict:
+    best = min(run(n) for _ in range(REPEAT))
+    return {
+        "policy": label,
+        "decorations": n,
+        "repeat": REPEAT,
+        "best_s": best,
+        "us_per_decoration": best / n * 1e6,
+    }
+
+
+def main() -> None:
+    env = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "implementation": platform.python_implementation(),
+        "version": __version__,
+        "machine": platform.machine(),
+    }
+
+    default = cache_policy()
+    results = []
+    try:
+        for label, policy in POLICIES:
+            set_cache_policy(**{**default, **policy})
+            results.extend(bench(label, n) for n in SIZES)
+    finally:
+        set_cache_policy(**default)
+    footprints = [footprint(n) for n in SIZES]
+
+    doc = {"environment": env, "results": results, "footprint": footprints}
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps(doc, indent=2) + "\n")
+
+    print(
+        f"conditional-method {__version__} — distinct names "
+        f"(best of {REPEAT}, {env['python']} on {env['machine']})"
+    )
+    print("-" * 66)
+    print(f"{'policy':<24} {'decorations':>12} {'total s':>10} {'µs/decoration':>16}")
+    print("-" * 66)
+    for r in results:
+        print(
+            f"{r['policy']:<24} {r['decorations']:12d} {r['best_s']:10.3f} "
+            f"{r['us_per_decoration']:16.3f}"
+        )
+    print("-" * 66)
+    print(f"{'decorations':>12} {'bytes/decoration':>18} {'ns/cached hit':>15}")
+    print("-" * 47)
+    for r in footprints:
+        print(
+            f"{r['decorations']:12d} {r['bytes_per_decoration']:18.1f} "
+            f"{r['ns_per_hit']:15.1f}"
+        )
+    print("-" * 47)
+    print(f"wrote {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
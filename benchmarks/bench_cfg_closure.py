@@ -21,6 +21,21 @@ Measured axes:
                                  over an enclosing variable
     cfg_closure_select_def       two make() factories (prod/dev); the class
                                  body assigns the selected one
+    plain_class_factory_def      a factory building a class with four methods
+    cfg_class_factory_def        the same factory with a prod/dev @cfg pair
+                                 per method (eight decorations per class)
+    cfg_factory_decorate_def     one @cfg(condition=True) decoration of a
+                                 function the factory made (no class build)
+
+  Allocation (definition-time scenarios): peak bytes traced by tracemalloc
+  while building one class, median over ALLOC_OPS builds.  CPython exposes
+  no allocation counter, so the bytes a build allocates (including what it
+  frees again before returning) stand in for the number of allocations.
+
+  Global state (definition-time scenarios): entries written to the global
+  selection cache and cache resets (generation bumps) per build, averaged
+  over ALLOC_OPS builds.  Names defined inside a function are selected in
+  the decorating frame's build scope, so a factory should leave none.
 
   Call time (class built once; method called per iteration):
     call_plain_closure           Worker().work() - plain closure method
@@ -36,17 +51,21 @@ Run:  python benchmarks/bench_cfg_closure.py
 
 from __future__ import annotations
 
+import gc
 import json
 import platform
+import statistics
 import timeit
+import tracemalloc
 from pathlib import Path
 
-from conditional_method import __version__, cfg
+from conditional_method import __version__, _c, cfg, reset_stats, stats
 
 RESULTS_PATH = Path(__file__).parent / "results" / "results_cfg_closure.json"
 
 N = 100_000
 REPEAT = 5
+ALLOC_OPS = 1_000
 
 PROD = "production"
 DEV = "development"
@@ -131,6 +150,80 @@ def cfg_closure_select_def():
     return lambda: build()
 
 
+def plain_class_factory_def():
+    def build():
+        class Worker:
+            def a(self):
+                return "a"
+
+            def b(self):
+                return "b"
+
+            def c(self):
+                return "c"
+
+            def d(self):
+                return "d"
+
+        return Worker
+
+    return build
+
+
+def cfg_class_factory_def():
+    def build():
+        env = PROD
+
+        class Worker:
+            @cfg(condition=env == DEV)
+            def a(self):
+                return "a-dev"
+
+            @cfg(condition=env == PROD)
+            def a(self):
+                return "a"
+
+            @cfg(condition=env == DEV)
+            def b(self):
+                return "b-dev"
+
+            @cfg(condition=env == PROD)
+            def b(self):
+                return "b"
+
+            @cfg(condition=env == DEV)
+            def c(self):
+                return "c-dev"
+
+            @cfg(condition=env == PROD)
+            def c(self):
+                return "c"
+
+            @cfg(condition=env == DEV)
+            def d(self):
+                return "d-dev"
+
+            @cfg(condition=env == PROD)
+            def d(self):
+                return "d"
+
+        return Worker
+
+    return build
+
+
+def cfg_factory_decorate_def():
+    def make():
+        def work(self):
+            return 1
+
+        return work
+
+    decorate = cfg(condition=True)
+    work = make()
+    return lambda: decorate(work)
+
+
 # --- call-time scenarios: class built once, method called per iteration ---
 def call_plain_closure():
     def make():
@@ -183,6 +276,9 @@ SCENARIOS = {
     "cfg_closure_true_def": cfg_closure_true_def,
     "cfg_closure_cond_def": cfg_closure_cond_def,
     "cfg_closure_select_def": cfg_closure_select_def,
+    "plain_class_factory_def": plain_class_factory_def,
+    "cfg_class_factory_def": cfg_class_factory_def,
+    "cfg_factory_decorate_def": cfg_factory_decorate_def,
     # call-time
     "call_plain_closure": call_plain_closure,
     "call_cfg_closure": call_cfg_closure,
@@ -206,6 +302,36 @@ def bench(name: str, fn) -> dict:
     }
 
 
+def alloc_bytes(fn) -> int:
+    """Median peak bytes traced while running ``fn`` once."""
+    fn()  # warm caches outside the measurement
+    samples = []
+    tracemalloc.start()
+    try:
+        for _ in range(ALLOC_OPS):
+            gc.collect()
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            samples.append(tracemalloc.get_traced_memory()[1] - start)
+    finally:
+        tracemalloc.stop()
+    return int(statistics.median(samples))
+
+
+def global_state(fn) -> dict:
+    """Global cache writes and resets per run of ``fn``."""
+    fn()
+    reset_stats()
+    generation = _c._cache_generation()
+    for _ in range(ALLOC_OPS):
+        fn()
+    return {
+        "cache_writes_per_op": stats()["cm_cache"]["writes"] / ALLOC_OPS,
+        "cache_resets_per_op": (_c._cache_generation() - generation) / ALLOC_OPS,
+    }
+
+
 def main() -> None:
     env = {
         "python": platform.python_version(),
@@ -218,7 +344,11 @@ def main() -> None:
     results = []
     for name, make in SCENARIOS.items():
         fn = make()
-        results.append(bench(name, fn))
+        result = bench(name, fn)
+        if name.endswith("_def"):
+            result["alloc_bytes_per_op"] = alloc_bytes(fn)
+            result.update(global_state(fn))
+        results.append(result)
 
     doc = {"environment": env, "results": results}
     RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -229,12 +359,21 @@ def main() -> None:
         f"({N} loops, {REPEAT} repeats)"
     )
     print(f"env: {env['python']} on {env['machine']} ({env['platform'][:40]})")
-    print("-" * 72)
-    print(f"{'scenario':26} {'best us/op':>12} {'mean us/op':>12}")
-    print("-" * 72)
+    print("-" * 90)
+    print(
+        f"{'scenario':26} {'best us/op':>12} {'mean us/op':>12} {'bytes/op':>10} "
+        f"{'writes/op':>10} {'resets/op':>10}"
+    )
+    print("-" * 90)
     for r in results:
-        print(f"{r['name']:26} {r['best_us_per_op']:12.3f} {r['mean_us_per_op']:12.3f}")
-    print("-" * 72)
+        alloc = r.get("alloc_bytes_per_op", "")
+        writes = r.get("cache_writes_per_op", "")
+        resets = r.get("cache_resets_per_op", "")
+        print(
+            f"{r['name']:26} {r['best_us_per_op']:12.3f} "
+            f"{r['mean_us_per_op']:12.3f} {alloc:>10} {writes:>10} {resets:>10}"
+        )
+    print("-" * 90)
 
     # sanity: the pattern behaves correctly
     def make():
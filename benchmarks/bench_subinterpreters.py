@@ -0,0 +1,170 @@
+"""Benchmark: building ``@cfg`` classes in parallel sub-interpreters.
+
+The extension uses multi-phase init with per-module state, so every
+interpreter gets its own caches and heap types and, on CPython 3.12+, it can
+be imported in interpreters that own their GIL (PEP 684).  This harness
+builds ``CLASSES`` classes (two ``@cfg`` candidates each) in ``N`` workers at
+once and reports the aggregate throughput for:
+
+    threads          N threads in the main interpreter (one shared GIL)
+    subinterpreters  N threads, each driving its own isolated interpreter
+
+With a per-interpreter GIL the sub-interpreter throughput should scale
+roughly linearly with ``N`` up to the number of cores; the shared-GIL
+threads stay flat.  Interpreters are created (and import
+``conditional_method``) before the clock starts.
+
+Results are written to benchmarks/results/results_subinterpreters.json and a
+human-readable table is printed.  Needs CPython 3.13+ (``_interpreters``) or
+3.14+ (``concurrent.interpreters``); older runtimes print a note and exit.
+
+Run:  python benchmarks/bench_subinterpreters.py
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from pathlib import Path
+
+from conditional_method import __version__, cfg
+
+RESULTS_PATH = Path(__file__).parent / "results" / "results_subinterpreters.json"
+
+CLASSES = 20_000
+REPEAT = 3
+WORKERS = sorted({1, 2, 4, os.cpu_count() or 1})
+
+try:  # CPython 3.13+ (the low-level module behind concurrent.interpreters)
+    import _interpreters
+except ImportError:  # pragma: no cover - depends on the runtime
+    _interpreters = None
+
+BUILD = """
+from conditional_method import cfg
+
+
+def build(n):
+    for i in range(n):
+        class Worker:
+            @cfg(condition=i % 2 == 0)
+            def work(self):
+                return "even"
+
+            @cfg(condition=i % 2 == 1)
+            def work(self):
+                return "odd"
+"""
+
+
+def build(n):
+    for i in range(n):
+
+        class Worker:
+            @cfg(condition=i % 2 == 0)
+            def work(self):
+                return "even"
+
+            @cfg(condition=i % 2 == 1)
+            def work(self):
+                return "odd"
+
+
+def _run_parallel(targets) -> float:
+    threads = [threading.Thread(target=t) for t in targets]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def threads_in_main(workers: int) -> float:
+    return _run_parallel([lambda: build(CLASSES)] * workers)
+
+
+def subinterpreters(workers: int) -> float:
+    interps = [_interpreters.create("isolated") for _ in range(workers)]
+    try:
+        setup = f"import sys\nsys.path[:] = {sys.path!r}\n{BUILD}"
+        for interp in interps:
+            _interpreters.run_string(interp, setup)
+
+        def target(interp):
+            return lambda: _interpreters.run_string(interp, f"build({CLASSES})")
+
+        return _run_parallel([target(interp) for interp in interps])
+    finally:
+        for interp in interps:
+            _interpreters.destroy(interp)
+
+
+SCENARIOS = {
+    "threads": threads_in_main,
+    "subinterpreters": subinterpreters,
+}
+
+
+def bench(name: str, fn, workers: int) -> dict:
+    times = [fn(workers) for _ in range(REPEAT)]
+    best = min(times)
+    return {
+        "name": name,
+        "workers": workers,
+        "classes_per_worker": CLASSES,
+        "repeat": REPEAT,
+        "best_s": best,
+        "mean_s": sum(times) / len(times),
+        "classes_per_s": workers * CLASSES / best,
+    }
+
+
+def main() -> None:
+    if _interpreters is None:
+        print("sub-interpreters need CPython 3.13+; nothing to measure")
+        return
+
+    env = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "implementation": platform.python_implementation(),
+        "version": __version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+    results = []
+    for workers in WORKERS:
+        for name, fn in SCENARIOS.items():
+            results.append(bench(name, fn, workers))
+
+    doc = {"environment": env, "results": results}
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps(doc, indent=2) + "\n")
+
+    base = {r["name"]: r["classes_per_s"] for r in results if r["workers"] == 1}
+    print(
+        f"conditional-method {__version__} — parallel class builds "
+        f"({CLASSES} classes/worker, {REPEAT} repeats)"
+    )
+    print(f"env: {env['python']} on {env['machine']}, {env['cpu_count']} CPUs")
+    print("-" * 64)
+    print(f"{'scenario':18} {'workers':>8} {'classes/s':>14} {'scaling':>10}")
+    print("-" * 64)
+    for r in results:
+        scaling = r["classes_per_s"] / base[r["name"]]
+        print(
+            f"{r['name']:18} {r['workers']:8d} {r['classes_per_s']:14.0f} "
+            f"{scaling:9.2f}x"
+        )
+    print("-" * 64)
+    print(f"wrote {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
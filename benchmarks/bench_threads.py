@@ -0,0 +1,125 @@
+"""Benchmark: ``@cfg`` decoration throughput from a thread pool.
+
+Plugin modules are often imported from worker threads, so every thread
+decorates against the interpreter's shared selection caches.  This harness
+has ``N`` threads each decorate ``DECORATIONS`` functions with distinct
+qualnames (half winners, half raisers, so the cache resets run too) and
+reports the aggregate throughput.
+
+On a free-threaded build (3.13t+) the caches are sharded by qualname hash
+behind per-shard critical sections, so throughput should scale with ``N`` up
+to the number of cores.  With the GIL the threads serialize and the numbers
+stay flat; the run records which case it measured (``gil_enabled``).
+
+Results are written to benchmarks/results/results_threads.json and a
+human-readable table is printed.
+
+Run:  python benchmarks/bench_threads.py
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from pathlib import Path
+
+from conditional_method import __version__, cfg
+
+RESULTS_PATH = Path(__file__).parent / "results" / "results_threads.json"
+
+DECORATIONS = 50_000
+REPEAT = 3
+THREADS = sorted({1, 2, 4, os.cpu_count() or 1})
+
+
+def _functions(worker: int) -> list:
+    funcs = []
+    for i in range(DECORATIONS):
+
+        def f():
+            return 1
+
+        f.__qualname__ = f"W{worker}.m{i}"
+        funcs.append(f)
+    return funcs
+
+
+def decorate(funcs) -> None:
+    for i, f in enumerate(funcs):
+        cfg(f, condition=i % 2 == 0)
+
+
+def run(threads: int) -> float:
+    # Build the functions up front so only decoration is timed.
+    work = [_functions(w) for w in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def target(funcs):
+        barrier.wait()
+        decorate(funcs)
+
+    pool = [threading.Thread(target=target, args=(funcs,)) for funcs in work]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench(threads: int) -> dict:
+    times = [run(threads) for _ in range(REPEAT)]
+    best = min(times)
+    return {
+        "name": "decorate",
+        "threads": threads,
+        "decorations_per_thread": DECORATIONS,
+        "repeat": REPEAT,
+        "best_s": best,
+        "mean_s": sum(times) / len(times),
+        "decorations_per_s": threads * DECORATIONS / best,
+    }
+
+
+def main() -> None:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    env = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "implementation": platform.python_implementation(),
+        "version": __version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "gil_enabled": is_gil_enabled(),
+    }
+
+    results = [bench(threads) for threads in THREADS]
+
+    doc = {"environment": env, "results": results}
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps(doc, indent=2) + "\n")
+
+    base = results[0]["decorations_per_s"]
+    gil = "GIL" if env["gil_enabled"] else "free-threaded"
+    print(
+        f"conditional-method {__version__} — threaded decoration "
+        f"({DECORATIONS} decorations/thread, {REPEAT} repeats)"
+    )
+    print(f"env: {env['python']} ({gil}) on {env['machine']}, {env['cpu_count']} CPUs")
+    print("-" * 52)
+    print(f"{'threads':>8} {'decorations/s':>16} {'scaling':>10}")
+    print("-" * 52)
+    for r in results:
+        scaling = r["decorations_per_s"] / base
+        print(f"{r['threads']:8d} {r['decorations_per_s']:16.0f} {scaling:9.2f}x")
+    print("-" * 52)
+    print(f"wrote {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,9 @@
 # for src/conditional_method/_c.c and fails if the line coverage is below the
 # threshold.
 #
-# Import-time-only functions (PyInit__c, CfgCallable_new_wrapper) are
-# excluded from the accounting: their CFG_ALLOC_FAIL_GUARD branches fire only
+# Import-time-only functions (PyInit__c, the Py_mod_exec slot
+# cfg_module_exec and its helpers, CfgCallable_new_wrapper) are excluded
+# from the accounting: their CFG_ALLOC_FAIL_GUARD branches fire only
 # during module import, when the PY_CFG_TESTING fail counter is not armed, so
 # they are unreachable by any test.  Counting them would punish every feature
 # that adds import-time state (e.g. a new cache) with permanently-uncovered
@@ -48,7 +49,7 @@ fi
 
 # 4. Compute testable coverage: take the last (authoritative) Lines-executed
 #    total for _c.c from the gcov stdout, then drop import-time-only lines.
-EXCLUDED_FUNCS="PyInit__c|CfgCallable_new_wrapper"
+EXCLUDED_FUNCS="PyInit__c|cfg_runtime_minor|cfg_module_exec|cfg_module_add|cfg_add_type|CfgCallable_new_wrapper"
 TOTAL=$(echo "$GCOV_OUT" | awk '
   /^File .*src\/conditional_method\/_c.c/ { want=1; next }
   want && /^Lines executed:[0-9.]+% of [0-9]+/ { total=$0 }
@@ -2,19 +2,23 @@
 
 The core implementation is a C extension (``conditional_method._c``)
 built with the Limited API / Stable ABI (abi3) so a single ``cp39-abi3``
-wheel covers CPython 3.9+.  There is no pure-Python implementation; the
-package requires the C extension.
+wheel covers CPython 3.9+.  Free-threaded interpreters (3.13t+) have no
+stable ABI, so those builds get a regular version-specific wheel instead.
+There is no pure-Python implementation; the package requires the C
+extension.
 """
 
 import sys
+import sysconfig
 
 from setuptools import Extension, setup
 
 IS_EMSCRIPTEN = sys.platform == "emscripten"
+IS_FREE_THREADED = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
 
 ext_kwargs = {}
 options = {}
-if not IS_EMSCRIPTEN:
+if not IS_EMSCRIPTEN and not IS_FREE_THREADED:
     ext_kwargs["py_limited_api"] = True
     options["bdist_wheel"] = {"py_limited_api": "cp39"}
 
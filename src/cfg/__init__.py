@@ -6,9 +6,18 @@ written against the earlier name keeps working; new code should import
 from ``conditional_method``.
 """
 
+from typing import Any
+
 from conditional_method import *  # noqa: F401,F403
 from conditional_method import (
     __all__,  # noqa: F401  (re-export)
     __version__,  # noqa: F401  (re-export)
     _c,  # noqa: F401  (expose conditional_method._c)
 )
+
+
+def __getattr__(name: str) -> Any:
+    # The names conditional_method imports on first use.
+    import conditional_method
+
+    return getattr(conditional_method, name)
@@ -2,7 +2,7 @@
 
 Public API::
 
-    from conditional_method import cfg, cm, if_, cfg_attr
+    from conditional_method import cfg, cm, if_, cfg_attr, reselect
 
 The implementation is a C extension module (``conditional_method._c``) built
 with the Limited API (abi3, cp39+) so a single wheel covers CPython 3.9-3.14
@@ -10,18 +10,31 @@ and wasm/Emscripten.  ``import conditional_method`` requires the C extension;
 there is no pure-Python fallback.
 """
 
+from __future__ import annotations
+
+import sys
+import weakref
+from collections.abc import Callable, Iterator, Mapping
 from importlib.metadata import PackageNotFoundError, version
+from typing import Any
 
 from ._c import (
+    _freeze,
+    _frozen,
     _get_failed,
     _get_mod_qual_func_name,
     assert_all_true,
+    cache_policy,
     cfg,
     cfg_attr,
     cm,
     debug,
     debug_enabled,
     if_,
+    reselect,
+    reset_stats,
+    set_cache_policy,
+    stats,
 )
 
 
@@ -59,6 +72,111 @@ def assert_all_true() -> None:
         )
 
 
+class _Snapshot(Mapping[str, Callable[..., Any]]):
+    """Read-only view of the winners :func:`freeze` found.  Winners are held
+    by weak reference where they support one, as the selection caches hold
+    them, so a winner whose class or module is collected leaves the
+    snapshot."""
+
+    def __init__(self, winners: Mapping[str, Callable[..., Any]]) -> None:
+        self._weak: dict[str, weakref.ref[Any]] = {}
+        self._strong: dict[str, Callable[..., Any]] = {}
+        for name, winner in winners.items():
+            try:
+                self._weak[name] = weakref.ref(winner)
+            except TypeError:
+                self._strong[name] = winner
+
+    def __getitem__(self, name: str) -> Callable[..., Any]:
+        if name in self._strong:
+            return self._strong[name]
+        winner = self._weak[name]()
+        if winner is None:
+            raise KeyError(name)
+        return winner
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._strong
+        for name, ref in list(self._weak.items()):
+            if ref() is not None:
+                yield name
+
+    def __len__(self) -> int:
+        return len(self._strong) + sum(
+            ref() is not None for ref in list(self._weak.values())
+        )
+
+    def __repr__(self) -> str:
+        return f"<frozen selection: {len(self)} winners>"
+
+
+_snapshot: Mapping[str, Callable[..., Any]] | None = None
+
+
+def freeze(*, on_decorate: str = "raise") -> Mapping[str, Callable[..., Any]]:
+    """Validate the selection registry and freeze it once startup is over.
+
+    Runs :func:`assert_all_true` (raising :class:`ConditionFailureError`
+    and leaving the registry as it was when a name has no true condition),
+    then releases the selection caches, the candidate registry behind
+    :func:`reselect` and the other per-name bookkeeping, which only later
+    decorations would read.  Returns a read-only snapshot of the selected
+    winners (``"module.qualname"`` -> function) still alive, held weakly
+    where they allow it, as the caches hold them.
+
+    `on_decorate` sets what a decoration or :func:`reselect` made later
+    does: ``"raise"`` (the default) raises :class:`RuntimeError`, and
+    ``"thaw"`` unfreezes the registry and proceeds in a new cache
+    generation.  ``lazy=True`` names decorated before the freeze still
+    resolve on first use.
+    """
+    global _snapshot
+    if on_decorate not in ("raise", "thaw"):
+        raise ValueError(f"on_decorate must be 'raise' or 'thaw', not {on_decorate!r}")
+    assert_all_true()
+    manifest = sys.modules.get(f"{__name__}.manifest")
+    if manifest is not None:
+        manifest._save_before_freeze()
+    _snapshot = _Snapshot(_freeze(on_decorate == "thaw"))
+    return _snapshot
+
+
+def frozen() -> Mapping[str, Callable[..., Any]] | None:
+    """Return the snapshot taken by :func:`freeze` while the registry is
+    frozen, else None."""
+    return _snapshot if _frozen() else None
+
+
+def __getattr__(name: str):
+    # ``conditional_method.trace``, ``profile_imports``, the import hook and
+    # the selection manifest are imported on first use, so the package import
+    # stays as cheap as the extension import.
+    if name == "trace":
+        import importlib
+
+        return importlib.import_module(f"{__name__}.trace")
+    if name == "profile_imports":
+        from .importtime import profile_imports
+
+        return profile_imports
+    if name in ("install_import_hook", "uninstall_import_hook"):
+        from . import importhook
+
+        return getattr(importhook, name)
+    if name == "use_manifest":
+        from .manifest import use_manifest
+
+        return use_manifest
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if debug_enabled():
+    import atexit
+
+    from . import trace
+
+    atexit.register(trace.dump)
+
 try:
     __version__: str = version("conditional-method")
 except PackageNotFoundError:  # pragma: no cover - editable/source installs
@@ -76,4 +194,14 @@ __all__ = [
     "cfg_attr",
     "debug",
     "debug_enabled",
+    "reselect",
+    "stats",
+    "reset_stats",
+    "cache_policy",
+    "set_cache_policy",
+    "freeze",
+    "frozen",
 ]
+# profile_imports, install_import_hook, uninstall_import_hook and
+# use_manifest are left out: listing them would make a star import (and the
+# `cfg` alias) import their modules eagerly (see __getattr__).
@@ -8,10 +8,16 @@ give editors/type checkers the precise call patterns via @overload:
   - Same for cfg_attr with decorators=[...]
   - cm / if_ are aliases of cfg.
 
-`condition` is either a bool (static selection) or a callable that receives
-the decorated function and returns a bool (evaluated at decoration time).
+`condition` is either a bool (static selection), a callable that receives
+the decorated function and returns a bool (evaluated at decoration time), or
+a native condition built from `cfg.env(...)` / `cfg.flag(...)` with `&`, `|`
+and `~` (evaluated by the extension without a Python call).
 When False, the decorated function is replaced by a TypeErrorRaiser that
 raises TypeError on call/__set_name__ (a build-time guard, not a drop).
+With `lazy=True` the condition is evaluated on first use of the name
+instead; the selector is typed as the function it resolves to.
+`depends_on` names the inputs a condition reads, for reselect(), and
+`pure=True` memoizes a callable condition that ignores its argument.
 
 Note: cfg_attr applies arbitrary decorators, which may transform the
 function's type; we preserve the original type as a best-effort (the C
@@ -20,21 +26,89 @@ extension keeps the wrapped callable).
 
 from __future__ import annotations
 
-from collections.abc import Callable, Sequence
-from typing import Any, TypeVar, overload
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+from typing import Any, Literal, NoReturn, Protocol, TypedDict, TypeVar, overload
 
-_F = TypeVar("_F", bound=Callable[..., Any])
+# Decision tracing, the import profiler and the import hook (imported on
+# first attribute access).
+from . import trace as trace
+from .importhook import install_import_hook as install_import_hook
+from .importhook import uninstall_import_hook as uninstall_import_hook
+from .importtime import profile_imports as profile_imports
+from .manifest import use_manifest as use_manifest
 
-Condition = bool | Callable[[Callable[..., Any]], bool]
+_F = TypeVar("_F", bound=Callable[..., Any])
+_C = TypeVar("_C", bound=type)
+
+class _Condition:
+    """Native condition built with ``cfg.env``/``cfg.flag`` and ``&``, ``|``,
+    ``~``; evaluated by the extension without calling into Python."""
+
+    @property
+    def keys(self) -> frozenset[str]: ...
+    def __call__(self, *args: Any, **kwargs: Any) -> bool: ...
+    def __eq__(self, other: str) -> _Condition: ...  # type: ignore[override]
+    def __ne__(self, other: str) -> _Condition: ...  # type: ignore[override]
+    def __and__(self, other: _Condition | bool) -> _Condition: ...
+    def __rand__(self, other: bool) -> _Condition: ...
+    def __or__(self, other: _Condition | bool) -> _Condition: ...
+    def __ror__(self, other: bool) -> _Condition: ...
+    def __invert__(self) -> _Condition: ...
+    def __bool__(self) -> NoReturn: ...
+    def __hash__(self) -> int: ...
+
+Condition = bool | _Condition | Callable[[Callable[..., Any]], bool]
+Keys = Hashable | Iterable[Hashable]
+
+class _Cfg(Protocol):
+    @overload
+    def __call__(
+        self,
+        func: _F,
+        *,
+        condition: Condition,
+        lazy: bool = ...,
+        depends_on: Keys | None = ...,
+        pure: bool = ...,
+    ) -> _F: ...
+    @overload
+    def __call__(
+        self,
+        func: _F,
+        condition: Condition,
+        *,
+        lazy: bool = ...,
+        depends_on: Keys | None = ...,
+        pure: bool = ...,
+    ) -> _F: ...
+    @overload
+    def __call__(
+        self,
+        *,
+        condition: Condition,
+        lazy: bool = ...,
+        depends_on: Keys | None = ...,
+        pure: bool = ...,
+    ) -> Callable[[_F], _F]: ...
+    @overload
+    def __call__(
+        self,
+        condition: Condition,
+        *,
+        lazy: bool = ...,
+        depends_on: Keys | None = ...,
+        pure: bool = ...,
+    ) -> Callable[[_F], _F]: ...
+    def env(self, name: str, /) -> _Condition: ...
+    def flag(self, name: str, /) -> _Condition: ...
+    def invalidate_conditions(self, *conditions: Callable[..., Any]) -> None: ...
+    def resolve_class(self, cls: _C, /) -> _C: ...
+    def set_flags(
+        self, flags: Mapping[str, object] | None = ..., /, **kwargs: object
+    ) -> list[str]: ...
+
+cfg: _Cfg
 
-@overload
-def cfg(func: _F, *, condition: Condition) -> _F: ...
-@overload
-def cfg(func: _F, condition: Condition) -> _F: ...
-@overload
-def cfg(*, condition: Condition) -> Callable[[_F], _F]: ...
-@overload
-def cfg(condition: Condition) -> Callable[[_F], _F]: ...
 @overload
 def cfg_attr(
     func: _F,
@@ -75,6 +149,47 @@ def debug_enabled() -> bool: ...
 def assert_all_true() -> None: ...
 def pending_failures() -> list[str]: ...
 def _get_failed() -> list[str]: ...
+def reselect(changed_keys: Keys | None = ...) -> list[str]: ...
+
+class _CacheStats(TypedDict):
+    hits: int
+    misses: int
+    writes: int
+    dead_weakrefs: int
+    stale: int
+    sweeps: int
+    swept: int
+    evicted: int
+
+class _Stats(TypedDict):
+    cm_cache: _CacheStats
+    cfg_attr_cache: _CacheStats
+    raisers: int
+    condition_calls: int
+    condition_ns: int
+    manifest_hits: int
+
+def stats() -> _Stats: ...
+def reset_stats() -> None: ...
+
+class _CachePolicy(TypedDict):
+    policy: Literal["sweep", "clock"]
+    max_size: int | None
+    sweep_threshold: int
+    dead_sweep_threshold: int
+
+def cache_policy() -> _CachePolicy: ...
+def set_cache_policy(
+    *,
+    policy: Literal["sweep", "clock"] = ...,
+    max_size: int | None = ...,
+    sweep_threshold: int = ...,
+    dead_sweep_threshold: int = ...,
+) -> None: ...
+def freeze(
+    *, on_decorate: Literal["raise", "thaw"] = ...
+) -> Mapping[str, Callable[..., Any]]: ...
+def frozen() -> Mapping[str, Callable[..., Any]] | None: ...
 
 # The C extension submodule (implementation internals; not part of the
 # public API but importable, e.g. by the legacy `cfg` shim). No stub is
@@ -96,4 +211,15 @@ __all__ = [
     "_get_failed",
     "debug",
     "debug_enabled",
+    "reselect",
+    "stats",
+    "reset_stats",
+    "cache_policy",
+    "set_cache_policy",
+    "freeze",
+    "frozen",
+    "profile_imports",
+    "install_import_hook",
+    "uninstall_import_hook",
+    "use_manifest",
 ]
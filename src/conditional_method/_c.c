@@ -1,4 +1,5 @@
 #include <Python.h>
+#include <string.h>
 #include <structmember.h>
 
 /* Test-only allocation-failure injection (PY_CFG_TESTING).
@@ -52,6 +53,46 @@ static PyObject *cfg_set_alloc_fail_count(PyObject *Py_UNUSED(self),
 #define CFG_ALLOC_FAIL_GUARD_VOID()
 #endif
 
+/* Test-only allocation accounting (PY_CFG_TESTING): per path, the objects
+ * the extension creates and releases on it, so a soak test can tell a
+ * steady state from a leak.  alloc_counts() returns {path: (created,
+ * released)} and reset_alloc_counts() zeroes them.  Process-wide like the
+ * failure counter, and not atomic: read them with one thread decorating. */
+#ifdef PY_CFG_TESTING
+enum {
+  CFG_ACCT_RAISER,       /* raisers (cfg_raiser_alloc / dealloc) */
+  CFG_ACCT_CACHE_ENTRY,  /* values stored in / dropped by the cache tables */
+  CFG_ACCT_QUALNAME_KEY, /* code-address keys of the qualname cache lookup */
+  CFG_ACCT_PATHS
+};
+static const char *const cfg_acct_names[CFG_ACCT_PATHS] = {
+    "raiser", "cache_entry", "qualname_key"};
+static unsigned long long _cfg_acct[CFG_ACCT_PATHS][2];
+#define CFG_ACCT_CREATED(path) (_cfg_acct[path][0]++)
+#define CFG_ACCT_RELEASED(path) (_cfg_acct[path][1]++)
+static PyObject *cfg_alloc_counts(PyObject *Py_UNUSED(self),
+                                  PyObject *Py_UNUSED(ignored)) {
+  PyObject *counts = PyDict_New();
+  for (int i = 0; counts != NULL && i < CFG_ACCT_PATHS; i++) {
+    PyObject *pair = Py_BuildValue("(KK)", _cfg_acct[i][0], _cfg_acct[i][1]);
+    if (pair == NULL ||
+        PyDict_SetItemString(counts, cfg_acct_names[i], pair) < 0) {
+      Py_CLEAR(counts);
+    }
+    Py_XDECREF(pair);
+  }
+  return counts;
+}
+static PyObject *cfg_reset_alloc_counts(PyObject *Py_UNUSED(self),
+                                        PyObject *Py_UNUSED(ignored)) {
+  memset(_cfg_acct, 0, sizeof(_cfg_acct));
+  Py_RETURN_NONE;
+}
+#else
+#define CFG_ACCT_CREATED(path) ((void)0)
+#define CFG_ACCT_RELEASED(path) ((void)0)
+#endif
+
 /* In production these expand to (0): the allocation error branches are only
  * reachable when a real allocation fails.  Under PY_CFG_TESTING they also
  * fire when the guard counter matches, so the `if (x == NULL ||
@@ -69,12 +110,70 @@ static PyObject *cfg_set_alloc_fail_count(PyObject *Py_UNUSED(self),
 #define CFG_ALLOC_TEST_FAIL_VOID() (0)
 #endif
 
-#include <stdarg.h>
+/* --- METH_FASTCALL and vectorcall on the stable ABI ---
+ *
+ * The abi3 wheel is built against the 3.9 Limited API, whose headers hide
+ * METH_FASTCALL (Limited API since 3.10) and the vectorcall protocol (since
+ * 3.12).  Both were final in 3.8, and every later release keeps the same
+ * flag bits, offsets and calling conventions (which is why they could join
+ * the Limited API unchanged), so they are spelled out here where the
+ * headers hide them.  `kwnames` is the tuple of keyword names (or NULL);
+ * their values follow the positional arguments in `args`. */
+#ifndef METH_FASTCALL
+#define METH_FASTCALL 0x0080
+#endif
+#ifndef Py_TPFLAGS_HAVE_VECTORCALL
+#define Py_TPFLAGS_HAVE_VECTORCALL (1UL << 11)
+#endif
+#ifndef PY_VECTORCALL_ARGUMENTS_OFFSET
+#define PY_VECTORCALL_ARGUMENTS_OFFSET ((size_t)1 << (8 * sizeof(size_t) - 1))
+#endif
+typedef PyObject *(*cfg_fastcallfunc)(PyObject *self, PyObject *const *args,
+                                      Py_ssize_t nargs, PyObject *kwnames);
+typedef PyObject *(*cfg_vectorcallfunc)(PyObject *callable,
+                                        PyObject *const *args, size_t nargsf,
+                                        PyObject *kwnames);
+
+/* The buffer protocol is in the Limited API since 3.11; the 3.9 headers
+ * hide Py_buffer and the buffer type slots, which 3.9 runtimes accept from
+ * PyType_FromSpec with this same layout. */
+#if defined(Py_LIMITED_API) && Py_LIMITED_API + 0 < 0x030B0000
+typedef struct bufferinfo {
+  void *buf;
+  PyObject *obj;
+  Py_ssize_t len;
+  Py_ssize_t itemsize;
+  int readonly;
+  int ndim;
+  char *format;
+  Py_ssize_t *shape;
+  Py_ssize_t *strides;
+  Py_ssize_t *suboffsets;
+  void *internal;
+} Py_buffer;
+#define PyBUF_WRITABLE 0x0001
+#define PyBUF_FORMAT 0x0004
+#define PyBUF_ND 0x0008
+#define PyBUF_STRIDES (0x0010 | PyBUF_ND)
+#define Py_bf_getbuffer 1
+#define Py_bf_releasebuffer 2
+#endif
+
+#include <limits.h>
+#include <stdint.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <time.h>
+#endif
 
-/* --- Debug logger (pure C, mirrors the old Python _logger) --- */
+/* --- Debug logger (pure C, mirrors the old Python _logger) ---
+ *
+ * `debug()` writes straight to stderr.  The selection paths themselves do not
+ * log; they record into the trace ring (see "Decision tracing"). */
 #define CFG_DEBUG_ENV_KEY "__conditional_method_debug__"
 
 static int _debug_enabled(void) {
@@ -85,18 +184,6 @@ static int _debug_enabled(void) {
   return strcmp(val, "false") != 0;
 }
 
-static void _cfg_log(const char *fmt, ...) {
-  if (!_debug_enabled()) {
-    return;
-  }
-  va_list ap;
-  va_start(ap, fmt);
-  fprintf(stderr, "conditional_method - DEBUG - ");
-  vfprintf(stderr, fmt, ap);
-  fprintf(stderr, "\n");
-  va_end(ap);
-}
-
 static PyObject *cfg_debug(PyObject *Py_UNUSED(self), PyObject *args) {
   if (!_debug_enabled()) {
     Py_RETURN_NONE;
@@ -131,181 +218,635 @@ static PyObject *cfg_debug_enabled(PyObject *Py_UNUSED(self),
 }
 
 /* Forward declarations */
-static PyObject *_cm_wrapper(PyObject *self, PyObject *args);
-static PyObject *cfg_attr_wrapper(PyObject *self, PyObject *args);
+static PyObject *_cm_wrapper(PyObject *self, PyObject *func);
+static PyObject *cfg_attr_wrapper(PyObject *self, PyObject *func);
 static PyObject *_cm_inner(PyObject *self, PyObject *args);
 static PyObject *_cm_inner_fast(PyObject *self, PyObject *func,
-                                PyObject *condition);
+                                PyObject *condition, PyObject *keys);
+static PyObject *cfg_lazy_add(PyObject *module, PyObject *func,
+                              PyObject *condition, PyObject *keys);
+static PyObject *cfg_resolve_class(PyObject *self, PyObject *cls);
 static PyObject *_raise_exec(PyObject *self, PyObject *args);
+static PyObject *cfg_dict_get(PyObject *dict, PyObject *key);
 static PyObject *_get_func_name(PyObject *self, PyObject *func);
-static PyObject *cm(PyObject *self, PyObject *args, PyObject *kwargs);
-static PyObject *cfg_attr(PyObject *self, PyObject *args, PyObject *kwargs);
+static PyObject *cm(PyObject *self, PyObject *const *args, Py_ssize_t nargs,
+                    PyObject *kwnames);
+static PyObject *cfg_attr(PyObject *self, PyObject *const *args,
+                          Py_ssize_t nargs, PyObject *kwnames);
 
 /* Method definitions for wrappers */
 static PyMethodDef cm_wrapper_def = {
-    "_cm_wrapper", (PyCFunction)(void (*)(void))_cm_wrapper, METH_VARARGS,
+    "_cm_wrapper", _cm_wrapper, METH_O,
     "Wrapper for @cfg with a closure-held condition."};
 
 static PyMethodDef cfg_attr_wrapper_def = {
-    "cfg_attr_wrapper", (PyCFunction)cfg_attr_wrapper, METH_VARARGS,
+    "cfg_attr_wrapper", cfg_attr_wrapper, METH_O,
     "Wrapper function for cfg_attr when used as a decorator"};
 
-/* Module level caches: one for cm/cfg/if_, one for cfg_attr */
-static PyObject *_cm_cache = NULL;
-static PyObject *_cfg_attr_cache = NULL;
-/* Set of qualnames whose current cached value is a TypeErrorRaiser (i.e.
- * decorated names that ended up with no true condition).  Populated in
- * _cm_inner's false path and in the cfg_attr raiser paths; a later
- * condition=True winner removes its qualname.  This is NOT cleared by
- * TypeErrorRaiser_new (which clears the caches for runtime last-wins
- * semantics) and is NOT cleared by _raise_typeerror: it is append-only per
- * name so that assert_all_true()/_get_failed() reflect every failure that
- * had no true winner (not just the most recent one).  A name is only
- * removed again when a later condition=True winner for that same name
- * resolves it (PySet_Discard in the true paths). */
-static PyObject *_failed_qualnames = NULL;
-/* The `weakref.ref` type, grabbed from the `weakref` module at init and
- * held for the module lifetime.  Used to distinguish weakref cache values
- * (true winners) from strong ones (type-error raisers) in cache_get_live. */
-static PyObject *CFG_weakref_ref_type = NULL;
-
-/* TypeErrorRaiser type declaration */
+/* --- Free-threaded builds (PEP 703) ---
+ *
+ * On a GIL-less interpreter every selection cache is split into
+ * CFG_CACHE_SHARDS shards picked by the qualname's hash, and each shard is
+ * only touched inside its own critical section (CFG_SHARD_LOCK), so threads
+ * decorating different names rarely contend on the same lock.  The cache
+ * generation is an atomic counter.  On GIL builds there is a single shard
+ * and the lock macros compile away.  CFG_CACHE_SHARDS may be overridden at
+ * build time (a power of two), e.g. to exercise the sharded layout on a GIL
+ * build.
+ *
+ * The free-threaded build cannot use the Limited API (there is no abi3 for
+ * it), so the FT-only paths freely use 3.13+ API: critical sections,
+ * PyDict_GetItemRef, PyWeakref_GetRef and the pyatomic helpers. */
+#ifndef CFG_CACHE_SHARDS
+#ifdef Py_GIL_DISABLED
+#define CFG_CACHE_SHARDS 16
+#else
+#define CFG_CACHE_SHARDS 1
+#endif
+#endif
+
+#if CFG_CACHE_SHARDS < 1 || (CFG_CACHE_SHARDS & (CFG_CACHE_SHARDS - 1)) != 0
+#error "CFG_CACHE_SHARDS must be a power of two"
+#endif
+
+#ifdef Py_GIL_DISABLED
+#define CFG_OBJECT_LOCK(obj) Py_BEGIN_CRITICAL_SECTION(obj)
+#define CFG_OBJECT_UNLOCK() Py_END_CRITICAL_SECTION()
+#else
+#define CFG_OBJECT_LOCK(obj) {
+#define CFG_OBJECT_UNLOCK() }
+#endif
+/* A shard's table is native memory, so its critical section is taken on
+ * the shard's weakref callback object, which lives as long as the table. */
+#define CFG_SHARD_LOCK(shard) CFG_OBJECT_LOCK((shard)->evict)
+#define CFG_SHARD_UNLOCK() CFG_OBJECT_UNLOCK()
+
+/* Selection caches: one for cm/cfg/if_, one for cfg_attr.
+ *
+ * Each shard keeps its entries in a CfgTable (see "Cache tables"): per
+ * qualname, a weakref to the winner or the TypeErrorRaiser placeholder,
+ * tagged with the cache generation the entry was written in (see
+ * cfg_cache_reset): an entry whose generation is not the current one is
+ * stale and reads as absent.  `_cm_cache` / `cm._cache` is a read-only
+ * _CacheView over the shards.  A shard is only read or written inside
+ * CFG_SHARD_LOCK. */
+/* Counters of one shard (see "Statistics"), bumped under the shard lock.
+ * They only grow until reset_stats(). */
 typedef struct {
-  PyObject_HEAD PyObject
-      *f_qualnames;   /* Set of function qualnames that failed conditions */
-  PyObject *qualname; /* Qualified name for the raiser */
-} TypeErrorRaiserObject;
+  uint64_t hits;    /* lookups that found a live entry */
+  uint64_t misses;  /* lookups that found none (absent, dead or stale) */
+  uint64_t writes;  /* entries stored */
+  uint64_t dead;    /* dead weakrefs reclaimed, by lookups and sweeps */
+  uint64_t stale;   /* older-generation entries reclaimed */
+  uint64_t sweeps;  /* shard_prune_dead passes */
+  uint64_t swept;   /* entries those passes removed */
+  uint64_t evicted; /* raisers evicted to stay within the max size */
+} CfgCacheStats;
+
+/* How a cache reclaims entries (see "Cache policy"): full sweeps only, or
+ * also a CLOCK hand advanced on every write. */
+enum { CFG_POLICY_SWEEP, CFG_POLICY_CLOCK, CFG_POLICY_COUNT };
+
+static const char *const cfg_policy_names[CFG_POLICY_COUNT] = {"sweep",
+                                                               "clock"};
+
+/* A cache policy, for a whole cache (module state) or one shard's share of
+ * it.  `max_size` 0 means unbounded. */
+typedef struct {
+  int policy;
+  Py_ssize_t max_size;
+  Py_ssize_t sweep_threshold;
+  Py_ssize_t dead_sweep_threshold;
+} CfgCachePolicy;
 
-static void TypeErrorRaiser_dealloc(TypeErrorRaiserObject *self) {
-  PyObject_GC_UnTrack(self);
-  Py_XDECREF(self->f_qualnames);
-  Py_XDECREF(self->qualname);
-  Py_TYPE(self)->tp_free((PyObject *)self);
-}
+/* --- Cache tables ---
+ *
+ * An open-addressing hash table of 32-byte slots: the key, the stored
+ * object with CFG_SLOT_* tag bits in its low bits, the key's hash and the
+ * generation the entry was written in.  A selection cache used to keep
+ * each entry in two dicts (entries and generations), a mark set and a
+ * reverse-index dict; the table holds all of it inline, so a lookup is one
+ * probe sequence and reading an entry's generation or mark is a field
+ * load.  Probing follows dict's perturbed sequence over a power-of-two
+ * capacity kept at most 2/3 full, and removed slots stay as tombstones
+ * until the next resize.
+ *
+ * Keys are compared by identity first: the cache keys are interned
+ * qualnames, so a hit costs a pointer comparison.  A str key that is not
+ * the interned object still matches by value.
+ *
+ * `refs`, allocated with the slots, is the reverse index of the winner
+ * weakrefs: a second open-addressing array, of slot numbers, hashed by the
+ * weakref's address.  It lets the weakref's callback (see cfg_cache_evict)
+ * find the entry of a winner that died, at 4 bytes per slot.  The table
+ * holds no references itself; the shard code owns what it stores. */
+#define CFG_SLOT_WEAK ((uintptr_t)1) /* the object is a winner weakref */
+#define CFG_SLOT_MARK ((uintptr_t)2) /* looked up since the hand passed */
+#define CFG_SLOT_TAGS (CFG_SLOT_WEAK | CFG_SLOT_MARK)
+#define CFG_SLOT_OBJECT(slot) ((PyObject *)((slot)->value & ~CFG_SLOT_TAGS))
 
-static int TypeErrorRaiser_traverse(TypeErrorRaiserObject *self,
-                                    visitproc visit, void *arg) {
-  Py_VISIT(self->f_qualnames);
-  Py_VISIT(self->qualname);
-  return 0;
-}
+typedef struct {
+  PyObject *key; /* NULL: never used; CFG_SLOT_DELETED: removed */
+  uintptr_t value;
+  Py_hash_t hash;
+  uint64_t generation;
+} CfgSlot;
 
-static int TypeErrorRaiser_clear(TypeErrorRaiserObject *self) {
-  Py_CLEAR(self->f_qualnames);
-  Py_CLEAR(self->qualname);
-  return 0;
+typedef struct {
+  CfgSlot *slots; /* NULL until the first insert */
+  uint32_t *refs; /* slot numbers, or CFG_REF_EMPTY / CFG_REF_DELETED */
+  size_t mask;    /* capacity - 1 */
+  Py_ssize_t used;
+  Py_ssize_t filled;      /* used and removed slots */
+  Py_ssize_t refs_filled; /* the same in `refs` */
+} CfgTable;
+
+typedef struct {
+  CfgTable table; /* qualname -> weakref(winner) | raiser, with generation */
+  PyObject *evict;
+  Py_ssize_t dead_since_sweep;   /* #6: dead/stale entries seen since sweep */
+  Py_ssize_t writes_since_sweep; /* paces the sweeps (see shard_maintain) */
+  size_t hand;                   /* CLOCK hand: a slot index in `table` */
+  CfgCachePolicy policy;         /* this shard's share of the cache policy */
+  CfgCacheStats stats;
+} CfgCacheShard;
+
+typedef struct {
+  CfgCacheShard shards[CFG_CACHE_SHARDS];
+  PyObject *exposed; /* `_cm_cache` / `cm._cache`: a _CacheView */
+} CfgCache;
+
+/* Per-module state (multi-phase init, PEP 489).
+ *
+ * Every piece of mutable state lives here rather than in C globals, so each
+ * module object -- one per (sub-)interpreter, or a second instance loaded
+ * with importlib -- has its own caches, failure set and heap types, and
+ * interpreters with their own GIL (PEP 684) never share a mutable object.
+ * C entry points reach the state through their `self`: the module itself
+ * for the module-level functions and the cfg/cm/cfg_attr aliases, a closure
+ * tuple whose first item is the module for the decorator-factory wrappers,
+ * and the `_cfg_module` back-reference on the heap types for
+ * TypeErrorRaiser (see cfg_state_from_type). */
+/* One decision in the trace ring (see "Decision tracing"): 56 bytes, laid
+ * out as CFG_DECISION_FORMAT.  `event` is 0 in a slot never written. */
+typedef struct {
+  uint64_t seq;      /* position in the stream of recorded events */
+  int64_t time_ns;   /* monotonic clock when the decision was made */
+  int64_t cost_ns;   /* time spent evaluating the condition (0: none) */
+  int64_t total_ns;  /* time spent in the whole decoration (0: not timed) */
+  int64_t chain_ns;  /* time spent in the decorators cfg_attr applied */
+  uint32_t name;     /* index into `trace_names` */
+  int32_t candidate; /* index among the name's candidates, -1 unknown */
+  uint8_t event;     /* CFG_TRACE_* */
+  uint8_t kind;      /* CFG_KIND_* */
+  uint8_t result;    /* 0, 1 or CFG_RESULT_PENDING */
+  uint8_t reserved[5];
+} CfgDecision;
+
+typedef struct {
+  CfgCache cm_cache;
+  CfgCache cfg_attr_cache;
+  /* Set of qualnames whose current cached value is a TypeErrorRaiser (i.e.
+   * decorated names that ended up with no true condition).  Populated in
+   * _cm_inner's false path and in the cfg_attr raiser paths; a later
+   * condition=True winner removes its qualname.  This is NOT cleared by
+   * TypeErrorRaiser_new (which resets the caches for runtime last-wins
+   * semantics) and is NOT cleared by _raise_typeerror: it is append-only per
+   * name so that assert_all_true()/_get_failed() reflect every failure that
+   * had no true winner (not just the most recent one).  A name is only
+   * removed again when a later condition=True winner for that same name
+   * resolves it (PySet_Discard in the true paths). */
+  PyObject *failed_qualnames;
+  /* The `weakref.ref` type, grabbed from the `weakref` module at exec time.
+   * Used to distinguish weakref cache values (true winners) from strong ones
+   * (type-error raisers) in cache_get_live. */
+  PyObject *weakref_ref_type;
+  /* `types.FunctionType`: plain functions have no __set_name__ to look up
+   * when a winner is installed (see cfg_install), and their qualified names
+   * are cached (see _get_func_name). */
+  PyObject *function_type;
+  /* code address -> (__qualname__, __module__, interned key), and the
+   * interned attribute names read while building a key. */
+  PyObject *qualname_cache;
+  PyObject *str_code;
+  PyObject *str_module;
+  PyObject *str_name;
+  PyObject *str_qualname;
+  /* Interned keyword names cm and cfg_attr match on every call. */
+  PyObject *str_condition;
+  PyObject *str_decorators;
+  PyObject *str_depends_on;
+  PyObject *str_lazy;
+  PyObject *str_pure;
+  /* "<locals>", the frame and code attributes read to find the frame that
+   * builds a name defined inside a function, and the list of [frame, dict]
+   * build scopes of those frames (see build_scope). */
+  PyObject *str_locals;
+  PyObject *str_f_back;
+  PyObject *str_f_code;
+  PyObject *str_co_name;
+  PyObject *str_co_flags;
+  PyObject *build_scopes;
+  /* Cache generation (epoch).  A "reset" of the selection state (a new
+   * TypeErrorRaiser, or one firing) used to PyDict_Clear both caches, which
+   * is O(N) in the number of cached winners and throws them all away on
+   * every disabled variant.  Instead it is an O(1) bump of this counter:
+   * entries written in an older generation are treated as absent by lookups
+   * and reclaimed lazily (on the lookup that finds them, or by the next
+   * sweep).  Atomic on free-threaded builds (read and bumped without any
+   * shard lock). */
+  uint64_t cache_generation;
+  /* CFG_THAWED, or what a decoration does after freeze() (see "Frozen
+   * registry").  Atomic on free-threaded builds. */
+  int frozen;
+  /* Engine counters outside the caches (see "Statistics"): raisers built,
+   * callable conditions called and the time spent in them, and the
+   * conditions the selection manifest answered.  Atomic on free-threaded
+   * builds. */
+  uint64_t stat_raisers;
+  uint64_t stat_condition_calls;
+  uint64_t stat_condition_ns;
+  uint64_t stat_manifest_hits;
+  /* The cache policy set with set_cache_policy(), for both caches (each
+   * shard holds its share); read and written under the module's lock. */
+  CfgCachePolicy cache_policy;
+  /* Heap types (PyType_FromSpec), one set per module object. */
+  PyObject *TypeErrorRaiserType;
+  PyObject *CfgCallableType;
+  PyObject *LazySelectorType;
+  /* qualname -> the shared _TypeErrorRaiser for that name (see
+   * cfg_raiser_get), and the size at which cfg_raisers_prune next drops the
+   * raisers nothing else refers to; read and written under its lock. */
+  PyObject *raisers;
+  Py_ssize_t raisers_prune_at;
+  /* qualname -> _LazySelector still collecting candidates (see
+   * cfg_lazy_add). */
+  PyObject *lazy_pending;
+  /* Candidate registry for reselect(): qualname -> _Candidates, and the
+   * reverse index key -> set of qualnames (see registry_note). */
+  PyObject *CandidatesType;
+  PyObject *candidates;
+  PyObject *key_index;
+  /* Selection manifest (see "Selection manifest"): the answers of
+   * `manifest_lookup` so far (qualname -> (filename, winner line) or None),
+   * filename -> whether `manifest_check` found it unchanged, and those two
+   * callables (or NULL).  All four under the lock of `manifest`. */
+  PyObject *manifest;
+  PyObject *manifest_files;
+  PyObject *manifest_lookup;
+  PyObject *manifest_check;
+  /* Native conditions (see ConditionObject): `os.environ`, its backing
+   * dict and key/value encoders (NULL where it has none), and the flags set
+   * with cfg.set_flags (exposed as `_flags`). */
+  PyObject *ConditionType;
+  PyObject *environ;
+  PyObject *environ_data;
+  PyObject *environ_encodekey;
+  PyObject *environ_encodevalue;
+  PyObject *flags;
+  /* Pure conditions: id(condition) -> (condition, result | None, epoch),
+   * and the current config epoch (see pure_register). */
+  PyObject *pure_memo;
+  PyObject *pure_epoch;
+  /* Shared decorator factories: condition identity -> the `_cm_wrapper` /
+   * `cfg_attr_wrapper` returned for it (see cfg_shared_decorator). */
+  PyObject *cm_decorators;
+  PyObject *cfg_attr_decorators;
+  /* Decision tracing: a ring of `trace_capacity` records, written while
+   * `trace_enabled` is set.  `trace_seq` counts every event ever recorded
+   * (the slot is `seq % trace_capacity`) and `trace_start` is the first
+   * sequence number still readable after a clear.  The ring is only touched
+   * under `trace_mutex` on free-threaded builds.  `trace_names` lists the
+   * qualnames records refer to and `trace_name_ids` maps them back to their
+   * index; `trace_exports` counts the buffers exported over the ring. */
+  CfgDecision *trace_ring;
+  Py_ssize_t trace_capacity;
+  uint64_t trace_seq;
+  uint64_t trace_start;
+  int trace_enabled;
+  Py_ssize_t trace_exports;
+  PyObject *trace_names;
+  PyObject *trace_name_ids;
+  PyObject *DecisionLogType;
+#ifdef Py_GIL_DISABLED
+  PyMutex trace_mutex;
+#endif
+  PyObject *CacheViewType;
+} cfg_state;
+
+static struct PyModuleDef conditionalmodule;
+static struct PyModuleDef conditionalmodule_312;
+static struct PyModuleDef conditionalmodule_313;
+
+static cfg_state *get_cfg_state(PyObject *module) {
+  return (cfg_state *)PyModule_GetState(module);
 }
 
-static void TypeErrorRaiser_finalize(TypeErrorRaiserObject *Py_UNUSED(self)) {
-  /* Clear the caches and the recorded failures */
-  if (_cm_cache != NULL) {
-    PyDict_Clear(_cm_cache);
-  }
-  if (_cfg_attr_cache != NULL) {
-    PyDict_Clear(_cfg_attr_cache);
+#ifdef Py_GIL_DISABLED
+#define CFG_GENERATION_LOAD(st)                                                \
+  _Py_atomic_load_uint64_relaxed(&(st)->cache_generation)
+#define CFG_GENERATION_BUMP(st)                                                \
+  _Py_atomic_add_uint64(&(st)->cache_generation, 1)
+#define CFG_STAT_ADD(st, field, n) _Py_atomic_add_uint64(&(st)->field, (n))
+#define CFG_STAT_LOAD(st, field) _Py_atomic_load_uint64_relaxed(&(st)->field)
+#define CFG_STAT_RESET(st, field)                                              \
+  _Py_atomic_store_uint64_relaxed(&(st)->field, 0)
+#else
+#define CFG_GENERATION_LOAD(st) ((st)->cache_generation)
+#define CFG_GENERATION_BUMP(st) ((st)->cache_generation++)
+#define CFG_STAT_ADD(st, field, n) ((st)->field += (n))
+#define CFG_STAT_LOAD(st, field) ((st)->field)
+#define CFG_STAT_RESET(st, field) ((st)->field = 0)
+#endif
+
+static void cfg_cache_reset(cfg_state *st) { CFG_GENERATION_BUMP(st); }
+
+/* --- Frozen registry ---
+ *
+ * freeze() (see cfg_freeze) ends the startup phase: the caches and the
+ * candidate registry are released, and `frozen` records what a decoration
+ * or a reselect() made afterwards does: fail with RuntimeError, or thaw the
+ * registry and go on in a new cache generation.  Only the entry points
+ * check it; the deferred selection of a `lazy=True` name decorated before
+ * the freeze still runs. */
+enum { CFG_THAWED, CFG_FROZEN_RAISE, CFG_FROZEN_THAW };
+
+#ifdef Py_GIL_DISABLED
+#define CFG_FROZEN_LOAD(st) _Py_atomic_load_int_relaxed(&(st)->frozen)
+#define CFG_FROZEN_SET(st, value)                                              \
+  _Py_atomic_store_int_relaxed(&(st)->frozen, (value))
+#else
+#define CFG_FROZEN_LOAD(st) ((st)->frozen)
+#define CFG_FROZEN_SET(st, value) ((st)->frozen = (value))
+#endif
+
+/* Let a decoration of `func` (NULL: a reselect) write the selection state:
+ * 0 when not frozen or thawed now, -1 with RuntimeError when frozen with
+ * on_decorate="raise". */
+static int cfg_check_frozen(cfg_state *st, PyObject *func) {
+  int frozen = CFG_FROZEN_LOAD(st);
+  if (frozen == CFG_THAWED) {
+    return 0;
   }
-  if (_failed_qualnames != NULL) {
-    PySet_Clear(_failed_qualnames);
+  if (frozen == CFG_FROZEN_RAISE) {
+    if (func != NULL) {
+      PyErr_Format(PyExc_RuntimeError,
+                   "cannot decorate %R: the selection registry is frozen "
+                   "(see conditional_method.freeze)",
+                   func);
+    } else {
+      PyErr_SetString(PyExc_RuntimeError,
+                      "cannot reselect: the selection registry is frozen "
+                      "(see conditional_method.freeze)");
+    }
+    return -1;
   }
+  CFG_FROZEN_SET(st, CFG_THAWED);
+  cfg_cache_reset(st);
+  return 0;
 }
 
-static void _raise_typeerror(TypeErrorRaiserObject *self) {
-  /* Clear the caches (runtime last-wins reset: a new raiser means the
-   * selection state should start fresh).  Deliberately do NOT clear the
-   * recorded _failed_qualnames: it is append-only per name so that
-   * assert_all_true()/_get_failed() keep reporting every name that ended
-   * up with no true condition, not just the most recent one. */
-  if (_cm_cache != NULL) {
-    PyDict_Clear(_cm_cache);
-  }
-  if (_cfg_attr_cache != NULL) {
-    PyDict_Clear(_cfg_attr_cache);
-  }
+/* --- Decision tracing ---
+ *
+ * Every selection decision (a winner stored, a cached winner reused, a
+ * raiser built, a lazy candidate queued, a cfg_attr application, a reselect
+ * rebind) can be recorded into a preallocated ring of fixed-layout
+ * CfgDecision records instead of being written to stderr as it happens.
+ * The enabled flag lives in the module state, so a decoration with tracing
+ * off costs one load and a branch (CFG_TRACE); with tracing on, an event is
+ * a clock read when the decoration starts, two around the condition (and
+ * around a cfg_attr decorator chain), one when it ends, a name-table lookup
+ * and a slot store.  These timings are what conditional_method.importtime
+ * reports.  Once the ring is full the oldest events are overwritten.
+ *
+ * A record names its qualname by index into `trace_names` (interned once
+ * per name), so it holds no object references and the ring can be exported
+ * as-is through the buffer protocol (see _DecisionLog): a reader drains
+ * thousands of events without a Python object per event.  Tracing starts
+ * enabled when `__conditional_method_debug__` is set at import and is
+ * toggled at runtime through `conditional_method.trace`. */
+#define CFG_TRACE_DEFAULT_CAPACITY 4096
+
+/* Event codes; 0 marks a slot that holds no event. */
+enum {
+  CFG_TRACE_NONE,
+  CFG_TRACE_SELECT,
+  CFG_TRACE_CACHED,
+  CFG_TRACE_RAISER,
+  CFG_TRACE_LAZY,
+  CFG_TRACE_ATTR_APPLY,
+  CFG_TRACE_ATTR_CACHED,
+  CFG_TRACE_ATTR_RAISER,
+  CFG_TRACE_REBIND,
+  CFG_TRACE_EVENTS
+};
 
-  /* Join the qualnames for the error message */
-  PyObject *qualnames_iter = PyObject_GetIter(self->f_qualnames);
-  if (qualnames_iter == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
-    return;
-  }
+static const char *const cfg_trace_event_names[CFG_TRACE_EVENTS] = {
+    "",
+    "cm.select",
+    "cm.cached",
+    "cm.raiser",
+    "cm.lazy",
+    "cfg_attr.apply",
+    "cfg_attr.cached",
+    "cfg_attr.raiser",
+    "reselect.rebind",
+};
 
-  PyObject *qualnames_list = PyList_New(0);
-  if (qualnames_list == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
-    Py_DECREF(qualnames_iter);
-    return;
+/* Condition kinds: a bool or other non-callable, a callable, a callable
+ * declared pure=True, a native _Condition. */
+enum {
+  CFG_KIND_STATIC,
+  CFG_KIND_CALLABLE,
+  CFG_KIND_PURE,
+  CFG_KIND_NATIVE,
+  CFG_KIND_COUNT
+};
+
+static const char *const cfg_trace_kind_names[CFG_KIND_COUNT] = {
+    "static", "callable", "pure", "native"};
+
+/* Results: false, true, or not evaluated (a queued lazy candidate). */
+#define CFG_RESULT_PENDING 2
+
+/* No name-table entry (the table could not grow). */
+#define CFG_TRACE_NO_NAME UINT32_MAX
+
+/* struct format of one record (standard sizes, no alignment). */
+#define CFG_DECISION_FORMAT "=QqqqqIiBBB5x"
+
+#ifdef Py_GIL_DISABLED
+#define CFG_TRACE_ON(st) _Py_atomic_load_int_relaxed(&(st)->trace_enabled)
+#define CFG_TRACE_SET(st, value)                                               \
+  _Py_atomic_store_int_relaxed(&(st)->trace_enabled, (value))
+#define CFG_TRACE_LOCK(st) PyMutex_Lock(&(st)->trace_mutex)
+#define CFG_TRACE_UNLOCK(st) PyMutex_Unlock(&(st)->trace_mutex)
+#else
+#define CFG_TRACE_ON(st) ((st)->trace_enabled)
+#define CFG_TRACE_SET(st, value) ((st)->trace_enabled = (value))
+#define CFG_TRACE_LOCK(st)
+#define CFG_TRACE_UNLOCK(st)
+#endif
+
+static void cfg_trace_record(cfg_state *st, int event, PyObject *qualname,
+                             Py_ssize_t candidate, PyObject *condition,
+                             int result, int64_t cost_ns, int64_t entered,
+                             int64_t chain_ns);
+
+#define CFG_TRACE(st, event, qualname, candidate, condition, result, cost_ns,  \
+                  entered, chain_ns)                                           \
+  do {                                                                         \
+    if (CFG_TRACE_ON(st)) {                                                    \
+      cfg_trace_record((st), (event), (qualname), (candidate), (condition),    \
+                       (result), (cost_ns), (entered), (chain_ns));            \
+    }                                                                          \
+  } while (0)
+
+/* Monotonic clock in nanoseconds (the Limited API has no PyTime_* reads
+ * before 3.13). */
+static int64_t cfg_now_ns(void) {
+#ifdef _WIN32
+  static LARGE_INTEGER frequency;
+  LARGE_INTEGER now;
+  if (frequency.QuadPart == 0) {
+    QueryPerformanceFrequency(&frequency);
   }
+  QueryPerformanceCounter(&now);
+  return (int64_t)(now.QuadPart / frequency.QuadPart) * 1000000000 +
+         (int64_t)(now.QuadPart % frequency.QuadPart) * 1000000000 /
+             frequency.QuadPart;
+#else
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (int64_t)ts.tv_sec * 1000000000 + (int64_t)ts.tv_nsec;
+#endif
+}
 
-  PyObject *item;
-  while ((item = PyIter_Next(qualnames_iter)) != NULL) {
-    if (PyList_Append(qualnames_list, item) < 0 || CFG_ALLOC_TEST_FAIL_VOID()) {
-      Py_DECREF(item);
-      Py_DECREF(qualnames_list);
-      Py_DECREF(qualnames_iter);
-      return;
+/* Turn tracing on, (re)allocating the ring when it is missing or has
+ * another capacity.  A new ring starts empty.  The ring cannot move while
+ * a buffer over it is exported. */
+static int cfg_trace_start(cfg_state *st, Py_ssize_t capacity) {
+  if (st->trace_ring == NULL || capacity != st->trace_capacity) {
+    size_t size = (size_t)capacity * sizeof(CfgDecision);
+    CfgDecision *ring =
+        CFG_ALLOC_TEST_FAIL() ? NULL : (CfgDecision *)PyMem_Malloc(size);
+    if (ring == NULL) {
+      PyErr_NoMemory();
+      return -1;
     }
-    Py_DECREF(item);
+    memset(ring, 0, size);
+    CFG_TRACE_LOCK(st);
+    if (st->trace_exports > 0) {
+      CFG_TRACE_UNLOCK(st);
+      PyMem_Free(ring);
+      PyErr_SetString(PyExc_BufferError,
+                      "cannot resize the trace ring while a buffer over it "
+                      "is exported");
+      return -1;
+    }
+    CfgDecision *old = st->trace_ring;
+    st->trace_ring = ring;
+    st->trace_capacity = capacity;
+    st->trace_start = st->trace_seq;
+    CFG_TRACE_UNLOCK(st);
+    PyMem_Free(old);
   }
-  Py_DECREF(qualnames_iter);
+  CFG_TRACE_SET(st, 1);
+  return 0;
+}
 
-  PyObject *separator = PyUnicode_FromString(", ");
-  if (separator == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
-    Py_DECREF(qualnames_list);
-    return;
+static void cfg_trace_clear_state(cfg_state *st) {
+  CFG_TRACE_SET(st, 0);
+  CFG_TRACE_LOCK(st);
+  CfgDecision *ring = st->trace_ring;
+  st->trace_ring = NULL;
+  st->trace_capacity = 0;
+  st->trace_start = st->trace_seq;
+  CFG_TRACE_UNLOCK(st);
+  PyMem_Free(ring);
+  Py_CLEAR(st->trace_names);
+  Py_CLEAR(st->trace_name_ids);
+}
+
+/* Module state for a heap type created by cfg_module_exec (or a subclass of
+ * one).  PyType_GetModule / PyType_FromModuleAndSpec are not in the 3.9
+ * Limited API, so each type carries a `_cfg_module` attribute pointing back
+ * at the module that created it; the module's state in turn holds the type,
+ * a cycle the GC breaks through cfg_module_clear.  Only used off the hot
+ * path (raisers created or fired from Python). */
+static cfg_state *cfg_state_from_type(PyTypeObject *type) {
+  PyObject *module = PyObject_GetAttrString((PyObject *)type, "_cfg_module");
+  if (module == NULL) {
+    return NULL;
+  }
+  PyModuleDef *def = PyModule_Check(module) ? PyModule_GetDef(module) : NULL;
+  if (def != &conditionalmodule && def != &conditionalmodule_312 &&
+      def != &conditionalmodule_313) {
+    Py_DECREF(module);
+    PyErr_SetString(PyExc_TypeError,
+                    "type is not bound to a conditional_method._c module");
+    return NULL;
   }
+  /* The type keeps the module (and therefore its state) alive. */
+  cfg_state *st = get_cfg_state(module);
+  Py_DECREF(module);
+  return st;
+}
+
+/* TypeErrorRaiser type declaration.  A raiser holds nothing but its name,
+ * so it is immutable and shared: every false decoration of a name returns
+ * the one raiser kept for it in st->raisers (see cfg_raiser_get).  Its only
+ * reference is to its type, so it is not GC-tracked; the module traverse
+ * reports that reference for the raisers it keeps. */
+typedef struct {
+  PyObject_HEAD PyObject *qualname; /* Qualified name for the raiser */
+} TypeErrorRaiserObject;
 
-  PyObject *joined_qualnames = PyUnicode_Join(separator, qualnames_list);
-  Py_DECREF(separator);
-  Py_DECREF(qualnames_list);
+static void TypeErrorRaiser_dealloc(TypeErrorRaiserObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
+  CFG_ACCT_RELEASED(CFG_ACCT_RAISER);
+  Py_XDECREF(self->qualname);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp); /* instances of heap types own a reference to the type */
+}
 
-  if (joined_qualnames == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
+static void _raise_typeerror(TypeErrorRaiserObject *self) {
+  /* Reset the caches (runtime last-wins reset: a new raiser means the
+   * selection state should start fresh) with an O(1) generation bump.
+   * Deliberately do NOT clear the recorded _failed_qualnames: it is
+   * append-only per name so that assert_all_true()/_get_failed() keep
+   * reporting every name that ended up with no true condition, not just the
+   * most recent one. */
+  cfg_state *st = cfg_state_from_type(Py_TYPE(self));
+  if (st != NULL) {
+    cfg_cache_reset(st);
+  } else if (PyErr_ExceptionMatches(PyExc_AttributeError)) {
+    /* The module that made this raiser was collected (clearing the type's
+     * `_cfg_module`) while the raiser lived on: no state to reset. */
+    PyErr_Clear();
+  } else {
     return;
   }
 
-  /* Get the default qualname if the list is empty */
-  PyObject *qualname = NULL;
-  if (PyUnicode_Check(self->qualname)) {
-    qualname = self->qualname;
-    if (CFG_ALLOC_TEST_FAIL_VOID()) {
-      Py_DECREF(joined_qualnames);
-      return;
-    }
-    /* Preserve the historical UnicodeEncodeError for unencodable qualnames
-     * (e.g. lone surrogates): the old PyUnicode_AsUTF8 path raised on
-     * surrogates, but that function is not in the Limited API (3.9-abi3).
-     * PyUnicode_AsEncodedString(utf-8) is abi3-safe and raises the same
-     * UnicodeEncodeError for unencodable input; we only need the side
-     * effect, so discard the encoded bytes. */
-    PyObject *enc = PyUnicode_AsEncodedString(qualname, "utf-8", NULL);
-    if (enc == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
-      Py_XDECREF(enc);
-      Py_DECREF(joined_qualnames);
-      return;
-    }
-    Py_DECREF(enc);
-  }
-
-  /* Check if the joined qualnames is empty */
-  int is_empty = (PyUnicode_GetLength(joined_qualnames) == 0);
-
-  /* Format the error message (%U needs a real str; use an empty str when
-   * there is no default qualname — matches the old "%s" with ""). */
-  PyObject *error_msg;
-  if (is_empty) {
-    PyObject *empty = PyUnicode_FromString("");
-    if (empty == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
-      Py_XDECREF(empty);
-      Py_DECREF(joined_qualnames);
-      return;
-    }
-    error_msg = PyUnicode_FromFormat("None of the conditions is true for `%U`",
-                                     qualname != NULL ? qualname : empty);
-    Py_DECREF(empty);
-  } else {
-    error_msg = PyUnicode_FromFormat("None of the conditions is true for `%U`",
-                                     joined_qualnames);
+  /* Preserve the historical UnicodeEncodeError for unencodable qualnames
+   * (e.g. lone surrogates): the old PyUnicode_AsUTF8 path raised on
+   * surrogates, but that function is not in the Limited API (3.9-abi3).
+   * PyUnicode_AsEncodedString(utf-8) is abi3-safe and raises the same
+   * UnicodeEncodeError for unencodable input; we only need the side
+   * effect, so discard the encoded bytes. */
+  PyObject *enc = PyUnicode_AsEncodedString(self->qualname, "utf-8", NULL);
+  if (enc == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
+    Py_XDECREF(enc);
+    return;
   }
-  Py_DECREF(joined_qualnames);
+  Py_DECREF(enc);
 
+  /* The message is only built here, when the raiser fires. */
+  PyObject *error_msg = PyUnicode_FromFormat(
+      "None of the conditions is true for `%U`", self->qualname);
   if (error_msg == NULL || CFG_ALLOC_TEST_FAIL_VOID()) {
+    Py_XDECREF(error_msg);
     return;
   }
 
@@ -334,41 +875,118 @@ static PyObject *TypeErrorRaiser_set_name(TypeErrorRaiserObject *self,
   return NULL;
 }
 
-static PyObject *TypeErrorRaiser_new(PyTypeObject *type,
-                                     PyObject *Py_UNUSED(args),
-                                     PyObject *Py_UNUSED(kwargs)) {
-  TypeErrorRaiserObject *self;
-  self = (TypeErrorRaiserObject *)type->tp_alloc(type, 0);
-  if (self != NULL) {
-    CFG_ALLOC_FAIL_GUARD();
-    self->f_qualnames = PySet_New(NULL);
-    if (self->f_qualnames == NULL) {
-      Py_DECREF(self);
-      return NULL;
-    }
+/* Allocate a raiser of `type` named `qualname` (a str). */
+static PyObject *cfg_raiser_alloc(PyTypeObject *type, PyObject *qualname) {
+  allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+  TypeErrorRaiserObject *self = (TypeErrorRaiserObject *)tp_alloc(type, 0);
+  if (self == NULL) {
+    return NULL;
+  }
+  CFG_ACCT_CREATED(CFG_ACCT_RAISER);
+  Py_INCREF(qualname);
+  self->qualname = qualname;
+  return (PyObject *)self;
+}
 
-    self->qualname = PyUnicode_FromString("");
-    if (self->qualname == NULL) {
-      Py_DECREF(self->f_qualnames);
-      Py_DECREF(self);
-      return NULL;
+/* st->raisers is pruned once it reaches this many raisers, then at twice
+ * the number left (see cfg_raisers_prune). */
+#define CFG_RAISERS_PRUNE_AT 1024
+
+/* Drop the raisers only st->raisers refers to: a later false decoration of
+ * their name makes a new one.  The next prune happens at twice the number
+ * left, so the dict holds at most twice the raisers in use (or
+ * CFG_RAISERS_PRUNE_AT) and each new raiser pays an amortized O(1) for the
+ * pruning.  Called with the dict's lock held. */
+static int cfg_raisers_prune(cfg_state *st) {
+  PyObject *unused = PyList_New(0);
+  if (unused == NULL) {
+    return -1;
+  }
+  Py_ssize_t pos = 0;
+  PyObject *key, *raiser;
+  while (PyDict_Next(st->raisers, &pos, &key, &raiser)) {
+    if (Py_REFCNT(raiser) == 1 && PyList_Append(unused, key) < 0) {
+      Py_DECREF(unused);
+      return -1;
+    }
+  }
+  /* Deleted after the walk: PyDict_Next must not see the dict change. */
+  for (Py_ssize_t i = 0; i < PyList_Size(unused); i++) {
+    if (PyDict_DelItem(st->raisers, PyList_GetItem(unused, i)) < 0) {
+      Py_DECREF(unused);
+      return -1;
     }
   }
+  Py_DECREF(unused);
+  st->raisers_prune_at =
+      Py_MAX(CFG_RAISERS_PRUNE_AT, 2 * PyDict_Size(st->raisers));
+  return 0;
+}
 
-  /* Clear the caches */
-  if (_cm_cache != NULL) {
-    PyDict_Clear(_cm_cache);
+/* The raiser for `qualname` (a str): the one kept in st->raisers, made on
+ * the first false decoration of the name.  If `reset`, reset the selection
+ * caches of `st` (not for a build scope's raiser, see build_scope). */
+static PyObject *cfg_raiser_get(cfg_state *st, PyObject *qualname, int reset) {
+  CFG_ALLOC_FAIL_GUARD();
+  PyObject *key = PyUnicode_FromObject(qualname);
+  if (key == NULL) {
+    return NULL;
+  }
+  PyUnicode_InternInPlace(&key);
+  PyObject *raiser;
+  CFG_OBJECT_LOCK(st->raisers);
+  raiser = cfg_dict_get(st->raisers, key);
+  if (raiser == NULL && (PyDict_Size(st->raisers) < st->raisers_prune_at ||
+                         cfg_raisers_prune(st) == 0)) {
+    raiser = cfg_raiser_alloc((PyTypeObject *)st->TypeErrorRaiserType, key);
+    if (raiser != NULL && (CFG_ALLOC_TEST_FAIL() ||
+                           PyDict_SetItem(st->raisers, key, raiser) < 0)) {
+      Py_CLEAR(raiser);
+    }
   }
-  if (_cfg_attr_cache != NULL) {
-    PyDict_Clear(_cfg_attr_cache);
+  CFG_OBJECT_UNLOCK();
+  Py_DECREF(key);
+  if (raiser == NULL) {
+    return NULL;
   }
 
-  return (PyObject *)self;
+  /* Reset the caches (O(1) generation bump; see cfg_cache_reset) */
+  if (reset) {
+    cfg_cache_reset(st);
+  }
+  CFG_STAT_ADD(st, stat_raisers, 1);
+  return raiser;
+}
+
+static PyObject *TypeErrorRaiser_new(PyTypeObject *type,
+                                     PyObject *Py_UNUSED(args),
+                                     PyObject *Py_UNUSED(kwargs)) {
+  cfg_state *st = cfg_state_from_type(type);
+  if (st == NULL) {
+    return NULL;
+  }
+  PyObject *empty = PyUnicode_FromString("");
+  if (empty == NULL) {
+    return NULL;
+  }
+  PyObject *raiser;
+  if (type == (PyTypeObject *)st->TypeErrorRaiserType) {
+    raiser = cfg_raiser_get(st, empty, 1);
+  } else {
+    /* A subclass instance may carry state of its own: never shared. */
+    raiser = cfg_raiser_alloc(type, empty);
+    if (raiser != NULL) {
+      cfg_cache_reset(st);
+      CFG_STAT_ADD(st, stat_raisers, 1);
+    }
+  }
+  Py_DECREF(empty);
+  return raiser;
 }
 
 static PyMemberDef TypeErrorRaiser_members[] = {
-    {"__qualname__", T_OBJECT_EX, offsetof(TypeErrorRaiserObject, qualname), 0,
-     "Qualified name for the raiser"},
+    {"__qualname__", T_OBJECT_EX, offsetof(TypeErrorRaiserObject, qualname),
+     READONLY, "Qualified name for the raiser"},
     {NULL} /* Sentinel */
 };
 
@@ -378,41 +996,48 @@ static PyMethodDef TypeErrorRaiser_methods[] = {
     {NULL} /* Sentinel */
 };
 
-static PyTypeObject TypeErrorRaiserType = {
-    PyVarObject_HEAD_INIT(NULL, 0).tp_name =
-        "conditional_method._TypeErrorRaiser",
-    .tp_doc = "Type error raiser for conditional methods",
-    .tp_basicsize = sizeof(TypeErrorRaiserObject),
-    .tp_itemsize = 0,
-    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC,
-    .tp_new = TypeErrorRaiser_new,
-    .tp_dealloc = (destructor)TypeErrorRaiser_dealloc,
-    .tp_call = (ternaryfunc)TypeErrorRaiser_call,
-    .tp_traverse = (traverseproc)TypeErrorRaiser_traverse,
-    .tp_clear = (inquiry)TypeErrorRaiser_clear,
-    .tp_finalize = (destructor)TypeErrorRaiser_finalize,
-    .tp_methods = TypeErrorRaiser_methods,
-    .tp_members = TypeErrorRaiser_members,
+static PyType_Slot TypeErrorRaiser_slots[] = {
+    {Py_tp_doc, (void *)"Type error raiser for conditional methods"},
+    {Py_tp_new, (void *)TypeErrorRaiser_new},
+    {Py_tp_dealloc, (void *)TypeErrorRaiser_dealloc},
+    {Py_tp_call, (void *)TypeErrorRaiser_call},
+    {Py_tp_methods, TypeErrorRaiser_methods},
+    {Py_tp_members, TypeErrorRaiser_members},
+    {0, NULL},
+};
+
+static PyType_Spec TypeErrorRaiser_spec = {
+    "conditional_method._TypeErrorRaiser",    sizeof(TypeErrorRaiserObject), 0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, TypeErrorRaiser_slots,
 };
 
 /* --- CfgCallable: a callable heap type with an instance __dict__ ---
    Used for the module-level aliases (cfg/cm/if_/cfg_attr)
    so that `cm._cache` / `cfg_attr._cache` are accessible, matching the
-   pure-Python reference API. */
+   pure-Python reference API.  Calls use vectorcall, which hands the
+   arguments straight to the METH_FASTCALL function without building an
+   argument tuple or keyword dict (tp_call remains for Python subclasses,
+   which do not inherit vectorcall before 3.12). */
 typedef struct {
   PyObject_HEAD PyObject *callable; /* underlying PyCFunction */
   PyObject *dict;                   /* instance __dict__ */
+  cfg_vectorcallfunc vectorcall;    /* CfgCallable_vectorcall */
+  cfg_fastcallfunc fastcall;        /* the function behind `callable` */
 } CfgCallableObject;
 
 static void CfgCallable_dealloc(CfgCallableObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
   PyObject_GC_UnTrack(self);
   Py_CLEAR(self->callable);
   Py_CLEAR(self->dict);
-  Py_TYPE(self)->tp_free((PyObject *)self);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp);
 }
 
 static int CfgCallable_traverse(CfgCallableObject *self, visitproc visit,
                                 void *arg) {
+  Py_VISIT(Py_TYPE(self));
   Py_VISIT(self->callable);
   Py_VISIT(self->dict);
   return 0;
@@ -433,6 +1058,19 @@ static PyObject *CfgCallable_call(CfgCallableObject *self, PyObject *args,
   return PyObject_Call(self->callable, args, kwargs);
 }
 
+static PyObject *CfgCallable_vectorcall(PyObject *callable,
+                                        PyObject *const *args, size_t nargsf,
+                                        PyObject *kwnames) {
+  CfgCallableObject *self = (CfgCallableObject *)callable;
+  if (self->callable == NULL) {
+    PyErr_SetString(PyExc_RuntimeError, "uninitialized CfgCallable");
+    return NULL;
+  }
+  return self->fastcall(PyCFunction_GetSelf(self->callable), args,
+                        (Py_ssize_t)(nargsf & ~PY_VECTORCALL_ARGUMENTS_OFFSET),
+                        kwnames);
+}
+
 static PyObject *CfgCallable_repr(CfgCallableObject *self) {
   /* #10: readable repr showing the wrapped PyCFunction's name. */
   if (self->callable == NULL) {
@@ -505,37 +1143,68 @@ static PyMethodDef CfgCallable_methods[] = {
     {NULL, NULL, 0, NULL},
 };
 
-static PyTypeObject CfgCallableType = {
-    PyVarObject_HEAD_INIT(NULL, 0).tp_name = "conditional_method._CfgCallable",
-    .tp_basicsize = sizeof(CfgCallableObject),
-    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC,
-    .tp_dictoffset = offsetof(CfgCallableObject, dict),
-    .tp_call = (ternaryfunc)CfgCallable_call,
-    .tp_dealloc = (destructor)CfgCallable_dealloc,
-    .tp_traverse = (traverseproc)CfgCallable_traverse,
-    .tp_clear = (inquiry)CfgCallable_clear,
-    .tp_repr = (reprfunc)CfgCallable_repr,
-    .tp_methods = CfgCallable_methods,
+/* PyType_FromSpec reads the instance __dict__ and vectorcall offsets from
+ * these special members (there are no slots for them). */
+static PyMemberDef CfgCallable_members[] = {
+    {"__dictoffset__", T_PYSSIZET, offsetof(CfgCallableObject, dict), READONLY,
+     NULL},
+    {"__vectorcalloffset__", T_PYSSIZET,
+     offsetof(CfgCallableObject, vectorcall), READONLY, NULL},
+    {NULL} /* Sentinel */
+};
+
+/* Instances only come from CfgCallable_new_wrapper.  Without a tp_new slot a
+ * 3.9 PyType_FromSpec type would inherit object.__new__ (there is no
+ * Py_TPFLAGS_DISALLOW_INSTANTIATION before 3.10). */
+static PyObject *CfgCallable_new(PyTypeObject *Py_UNUSED(type),
+                                 PyObject *Py_UNUSED(args),
+                                 PyObject *Py_UNUSED(kwargs)) {
+  PyErr_SetString(PyExc_TypeError,
+                  "cannot create 'conditional_method._CfgCallable' instances");
+  return NULL;
+}
+
+static PyType_Slot CfgCallable_slots[] = {
+    {Py_tp_new, (void *)CfgCallable_new},
+    {Py_tp_call, (void *)CfgCallable_call},
+    {Py_tp_dealloc, (void *)CfgCallable_dealloc},
+    {Py_tp_traverse, (void *)CfgCallable_traverse},
+    {Py_tp_clear, (void *)CfgCallable_clear},
+    {Py_tp_repr, (void *)CfgCallable_repr},
+    {Py_tp_methods, CfgCallable_methods},
+    {Py_tp_members, CfgCallable_members},
+    {0, NULL},
+};
+
+static PyType_Spec CfgCallable_spec = {
+    "conditional_method._CfgCallable",
+    sizeof(CfgCallableObject),
+    0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC |
+        Py_TPFLAGS_HAVE_VECTORCALL,
+    CfgCallable_slots,
 };
 
-/* Wrap a PyCFunction in a CfgCallable instance. */
-static PyObject *CfgCallable_new_wrapper(PyMethodDef *def) {
+/* Wrap a PyCFunction bound to `module` (its `self`, through which the
+ * function reaches the module state) in a CfgCallable instance. */
+static PyObject *CfgCallable_new_wrapper(PyObject *module, PyMethodDef *def) {
   CFG_ALLOC_FAIL_GUARD();
-  PyObject *cf = PyCFunction_New(def, NULL);
+  PyObject *cf = PyCFunction_NewEx(def, module, NULL);
   if (cf == NULL) {
     return NULL;
   }
-  if (PyType_Ready(&CfgCallableType) < 0) {
-    Py_DECREF(cf);
-    return NULL;
-  }
-  CfgCallableObject *obj =
-      (CfgCallableObject *)CfgCallableType.tp_alloc(&CfgCallableType, 0);
+  PyTypeObject *type = (PyTypeObject *)get_cfg_state(module)->CfgCallableType;
+  allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+  CfgCallableObject *obj = (CfgCallableObject *)tp_alloc(type, 0);
   if (obj == NULL) {
     Py_DECREF(cf);
     return NULL;
   }
   obj->callable = cf; /* steals the reference */
+  if (def->ml_flags & METH_FASTCALL) {
+    obj->fastcall = (cfg_fastcallfunc)(void (*)(void))def->ml_meth;
+    obj->vectorcall = CfgCallable_vectorcall;
+  }
   CFG_ALLOC_FAIL_GUARD();
   obj->dict = PyDict_New();
   if (obj->dict == NULL) {
@@ -545,7 +1214,7 @@ static PyObject *CfgCallable_new_wrapper(PyMethodDef *def) {
   return (PyObject *)obj;
 }
 
-/* Function to create a new TypeErrorRaiser instance */
+/* Function to get the TypeErrorRaiser for a qualname */
 static PyObject *_raise_exec(PyObject *self, PyObject *args) {
   PyObject *qualname = NULL;
 
@@ -553,115 +1222,56 @@ static PyObject *_raise_exec(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  /* Create a new TypeErrorRaiser instance */
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *raiser =
-      PyObject_CallObject((PyObject *)&TypeErrorRaiserType, NULL);
-  if (raiser == NULL) {
-    return NULL;
-  }
-
-  /* Set the qualname if provided */
+  cfg_state *st = get_cfg_state(self);
   if (qualname != NULL && PyUnicode_Check(qualname)) {
-    TypeErrorRaiserObject *raiser_obj = (TypeErrorRaiserObject *)raiser;
-    Py_DECREF(raiser_obj->qualname);
-    raiser_obj->qualname = PyUnicode_FromObject(qualname);
-    if (raiser_obj->qualname == NULL) {
-      Py_DECREF(raiser);
-      return NULL;
-    }
+    return cfg_raiser_get(st, qualname, 1);
   }
-
+  /* Without a str qualname, the raiser has an empty one */
+  PyObject *empty = PyUnicode_FromString("");
+  if (empty == NULL) {
+    return NULL;
+  }
+  PyObject *raiser = cfg_raiser_get(st, empty, 1);
+  Py_DECREF(empty);
   return raiser;
 }
 
-/* Prune dead-weakref entries from `cache` so the module-global dict does not
- * grow without bound in long-running processes.  Only removes entries whose
- * cached value is a weakref whose referent has been garbage-collected;
- * strong values (TypeErrorRaiser) are never removed here. */
-static PyObject *deref_weakref_live(PyObject *cache, PyObject *key,
-                                    PyObject *val);
-static void cache_prune_dead(PyObject *cache) {
-  if (cache == NULL || CFG_weakref_ref_type == NULL) {
-    return;
-  }
-  PyObject *keys = PyDict_Keys(cache);
-  if (keys == NULL) {
-    return;
+/* The shard of `cache` holding `key` (an interned str, whose hash is
+ * cached). */
+static CfgCacheShard *cache_shard(CfgCache *cache, PyObject *key) {
+#if CFG_CACHE_SHARDS > 1
+  Py_hash_t hash = PyObject_Hash(key);
+  if (hash == -1) {
+    PyErr_Clear(); /* str hashes cannot fail; keep any other key usable */
+    hash = 0;
   }
-  Py_ssize_t n = PyList_GET_SIZE(keys);
-  for (Py_ssize_t i = 0; i < n; i++) {
-    PyObject *key = PyList_GET_ITEM(keys, i);
-    PyObject *val = PyDict_GetItem(cache, key);
-    if (val == NULL ||
-        !PyObject_TypeCheck(val, (PyTypeObject *)CFG_weakref_ref_type)) {
-      continue;
-    }
-    PyObject *obj = deref_weakref_live(NULL, NULL, val);
-    if (obj == NULL) {
-      PyDict_DelItem(cache, key);
-    } else {
-      Py_DECREF(obj);
-    }
-  }
-  Py_DECREF(keys);
+  return &cache->shards[(size_t)hash & (CFG_CACHE_SHARDS - 1)];
+#else
+  (void)key;
+  return &cache->shards[0];
+#endif
 }
 
-/* High-water mark for cache sweeps: when either module cache exceeds this
- * many entries, the next write triggers a full dead-weakref sweep so the
- * dict does not grow without bound in long-running processes. */
-#define CFG_CACHE_SWEEP_THRESHOLD 128
-/* #6 amortized sweep: count dead weakrefs since the last sweep; when this
- * crosses CFG_CACHE_DEAD_SWEEP_THRESHOLD, prune all dead entries in one pass
- * (instead of scanning the whole dict on every growth past the high-water
- * mark). */
-#define CFG_CACHE_DEAD_SWEEP_THRESHOLD 32
-static Py_ssize_t _cm_cache_dead_since_sweep = 0;
-
-/* Store `val` under `key` in `cache`, as a weakref when `val` is
- * weakly-referencable (true-condition winner functions) or as a strong
- * reference otherwise (TypeErrorRaiser objects, which are not
- * weakly-referencable).  Weakref values keep the module-global caches from
- * pinning every selected function (and therefore its module) alive for the
- * whole process: once the class/function is garbage-collected the entry's
- * referent dies and is pruned.  Returns 0 on success, -1 on error (leaving
- * the previous value intact). */
-static int cache_set_weak_or_strong(PyObject *cache, PyObject *key,
-                                    PyObject *val) {
-  /* #3 (revised): the module cache stores weakrefs for true winners so a
-   * dropped class's method is never pinned (existing leak-safety contract,
-   * enforced by tests).  We therefore keep weakrefs for ALL values here; the
-   * steady-state speedup instead comes from proposal #5 (constant-condition
-   * fast path) and #4 (interned qualname keys). */
-  int rc;
-  PyObject *wr = PyWeakref_NewRef(val, NULL);
-  if (wr != NULL) {
-    rc = PyDict_SetItem(cache, key, wr);
-    Py_DECREF(wr);
-  } else {
-    /* val is not weakly-referencable: store it strongly. */
+/* New reference to `dict[key]`, or NULL (no exception set) when absent.
+ * Free-threaded builds must not hold borrowed references across calls that
+ * may suspend the shard's critical section. */
+static PyObject *cfg_dict_get(PyObject *dict, PyObject *key) {
+#ifdef Py_GIL_DISABLED
+  PyObject *val;
+  if (PyDict_GetItemRef(dict, key, &val) < 0) {
     PyErr_Clear();
-    rc = PyDict_SetItem(cache, key, val);
-  }
-  if (rc < 0) {
-    return -1;
-  }
-  /* #6 amortized sweep: prune when the cache exceeds the high-water mark
-   * (existing contract: many throwaway decorations must not grow the dict
-   * unboundedly) OR when the dead-weakref counter crosses its threshold
-   * (catches the small-cache-but-many-dead case without a full scan on every
-   * write).  Steady-state live caches never sweep. */
-  if (PyDict_Size(cache) > CFG_CACHE_SWEEP_THRESHOLD ||
-      _cm_cache_dead_since_sweep > CFG_CACHE_DEAD_SWEEP_THRESHOLD) {
-    cache_prune_dead(cache);
-    _cm_cache_dead_since_sweep = 0;
+    return NULL;
   }
-  return 0;
+  return val;
+#else
+  PyObject *val = PyDict_GetItem(dict, key);
+  Py_XINCREF(val);
+  return val;
+#endif
 }
 
-/* Dereference `val` (a weakref) returning a NEW reference to the live
- * referent, or NULL when the referent has died (pruning the cache entry and
- * treating it as absent).
+/* New reference to the referent of the weakref `wr`, or NULL (no exception
+ * set) when the referent has died.
  *
  * We deliberately use PyWeakref_GetObject + Py_INCREF rather than the newer
  * PyWeakref_GetRef (CPython 3.13): this extension is built as a `cp39-abi3`
@@ -670,1026 +1280,5369 @@ static int cache_set_weak_or_strong(PyObject *cache, PyObject *key,
  * against newer headers would fail to import on older runtimes
  * ("undefined symbol: PyWeakref_GetRef").  PyWeakref_GetObject is stable ABI
  * on all supported versions.  Reading under the GIL makes the borrowed-ref
- * + INCREF safe. */
-static PyObject *deref_weakref_live(PyObject *cache, PyObject *key,
-                                    PyObject *val) {
-  PyObject *obj = PyWeakref_GetObject(val);
-  if (obj == Py_None) {
-    /* referent is gone: prune and treat as absent */
-    _cm_cache_dead_since_sweep++; /* #6 */
-    if (cache != NULL) {
-      PyDict_DelItem(cache, key);
-    }
+ * + INCREF safe.  Free-threaded builds are never abi3 and have no GIL to
+ * lean on, so they use PyWeakref_GetRef. */
+static PyObject *cfg_weakref_get(PyObject *wr) {
+#ifdef Py_GIL_DISABLED
+  PyObject *obj;
+  if (PyWeakref_GetRef(wr, &obj) < 0) {
+    PyErr_Clear();
     return NULL;
   }
-  Py_INCREF(obj);
   return obj;
-}
-
-/* Read `cache[key]`, returning a NEW reference to the live cached value.
- * A weakref value is dereferenced; a dead weakref is pruned and treated as
- * absent.  A strong value (TypeErrorRaiser) is returned as-is.  Returns NULL
- * when there is no live entry for `key`. */
-static PyObject *cache_get_live(PyObject *cache, PyObject *key) {
-  PyObject *val = PyDict_GetItem(cache, key);
-  if (val == NULL) {
+#else
+  PyObject *obj = PyWeakref_GetObject(wr);
+  if (obj == NULL || obj == Py_None) {
+    PyErr_Clear();
     return NULL;
   }
-  if (CFG_weakref_ref_type != NULL &&
-      PyObject_TypeCheck(val, (PyTypeObject *)CFG_weakref_ref_type)) {
-    return deref_weakref_live(cache, key, val);
-  }
-  Py_INCREF(val);
-  return val;
+  Py_INCREF(obj);
+  return obj;
+#endif
 }
 
-/* Function to get the fully qualified name of a function */
-static PyObject *_get_func_name(PyObject *self, PyObject *func) {
-  PyObject *module = NULL;
-  PyObject *qualname = NULL;
-  PyObject *result = NULL;
+/* Marks a removed slot (see "Cache tables"). */
+static char cfg_slot_deleted;
+#define CFG_SLOT_DELETED ((PyObject *)&cfg_slot_deleted)
 
-  /* Try to get __qualname__ or __name__ */
-  if (PyObject_HasAttrString(func, "__qualname__")) {
-    qualname = PyObject_GetAttrString(func, "__qualname__");
-  } else if (PyObject_HasAttrString(func, "__name__")) {
-    qualname = PyObject_GetAttrString(func, "__name__");
+#define CFG_REF_EMPTY UINT32_MAX
+#define CFG_REF_DELETED (UINT32_MAX - 1)
+/* Slot numbers must stay below the markers. */
+#define CFG_TABLE_MAX_CAPACITY ((size_t)1 << 31)
+
+#define CFG_PROBE_NEXT(i, perturb, mask)                                       \
+  do {                                                                         \
+    (perturb) >>= 5;                                                           \
+    (i) = ((i) * 5 + (perturb) + 1) & (mask);                                  \
+  } while (0)
+
+/* The hash of an address, for the reverse index. */
+static size_t cfg_pointer_hash(const void *p) {
+  size_t y = (size_t)p;
+  /* The low bits of an object address are always zero. */
+  return (y >> 4) | (y << (8 * sizeof(size_t) - 4));
+}
+
+static int cfg_str_equal(PyObject *a, PyObject *b) {
+  if (!PyUnicode_Check(a) || !PyUnicode_Check(b)) {
+    return 0;
+  }
+  int rc = PyUnicode_Compare(a, b);
+  if (rc == -1 && PyErr_Occurred()) {
+    PyErr_Clear();
   }
+  return rc == 0;
+}
 
-  /* If we found a name, get the module and combine them */
-  if (qualname != NULL) {
-    if (PyObject_HasAttrString(func, "__module__")) {
-      module = PyObject_GetAttrString(func, "__module__");
-      if (module != NULL && PyUnicode_Check(module)) {
-        CFG_ALLOC_FAIL_GUARD();
-        result = PyUnicode_FromFormat("%U.%U", module, qualname);
-      }
+/* The slot holding `key` (hash `hash`) in `table`, or NULL. */
+static CfgSlot *cfg_table_find(const CfgTable *table, PyObject *key,
+                               Py_hash_t hash) {
+  if (table->slots == NULL) {
+    return NULL;
+  }
+  size_t perturb = (size_t)hash;
+  size_t i = perturb & table->mask;
+  for (;;) {
+    CfgSlot *slot = &table->slots[i];
+    if (slot->key == key) {
+      return slot;
+    }
+    if (slot->key == NULL) {
+      return NULL;
     }
+    if (slot->hash == hash && slot->key != CFG_SLOT_DELETED &&
+        cfg_str_equal(slot->key, key)) {
+      return slot;
+    }
+    CFG_PROBE_NEXT(i, perturb, table->mask);
+  }
+}
+
+/* The first unused or removed slot of the probe sequence for `hash`. */
+static CfgSlot *cfg_table_free_slot(const CfgTable *table, Py_hash_t hash) {
+  size_t perturb = (size_t)hash;
+  size_t i = perturb & table->mask;
+  while (table->slots[i].key != NULL &&
+         table->slots[i].key != CFG_SLOT_DELETED) {
+    CFG_PROBE_NEXT(i, perturb, table->mask);
+  }
+  return &table->slots[i];
+}
 
-    if (result == NULL) {
-      /* If we couldn't get the module, just use the qualname */
-      CFG_ALLOC_FAIL_GUARD();
-      result = PyUnicode_FromObject(qualname);
+/* The reverse-index entry of the winner weakref `wr`, or NULL. */
+static uint32_t *cfg_table_find_ref(const CfgTable *table, PyObject *wr) {
+  if (table->slots == NULL) {
+    return NULL;
+  }
+  size_t perturb = cfg_pointer_hash(wr);
+  size_t i = perturb & table->mask;
+  for (;;) {
+    uint32_t *ref = &table->refs[i];
+    if (*ref == CFG_REF_EMPTY) {
+      return NULL;
+    }
+    if (*ref != CFG_REF_DELETED && CFG_SLOT_OBJECT(&table->slots[*ref]) == wr) {
+      return ref;
     }
+    CFG_PROBE_NEXT(i, perturb, table->mask);
+  }
+}
 
-    Py_XDECREF(module);
-    Py_XDECREF(qualname);
+/* Index the winner weakref stored in `slot`. */
+static void cfg_table_add_ref(CfgTable *table, const CfgSlot *slot) {
+  size_t perturb = cfg_pointer_hash(CFG_SLOT_OBJECT(slot));
+  size_t i = perturb & table->mask;
+  while (table->refs[i] != CFG_REF_EMPTY && table->refs[i] != CFG_REF_DELETED) {
+    CFG_PROBE_NEXT(i, perturb, table->mask);
+  }
+  if (table->refs[i] == CFG_REF_EMPTY) {
+    table->refs_filled++;
+  }
+  table->refs[i] = (uint32_t)(slot - table->slots);
+}
 
-    if (result != NULL) {
-      return result;
+/* Rebuild the reverse index from the slots, dropping its removed
+ * entries. */
+static void cfg_table_rebuild_refs(CfgTable *table) {
+  memset(table->refs, 0xff, (table->mask + 1) * sizeof(uint32_t));
+  table->refs_filled = 0;
+  for (size_t i = 0; i <= table->mask; i++) {
+    CfgSlot *slot = &table->slots[i];
+    if (slot->key != NULL && slot->key != CFG_SLOT_DELETED &&
+        (slot->value & CFG_SLOT_WEAK)) {
+      cfg_table_add_ref(table, slot);
     }
   }
+}
 
-  /* If we couldn't get the name directly, try through __wrapped__, __func__, or
-   * fget */
-  const char *attrs[] = {"__wrapped__", "__func__", "fget"};
-  for (int i = 0; i < 3; i++) {
-    if (PyObject_HasAttrString(func, attrs[i])) {
-      PyObject *wrapped = PyObject_GetAttrString(func, attrs[i]);
-      if (wrapped != NULL) {
-        result = _get_func_name(self, wrapped);
-        Py_DECREF(wrapped);
-        if (result != NULL) {
-          return result;
-        }
+/* Make room for one more entry: past 2/3 full, move the entries to a
+ * table at most 2/3 full after the insert, dropping the removed slots.
+ * Returns -1 with MemoryError. */
+static int cfg_table_reserve(CfgTable *table) {
+  if (table->slots != NULL &&
+      (size_t)(table->filled + 1) * 3 <= (table->mask + 1) * 2) {
+    return 0;
+  }
+  size_t capacity = 8;
+  while (capacity * 2 < (size_t)(table->used + 1) * 3) {
+    capacity <<= 1;
+  }
+  if (capacity > CFG_TABLE_MAX_CAPACITY || CFG_ALLOC_TEST_FAIL()) {
+    PyErr_NoMemory();
+    return -1;
+  }
+  /* PyMem_Calloc is not declared for the 3.9 Limited API. */
+  CfgSlot *slots =
+      PyMem_Malloc(capacity * (sizeof(CfgSlot) + sizeof(uint32_t)));
+  if (slots == NULL) {
+    PyErr_NoMemory();
+    return -1;
+  }
+  memset(slots, 0, capacity * sizeof(CfgSlot));
+  CfgTable grown = {slots,        (uint32_t *)(slots + capacity),
+                    capacity - 1, table->used,
+                    table->used,  0};
+  if (table->slots != NULL) {
+    for (size_t i = 0; i <= table->mask; i++) {
+      CfgSlot *slot = &table->slots[i];
+      if (slot->key != NULL && slot->key != CFG_SLOT_DELETED) {
+        *cfg_table_free_slot(&grown, slot->hash) = *slot;
       }
     }
+    PyMem_Free(table->slots);
   }
-
-  /* If we still don't have a name, raise TypeError */
-  PyErr_SetString(PyExc_TypeError, "Cannot get fully qualified function name");
-  return NULL;
+  cfg_table_rebuild_refs(&grown);
+  *table = grown;
+  return 0;
 }
 
-/* Wrapper function for the decorator */
-static PyObject *_cm_wrapper(PyObject *self, PyObject *args) {
-  PyObject *func = NULL;
-
-  if (!PyArg_ParseTuple(args, "O", &func)) {
-    return NULL;
+/* Claim a slot for `key`, which must be absent, after cfg_table_reserve.
+ * The caller stores the value with cfg_table_store. */
+static CfgSlot *cfg_table_insert(CfgTable *table, PyObject *key,
+                                 Py_hash_t hash) {
+  CfgSlot *slot = cfg_table_free_slot(table, hash);
+  if (slot->key == NULL) {
+    table->filled++;
   }
+  table->used++;
+  slot->key = key;
+  slot->hash = hash;
+  slot->value = 0;
+  return slot;
+}
 
-  /* Get the condition from closure */
-  PyObject *condition = self; /* self is the closure holding the condition */
-  if (condition == NULL) {
-    PyErr_SetString(PyExc_RuntimeError, "No condition found in closure");
-    return NULL;
+/* Drop the reverse-index entry of the object in `slot`, if indexed. */
+static void cfg_table_drop_ref(CfgTable *table, const CfgSlot *slot) {
+  if (slot->value & CFG_SLOT_WEAK) {
+    uint32_t *ref = cfg_table_find_ref(table, CFG_SLOT_OBJECT(slot));
+    if (ref != NULL) {
+      *ref = CFG_REF_DELETED;
+    }
   }
+}
 
-  /* #1: call the fast inner directly — no Py_BuildValue tuple. */
-  CFG_ALLOC_FAIL_GUARD();
-  return _cm_inner_fast(NULL, func, condition);
+/* Store `obj` (a winner weakref when `weak`) in `slot`, replacing and
+ * unindexing what it held. */
+static void cfg_table_store(CfgTable *table, CfgSlot *slot, PyObject *obj,
+                            int weak, uint64_t generation) {
+  cfg_table_drop_ref(table, slot);
+  slot->value = (uintptr_t)obj | (weak ? CFG_SLOT_WEAK : 0);
+  slot->generation = generation;
+  if (weak) {
+    if ((size_t)(table->refs_filled + 1) * 3 > (table->mask + 1) * 2) {
+      cfg_table_rebuild_refs(table); /* indexes `slot` too */
+    } else {
+      cfg_table_add_ref(table, slot);
+    }
+  }
 }
 
-/* The core conditional method implementation */
-static PyObject *cm(PyObject *self, PyObject *args, PyObject *kwargs) {
-  PyObject *func = NULL;
-  PyObject *condition = Py_None;
+static void cfg_table_remove(CfgTable *table, CfgSlot *slot) {
+  cfg_table_drop_ref(table, slot);
+  slot->key = CFG_SLOT_DELETED;
+  slot->value = 0;
+  table->used--;
+}
 
-  /* Parse arguments */
-  if (!PyArg_ParseTuple(args, "|O", &func)) {
+/* The first entry at or after slot `*pos`, advancing `*pos` past it, or
+ * NULL at the end.  Removing entries (but not inserting them) while
+ * iterating is safe. */
+static CfgSlot *cfg_table_next(const CfgTable *table, size_t *pos) {
+  if (table->slots == NULL) {
     return NULL;
   }
-
-  if (kwargs != NULL) {
-    PyObject *cond = PyDict_GetItemString(kwargs, "condition");
-    if (cond != NULL) {
-      condition = cond;
+  while (*pos <= table->mask) {
+    CfgSlot *slot = &table->slots[(*pos)++];
+    if (slot->key != NULL && slot->key != CFG_SLOT_DELETED) {
+      return slot;
     }
   }
+  return NULL;
+}
 
-  /* If no function is provided, return the inner decorator */
-  if (func == NULL || func == Py_None) {
-    if (condition == Py_None) {
-      PyErr_SetString(PyExc_TypeError,
-                      "`@cfg` must be used as a decorator and `condition` "
-                      "must be specified as an instance of type `bool`");
-      return NULL;
-    }
+/* Empty `table`, handing its slots to the caller to release (PyMem_Free)
+ * once it has dropped what they reference; returns the slots and their
+ * count.  Detaching first keeps re-entrant code from seeing freed slots. */
+static CfgSlot *cfg_table_detach(CfgTable *table, size_t *count) {
+  CfgSlot *slots = table->slots;
+  *count = slots != NULL ? table->mask + 1 : 0;
+  table->slots = NULL;
+  table->refs = NULL;
+  table->mask = 0;
+  table->used = table->filled = table->refs_filled = 0;
+  return slots;
+}
 
-    /* Create a wrapper function that will call _cm_inner with the captured
-     * condition */
-    CFG_ALLOC_FAIL_GUARD();
-    PyObject *wrapper = PyCFunction_NewEx(&cm_wrapper_def, condition, NULL);
-    if (wrapper == NULL) {
-      return NULL;
+/* Empty a shard, releasing what its entries held.  Caller holds the shard
+ * lock (or the shard is no longer reachable). */
+static void shard_clear(CfgCacheShard *shard) {
+  size_t count;
+  CfgSlot *slots = cfg_table_detach(&shard->table, &count);
+  shard->hand = 0;
+  for (size_t i = 0; i < count; i++) {
+    if (slots[i].key != NULL && slots[i].key != CFG_SLOT_DELETED) {
+      Py_DECREF(slots[i].key);
+      CFG_ACCT_RELEASED(CFG_ACCT_CACHE_ENTRY);
+      Py_DECREF(CFG_SLOT_OBJECT(&slots[i]));
     }
-
-    return wrapper;
   }
+  PyMem_Free(slots);
+}
 
-  /* If a function is provided but no condition, raise TypeError */
-  if (condition == Py_None) {
-    PyErr_SetString(PyExc_TypeError,
-                    "`@cfg` must be used as a decorator and `condition` "
-                    "must be specified as an instance of type `bool`");
+/* The entry of `key` in `shard`, or NULL.  Caller holds the shard lock. */
+static CfgSlot *shard_find(CfgCacheShard *shard, PyObject *key) {
+  Py_hash_t hash = PyObject_Hash(key);
+  if (hash == -1) {
+    PyErr_Clear(); /* not a cache key */
     return NULL;
   }
+  return cfg_table_find(&shard->table, key, hash);
+}
 
-  /* #1: call _cm_inner_fast directly — no tuple build. */
-  CFG_ALLOC_FAIL_GUARD();
-  return _cm_inner_fast(NULL, func, condition);
+/* Is `slot` from the current cache generation?  Entries written before the
+ * last cfg_cache_reset() are stale. */
+static int shard_entry_is_current(cfg_state *st, const CfgSlot *slot) {
+  return slot->generation == CFG_GENERATION_LOAD(st);
 }
 
-static PyObject *_cm_inner_fast(PyObject *self, PyObject *func,
-                                PyObject *condition);
-/* Public METH_VARARGS entry (kept for compatibility): unpacks the 2-tuple
- * then delegates to the fast path. */
-static PyObject *_cm_inner(PyObject *self, PyObject *args) {
-  PyObject *func = NULL;
-  PyObject *condition = NULL;
+/* Drop the entry in `slot`.  Caller holds the shard lock. */
+static void shard_discard(CfgCacheShard *shard, CfgSlot *slot) {
+  PyObject *key = slot->key;
+  PyObject *val = CFG_SLOT_OBJECT(slot);
+  cfg_table_remove(&shard->table, slot);
+  CFG_ACCT_RELEASED(CFG_ACCT_CACHE_ENTRY);
+  Py_DECREF(val);
+  Py_DECREF(key);
+}
 
-  if (!PyArg_ParseTuple(args, "OO", &func, &condition)) {
-    return NULL;
+/* Prune dead-weakref and stale-generation entries from `shard` so the
+ * cache does not grow without bound in long-running processes.
+ * Removes entries whose cached value is a weakref whose referent has been
+ * garbage-collected, and entries (weakrefs and TypeErrorRaisers alike)
+ * written before the last generation bump; current raisers are never
+ * removed here.  Caller holds the shard lock. */
+static void shard_prune_dead(cfg_state *st, CfgCacheShard *shard) {
+  shard->stats.sweeps++;
+  size_t pos = 0;
+  CfgSlot *slot;
+  while ((slot = cfg_table_next(&shard->table, &pos)) != NULL) {
+    if (!shard_entry_is_current(st, slot)) {
+      shard->stats.stale++;
+      shard->stats.swept++;
+      shard_discard(shard, slot);
+    } else if (slot->value & CFG_SLOT_WEAK) {
+      PyObject *obj = cfg_weakref_get(CFG_SLOT_OBJECT(slot));
+      if (obj == NULL) {
+        shard->stats.dead++;
+        shard->stats.swept++;
+        shard_discard(shard, slot);
+      }
+      Py_XDECREF(obj);
+    }
   }
-  return _cm_inner_fast(self, func, condition);
 }
 
-static PyObject *_cm_inner_fast(PyObject *self, PyObject *func,
-                                PyObject *condition) {
+/* --- Cache policy ---
+ *
+ * A winner is stored as a weakref whose callback (cfg_cache_evict) drops
+ * the winner's entry the moment it dies, through the reverse index of the
+ * shard's table; no scan is needed for dead winners.  Entries written
+ * before the last generation bump are reclaimed by the lookup that finds
+ * them, and otherwise:
+ *
+ * - "sweep": by a full pass over the shard (shard_prune_dead) when it
+ *   holds more than `sweep_threshold` entries and had writes for at least
+ *   a quarter of them since the last pass, or when lookups found more than
+ *   `dead_sweep_threshold` (or half the shard) dead entries since the last
+ *   pass.  A pass over N entries thus follows N/4 writes: a write is
+ *   amortized O(1) at any size, where sweeping on every write past the
+ *   threshold made N decorations O(N^2).
+ * - "clock": additionally by a CLOCK hand that every write advances over
+ *   CFG_CLOCK_STEPS entries, reclaiming the dead and stale ones it passes,
+ *   so they go away without waiting for a full pass.
+ *
+ * With a `max_size`, a write that leaves the shard over its share of it
+ * moves the hand on, over up to CFG_CLOCK_EVICT_STEPS entries, until the
+ * shard fits: the dead and stale entries it passes are reclaimed, and a
+ * raiser is evicted unless a lookup found it since the hand last passed it
+ * (CLOCK's second chance, an approximation of LRU).  Live winners are never
+ * evicted: a later false decoration of the name must find its winner, so a
+ * shard holding more of them than its max size stays over it.  The
+ * thresholds and the max size are split evenly across the shards. */
+#define CFG_CACHE_SWEEP_THRESHOLD 128
+#define CFG_CACHE_DEAD_SWEEP_THRESHOLD 32
+#define CFG_CLOCK_STEPS 2
+#define CFG_CLOCK_EVICT_STEPS 8
 
-  /* Get the fully qualified name of the function */
-  PyObject *f_qualname = _get_func_name(self, func);
-  if (f_qualname == NULL) {
-    return NULL;
+/* `total` split across the shards (at least 1; 0 stays 0). */
+static Py_ssize_t cfg_shard_share(Py_ssize_t total) {
+  if (total == 0) {
+    return 0;
   }
-  /* #4: intern the qualname key so repeated decorations of the same name
-   * reuse a single string object (faster dict lookups + less memory). */
-  PyUnicode_InternInPlace(&f_qualname);
-  /* Debug-only UTF-8 logging (abi3-3.9-safe: encode to bytes, read buffer;
-   * the Limited-API PyUnicode_AsUTF8* forms are 3.10+). */
-  PyObject *fq_encoded = PyUnicode_AsEncodedString(f_qualname, "utf-8", NULL);
-  const char *fq_utf8 =
-      fq_encoded != NULL ? PyBytes_AsString(fq_encoded) : NULL;
-  _cfg_log("cm: decorating %s", fq_utf8 != NULL ? fq_utf8 : "?");
-  _cfg_log("cm: f_qualname %s", fq_utf8 != NULL ? fq_utf8 : "?");
-  Py_XDECREF(fq_encoded);
-
-  /* #5 constant-condition fast paths: condition=True and condition=False
-   * (the overwhelmingly common cases) skip the generic path entirely. */
-  if (condition == Py_True) {
-    /* A constant True condition always wins: cache it and return the function.
-     */
-    _cfg_log("cm: condition=True -> WINNER for %U (cache miss, storing)",
-             f_qualname);
-    if (cache_set_weak_or_strong(_cm_cache, f_qualname, func) < 0 ||
-        CFG_ALLOC_TEST_FAIL()) {
-      Py_DECREF(f_qualname);
-      return NULL;
-    }
-    if (_failed_qualnames != NULL) {
-      int discarded = PySet_Discard(_failed_qualnames, f_qualname);
-      if (discarded < 0) {
-        Py_DECREF(f_qualname);
-        return NULL;
+  return total / CFG_CACHE_SHARDS > 0 ? total / CFG_CACHE_SHARDS : 1;
+}
+
+/* Give every shard of `cache` its share of `policy`. */
+static void cfg_cache_apply_policy(CfgCache *cache,
+                                   const CfgCachePolicy *policy) {
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &cache->shards[i];
+    CFG_SHARD_LOCK(shard);
+    shard->policy.policy = policy->policy;
+    shard->policy.max_size =
+        policy->max_size > 0
+            ? (policy->max_size + CFG_CACHE_SHARDS - 1) / CFG_CACHE_SHARDS
+            : 0;
+    shard->policy.sweep_threshold = cfg_shard_share(policy->sweep_threshold);
+    shard->policy.dead_sweep_threshold =
+        cfg_shard_share(policy->dead_sweep_threshold);
+    if (shard->policy.max_size == 0) {
+      size_t pos = 0;
+      CfgSlot *slot;
+      while ((slot = cfg_table_next(&shard->table, &pos)) != NULL) {
+        slot->value &= ~CFG_SLOT_MARK;
       }
     }
-    Py_DECREF(f_qualname);
-    Py_INCREF(func);
-    return func;
+    CFG_SHARD_UNLOCK();
   }
-  /* Evaluate the condition */
-  PyObject *cond_result = NULL;
+}
 
-  if (PyCallable_Check(condition)) {
-    /* If condition is callable, call it with the function */
-    CFG_ALLOC_FAIL_GUARD();
-    PyObject *args_tuple = PyTuple_New(1);
-    if (args_tuple == NULL) {
-      Py_DECREF(f_qualname);
-      return NULL;
+/* Move the CLOCK hand of `shard` over up to `steps` entries, reclaiming
+ * the dead and stale ones.  While the shard holds more than its max size,
+ * a raiser the hand reaches is evicted, or loses its mark when it was
+ * referenced since the hand last passed.  Caller holds the shard lock. */
+static void shard_clock(cfg_state *st, CfgCacheShard *shard, Py_ssize_t steps) {
+  for (Py_ssize_t i = 0; i < steps; i++) {
+    CfgSlot *slot = cfg_table_next(&shard->table, &shard->hand);
+    if (slot == NULL) {
+      shard->hand = 0; /* wrap around */
+      slot = cfg_table_next(&shard->table, &shard->hand);
+      if (slot == NULL) {
+        return; /* empty */
+      }
     }
-
-    Py_INCREF(func);
-    /* Use the libpython function form: the inline PyTuple_SET_ITEM macro
-     * reads the PyTupleObject layout at compile time, which is stale on
-     * CPython 3.14/wasm (Emscripten) and corrupts memory there (the same
-     * bug class as PyTuple_GET_ITEM before). PyTuple_SetItem is a real
-     * libpython function that is wasm-safe and part of the Limited API.
-     * It steals func on success; on failure (-1) it does not, so decref. */
-    if (PyTuple_SetItem(args_tuple, 0, func) < 0) {
-      Py_DECREF(func);
-      Py_DECREF(args_tuple);
-      Py_DECREF(f_qualname);
-      return NULL;
+    if (!shard_entry_is_current(st, slot)) {
+      shard->stats.stale++;
+      shard_discard(shard, slot);
+      continue;
     }
-
-    cond_result = PyObject_CallObject(condition, args_tuple);
-    Py_DECREF(args_tuple);
-
-    if (cond_result == NULL) {
-      /* Only TypeError from the condition is wrapped; other exceptions
-       * (e.g. ValueError) propagate unchanged (matches the Python
-       * reference implementation). */
-      PyObject *error_type, *error_value, *error_traceback;
-      PyErr_Fetch(&error_type, &error_value, &error_traceback);
-      if (error_type != NULL &&
-          PyErr_GivenExceptionMatches(error_type, PyExc_TypeError)) {
-        PyObject *error_msg = PyUnicode_FromFormat(
-            "Error calling `condition` for `%U`: %S", f_qualname, error_value);
-        if (error_msg != NULL) {
-          PyErr_SetObject(PyExc_TypeError, error_msg);
-          Py_DECREF(error_msg);
-        }
-        Py_XDECREF(error_type);
-        Py_XDECREF(error_value);
-        Py_XDECREF(error_traceback);
+    PyObject *obj = NULL;
+    if (slot->value & CFG_SLOT_WEAK) {
+      obj = cfg_weakref_get(CFG_SLOT_OBJECT(slot));
+      if (obj == NULL) {
+        shard->stats.dead++;
+        shard_discard(shard, slot);
+        continue;
+      }
+    }
+    if (obj == NULL && shard->policy.max_size > 0 &&
+        shard->table.used > shard->policy.max_size &&
+        PyObject_TypeCheck(CFG_SLOT_OBJECT(slot),
+                           (PyTypeObject *)st->TypeErrorRaiserType)) {
+      if (slot->value & CFG_SLOT_MARK) {
+        slot->value &= ~CFG_SLOT_MARK;
       } else {
-        PyErr_Restore(error_type, error_value, error_traceback);
+        shard->stats.evicted++;
+        shard_discard(shard, slot);
       }
-      Py_DECREF(f_qualname);
-      return NULL;
     }
-  } else {
-    /* If condition is not callable, convert it to a boolean */
-    cond_result = PyObject_IsTrue(condition) ? Py_True : Py_False;
-    Py_INCREF(cond_result);
+    Py_XDECREF(obj);
   }
+}
 
-  /* Convert the result to a boolean */
-  int cond_bool = PyObject_IsTrue(cond_result);
-  Py_DECREF(cond_result);
-
-  if (cond_bool == -1) {
-    Py_DECREF(f_qualname);
-    return NULL;
+/* Mark the entry in `slot` as looked up, for the CLOCK hand to spare it
+ * once; only kept while the shard has a max size.  Caller holds the shard
+ * lock. */
+static void shard_mark(CfgCacheShard *shard, CfgSlot *slot) {
+  if (shard->policy.max_size > 0) {
+    slot->value |= CFG_SLOT_MARK;
   }
+}
 
-  /* If the condition is true, cache the winner (as a weakref) and return it */
-  if (cond_bool) {
-    if (cache_set_weak_or_strong(_cm_cache, f_qualname, func) < 0 ||
-        CFG_ALLOC_TEST_FAIL()) {
-      Py_DECREF(f_qualname);
-      return NULL;
-    }
-    /* A true winner clears any recorded failure for this name. */
-    if (_failed_qualnames != NULL) {
-      int discarded = PySet_Discard(_failed_qualnames, f_qualname);
-      if (discarded < 0) {
-        Py_DECREF(f_qualname);
-        return NULL;
-      }
+/* Apply the shard's policy after a write: advance the CLOCK hand, sweep
+ * when due (see "Cache policy").  New entries start unmarked, so when no
+ * entry is looked up again the oldest go first.  Caller holds the shard
+ * lock. */
+static void shard_maintain(cfg_state *st, CfgCacheShard *shard) {
+  const CfgCachePolicy *policy = &shard->policy;
+  if (policy->policy == CFG_POLICY_CLOCK) {
+    shard_clock(st, shard, CFG_CLOCK_STEPS);
+  }
+  if (policy->max_size > 0) {
+    /* Bounded: the entries over the size may all be live winners. */
+    Py_ssize_t budget = CFG_CLOCK_EVICT_STEPS;
+    while (shard->table.used > policy->max_size && budget-- > 0) {
+      shard_clock(st, shard, 1);
     }
-    Py_DECREF(f_qualname);
-    Py_INCREF(func);
-    return func;
   }
+  /* Stale entries count towards the size until reclaimed. */
+  Py_ssize_t size = shard->table.used;
+  shard->writes_since_sweep++;
+  if ((size > policy->sweep_threshold &&
+       shard->writes_since_sweep >= size / 4) ||
+      shard->dead_since_sweep >
+          Py_MAX(policy->dead_sweep_threshold, size / 2)) {
+    shard_prune_dead(st, shard);
+    shard->dead_since_sweep = 0;
+    shard->writes_since_sweep = 0;
+  }
+}
 
-  /* If the condition is false, check if the cache holds a live winner */
-  PyObject *cached_func = cache_get_live(_cm_cache, f_qualname);
-  if (cached_func != NULL) {
-    _cfg_log("cm: condition=false but cache HIT for %U -> cached winner",
-             f_qualname);
-    Py_DECREF(f_qualname);
-    return cached_func; /* new reference */
+/* Store `stored` under `key` in `shard`, tagged with the current cache
+ * generation; `weak` tells a winner weakref from a raiser.  Caller holds
+ * the shard lock. */
+static int shard_set(cfg_state *st, CfgCacheShard *shard, PyObject *key,
+                     PyObject *stored, int weak) {
+  Py_hash_t hash = PyObject_Hash(key);
+  if (hash == -1) {
+    return -1;
+  }
+  CfgSlot *slot = cfg_table_find(&shard->table, key, hash);
+  PyObject *replaced = NULL;
+  if (slot != NULL) {
+    replaced = CFG_SLOT_OBJECT(slot);
+  } else {
+    if (cfg_table_reserve(&shard->table) < 0) {
+      return -1;
+    }
+    Py_INCREF(key);
+    slot = cfg_table_insert(&shard->table, key, hash);
   }
-  _cfg_log("cm: condition=false and cache MISS for %U -> TypeErrorRaiser",
-           f_qualname);
+  Py_INCREF(stored);
+  CFG_ACCT_CREATED(CFG_ACCT_CACHE_ENTRY);
+  cfg_table_store(&shard->table, slot, stored, weak, CFG_GENERATION_LOAD(st));
+  if (replaced != NULL) {
+    CFG_ACCT_RELEASED(CFG_ACCT_CACHE_ENTRY);
+    Py_DECREF(replaced);
+  }
+  shard->stats.writes++;
+  shard_maintain(st, shard);
+  return 0;
+}
 
-  /* If the function is not in the cache, create a TypeErrorRaiser */
-  PyObject *raiser = _raise_exec(NULL, Py_BuildValue("(O)", f_qualname));
-  if (raiser == NULL) {
-    Py_DECREF(f_qualname);
-    return NULL;
+/* Store `val` under `key` in `cache`, as a weakref when `val` is
+ * weakly-referencable (true-condition winner functions) or as a strong
+ * reference otherwise (TypeErrorRaiser objects, which are not
+ * weakly-referencable), tagged with the current cache generation.  Weakref
+ * values keep the module-global caches from pinning every selected function
+ * (and therefore its module) alive for the whole process: once the
+ * class/function is garbage-collected the entry's referent dies and is
+ * pruned.  Returns 0 on success, -1 on error. */
+static int cache_set_weak_or_strong(cfg_state *st, CfgCache *cache,
+                                    PyObject *key, PyObject *val) {
+  /* #3 (revised): the module cache stores weakrefs for true winners so a
+   * dropped class's method is never pinned (existing leak-safety contract,
+   * enforced by tests).  We therefore keep weakrefs for ALL values here; the
+   * steady-state speedup instead comes from proposal #5 (constant-condition
+   * fast path) and #4 (interned qualname keys).  The weakref's callback
+   * drops the entry as soon as the winner dies. */
+  CfgCacheShard *shard = cache_shard(cache, key);
+  PyObject *wr = NULL;
+  /* A raiser is not weakly-referencable: store it strongly without
+   * raising (and clearing) a TypeError on every false decoration. */
+  if (Py_TYPE(val) != (PyTypeObject *)st->TypeErrorRaiserType &&
+      (wr = PyWeakref_NewRef(val, shard->evict)) == NULL) {
+    /* val is not weakly-referencable: store it strongly. */
+    PyErr_Clear();
   }
+  int rc;
+  CFG_SHARD_LOCK(shard);
+  rc = shard_set(st, shard, key, wr != NULL ? wr : val, wr != NULL);
+  CFG_SHARD_UNLOCK();
+  Py_XDECREF(wr);
+  return rc;
+}
 
-  /* Add the function qualname to the raiser's f_qualnames set */
-  TypeErrorRaiserObject *raiser_obj = (TypeErrorRaiserObject *)raiser;
-  if (PySet_Add(raiser_obj->f_qualnames, f_qualname) < 0 ||
-      CFG_ALLOC_TEST_FAIL()) {
-    Py_DECREF(f_qualname);
-    Py_DECREF(raiser);
+/* Read `shard[key]` (see cache_get_live).  Caller holds the shard lock. */
+static PyObject *shard_get_live(cfg_state *st, CfgCacheShard *shard,
+                                PyObject *key) {
+  CfgSlot *slot = shard_find(shard, key);
+  if (slot == NULL) {
+    shard->stats.misses++;
     return NULL;
   }
-
-  /* Record the raiser in the module cache under the qualname (strong ref —
-   * TypeErrorRaiser is not weakly-referencable) so the eager validation
-   * helpers (assert_all_true/_get_failed) can find names whose condition is
-   * false.  A later `condition=True` winner for the same name overwrites
-   * this entry (the cache is keyed by qualname). */
-  if (cache_set_weak_or_strong(_cm_cache, f_qualname, raiser) < 0 ||
-      CFG_ALLOC_TEST_FAIL()) {
-    Py_DECREF(f_qualname);
-    Py_DECREF(raiser);
+  if (!shard_entry_is_current(st, slot)) {
+    /* written before the last reset: reclaim lazily, treat as absent */
+    shard->dead_since_sweep++;
+    shard->stats.stale++;
+    shard->stats.misses++;
+    shard_discard(shard, slot);
     return NULL;
   }
-  /* Record the failure in the dedicated set (survives TypeErrorRaiser_new's
-   * cache clearing so multiple independent failures stay visible). */
-  if (_failed_qualnames != NULL) {
-    if (PySet_Add(_failed_qualnames, f_qualname) < 0 || CFG_ALLOC_TEST_FAIL()) {
-      Py_DECREF(f_qualname);
-      Py_DECREF(raiser);
+  PyObject *val = CFG_SLOT_OBJECT(slot);
+  if (slot->value & CFG_SLOT_WEAK) {
+    PyObject *obj = cfg_weakref_get(val);
+    if (obj == NULL) {
+      /* referent is gone: prune and treat as absent */
+      shard->dead_since_sweep++; /* #6 */
+      shard->stats.dead++;
+      shard->stats.misses++;
+      shard_discard(shard, slot);
       return NULL;
     }
+    shard_mark(shard, slot);
+    shard->stats.hits++;
+    return obj;
   }
-
-  Py_DECREF(f_qualname);
-  return raiser;
+  shard_mark(shard, slot);
+  shard->stats.hits++;
+  Py_INCREF(val);
+  return val;
 }
 
-/* Wrapper function for cfg_attr when used as a decorator */
-static PyObject *cfg_attr_wrapper(PyObject *self, PyObject *args) {
-  PyObject *func = NULL;
+/* Read `cache[key]`, returning a NEW reference to the live cached value.
+ * A weakref value is dereferenced; a dead weakref or an entry from an older
+ * generation is pruned and treated as absent.  A strong value
+ * (TypeErrorRaiser) is returned as-is.  Returns NULL when there is no live
+ * entry for `key`. */
+static PyObject *cache_get_live(cfg_state *st, CfgCache *cache, PyObject *key) {
+  CfgCacheShard *shard = cache_shard(cache, key);
+  PyObject *result;
+  CFG_SHARD_LOCK(shard);
+  result = shard_get_live(st, shard, key);
+  CFG_SHARD_UNLOCK();
+  return result;
+}
 
-  if (!PyArg_ParseTuple(args, "O", &func)) {
-    return NULL;
+/* --- Qualified names ---
+ *
+ * The selection state is keyed by "module.qualname".  Building that string
+ * (attribute lookups, a format and an intern) used to be most of the cost
+ * of a decoration, and class factories decorate functions made from the
+ * same code over and over.  For plain functions the interned key is cached
+ * under the address of the function's code object.  An entry records the
+ * `__qualname__` and `__module__` objects the key was built from and is
+ * only reused while the function still carries those very objects, which
+ * functions made from the same code share unless one is renamed.  An entry
+ * holds no reference to the code object, so a code object that dies (and
+ * an address that is reused) cannot produce a wrong key; the cache is
+ * emptied when it reaches CFG_QUALNAME_CACHE_MAX entries. */
+#define CFG_QUALNAME_CACHE_MAX 4096
+
+/* getattr(obj, name) or NULL without an exception, like hasattr(). */
+static PyObject *cfg_getattr_opt(PyObject *obj, PyObject *name) {
+  PyObject *value = PyObject_GetAttr(obj, name);
+  if (value == NULL) {
+    PyErr_Clear();
   }
+  return value;
+}
 
-  /* Get closure tuple containing condition and decorators */
-  PyObject *closure = self;
-  if (!PyTuple_Check(closure) || PyTuple_Size(closure) != 2) {
-    PyErr_SetString(PyExc_RuntimeError, "Invalid closure in cfg_attr_wrapper");
+/* "module.qualname", or the qualname alone without a str module (new
+ * reference, NULL with an exception when `qualname` is not a str). */
+static PyObject *func_name_join(PyObject *module, PyObject *qualname) {
+  if (CFG_ALLOC_TEST_FAIL()) {
     return NULL;
   }
-
-  /* Get condition and decorators from closure.
-   * Use the libpython function forms (PyTuple_GetItem / PyTuple_GetSize):
-   * the inline PyTuple_GET_ITEM/GET_SIZE macros read a stale PyTupleObject
-   * layout on CPython 3.14/wasm and corrupt memory there (same bug class as
-   * PyTuple_SET_ITEM; fixed throughout). These are real libpython functions
-   * (wasm-safe, Limited API). */
-  PyObject *condition = PyTuple_GetItem(closure, 0);
-  PyObject *decorators = PyTuple_GetItem(closure, 1);
-  if (condition == NULL || decorators == NULL) {
-    return NULL;
+  if (module != NULL && PyUnicode_Check(module) && PyUnicode_Check(qualname)) {
+    return PyUnicode_FromFormat("%U.%U", module, qualname);
   }
+  return PyUnicode_FromObject(qualname);
+}
 
-  /* Call cfg_attr with all the arguments */
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *args_tuple = PyTuple_Pack(1, func);
-  if (args_tuple == NULL) {
-    return NULL;
+/* The uncached lookup: `__qualname__` (or `__name__`) and `__module__`,
+ * else the name of what the object wraps (`__wrapped__`, `__func__`,
+ * `fget`). */
+static PyObject *func_name_build(PyObject *self, cfg_state *st,
+                                 PyObject *func) {
+  PyObject *qualname = cfg_getattr_opt(func, st->str_qualname);
+  if (qualname == NULL) {
+    qualname = cfg_getattr_opt(func, st->str_name);
   }
-
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *kwargs = PyDict_New();
-  if (kwargs == NULL) {
-    Py_DECREF(args_tuple);
-    return NULL;
+  if (qualname != NULL) {
+    PyObject *module = cfg_getattr_opt(func, st->str_module);
+    PyObject *result = func_name_join(module, qualname);
+    Py_XDECREF(module);
+    Py_DECREF(qualname);
+    if (result != NULL) {
+      return result;
+    }
+    PyErr_Clear();
   }
 
-  CFG_ALLOC_FAIL_GUARD();
-  if (PyDict_SetItemString(kwargs, "condition", condition) < 0 ||
-      PyDict_SetItemString(kwargs, "decorators", decorators) < 0) {
-    Py_DECREF(args_tuple);
-    Py_DECREF(kwargs);
-    return NULL;
+  static const char *attrs[] = {"__wrapped__", "__func__", "fget"};
+  for (int i = 0; i < 3; i++) {
+    PyObject *wrapped = PyObject_GetAttrString(func, attrs[i]);
+    if (wrapped == NULL) {
+      PyErr_Clear();
+      continue;
+    }
+    PyObject *result = _get_func_name(self, wrapped);
+    Py_DECREF(wrapped);
+    if (result != NULL) {
+      return result;
+    }
   }
 
-  PyObject *result = cfg_attr(NULL, args_tuple, kwargs);
-  Py_DECREF(args_tuple);
-  Py_DECREF(kwargs);
-
-  return result;
+  PyErr_SetString(PyExc_TypeError, "Cannot get fully qualified function name");
+  return NULL;
 }
 
-/* Helper: apply decorators to a function (true branch of cfg_attr).
-   decorators is a sequence; applied right-to-left so decorators[0] is
-   outermost. */
-static PyObject *cfg_attr_apply_decorators(PyObject *func, PyObject *decorators,
-                                           PyObject *f_qualname) {
-  PyObject *result = NULL;
-  if (!PySequence_Check(decorators)) {
-    PyErr_SetString(PyExc_TypeError, "decorators must be a sequence");
-    goto error;
+/* The fully qualified name of `func` (new reference); interned when it
+ * comes from, or goes into, the cache. */
+static PyObject *_get_func_name(PyObject *self, PyObject *func) {
+  cfg_state *st = get_cfg_state(self);
+  if (Py_TYPE(func) != (PyTypeObject *)st->function_type) {
+    return func_name_build(self, st, func);
   }
-  Py_ssize_t n = PySequence_Length(decorators);
-  if (n < 0) {
-    goto error;
+  /* Functions always have these; __module__ may be None. */
+  PyObject *code = PyObject_GetAttr(func, st->str_code);
+  if (code == NULL) {
+    return NULL;
   }
-  if (n == 0) {
-    /* Cache the undecorated function just like any other true result, so a
-       later false condition for the same qualname reuses it (parity with
-       cm's cache semantics). */
-    Py_INCREF(func);
-    if (f_qualname != NULL &&
-        (cache_set_weak_or_strong(_cfg_attr_cache, f_qualname, func) < 0 ||
-         CFG_ALLOC_TEST_FAIL())) {
-      Py_DECREF(func);
-      return NULL;
-    }
-    if (f_qualname != NULL && _failed_qualnames != NULL) {
-      if (PySet_Discard(_failed_qualnames, f_qualname) < 0) {
-        Py_DECREF(func);
-        return NULL;
-      }
-    }
-    return func;
+  PyObject *key = PyLong_FromVoidPtr(code);
+  Py_DECREF(code);
+  if (key == NULL) {
+    return NULL;
   }
-  result = func;
-  Py_INCREF(result);
-  for (Py_ssize_t i = n - 1; i >= 0; i--) {
-    CFG_ALLOC_FAIL_GUARD();
-    PyObject *decorator = PySequence_GetItem(decorators, i);
-    if (decorator == NULL) {
-      goto error;
-    }
-    CFG_ALLOC_FAIL_GUARD();
-    PyObject *args_tuple = PyTuple_Pack(1, result);
-    Py_DECREF(result);
-    result = NULL;
-    if (args_tuple == NULL) {
-      Py_DECREF(decorator);
-      goto error;
+  CFG_ACCT_CREATED(CFG_ACCT_QUALNAME_KEY);
+  PyObject *qualname = PyObject_GetAttr(func, st->str_qualname);
+  PyObject *module =
+      qualname != NULL ? PyObject_GetAttr(func, st->str_module) : NULL;
+  if (module == NULL) {
+    CFG_ACCT_RELEASED(CFG_ACCT_QUALNAME_KEY);
+    Py_DECREF(key);
+    Py_XDECREF(qualname);
+    return NULL;
+  }
+  PyObject *result = NULL;
+  PyObject *entry = cfg_dict_get(st->qualname_cache, key);
+  if (entry != NULL && PyTuple_GetItem(entry, 0) == qualname &&
+      PyTuple_GetItem(entry, 1) == module) {
+    result = PyTuple_GetItem(entry, 2);
+    Py_INCREF(result);
+  } else if ((result = func_name_join(module, qualname)) != NULL) {
+    PyUnicode_InternInPlace(&result);
+    /* Best effort: a failed store only costs the next lookup. */
+    if (PyDict_Size(st->qualname_cache) >= CFG_QUALNAME_CACHE_MAX) {
+      PyDict_Clear(st->qualname_cache);
     }
-    PyObject *decorated = PyObject_Call(decorator, args_tuple, NULL);
-    Py_DECREF(args_tuple);
-    Py_DECREF(decorator);
-    if (decorated == NULL) {
-      goto error;
+    PyObject *fresh = PyTuple_Pack(3, qualname, module, result);
+    if (fresh == NULL || CFG_ALLOC_TEST_FAIL() ||
+        PyDict_SetItem(st->qualname_cache, key, fresh) < 0) {
+      PyErr_Clear();
     }
-    result = decorated;
+    Py_XDECREF(fresh);
   }
-  if (f_qualname != NULL) {
-    if (cache_set_weak_or_strong(_cfg_attr_cache, f_qualname, result) < 0 ||
-        CFG_ALLOC_TEST_FAIL()) {
-      goto error;
+  Py_XDECREF(entry);
+  CFG_ACCT_RELEASED(CFG_ACCT_QUALNAME_KEY);
+  Py_DECREF(key);
+  Py_DECREF(qualname);
+  Py_DECREF(module);
+  return result;
+}
+
+/* --- Native conditions: cfg.env(...) / cfg.flag(...) ---
+ *
+ * Most callable conditions are one-line environment or feature-flag checks
+ * (`lambda f: os.environ["ENV"] == "production"`), and evaluating them costs
+ * a call into Python per decoration.  A _Condition is the same check kept as
+ * a small expression tree the extension evaluates itself:
+ *
+ *   cfg.env("ENV")                 set and non-empty
+ *   cfg.env("ENV") == "production" set and equal (`!=` is its negation)
+ *   cfg.flag("new_ui")             truthy value in cfg.set_flags(...)
+ *   a & b, a | b, ~a               composition (bools are accepted as leaves)
+ *
+ * Environment leaves read os.environ's backing dict (`os.environ._data`,
+ * captured at module exec) with the key and value encoded once when the
+ * node is built, so an evaluation is a dict lookup and a comparison --
+ * always against the live environment, with no Python frame.  Platforms
+ * whose os.environ has no such dict fall back to os.environ[name].
+ *
+ * Nodes are immutable and hash by identity.  `bool(node)` raises: `and`,
+ * `or` and `not` would silently evaluate the condition where it is written
+ * instead of composing it.  Calling a node (with any arguments, e.g. the
+ * decorated function) returns its current value, so a node is also a valid
+ * callable condition everywhere one is accepted.  Each node carries the set
+ * of environment/flag names it reads, which the candidate registry uses as
+ * the default `depends_on=` keys (see registry_note). */
+enum {
+  CFG_COND_CONST,
+  CFG_COND_ENV,
+  CFG_COND_ENV_EQ,
+  CFG_COND_ENV_NE,
+  CFG_COND_FLAG,
+  CFG_COND_AND,
+  CFG_COND_OR,
+  CFG_COND_NOT,
+};
+
+typedef struct {
+  PyObject_HEAD int kind;
+  PyObject *module; /* the _c module (environment and flags) */
+  PyObject *name;   /* variable / flag name; Py_True/Py_False for CONST */
+  PyObject *value;  /* compared str (ENV_EQ/ENV_NE), or NULL */
+  PyObject *ekey;   /* `name` encoded like os.environ's keys */
+  PyObject *evalue; /* `value` encoded like os.environ's values */
+  PyObject *left;   /* operands of AND/OR/NOT */
+  PyObject *right;
+  PyObject *keys; /* frozenset of the names read */
+} ConditionObject;
+
+static void Condition_dealloc(ConditionObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
+  PyObject_GC_UnTrack(self);
+  Py_CLEAR(self->module);
+  Py_CLEAR(self->name);
+  Py_CLEAR(self->value);
+  Py_CLEAR(self->ekey);
+  Py_CLEAR(self->evalue);
+  Py_CLEAR(self->left);
+  Py_CLEAR(self->right);
+  Py_CLEAR(self->keys);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp);
+}
+
+static int Condition_traverse(ConditionObject *self, visitproc visit,
+                              void *arg) {
+  Py_VISIT(Py_TYPE(self));
+  Py_VISIT(self->module);
+  Py_VISIT(self->left);
+  Py_VISIT(self->right);
+  return 0;
+}
+
+static int Condition_clear(ConditionObject *self) {
+  Py_CLEAR(self->module);
+  Py_CLEAR(self->left);
+  Py_CLEAR(self->right);
+  return 0;
+}
+
+static PyObject *Condition_call(ConditionObject *self, PyObject *args,
+                                PyObject *kwargs);
+
+/* Whether `obj` is a _Condition of any module object (the type is final and
+ * each module object has its own, so compare the call slot). */
+static int cfg_is_condition(PyObject *obj) {
+  PyTypeObject *tp = Py_TYPE(obj);
+  return (PyType_GetFlags(tp) & Py_TPFLAGS_HEAPTYPE) &&
+         PyType_GetSlot(tp, Py_tp_call) == (void *)Condition_call;
+}
+
+/* Evaluate a node: 1 if true, 0 if false, -1 with an exception set. */
+static int condition_eval(ConditionObject *self) {
+  cfg_state *st = get_cfg_state(self->module);
+  int result;
+  switch (self->kind) {
+  case CFG_COND_CONST:
+    return self->name == Py_True;
+  case CFG_COND_FLAG: {
+    PyObject *value = cfg_dict_get(st->flags, self->name);
+    if (value == NULL) {
+      return 0;
     }
-    if (_failed_qualnames != NULL) {
-      if (PySet_Discard(_failed_qualnames, f_qualname) < 0) {
-        goto error;
+    result = PyObject_IsTrue(value);
+    Py_DECREF(value);
+    return result;
+  }
+  case CFG_COND_ENV:
+  case CFG_COND_ENV_EQ:
+  case CFG_COND_ENV_NE: {
+    PyObject *value;
+    if (st->environ_data != NULL) {
+      value = cfg_dict_get(st->environ_data, self->ekey);
+    } else {
+      value = PyObject_GetItem(st->environ, self->ekey);
+      if (value == NULL) {
+        if (!PyErr_ExceptionMatches(PyExc_KeyError)) {
+          return -1;
+        }
+        PyErr_Clear();
       }
     }
+    if (value == NULL) {
+      return self->kind == CFG_COND_ENV_NE;
+    }
+    result = self->kind == CFG_COND_ENV
+                 ? PyObject_IsTrue(value)
+                 : PyObject_RichCompareBool(value, self->evalue, Py_EQ);
+    Py_DECREF(value);
+    if (result < 0) {
+      return -1;
+    }
+    return self->kind == CFG_COND_ENV_NE ? !result : result;
+  }
+  default:
+    break;
+  }
+  if (Py_EnterRecursiveCall(" while evaluating a condition")) {
+    return -1;
   }
+  result = condition_eval((ConditionObject *)self->left);
+  if (self->kind == CFG_COND_NOT) {
+    result = result < 0 ? -1 : !result;
+  } else if (result == (self->kind == CFG_COND_AND)) {
+    /* AND with a true left side, OR with a false one. */
+    result = condition_eval((ConditionObject *)self->right);
+  }
+  Py_LeaveRecursiveCall();
   return result;
-error:
-  Py_XDECREF(result);
-  return NULL;
 }
 
-/* Helper: create a TypeErrorRaiser for a false-conditioned function
-   (shared by cm and cfg_attr). Adds f_qualname to the raiser's set and to
-   the module-level _failed_qualnames set (visible to assert_all_true). */
-static PyObject *cfg_make_raiser(PyObject *f_qualname) {
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *raiser_args = Py_BuildValue("(O)", f_qualname);
-  if (raiser_args == NULL) {
+static PyObject *Condition_call(ConditionObject *self,
+                                PyObject *Py_UNUSED(args),
+                                PyObject *Py_UNUSED(kwargs)) {
+  int result = condition_eval(self);
+  if (result < 0) {
     return NULL;
   }
-  PyObject *raiser = _raise_exec(NULL, raiser_args);
-  Py_DECREF(raiser_args);
-  if (raiser == NULL) {
+  return PyBool_FromLong(result);
+}
+
+static ConditionObject *condition_alloc(PyObject *module, int kind) {
+  PyTypeObject *type = (PyTypeObject *)get_cfg_state(module)->ConditionType;
+  allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+  ConditionObject *node = (ConditionObject *)tp_alloc(type, 0);
+  if (node == NULL) {
     return NULL;
   }
-  TypeErrorRaiserObject *raiser_obj = (TypeErrorRaiserObject *)raiser;
+  node->kind = kind;
+  Py_INCREF(module);
+  node->module = module;
+  return node;
+}
+
+/* `obj` encoded with os.environ's encodekey/encodevalue (new reference), or
+ * unchanged when the environment is read through os.environ itself. */
+static PyObject *condition_encode(cfg_state *st, PyObject *encode,
+                                  PyObject *obj) {
+  if (st->environ_data == NULL) {
+    Py_INCREF(obj);
+    return obj;
+  }
+  return PyObject_CallFunctionObjArgs(encode, obj, NULL);
+}
+
+/* A leaf reading `name` (ENV or FLAG). */
+static PyObject *condition_leaf(PyObject *module, PyObject *name, int kind) {
+  if (!PyUnicode_Check(name)) {
+    PyErr_Format(PyExc_TypeError, "`cfg.%s` expects a str name, not %R",
+                 kind == CFG_COND_ENV ? "env" : "flag", name);
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(module);
   CFG_ALLOC_FAIL_GUARD();
-  if (PySet_Add(raiser_obj->f_qualnames, f_qualname) < 0 ||
-      CFG_ALLOC_TEST_FAIL()) {
-    Py_DECREF(raiser);
+  ConditionObject *node = condition_alloc(module, kind);
+  if (node == NULL) {
     return NULL;
   }
-  /* Record the failure so assert_all_true/_get_failed can report it. */
-  if (_failed_qualnames != NULL) {
-    if (PySet_Add(_failed_qualnames, f_qualname) < 0 || CFG_ALLOC_TEST_FAIL()) {
-      Py_DECREF(raiser);
-      return NULL;
-    }
+  Py_INCREF(name);
+  node->name = name;
+  PyObject *single = PyTuple_Pack(1, name);
+  node->keys = single != NULL ? PyFrozenSet_New(single) : NULL;
+  Py_XDECREF(single);
+  if (node->keys == NULL) {
+    Py_DECREF(node);
+    return NULL;
   }
-  return raiser;
+  if (kind == CFG_COND_ENV && (node->ekey = condition_encode(
+                                   st, st->environ_encodekey, name)) == NULL) {
+    Py_DECREF(node);
+    return NULL;
+  }
+  return (PyObject *)node;
 }
 
-/* Implementation of cfg_attr function */
-static PyObject *cfg_attr(PyObject *self, PyObject *args, PyObject *kwargs) {
-  PyObject *func = NULL;
-  PyObject *condition = Py_None;
-  PyObject *decorators = NULL;
+static PyObject *cfg_env(PyObject *self, PyObject *name) {
+  return condition_leaf(self, name, CFG_COND_ENV);
+}
 
-  static char *kwlist[] = {"", "condition", "decorators", NULL};
+static PyObject *cfg_flag(PyObject *self, PyObject *name) {
+  return condition_leaf(self, name, CFG_COND_FLAG);
+}
 
-  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|OOO", kwlist, &func,
-                                   &condition, &decorators)) {
+/* cfg.env(name) == value / != value */
+static PyObject *Condition_richcompare(ConditionObject *self, PyObject *other,
+                                       int op) {
+  if (self->kind != CFG_COND_ENV || (op != Py_EQ && op != Py_NE)) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+  if (!PyUnicode_Check(other)) {
+    PyErr_Format(PyExc_TypeError,
+                 "environment variables are str: cannot compare %R with %R",
+                 (PyObject *)self, other);
     return NULL;
   }
-
-  /* f is None and condition is None -> ValueError (decorator factory misuse) */
-  if ((func == NULL || func == Py_None) && condition == Py_None) {
-    PyErr_SetString(PyExc_ValueError,
-                    "`condition` is required and must be a bool or a callable "
-                    "that takes the decorated function and returns a bool");
+  cfg_state *st = get_cfg_state(self->module);
+  CFG_ALLOC_FAIL_GUARD();
+  ConditionObject *node = condition_alloc(
+      self->module, op == Py_EQ ? CFG_COND_ENV_EQ : CFG_COND_ENV_NE);
+  if (node == NULL) {
+    return NULL;
+  }
+  Py_INCREF(self->name);
+  node->name = self->name;
+  Py_INCREF(self->ekey);
+  node->ekey = self->ekey;
+  Py_INCREF(self->keys);
+  node->keys = self->keys;
+  Py_INCREF(other);
+  node->value = other;
+  node->evalue = condition_encode(st, st->environ_encodevalue, other);
+  if (node->evalue == NULL) {
+    Py_DECREF(node);
     return NULL;
   }
+  return (PyObject *)node;
+}
 
-  /* condition is None (but f given) -> TypeError */
-  if (condition == Py_None) {
-    PyErr_SetString(PyExc_TypeError,
-                    "`condition` is required and must be a bool or a callable "
-                    "that takes the decorated function and returns a bool");
+/* An operand of `&` / `|` as a node (new reference): nodes as they are,
+ * bools as constant leaves; NULL without an exception for anything else. */
+static PyObject *condition_operand(PyObject *module, PyObject *obj) {
+  if (cfg_is_condition(obj)) {
+    Py_INCREF(obj);
+    return obj;
+  }
+  if (!PyBool_Check(obj)) {
+    return NULL;
+  }
+  ConditionObject *node = condition_alloc(module, CFG_COND_CONST);
+  if (node == NULL) {
+    return NULL;
+  }
+  Py_INCREF(obj);
+  node->name = obj;
+  node->keys = PyFrozenSet_New(NULL);
+  if (node->keys == NULL) {
+    Py_DECREF(node);
     return NULL;
   }
+  return (PyObject *)node;
+}
 
-  /* Default decorators to an empty tuple */
-  if (decorators == NULL) {
-    CFG_ALLOC_FAIL_GUARD();
-    decorators = PyTuple_New(0);
-    if (decorators == NULL) {
+static PyObject *condition_combine(PyObject *a, PyObject *b, int kind) {
+  PyObject *module = ((ConditionObject *)(cfg_is_condition(a) ? a : b))->module;
+  PyObject *left = condition_operand(module, a);
+  PyObject *right = left != NULL ? condition_operand(module, b) : NULL;
+  if (right == NULL) {
+    Py_XDECREF(left);
+    if (PyErr_Occurred()) {
       return NULL;
     }
-  } else {
-    Py_INCREF(decorators);
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+  ConditionObject *node = NULL;
+  if (!CFG_ALLOC_TEST_FAIL()) {
+    node = condition_alloc(module, kind);
+  }
+  if (node == NULL) {
+    Py_DECREF(left);
+    Py_DECREF(right);
+    return NULL;
+  }
+  node->left = left;
+  node->right = right;
+  node->keys = PyNumber_Or(((ConditionObject *)left)->keys,
+                           ((ConditionObject *)right)->keys);
+  if (node->keys == NULL) {
+    Py_DECREF(node);
+    return NULL;
   }
+  return (PyObject *)node;
+}
 
-  /* Helper: build a factory wrapper that captures condition+decorators. */
-  PyObject *closure = NULL;
-  PyObject *wrapper = NULL;
+static PyObject *Condition_and(PyObject *a, PyObject *b) {
+  return condition_combine(a, b, CFG_COND_AND);
+}
 
-  /* Evaluate a callable condition */
-  if (PyCallable_Check(condition)) {
-    /* Factory form: return a wrapper that evaluates per-function. */
-    if (func == NULL || func == Py_None) {
-      CFG_ALLOC_FAIL_GUARD();
-      closure = PyTuple_New(2);
-      if (closure == NULL) {
-        goto error;
-      }
-      Py_INCREF(condition);
-      /* libpython function forms (wasm-safe; the inline SET_ITEM macro reads
-       * a stale PyTupleObject layout on CPython 3.14/wasm). Each steals its
-       * argument on success; on failure it does not, so decref on error. */
-      if (PyTuple_SetItem(closure, 0, condition) < 0 ||
-          PyTuple_SetItem(closure, 1, decorators) < 0) {
-        Py_DECREF(condition);
-        Py_DECREF(closure);
-        decorators = NULL; /* ownership consumed by the failed SetItem */
-        goto error;
-      }
-      decorators = NULL; /* ownership transferred into closure */
-      CFG_ALLOC_FAIL_GUARD();
-      wrapper = PyCFunction_New(&cfg_attr_wrapper_def, closure);
-      if (wrapper == NULL) {
-        goto error;
-      }
-      return wrapper;
-    }
-    /* Direct: evaluate condition(func) */
-    PyObject *cond_args = PyTuple_Pack(1, func);
-    if (cond_args == NULL) {
-      goto error;
-    }
-    PyObject *cond_result = PyObject_CallObject(condition, cond_args);
-    Py_DECREF(cond_args);
-    if (cond_result == NULL) {
-      PyObject *error_type, *error_value, *error_traceback;
-      PyErr_Fetch(&error_type, &error_value, &error_traceback);
-      PyObject *fq = _get_func_name(NULL, func);
-      if (error_type != NULL &&
-          PyErr_GivenExceptionMatches(error_type, PyExc_TypeError) &&
-          fq != NULL) {
-        PyObject *error_msg = PyUnicode_FromFormat(
-            "Error calling `condition` for `%U`: %S", fq, error_value);
-        if (error_msg != NULL) {
-          PyErr_SetObject(PyExc_TypeError, error_msg);
-          Py_DECREF(error_msg);
-        }
-        Py_XDECREF(error_type);
-        Py_XDECREF(error_value);
-        Py_XDECREF(error_traceback);
-      } else {
-        PyErr_Restore(error_type, error_value, error_traceback);
-      }
-      Py_XDECREF(fq);
-      goto error;
-    }
-    int cond_bool = PyObject_IsTrue(cond_result);
-    Py_DECREF(cond_result);
-    if (cond_bool == -1) {
-      goto error;
-    }
-    if (cond_bool) {
-      PyObject *fq = _get_func_name(NULL, func);
-      if (fq == NULL) {
-        goto error;
-      }
-      PyObject *result = cfg_attr_apply_decorators(func, decorators, fq);
-      Py_DECREF(fq);
-      Py_DECREF(decorators);
-      decorators = NULL;
-      return result;
-    }
-    /* False: raiser */
-    PyObject *fq = _get_func_name(NULL, func);
-    if (fq == NULL) {
-      goto error;
-    }
-    PyObject *cached = cache_get_live(_cfg_attr_cache, fq);
-    if (cached != NULL) {
-      Py_DECREF(fq);
-      Py_DECREF(decorators);
-      decorators = NULL;
-      return cached; /* new reference */
-    }
-    PyObject *raiser = cfg_make_raiser(fq);
-    Py_DECREF(fq);
-    Py_DECREF(decorators);
-    decorators = NULL;
-    return raiser;
-  }
+static PyObject *Condition_or(PyObject *a, PyObject *b) {
+  return condition_combine(a, b, CFG_COND_OR);
+}
 
-  /* Non-callable condition */
-  int cond_truthy = PyObject_IsTrue(condition);
-  if (cond_truthy == -1) {
-    goto error;
+static PyObject *Condition_invert(ConditionObject *self) {
+  CFG_ALLOC_FAIL_GUARD();
+  ConditionObject *node = condition_alloc(self->module, CFG_COND_NOT);
+  if (node == NULL) {
+    return NULL;
   }
+  Py_INCREF(self);
+  node->left = (PyObject *)self;
+  Py_INCREF(self->keys);
+  node->keys = self->keys;
+  return (PyObject *)node;
+}
 
-  if (cond_truthy) {
-    /* True: apply decorators (factory or direct) */
-    if (func == NULL || func == Py_None) {
-      _cfg_log("cfg_attr: true factory");
-      closure = PyTuple_New(2);
-      if (closure == NULL) {
-        goto error;
-      }
-      Py_INCREF(condition);
-      if (PyTuple_SetItem(closure, 0, condition) < 0 ||
-          PyTuple_SetItem(closure, 1, decorators) < 0) {
-        Py_DECREF(condition);
-        Py_DECREF(closure);
-        decorators = NULL;
-        goto error;
-      }
-      decorators = NULL; /* ownership transferred into closure */
-      wrapper = PyCFunction_New(&cfg_attr_wrapper_def, closure);
-      if (wrapper == NULL) {
-        goto error;
-      }
-      return wrapper;
-    }
-    PyObject *fq = _get_func_name(NULL, func);
-    if (fq == NULL) {
-      goto error;
-    }
-    PyObject *result = cfg_attr_apply_decorators(func, decorators, fq);
-    Py_DECREF(fq);
-    Py_DECREF(decorators);
-    decorators = NULL;
-    return result;
-  }
+static int Condition_bool(ConditionObject *self) {
+  PyErr_Format(PyExc_TypeError,
+               "the truth value of %R is only known when it is evaluated: "
+               "pass it as `condition=` or call it, and combine conditions "
+               "with `&`, `|` and `~` rather than `and`, `or` and `not`",
+               (PyObject *)self);
+  return -1;
+}
 
-  /* False: raiser (factory or direct) */
-  if (func == NULL || func == Py_None) {
-    closure = PyTuple_New(2);
-    if (closure == NULL) {
-      goto error;
-    }
-    Py_INCREF(condition);
-    if (PyTuple_SetItem(closure, 0, condition) < 0 ||
-        PyTuple_SetItem(closure, 1, decorators) < 0) {
-      Py_DECREF(condition);
-      Py_DECREF(closure);
-      decorators = NULL;
-      goto error;
-    }
-    decorators = NULL; /* ownership transferred into closure */
-    wrapper = PyCFunction_New(&cfg_attr_wrapper_def, closure);
-    if (wrapper == NULL) {
-      goto error;
-    }
-    return wrapper;
+/* repr of an operand, parenthesized unless it is a leaf or a negation
+ * (`&`/`|` bind tighter than `==`). */
+static PyObject *condition_repr_operand(PyObject *operand) {
+  int kind = ((ConditionObject *)operand)->kind;
+  if (kind == CFG_COND_ENV_EQ || kind == CFG_COND_ENV_NE ||
+      kind == CFG_COND_AND || kind == CFG_COND_OR) {
+    return PyUnicode_FromFormat("(%R)", operand);
   }
-  PyObject *fq = _get_func_name(NULL, func);
-  if (fq == NULL) {
-    goto error;
+  return PyObject_Repr(operand);
+}
+
+static PyObject *Condition_repr(ConditionObject *self) {
+  switch (self->kind) {
+  case CFG_COND_CONST:
+    return PyObject_Repr(self->name);
+  case CFG_COND_ENV:
+    return PyUnicode_FromFormat("cfg.env(%R)", self->name);
+  case CFG_COND_ENV_EQ:
+  case CFG_COND_ENV_NE:
+    return PyUnicode_FromFormat(
+        "cfg.env(%R) %s %R", self->name,
+        self->kind == CFG_COND_ENV_EQ ? "==" : "!=", self->value);
+  case CFG_COND_FLAG:
+    return PyUnicode_FromFormat("cfg.flag(%R)", self->name);
+  default:
+    break;
   }
-  PyObject *cached = cache_get_live(_cfg_attr_cache, fq);
-  if (cached != NULL) {
-    Py_DECREF(fq);
-    Py_DECREF(decorators);
-    decorators = NULL;
-    return cached; /* new reference */
+  PyObject *left = condition_repr_operand(self->left);
+  if (left == NULL || self->kind == CFG_COND_NOT) {
+    PyObject *repr = left != NULL ? PyUnicode_FromFormat("~%U", left) : NULL;
+    Py_XDECREF(left);
+    return repr;
   }
-  PyObject *raiser = cfg_make_raiser(fq);
-  Py_DECREF(fq);
-  Py_DECREF(decorators);
-  decorators = NULL;
-  return raiser;
+  PyObject *right = condition_repr_operand(self->right);
+  PyObject *repr =
+      right != NULL
+          ? PyUnicode_FromFormat("%U %s %U", left,
+                                 self->kind == CFG_COND_AND ? "&" : "|", right)
+          : NULL;
+  Py_DECREF(left);
+  Py_XDECREF(right);
+  return repr;
+}
 
-error:
-  Py_XDECREF(closure);
-  Py_XDECREF(wrapper);
-  Py_XDECREF(decorators);
+static PyObject *Condition_get_keys(ConditionObject *self,
+                                    void *Py_UNUSED(closure)) {
+  Py_INCREF(self->keys);
+  return self->keys;
+}
+
+static PyGetSetDef Condition_getset[] = {
+    {"keys", (getter)Condition_get_keys, NULL,
+     "Environment variable and flag names the condition reads", NULL},
+    {NULL} /* Sentinel */
+};
+
+/* Identity hash: defining __eq__ would otherwise make nodes unhashable. */
+static Py_hash_t Condition_hash(ConditionObject *self) {
+  return (Py_hash_t)((uintptr_t)self >> 4);
+}
+
+/* Instances only come from cfg.env / cfg.flag and the operators. */
+static PyObject *Condition_new(PyTypeObject *Py_UNUSED(type),
+                               PyObject *Py_UNUSED(args),
+                               PyObject *Py_UNUSED(kwargs)) {
+  PyErr_SetString(PyExc_TypeError,
+                  "cannot create 'conditional_method._Condition' instances");
   return NULL;
 }
 
-/* --- Eager validation: assert_all_true() -------------------------------
+static PyType_Slot Condition_slots[] = {
+    {Py_tp_doc, (void *)"Condition evaluated natively by @cfg (cfg.env, "
+                        "cfg.flag, &, |, ~)"},
+    {Py_tp_new, (void *)Condition_new},
+    {Py_tp_dealloc, (void *)Condition_dealloc},
+    {Py_tp_traverse, (void *)Condition_traverse},
+    {Py_tp_clear, (void *)Condition_clear},
+    {Py_tp_call, (void *)Condition_call},
+    {Py_tp_repr, (void *)Condition_repr},
+    {Py_tp_hash, (void *)Condition_hash},
+    {Py_tp_richcompare, (void *)Condition_richcompare},
+    {Py_tp_getset, Condition_getset},
+    {Py_nb_and, (void *)Condition_and},
+    {Py_nb_or, (void *)Condition_or},
+    {Py_nb_invert, (void *)Condition_invert},
+    {Py_nb_bool, (void *)Condition_bool},
+    {0, NULL},
+};
+
+static PyType_Spec Condition_spec = {
+    "conditional_method._Condition",         sizeof(ConditionObject), 0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, Condition_slots,
+};
+
+/* --- Pure conditions: @cfg(condition=..., pure=True) ---
  *
- * Module-level ``@cfg(condition=False)`` decorations return a
- * TypeErrorRaiser *immediately* (the function itself is replaced), but the
- * error only fires when the name is *called*.  For config/flag-style
- * modules you often want to fail at import time when a decorated name ended
- * up with no true condition.  ``assert_all_true()`` scans the module-level
- * cache and raises a TypeError naming every qualified function whose cached
- * value is a TypeErrorRaiser (i.e. no ``condition=True`` winner).  It is a
- * no-op (returns None) when everything is satisfied.
+ * A callable condition is called once per decorated function, so one
+ * `is_development` gating hundreds of methods re-reads the environment
+ * hundreds of times while a package imports.  `pure=True` declares that
+ * the condition ignores its argument: its result is memoized per condition
+ * object in the module state's `pure_memo` dict, keyed by the condition's
+ * id and holding (condition, result | None, epoch).  The strong reference
+ * to the condition keeps its id from being reused.
  *
- * ``_get_failed()`` returns the same list as a Python list of qualname
- * strings (empty when all conditions are true) — used by tests and by
- * ``assert_all_true`` itself.
- */
+ * Results belong to a config epoch: reselect() (and so cfg.set_flags) and
+ * cfg.invalidate_conditions() with no arguments start a new one with an
+ * O(1) bump, after which older results read as absent, as with the cache
+ * generation.  Naming conditions drops only their results.  The memo holds
+ * at most CFG_PURE_MEMO_MAX conditions; registering one more empties it
+ * (the conditions still decorated are registered again by their next
+ * decoration). */
+#define CFG_PURE_MEMO_MAX 1024
+
+/* Mark `condition` as pure (a no-op if it already is). */
+static int pure_register(cfg_state *st, PyObject *condition) {
+  PyObject *key = PyLong_FromVoidPtr(condition);
+  if (key == NULL) {
+    return -1;
+  }
+  int rc = 0;
+  CFG_OBJECT_LOCK(st->pure_memo);
+  PyObject *entry = cfg_dict_get(st->pure_memo, key);
+  if (entry == NULL) {
+    if (PyDict_Size(st->pure_memo) >= CFG_PURE_MEMO_MAX) {
+      PyDict_Clear(st->pure_memo);
+    }
+    entry = PyTuple_Pack(3, condition, Py_None, st->pure_epoch);
+    rc = entry != NULL && !CFG_ALLOC_TEST_FAIL()
+             ? PyDict_SetItem(st->pure_memo, key, entry)
+             : -1;
+  }
+  Py_XDECREF(entry);
+  CFG_OBJECT_UNLOCK();
+  Py_DECREF(key);
+  return rc;
+}
 
-static PyObject *cfg_get_failed(PyObject *Py_UNUSED(self),
-                                PyObject *Py_UNUSED(ignored)) {
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *result = PyList_New(0);
-  if (result == NULL) {
-    return NULL;
+/* The memoized result of `condition`: 1 or 0, or -2 if there is none.
+ * `*key` receives the memo key (new reference) when the condition is pure,
+ * for pure_store. */
+static int pure_lookup(cfg_state *st, PyObject *condition, PyObject **key) {
+  *key = NULL;
+  if (PyDict_Size(st->pure_memo) == 0) {
+    return -2;
   }
-  PyObject *iter = PyObject_GetIter(_failed_qualnames);
-  if (iter == NULL) {
-    Py_DECREF(result);
+  PyObject *memo_key = PyLong_FromVoidPtr(condition);
+  if (memo_key == NULL) {
+    return -1;
+  }
+  int result = -2;
+  CFG_OBJECT_LOCK(st->pure_memo);
+  PyObject *entry = cfg_dict_get(st->pure_memo, memo_key);
+  if (entry != NULL && PyTuple_GetItem(entry, 0) == condition) {
+    PyObject *value = PyTuple_GetItem(entry, 1);
+    if (value != Py_None && PyTuple_GetItem(entry, 2) == st->pure_epoch) {
+      result = value == Py_True;
+    }
+    *key = memo_key;
+  } else {
+    Py_DECREF(memo_key);
+  }
+  Py_XDECREF(entry);
+  CFG_OBJECT_UNLOCK();
+  return result;
+}
+
+/* Record the result of a pure condition for the current epoch.  Best
+ * effort: a failure only costs the memoization. */
+static void pure_store(cfg_state *st, PyObject *key, PyObject *condition,
+                       int result) {
+  CFG_OBJECT_LOCK(st->pure_memo);
+  PyObject *entry =
+      PyTuple_Pack(3, condition, result ? Py_True : Py_False, st->pure_epoch);
+  if (entry == NULL || CFG_ALLOC_TEST_FAIL_VOID() ||
+      PyDict_SetItem(st->pure_memo, key, entry) < 0) {
+    PyErr_Clear();
+  }
+  Py_XDECREF(entry);
+  CFG_OBJECT_UNLOCK();
+}
+
+/* Start a new config epoch: every memoized result reads as absent. */
+static int pure_new_epoch(cfg_state *st) {
+  int rc = 0;
+  CFG_OBJECT_LOCK(st->pure_memo);
+  PyObject *one = PyLong_FromLong(1);
+  PyObject *next = one != NULL ? PyNumber_Add(st->pure_epoch, one) : NULL;
+  Py_XDECREF(one);
+  if (next == NULL || CFG_ALLOC_TEST_FAIL()) {
+    Py_XDECREF(next);
+    rc = -1;
+  } else {
+    PyObject *old = st->pure_epoch;
+    st->pure_epoch = next;
+    Py_DECREF(old);
+  }
+  CFG_OBJECT_UNLOCK();
+  return rc;
+}
+
+/* cfg.invalidate_conditions(*conditions): forget the memoized results of
+ * the given pure conditions, or of all of them. */
+static PyObject *cfg_invalidate_conditions(PyObject *self, PyObject *args) {
+  cfg_state *st = get_cfg_state(self);
+  Py_ssize_t n = PyTuple_Size(args);
+  if (n == 0) {
+    if (pure_new_epoch(st) < 0) {
+      return NULL;
+    }
+    Py_RETURN_NONE;
+  }
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *condition = PyTuple_GetItem(args, i);
+    PyObject *key = PyLong_FromVoidPtr(condition);
+    if (key == NULL) {
+      return NULL;
+    }
+    int rc = 0;
+    CFG_OBJECT_LOCK(st->pure_memo);
+    PyObject *entry = cfg_dict_get(st->pure_memo, key);
+    if (entry != NULL && PyTuple_GetItem(entry, 0) == condition) {
+      PyObject *reset = PyTuple_Pack(3, condition, Py_None, st->pure_epoch);
+      rc = reset != NULL && !CFG_ALLOC_TEST_FAIL()
+               ? PyDict_SetItem(st->pure_memo, key, reset)
+               : -1;
+      Py_XDECREF(reset);
+    }
+    Py_XDECREF(entry);
+    CFG_OBJECT_UNLOCK();
+    Py_DECREF(key);
+    if (rc < 0) {
+      return NULL;
+    }
+  }
+  Py_RETURN_NONE;
+}
+
+/* --- Candidate registry: runtime re-selection (reselect) ---
+ *
+ * An eager decoration only remembers the winner, so flipping the input a
+ * condition reads used to need a restart (or a re-import) to take effect.
+ * Names whose selection can change at runtime -- a candidate with a
+ * callable condition, or one declaring the inputs it reads with
+ * `depends_on=` -- instead get a _Candidates entry in the module state's
+ * `candidates` registry (qualname -> entry): every candidate in decoration
+ * order with its last result.  reselect() re-evaluates the affected
+ * conditions, picks the winner the decorations would pick now (last true
+ * wins) and swaps it into the owning class or module namespace.
+ *
+ * Static bool candidates are only recorded once their name is tracked, so
+ * code that never uses callable conditions or `depends_on` never pins a
+ * function.  A tracked name holds its current definition's candidates
+ * strongly; decorating one of the same code objects again (a class built
+ * again by a factory, a module re-executed) starts a new definition, so the
+ * registry stays bounded.  `key_index` maps each declared key to the
+ * qualnames that read it, which is what keeps reselect(changed_keys=...)
+ * proportional to the names actually affected; it is pruned lazily (the
+ * entry's `keys` set is authoritative). */
+typedef struct {
+  PyObject_HEAD PyObject *qualname; /* interned "module.Qual.name" key */
+  PyObject *candidates;             /* list of (func, condition, keys|None) */
+  PyObject *results; /* list of bool, last result per candidate */
+  PyObject *keys;    /* set: union of the declared keys */
+  PyObject *owner;   /* weakref to the owning class/module, or NULL */
+  PyObject *name;    /* attribute name in the owner, or NULL */
+} CandidatesObject;
+
+static void Candidates_dealloc(CandidatesObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
+  PyObject_GC_UnTrack(self);
+  Py_CLEAR(self->qualname);
+  Py_CLEAR(self->candidates);
+  Py_CLEAR(self->results);
+  Py_CLEAR(self->keys);
+  Py_CLEAR(self->owner);
+  Py_CLEAR(self->name);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp);
+}
+
+static int Candidates_traverse(CandidatesObject *self, visitproc visit,
+                               void *arg) {
+  Py_VISIT(Py_TYPE(self));
+  Py_VISIT(self->candidates);
+  Py_VISIT(self->keys);
+  Py_VISIT(self->owner);
+  return 0;
+}
+
+static int Candidates_clear(CandidatesObject *self) {
+  Py_CLEAR(self->candidates);
+  Py_CLEAR(self->keys);
+  Py_CLEAR(self->owner);
+  return 0;
+}
+
+static PyObject *Candidates_repr(CandidatesObject *self) {
+  return PyUnicode_FromFormat("<conditional_method._Candidates %R (%zd)>",
+                              self->qualname, PyList_Size(self->candidates));
+}
+
+static PyMemberDef Candidates_members[] = {
+    {"__qualname__", T_OBJECT_EX, offsetof(CandidatesObject, qualname),
+     READONLY, "Fully qualified name the candidates were decorated under"},
+    {"candidates", T_OBJECT_EX, offsetof(CandidatesObject, candidates),
+     READONLY, "(func, condition, keys) per candidate, in decoration order"},
+    {"results", T_OBJECT_EX, offsetof(CandidatesObject, results), READONLY,
+     "Last result of each candidate's condition"},
+    {"keys", T_OBJECT_EX, offsetof(CandidatesObject, keys), READONLY,
+     "Keys declared with depends_on= by any candidate"},
+    {NULL} /* Sentinel */
+};
+
+/* Instances only come from decorations (see CfgCallable_new). */
+static PyObject *Candidates_new(PyTypeObject *Py_UNUSED(type),
+                                PyObject *Py_UNUSED(args),
+                                PyObject *Py_UNUSED(kwargs)) {
+  PyErr_SetString(PyExc_TypeError,
+                  "cannot create 'conditional_method._Candidates' instances");
+  return NULL;
+}
+
+static PyType_Slot Candidates_slots[] = {
+    {Py_tp_doc, (void *)"Recorded @cfg candidates of one name (reselect)"},
+    {Py_tp_new, (void *)Candidates_new},
+    {Py_tp_dealloc, (void *)Candidates_dealloc},
+    {Py_tp_traverse, (void *)Candidates_traverse},
+    {Py_tp_clear, (void *)Candidates_clear},
+    {Py_tp_repr, (void *)Candidates_repr},
+    {Py_tp_members, Candidates_members},
+    {0, NULL},
+};
+
+static PyType_Spec Candidates_spec = {
+    "conditional_method._Candidates",        sizeof(CandidatesObject), 0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, Candidates_slots,
+};
+
+/* Normalize a `depends_on=` value to a frozenset of keys (new reference):
+ * an iterable of hashable keys, or a single key (str, bytes, or any
+ * hashable that is not iterable, e.g. an int or an enum member). */
+static PyObject *cfg_keys_from(PyObject *depends_on) {
+  PyObject *iter = NULL;
+  if (!PyUnicode_Check(depends_on) && !PyBytes_Check(depends_on)) {
+    iter = PyObject_GetIter(depends_on);
+    if (iter == NULL) {
+      PyErr_Clear();
+    }
+  }
+  PyObject *keys = NULL;
+  if (iter != NULL) {
+    keys = PyFrozenSet_New(iter);
+    Py_DECREF(iter);
+  } else if (PyObject_Hash(depends_on) != -1) {
+    PyObject *single = PyTuple_Pack(1, depends_on);
+    keys = single != NULL ? PyFrozenSet_New(single) : NULL;
+    Py_XDECREF(single);
+  }
+  if (keys == NULL && PyErr_ExceptionMatches(PyExc_TypeError)) {
+    PyErr_Clear();
+    PyErr_Format(PyExc_TypeError,
+                 "`depends_on` must be a hashable key or an iterable of "
+                 "them, not %R",
+                 depends_on);
+  }
+  return keys;
+}
+
+/* --- Statistics ---
+ *
+ * stats() reports counters the engine keeps as it runs: per cache (`_cm_cache`
+ * and `_cfg_attr_cache`) the lookups that hit and missed, the entries
+ * written, the dead weakrefs and stale-generation entries reclaimed and the
+ * sweeps (shard_prune_dead) with the entries they removed; and for the
+ * engine the raisers built, the calls into callable conditions with the
+ * time they took and the conditions the selection manifest answered
+ * instead.  Cache counters live in each shard and are bumped under
+ * the shard lock the operation already holds; the others are relaxed
+ * atomic adds.  Counters only grow until reset_stats(). */
+
+/* Account one callable-condition call that started at `start`. */
+static void cfg_stat_condition(cfg_state *st, int64_t start) {
+  CFG_STAT_ADD(st, stat_condition_calls, 1);
+  CFG_STAT_ADD(st, stat_condition_ns, (uint64_t)(cfg_now_ns() - start));
+}
+
+/* Evaluate `condition` for `func`: 1 if true, 0 if false, -1 with an
+ * exception set.  A callable condition is called with the function; a
+ * native condition is evaluated without a call. */
+static int cfg_eval_condition(cfg_state *st, PyObject *condition,
+                              PyObject *func, PyObject *f_qualname) {
+  if (cfg_is_condition(condition)) {
+    return condition_eval((ConditionObject *)condition);
+  }
+  if (!PyCallable_Check(condition)) {
+    return PyObject_IsTrue(condition);
+  }
+  PyObject *memo_key;
+  int memoized = pure_lookup(st, condition, &memo_key);
+  if (memoized != -2) {
+    Py_XDECREF(memo_key);
+    return memoized;
+  }
+  PyObject *cond_result = NULL;
+  if (!CFG_ALLOC_TEST_FAIL()) {
+    int64_t start = cfg_now_ns();
+    cond_result = PyObject_CallFunctionObjArgs(condition, func, NULL);
+    cfg_stat_condition(st, start);
+  }
+  if (cond_result == NULL) {
+    Py_XDECREF(memo_key);
+    /* Only TypeError from the condition is wrapped; other exceptions
+     * (e.g. ValueError) propagate unchanged (matches the Python
+     * reference implementation). */
+    if (PyErr_ExceptionMatches(PyExc_TypeError)) {
+      PyObject *error_type, *error_value, *error_traceback;
+      PyErr_Fetch(&error_type, &error_value, &error_traceback);
+      PyErr_Format(PyExc_TypeError, "Error calling `condition` for `%U`: %S",
+                   f_qualname, error_value != NULL ? error_value : Py_None);
+      Py_XDECREF(error_type);
+      Py_XDECREF(error_value);
+      Py_XDECREF(error_traceback);
+    }
+    return -1;
+  }
+  int cond_bool = PyObject_IsTrue(cond_result);
+  Py_DECREF(cond_result);
+  if (memo_key != NULL) {
+    if (cond_bool >= 0) {
+      pure_store(st, memo_key, condition, cond_bool);
+    }
+    Py_DECREF(memo_key);
+  }
+  return cond_bool;
+}
+
+/* --- Decision tracing: recording (see "Decision tracing") --- */
+
+/* The name-table index of `qualname`, adding it on first sight.  Best
+ * effort: CFG_TRACE_NO_NAME when the table cannot grow. */
+static uint32_t cfg_trace_name_id(cfg_state *st, PyObject *qualname) {
+  uint32_t name = CFG_TRACE_NO_NAME;
+  CFG_OBJECT_LOCK(st->trace_name_ids);
+  PyObject *id = cfg_dict_get(st->trace_name_ids, qualname);
+  if (id != NULL) {
+    name = (uint32_t)PyLong_AsUnsignedLong(id);
+    Py_DECREF(id);
+  } else {
+    Py_ssize_t next = PyList_Size(st->trace_names);
+    id = next < (Py_ssize_t)CFG_TRACE_NO_NAME ? PyLong_FromSsize_t(next) : NULL;
+    if (id != NULL && PyList_Append(st->trace_names, qualname) == 0 &&
+        PyDict_SetItem(st->trace_name_ids, qualname, id) == 0) {
+      name = (uint32_t)next;
+    }
+    Py_XDECREF(id);
+    PyErr_Clear();
+  }
+  CFG_OBJECT_UNLOCK();
+  return name;
+}
+
+static int cfg_condition_kind(cfg_state *st, PyObject *condition) {
+  if (condition == NULL || !PyCallable_Check(condition)) {
+    return CFG_KIND_STATIC;
+  }
+  if (cfg_is_condition(condition)) {
+    return CFG_KIND_NATIVE;
+  }
+  /* Pure conditions are the ones with a memo entry. */
+  PyObject *memo_key;
+  (void)pure_lookup(st, condition, &memo_key);
+  PyErr_Clear();
+  int kind = memo_key != NULL ? CFG_KIND_PURE : CFG_KIND_CALLABLE;
+  Py_XDECREF(memo_key);
+  return kind;
+}
+
+/* Index of the last candidate recorded for a tracked name (the one just
+ * decorated), or -1 for a name the registry does not track. */
+static Py_ssize_t cfg_trace_candidate(cfg_state *st, PyObject *f_qualname) {
+  CandidatesObject *entry =
+      (CandidatesObject *)cfg_dict_get(st->candidates, f_qualname);
+  if (entry == NULL) {
+    return -1;
+  }
+  Py_ssize_t index = PyList_Size(entry->candidates) - 1;
+  Py_DECREF(entry);
+  return index;
+}
+
+static void cfg_trace_record(cfg_state *st, int event, PyObject *qualname,
+                             Py_ssize_t candidate, PyObject *condition,
+                             int result, int64_t cost_ns, int64_t entered,
+                             int64_t chain_ns) {
+  int64_t now = cfg_now_ns();
+  uint32_t name = cfg_trace_name_id(st, qualname);
+  int kind = cfg_condition_kind(st, condition);
+  CFG_TRACE_LOCK(st);
+  if (st->trace_ring != NULL) {
+    CfgDecision *slot =
+        &st->trace_ring[st->trace_seq % (uint64_t)st->trace_capacity];
+    slot->seq = st->trace_seq++;
+    slot->time_ns = now;
+    slot->cost_ns = cost_ns;
+    slot->total_ns = entered != 0 ? now - entered : 0;
+    slot->chain_ns = chain_ns;
+    slot->name = name;
+    slot->candidate = candidate <= INT32_MAX ? (int32_t)candidate : -1;
+    slot->event = (uint8_t)event;
+    slot->kind = (uint8_t)kind;
+    slot->result = (uint8_t)result;
+  }
+  CFG_TRACE_UNLOCK(st);
+}
+
+/* Record reselect() rebinding a tracked name to `winner`, the last of its
+ * candidates holding that function. */
+static void cfg_trace_rebind(cfg_state *st, CandidatesObject *entry,
+                             PyObject *winner) {
+  Py_ssize_t index = PyList_Size(entry->candidates) - 1;
+  while (index >= 0 && PyTuple_GetItem(PyList_GetItem(entry->candidates, index),
+                                       0) != winner) {
+    index--;
+  }
+  PyObject *condition =
+      index >= 0 ? PyTuple_GetItem(PyList_GetItem(entry->candidates, index), 1)
+                 : NULL;
+  cfg_trace_record(st, CFG_TRACE_REBIND, entry->qualname, index, condition, 1,
+                   0, 0, 0);
+}
+
+/* The code object a candidate was defined from (new reference), looking
+ * through staticmethod/classmethod/property/functools.wraps layers; the
+ * object itself when it has none.  Identifies a re-executed definition. */
+static PyObject *cfg_code_of(PyObject *func) {
+  static const char *attrs[] = {"__func__", "fget", "__wrapped__"};
+  Py_INCREF(func);
+  for (int depth = 0; depth < 4; depth++) {
+    PyObject *code = PyObject_GetAttrString(func, "__code__");
+    if (code != NULL) {
+      Py_DECREF(func);
+      return code;
+    }
+    PyErr_Clear();
+    PyObject *inner = NULL;
+    for (int i = 0; i < 3 && inner == NULL; i++) {
+      inner = PyObject_GetAttrString(func, attrs[i]);
+      if (inner == NULL) {
+        PyErr_Clear();
+      }
+    }
+    if (inner == NULL) {
+      break;
+    }
+    Py_DECREF(func);
+    func = inner;
+  }
+  return func;
+}
+
+/* --- Selection manifest ---
+ *
+ * conditional_method.manifest records which candidate each tracked name
+ * selected and, on a later start, installs that record with _manifest_load:
+ * `lookup(qualname)` returns the (co_filename, co_firstlineno) of the
+ * winner, the line 0 when no condition was true, or None for a name not
+ * recorded.  The record stays in the mapped file; each name is looked up
+ * once and its answer kept in `manifest`.  While the record holds a name, a
+ * decoration answers the callable conditions of its candidates from it --
+ * true for the candidate defined on the recorded line, false for the others
+ * -- instead of calling them.  The first name looked up in a file asks
+ * `manifest_check` whether the file is still the one recorded; the names of
+ * a file that is not are selected live.  reselect() always calls the
+ * conditions. */
+
+/* The record of `f_qualname` (new reference): a (filename, line) tuple, or
+ * NULL when there is none.  Never sets an exception. */
+static PyObject *manifest_entry(cfg_state *st, PyObject *f_qualname) {
+  PyObject *entry, *lookup;
+  CFG_OBJECT_LOCK(st->manifest);
+  lookup = st->manifest_lookup;
+  Py_XINCREF(lookup);
+  entry = lookup != NULL ? cfg_dict_get(st->manifest, f_qualname) : NULL;
+  CFG_OBJECT_UNLOCK();
+  if (lookup == NULL) {
     return NULL;
   }
-  PyObject *item;
-  while ((item = PyIter_Next(iter)) != NULL) {
-    if (PyList_Append(result, item) < 0) {
-      Py_DECREF(item);
+  if (entry == NULL) {
+    entry = PyObject_CallFunctionObjArgs(lookup, f_qualname, NULL);
+    if (entry == NULL) {
+      PyErr_Clear();
+    } else if (entry != Py_None &&
+               (!PyTuple_Check(entry) || PyTuple_Size(entry) != 2 ||
+                !PyUnicode_Check(PyTuple_GetItem(entry, 0)) ||
+                !PyLong_Check(PyTuple_GetItem(entry, 1)))) {
+      Py_DECREF(entry);
+      entry = Py_None;
+      Py_INCREF(entry);
+    }
+    if (entry != NULL) {
+      CFG_OBJECT_LOCK(st->manifest);
+      if (st->manifest_lookup == lookup &&
+          PyDict_SetItem(st->manifest, f_qualname, entry) < 0) {
+        PyErr_Clear();
+      }
+      CFG_OBJECT_UNLOCK();
+    }
+  }
+  Py_DECREF(lookup);
+  if (entry == Py_None) {
+    Py_CLEAR(entry);
+  }
+  return entry;
+}
+
+/* The recorded result of the callable condition of `func` (decorated as
+ * `f_qualname`): 1 or 0, or -2 when there is none.  Best effort: an error
+ * reads as no record. */
+static int manifest_lookup(cfg_state *st, PyObject *f_qualname,
+                           PyObject *func) {
+  PyObject *entry = manifest_entry(st, f_qualname);
+  if (entry == NULL) {
+    return -2;
+  }
+  PyObject *valid, *check;
+  PyObject *filename = PyTuple_GetItem(entry, 0);
+  CFG_OBJECT_LOCK(st->manifest);
+  valid = cfg_dict_get(st->manifest_files, filename);
+  check = st->manifest_check;
+  Py_XINCREF(check);
+  CFG_OBJECT_UNLOCK();
+  if (valid == NULL && check != NULL) {
+    PyObject *answer = PyObject_CallFunctionObjArgs(check, filename, NULL);
+    int same = answer != NULL ? PyObject_IsTrue(answer) : -1;
+    Py_XDECREF(answer);
+    if (same >= 0) {
+      valid = same ? Py_True : Py_False;
+      Py_INCREF(valid);
+      CFG_OBJECT_LOCK(st->manifest);
+      if (PyDict_SetItem(st->manifest_files, filename, valid) < 0) {
+        PyErr_Clear();
+      }
+      CFG_OBJECT_UNLOCK();
+    }
+  }
+  Py_XDECREF(check);
+  int result = -2;
+  if (valid == Py_True) {
+    PyObject *code = cfg_code_of(func);
+    PyObject *co_filename = PyObject_GetAttrString(code, "co_filename");
+    PyObject *line = co_filename != NULL
+                         ? PyObject_GetAttrString(code, "co_firstlineno")
+                         : NULL;
+    if (line != NULL &&
+        PyObject_RichCompareBool(co_filename, filename, Py_EQ) > 0) {
+      result = PyObject_RichCompareBool(line, PyTuple_GetItem(entry, 1), Py_EQ);
+    }
+    Py_XDECREF(line);
+    Py_XDECREF(co_filename);
+    Py_DECREF(code);
+  }
+  if (result < 0) {
+    result = -2;
+  }
+  PyErr_Clear();
+  Py_XDECREF(valid);
+  Py_DECREF(entry);
+  if (result != -2) {
+    CFG_STAT_ADD(st, stat_manifest_hits, 1);
+  }
+  return result;
+}
+
+/* cfg_eval_condition for a decoration: a callable condition the selection
+ * manifest has a result for is not called. */
+static int cfg_decide_condition(cfg_state *st, PyObject *condition,
+                                PyObject *func, PyObject *f_qualname) {
+  if (!cfg_is_condition(condition) && PyCallable_Check(condition)) {
+    int recorded = manifest_lookup(st, f_qualname, func);
+    if (recorded != -2) {
+      return recorded;
+    }
+  }
+  return cfg_eval_condition(st, condition, func, f_qualname);
+}
+
+/* _manifest_load(lookup, check): replace the selection manifest with the
+ * record `lookup(qualname)` reads, whose files `check(filename)`
+ * validates; (None, None) drops it. */
+static PyObject *cfg_manifest_load(PyObject *self, PyObject *args) {
+  cfg_state *st = get_cfg_state(self);
+  PyObject *lookup, *check;
+  if (!PyArg_ParseTuple(args, "OO:_manifest_load", &lookup, &check)) {
+    return NULL;
+  }
+  if ((lookup == Py_None) != (check == Py_None) ||
+      (lookup != Py_None &&
+       (!PyCallable_Check(lookup) || !PyCallable_Check(check)))) {
+    PyErr_SetString(PyExc_TypeError,
+                    "`lookup` and `check` must both be callable, or both None");
+    return NULL;
+  }
+  PyObject *old_lookup, *old_check;
+  CFG_OBJECT_LOCK(st->manifest);
+  PyDict_Clear(st->manifest);
+  PyDict_Clear(st->manifest_files);
+  old_lookup = st->manifest_lookup;
+  old_check = st->manifest_check;
+  st->manifest_lookup = NULL;
+  st->manifest_check = NULL;
+  if (lookup != Py_None) {
+    Py_INCREF(lookup);
+    Py_INCREF(check);
+    st->manifest_lookup = lookup;
+    st->manifest_check = check;
+  }
+  CFG_OBJECT_UNLOCK();
+  Py_XDECREF(old_lookup);
+  Py_XDECREF(old_check);
+  Py_RETURN_NONE;
+}
+
+/* Whether `func` comes from the same definition as a recorded candidate. */
+static int candidates_redefined(CandidatesObject *entry, PyObject *func) {
+  PyObject *code = cfg_code_of(func);
+  int found = 0;
+  Py_ssize_t n = PyList_Size(entry->candidates);
+  for (Py_ssize_t i = 0; i < n && !found; i++) {
+    PyObject *other =
+        cfg_code_of(PyTuple_GetItem(PyList_GetItem(entry->candidates, i), 0));
+    found = other == code;
+    Py_DECREF(other);
+  }
+  Py_DECREF(code);
+  return found;
+}
+
+static int candidates_append(CandidatesObject *entry, PyObject *func,
+                             PyObject *condition, PyObject *keys, int result) {
+  PyObject *candidate =
+      PyTuple_Pack(3, func, condition, keys != NULL ? keys : Py_None);
+  if (candidate == NULL) {
+    return -1;
+  }
+  int rc = PyList_Append(entry->candidates, candidate);
+  Py_DECREF(candidate);
+  if (rc < 0) {
+    return -1;
+  }
+  if (CFG_ALLOC_TEST_FAIL() ||
+      PyList_Append(entry->results, result ? Py_True : Py_False) < 0) {
+    /* Keep the two lists parallel. */
+    PyObject *type, *value, *traceback;
+    PyErr_Fetch(&type, &value, &traceback);
+    PySequence_DelItem(entry->candidates, -1);
+    PyErr_Restore(type, value, traceback);
+    return -1;
+  }
+  return 0;
+}
+
+static CandidatesObject *candidates_new(cfg_state *st, PyObject *f_qualname) {
+  PyTypeObject *type = (PyTypeObject *)st->CandidatesType;
+  allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+  CandidatesObject *entry = (CandidatesObject *)tp_alloc(type, 0);
+  if (entry == NULL) {
+    return NULL;
+  }
+  Py_INCREF(f_qualname);
+  entry->qualname = f_qualname;
+  entry->candidates = PyList_New(0);
+  entry->results = PyList_New(0);
+  entry->keys = PySet_New(NULL);
+  if (entry->candidates == NULL || entry->results == NULL ||
+      entry->keys == NULL || CFG_ALLOC_TEST_FAIL()) {
+    Py_DECREF(entry);
+    return NULL;
+  }
+  return entry;
+}
+
+/* Record `keys` for the entry and in the reverse index. */
+static int registry_index_keys(cfg_state *st, CandidatesObject *entry,
+                               PyObject *keys) {
+  PyObject *iter = PyObject_GetIter(keys);
+  if (iter == NULL) {
+    return -1;
+  }
+  PyObject *key;
+  while ((key = PyIter_Next(iter)) != NULL) {
+    PyObject *names = cfg_dict_get(st->key_index, key);
+    if (names == NULL) {
+      names = PySet_New(NULL);
+      if (names == NULL || CFG_ALLOC_TEST_FAIL() ||
+          PyDict_SetItem(st->key_index, key, names) < 0) {
+        Py_XDECREF(names);
+        Py_DECREF(key);
+        Py_DECREF(iter);
+        return -1;
+      }
+    }
+    int rc = PySet_Add(names, entry->qualname);
+    Py_DECREF(names);
+    if (rc < 0 || PySet_Add(entry->keys, key) < 0) {
+      Py_DECREF(key);
       Py_DECREF(iter);
-      Py_DECREF(result);
-      return NULL;
+      return -1;
+    }
+    Py_DECREF(key);
+  }
+  Py_DECREF(iter);
+  return PyErr_Occurred() ? -1 : 0;
+}
+
+/* `scope[f_qualname]` for a build scope (see build_scope): new reference,
+ * or NULL without an exception when it is missing or its winner is dead. */
+static PyObject *scope_get(cfg_state *st, PyObject *scope,
+                           PyObject *f_qualname) {
+  PyObject *value = cfg_dict_get(scope, f_qualname);
+  if (value != NULL &&
+      Py_TYPE(value) == (PyTypeObject *)st->weakref_ref_type) {
+    PyObject *winner = cfg_weakref_get(value);
+    Py_DECREF(value);
+    return winner;
+  }
+  return value;
+}
+
+/* Set `scope[f_qualname]`: a weak reference to a winner that allows one,
+ * the object itself otherwise (a raiser). */
+static int scope_set(cfg_state *st, PyObject *scope, PyObject *f_qualname,
+                     PyObject *value) {
+  PyObject *ref = NULL;
+  if (Py_TYPE(value) != (PyTypeObject *)st->TypeErrorRaiserType &&
+      (ref = PyWeakref_NewRef(value, NULL)) == NULL) {
+    PyErr_Clear();
+  }
+  int rc = PyDict_SetItem(scope, f_qualname, ref != NULL ? ref : value);
+  Py_XDECREF(ref);
+  return rc;
+}
+
+static int registry_note_locked(cfg_state *st, PyObject *scope,
+                                PyObject *f_qualname, PyObject *func,
+                                PyObject *condition, PyObject *keys,
+                                int result) {
+  int tracked = keys != NULL || PyCallable_Check(condition);
+  CandidatesObject *entry =
+      (CandidatesObject *)cfg_dict_get(st->candidates, f_qualname);
+  int redefined = entry != NULL && candidates_redefined(entry, func);
+  if (redefined) {
+    Py_CLEAR(entry);
+    if (PyDict_DelItem(st->candidates, f_qualname) < 0) {
+      return -1;
+    }
+  }
+  if (entry == NULL) {
+    if (!tracked) {
+      return 0;
+    }
+    entry = candidates_new(st, f_qualname);
+    if (entry == NULL) {
+      return -1;
+    }
+    /* The name starts being tracked part-way through its candidates: the
+     * earlier ones are gone, but the live winner they selected (if any)
+     * stays in the running as an always-true fallback.  Not for a new
+     * definition, whose cached winner is the previous definition's.  A
+     * name selected in a build scope finds it there. */
+    PyObject *prior = redefined ? NULL
+                      : scope != NULL
+                          ? scope_get(st, scope, f_qualname)
+                          : cache_get_live(st, &st->cm_cache, f_qualname);
+    int rc = 0;
+    if (prior != NULL &&
+        !PyObject_TypeCheck(prior, (PyTypeObject *)st->TypeErrorRaiserType)) {
+      rc = candidates_append(entry, prior, Py_True, NULL, 1);
+    }
+    Py_XDECREF(prior);
+    if (rc < 0 || PyErr_Occurred() ||
+        PyDict_SetItem(st->candidates, f_qualname, (PyObject *)entry) < 0) {
+      Py_DECREF(entry);
+      return -1;
+    }
+  }
+  int rc = candidates_append(entry, func, condition, keys, result);
+  if (rc == 0 && keys != NULL) {
+    rc = registry_index_keys(st, entry, keys);
+  }
+  Py_DECREF(entry);
+  return rc;
+}
+
+/* Record a decorated candidate and its result (called by _cm_inner_fast,
+ * with the name's build scope or NULL).  Untracked names cost one size
+ * check while nothing is tracked.  A native condition without `depends_on=`
+ * declares the names it reads. */
+static int registry_note(cfg_state *st, PyObject *scope, PyObject *f_qualname,
+                         PyObject *func, PyObject *condition, PyObject *keys,
+                         int result) {
+  if (keys == NULL && cfg_is_condition(condition) &&
+      PySet_Size(((ConditionObject *)condition)->keys) > 0) {
+    keys = ((ConditionObject *)condition)->keys;
+  }
+  if (keys == NULL && !PyCallable_Check(condition) &&
+      PyDict_Size(st->candidates) == 0) {
+    return 0;
+  }
+  int rc;
+  CFG_OBJECT_LOCK(st->candidates);
+  rc = registry_note_locked(st, scope, f_qualname, func, condition, keys,
+                            result);
+  CFG_OBJECT_UNLOCK();
+  return rc;
+}
+
+/* Remember where a lazily selected name was installed (see lazy_resolve):
+ * classes defined inside functions cannot be found from their qualname. */
+static int registry_set_owner(cfg_state *st, PyObject *f_qualname,
+                              PyObject *owner, PyObject *name) {
+  CandidatesObject *entry =
+      (CandidatesObject *)cfg_dict_get(st->candidates, f_qualname);
+  if (entry == NULL) {
+    return 0;
+  }
+  PyObject *ref = PyWeakref_NewRef(owner, NULL);
+  if (ref == NULL || CFG_ALLOC_TEST_FAIL()) {
+    Py_XDECREF(ref);
+    Py_DECREF(entry);
+    return -1;
+  }
+  Py_XDECREF(entry->owner);
+  entry->owner = ref;
+  Py_INCREF(name);
+  Py_XDECREF(entry->name);
+  entry->name = name;
+  Py_DECREF(entry);
+  return 0;
+}
+
+/* Find the namespace a tracked name is bound in (new reference, with its
+ * attribute name in *name_out), or NULL without an exception when it
+ * cannot be found: the owner recorded by a lazy install, else the path
+ * pickle uses -- func.__module__ in sys.modules, then func.__qualname__
+ * minus its last part.  Names under `<locals>` are only reachable through
+ * a recorded owner. */
+static PyObject *candidates_owner(CandidatesObject *entry,
+                                  PyObject **name_out) {
+  if (entry->owner != NULL) {
+    PyObject *owner = cfg_weakref_get(entry->owner);
+    if (owner != NULL) {
+      Py_INCREF(entry->name);
+      *name_out = entry->name;
+      return owner;
+    }
+  }
+  PyObject *func = PyTuple_GetItem(PyList_GetItem(entry->candidates, 0), 0);
+  Py_INCREF(func);
+  PyObject *modname = NULL;
+  PyObject *qualname = NULL;
+  /* Descend through descriptors that do not carry the names themselves. */
+  while (func != NULL) {
+    modname = PyObject_GetAttrString(func, "__module__");
+    qualname = PyObject_GetAttrString(func, "__qualname__");
+    if (modname != NULL && qualname != NULL && PyUnicode_Check(modname) &&
+        PyUnicode_Check(qualname)) {
+      break;
+    }
+    PyErr_Clear();
+    Py_CLEAR(modname);
+    Py_CLEAR(qualname);
+    PyObject *inner = PyObject_GetAttrString(func, "__func__");
+    if (inner == NULL) {
+      PyErr_Clear();
+      inner = PyObject_GetAttrString(func, "fget");
+    }
+    if (inner == NULL) {
+      PyErr_Clear();
+    }
+    Py_DECREF(func);
+    func = inner;
+  }
+  if (func == NULL) {
+    return NULL;
+  }
+  Py_DECREF(func);
+
+  PyObject *dot = PyUnicode_FromString(".");
+  PyObject *parts = dot != NULL ? PyUnicode_Split(qualname, dot, -1) : NULL;
+  Py_XDECREF(dot);
+  Py_DECREF(qualname);
+  if (parts == NULL) {
+    Py_DECREF(modname);
+    return NULL;
+  }
+  PyObject *owner = cfg_dict_get(PyImport_GetModuleDict(), modname);
+  Py_DECREF(modname);
+  Py_ssize_t n = PyList_Size(parts);
+  for (Py_ssize_t i = 0; owner != NULL && i < n - 1; i++) {
+    PyObject *next = PyObject_GetAttr(owner, PyList_GetItem(parts, i));
+    Py_DECREF(owner);
+    owner = next;
+  }
+  if (owner == NULL) {
+    PyErr_Clear();
+    Py_DECREF(parts);
+    return NULL;
+  }
+  *name_out = PyList_GetItem(parts, n - 1);
+  Py_INCREF(*name_out);
+  Py_DECREF(parts);
+  return owner;
+}
+
+/* Bind `winner` as `owner.name` the way class creation would have: a
+ * descriptor that needs its owner (e.g. functools.cached_property) gets
+ * __set_name__ first, and if that fails nothing is bound. */
+static int cfg_install(cfg_state *st, PyObject *owner, PyObject *name,
+                       PyObject *winner) {
+  if (PyType_Check(owner) &&
+      Py_TYPE(winner) != (PyTypeObject *)st->function_type) {
+    PyObject *set_name = PyObject_GetAttrString(winner, "__set_name__");
+    if (set_name == NULL) {
+      PyErr_Clear();
+    } else {
+      PyObject *r = PyObject_CallFunctionObjArgs(set_name, owner, name, NULL);
+      Py_DECREF(set_name);
+      if (r == NULL) {
+        return -1;
+      }
+      Py_DECREF(r);
+    }
+  }
+  return PyObject_SetAttr(owner, name, winner);
+}
+
+/* Re-evaluate `entry`'s stale conditions -- every tracked one for a full
+ * reselect, only those declaring one of `keys` otherwise -- and return the
+ * index of the winner (last true), -1 without one, -2 on error. */
+static Py_ssize_t candidates_select(cfg_state *st, CandidatesObject *entry,
+                                    PyObject *keys) {
+  Py_ssize_t best = -1;
+  Py_ssize_t n = PyList_Size(entry->candidates);
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *candidate = PyList_GetItem(entry->candidates, i);
+    PyObject *func = PyTuple_GetItem(candidate, 0);
+    PyObject *condition = PyTuple_GetItem(candidate, 1);
+    PyObject *declared = PyTuple_GetItem(candidate, 2);
+    int stale = 0;
+    if (keys == NULL) {
+      stale = declared != Py_None || PyCallable_Check(condition);
+    } else if (declared != Py_None) {
+      PyObject *iter = PyObject_GetIter(keys);
+      PyObject *key;
+      while (!stale && iter != NULL && (key = PyIter_Next(iter)) != NULL) {
+        stale = PySet_Contains(declared, key);
+        Py_DECREF(key);
+      }
+      Py_XDECREF(iter);
+      if (stale < 0 || PyErr_Occurred()) {
+        return -2;
+      }
+    }
+    int result;
+    if (stale) {
+      result = cfg_eval_condition(st, condition, func, entry->qualname);
+      if (result < 0) {
+        return -2;
+      }
+      PyObject *value = result ? Py_True : Py_False;
+      Py_INCREF(value);
+      PyList_SetItem(entry->results, i, value);
+    } else {
+      result = PyList_GetItem(entry->results, i) == Py_True;
+    }
+    if (result) {
+      best = i;
+    }
+  }
+  return best;
+}
+
+/* Qualnames of the entries to re-select (new list): all of them, or those
+ * that declared one of `keys`. */
+static PyObject *reselect_targets(cfg_state *st, PyObject *keys) {
+  if (keys == NULL) {
+    return PyDict_Keys(st->candidates);
+  }
+  PyObject *targets = PySet_New(NULL);
+  PyObject *iter = targets != NULL ? PyObject_GetIter(keys) : NULL;
+  if (iter == NULL) {
+    Py_XDECREF(targets);
+    return NULL;
+  }
+  PyObject *key;
+  while ((key = PyIter_Next(iter)) != NULL) {
+    PyObject *names = cfg_dict_get(st->key_index, key);
+    PyObject *snapshot = names != NULL ? PySequence_List(names) : NULL;
+    Py_ssize_t n = snapshot != NULL ? PyList_Size(snapshot) : 0;
+    for (Py_ssize_t i = 0; i < n; i++) {
+      PyObject *qualname = PyList_GetItem(snapshot, i);
+      CandidatesObject *entry =
+          (CandidatesObject *)cfg_dict_get(st->candidates, qualname);
+      int live = entry != NULL ? PySet_Contains(entry->keys, key) : 0;
+      Py_XDECREF(entry);
+      /* Index entries left behind by a redefinition are dropped here. */
+      if ((live > 0 ? PySet_Add(targets, qualname)
+                    : PySet_Discard(names, qualname)) < 0) {
+        break;
+      }
+    }
+    Py_XDECREF(snapshot);
+    Py_XDECREF(names);
+    Py_DECREF(key);
+    if (PyErr_Occurred()) {
+      break;
     }
-    Py_DECREF(item);
   }
   Py_DECREF(iter);
   if (PyErr_Occurred()) {
-    Py_DECREF(result);
+    Py_DECREF(targets);
+    return NULL;
+  }
+  PyObject *result = PySequence_List(targets);
+  Py_DECREF(targets);
+  return result;
+}
+
+/* Swap `winner` into the owner's namespace if what is bound there came from
+ * this selection (a candidate or the raiser); anything else was rebound by
+ * someone else and is left alone.  Returns 1 if rebound, 0 if not, -1 on
+ * error.  The selection caches are updated either way, so later eager
+ * decorations of the name see the new winner. */
+static int candidates_rebind(cfg_state *st, CandidatesObject *entry,
+                             PyObject *winner) {
+  int rc = 0;
+  PyObject *name = NULL;
+  PyObject *owner = candidates_owner(entry, &name);
+  PyObject *ns =
+      owner != NULL ? PyObject_GetAttrString(owner, "__dict__") : NULL;
+  PyObject *current = ns != NULL ? PyObject_GetItem(ns, name) : NULL;
+  PyErr_Clear();
+  if (current != NULL && current != winner) {
+    int ours =
+        PyObject_TypeCheck(current, (PyTypeObject *)st->TypeErrorRaiserType);
+    Py_ssize_t n = PyList_Size(entry->candidates);
+    for (Py_ssize_t i = 0; i < n && !ours; i++) {
+      ours =
+          PyTuple_GetItem(PyList_GetItem(entry->candidates, i), 0) == current;
+    }
+    if (ours) {
+      rc = cfg_install(st, owner, name, winner) < 0 ? -1 : 1;
+    }
+  }
+  Py_XDECREF(current);
+  Py_XDECREF(ns);
+  Py_XDECREF(owner);
+  Py_XDECREF(name);
+  if (rc < 0) {
+    return -1;
+  }
+  PyObject *cached = cache_get_live(st, &st->cm_cache, entry->qualname);
+  Py_XDECREF(cached);
+  if (cached != winner &&
+      (cache_set_weak_or_strong(st, &st->cm_cache, entry->qualname, winner) <
+           0 ||
+       PySet_Discard(st->failed_qualnames, entry->qualname) < 0)) {
+    return -1;
+  }
+  return rc;
+}
+
+/* reselect(changed_keys=None): see the registry comment above.  Every
+ * affected name is evaluated before anything is rebound, so a name left
+ * without a true condition raises TypeError and changes nothing. */
+static PyObject *cfg_reselect(PyObject *self, PyObject *args,
+                              PyObject *kwargs) {
+  static char *kwlist[] = {"changed_keys", NULL};
+  PyObject *changed = Py_None;
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|O:reselect", kwlist,
+                                   &changed)) {
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self);
+  if (cfg_check_frozen(st, NULL) < 0) {
+    return NULL;
+  }
+  PyObject *keys = NULL;
+  PyObject *targets = NULL;
+  PyObject *plan = NULL;
+  PyObject *failed = NULL;
+  PyObject *rebound = NULL;
+  if (changed != Py_None && (keys = cfg_keys_from(changed)) == NULL) {
+    return NULL;
+  }
+  /* The inputs changed: results memoized for pure conditions are stale. */
+  if (pure_new_epoch(st) < 0) {
+    Py_XDECREF(keys);
+    return NULL;
+  }
+  targets = reselect_targets(st, keys);
+  plan = PyList_New(0);
+  failed = PyList_New(0);
+  if (targets == NULL || plan == NULL || failed == NULL ||
+      PyList_Sort(targets) < 0 || CFG_ALLOC_TEST_FAIL()) {
+    goto done;
+  }
+  Py_ssize_t n = PyList_Size(targets);
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *qualname = PyList_GetItem(targets, i);
+    CandidatesObject *entry =
+        (CandidatesObject *)cfg_dict_get(st->candidates, qualname);
+    if (entry == NULL) {
+      continue; /* redefined away by a condition with side effects */
+    }
+    Py_ssize_t best = candidates_select(st, entry, keys);
+    PyObject *step =
+        best >= 0
+            ? Py_BuildValue(
+                  "(OO)", entry,
+                  PyTuple_GetItem(PyList_GetItem(entry->candidates, best), 0))
+            : NULL;
+    Py_DECREF(entry);
+    if (best == -2 || (best >= 0 ? step == NULL || PyList_Append(plan, step) < 0
+                                 : PyList_Append(failed, qualname) < 0)) {
+      Py_XDECREF(step);
+      goto done;
+    }
+    Py_XDECREF(step);
+  }
+  if (PyList_Size(failed) > 0) {
+    PyObject *sep = PyUnicode_FromString("`, `");
+    PyObject *joined = sep != NULL ? PyUnicode_Join(sep, failed) : NULL;
+    Py_XDECREF(sep);
+    if (joined != NULL) {
+      PyErr_Format(PyExc_TypeError, "None of the conditions is true for `%U`",
+                   joined);
+      Py_DECREF(joined);
+    }
+    goto done;
+  }
+  rebound = PyList_New(0);
+  n = PyList_Size(plan);
+  for (Py_ssize_t i = 0; rebound != NULL && i < n; i++) {
+    PyObject *step = PyList_GetItem(plan, i);
+    CandidatesObject *entry = (CandidatesObject *)PyTuple_GetItem(step, 0);
+    int rc = candidates_rebind(st, entry, PyTuple_GetItem(step, 1));
+    if (rc < 0 || (rc > 0 && PyList_Append(rebound, entry->qualname) < 0)) {
+      Py_CLEAR(rebound);
+    } else if (rc > 0 && CFG_TRACE_ON(st)) {
+      cfg_trace_rebind(st, entry, PyTuple_GetItem(step, 1));
+    }
+  }
+
+done:
+  Py_XDECREF(keys);
+  Py_XDECREF(targets);
+  Py_XDECREF(plan);
+  Py_XDECREF(failed);
+  return rebound;
+}
+
+/* cfg.set_flags(mapping=None, /, **flags): update the flags read by
+ * cfg.flag(...) and reselect the names that read them.  Returns reselect's
+ * list of rebound qualnames. */
+static PyObject *cfg_set_flags(PyObject *self, PyObject *args,
+                               PyObject *kwargs) {
+  PyObject *mapping = NULL;
+  if (!PyArg_ParseTuple(args, "|O:set_flags", &mapping)) {
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self);
+  PyObject *updates = PyDict_New();
+  if (updates == NULL ||
+      (mapping != NULL && PyDict_Merge(updates, mapping, 1) < 0) ||
+      (kwargs != NULL && PyDict_Update(updates, kwargs) < 0)) {
+    Py_XDECREF(updates);
+    return NULL;
+  }
+  PyObject *name, *value;
+  Py_ssize_t pos = 0;
+  while (PyDict_Next(updates, &pos, &name, &value)) {
+    if (!PyUnicode_Check(name)) {
+      PyErr_Format(PyExc_TypeError, "flag names must be str, not %R", name);
+      Py_DECREF(updates);
+      return NULL;
+    }
+  }
+  PyObject *changed = NULL;
+  if (PyDict_Update(st->flags, updates) == 0 && !CFG_ALLOC_TEST_FAIL()) {
+    changed = PyTuple_Pack(1, updates);
+  }
+  Py_DECREF(updates);
+  if (changed == NULL) {
+    return NULL;
+  }
+  PyObject *rebound = cfg_reselect(self, changed, NULL);
+  Py_DECREF(changed);
+  return rebound;
+}
+
+static PyMethodDef cfg_condition_methods[] = {
+    {"env", cfg_env, METH_O,
+     "Native condition on an environment variable: true when it is set and "
+     "non-empty; compare with == / != for a value."},
+    {"flag", cfg_flag, METH_O,
+     "Native condition on a flag set with cfg.set_flags(): true when its "
+     "value is truthy."},
+    {"invalidate_conditions", cfg_invalidate_conditions, METH_VARARGS,
+     "Forget the memoized results of the given pure=True conditions, or of "
+     "all of them."},
+    {"resolve_class", cfg_resolve_class, METH_O,
+     "Class decorator: select every lazy=True name of the class in one pass "
+     "and install the winners."},
+    {"set_flags", (PyCFunction)(void (*)(void))cfg_set_flags,
+     METH_VARARGS | METH_KEYWORDS,
+     "Set flags read by cfg.flag() and reselect the names reading them; "
+     "returns the rebound qualnames."},
+    {NULL, NULL, 0, NULL} /* Sentinel */
+};
+
+/* --- Shared decorators ---
+ *
+ * `@cfg(condition=X)` is a factory call: it used to build a closure tuple
+ * and a PyCFunction (both GC-tracked) for every decorated function, and a
+ * large module repeats the same few conditions hundreds of times.  The
+ * plain factory forms -- cm without `lazy=`/`depends_on=`, and cfg_attr --
+ * are now looked up by the identity of their condition and the decorator
+ * built for it is reused.  The bools key as themselves, any other condition
+ * by its address; the decorator's closure holds the condition, so an
+ * address cannot be reused while its entry exists.  A cfg_attr entry is
+ * only reused for the same `decorators` object.  Decorators are immutable
+ * (a PyCFunction over a tuple), so sharing one is unobservable except by
+ * identity.  Each table is emptied when it reaches
+ * CFG_DECORATOR_CACHE_MAX entries, which bounds what fresh conditions
+ * (inline lambdas) keep alive. */
+#define CFG_DECORATOR_CACHE_MAX 256
+
+/* The decorator over `closure` (module, condition[, decorators]) from
+ * `table`, or a new one stored there (new reference, NULL with an
+ * exception). */
+static PyObject *cfg_shared_decorator(PyObject *table, PyMethodDef *def,
+                                      PyObject *closure) {
+  PyObject *condition = PyTuple_GetItem(closure, 1);
+  PyObject *key = PyBool_Check(condition) ? (Py_INCREF(condition), condition)
+                                          : PyLong_FromVoidPtr(condition);
+  if (key == NULL) {
+    return NULL;
+  }
+  PyObject *decorator = cfg_dict_get(table, key);
+  if (decorator != NULL) {
+    /* Same condition; cfg_attr also needs the same decorators. */
+    PyObject *held = PyCFunction_GetSelf(decorator);
+    if (PyTuple_Size(closure) < 3 ||
+        PyTuple_GetItem(held, 2) == PyTuple_GetItem(closure, 2)) {
+      Py_DECREF(key);
+      return decorator;
+    }
+    Py_CLEAR(decorator);
+  }
+  if (!CFG_ALLOC_TEST_FAIL()) {
+    decorator = PyCFunction_NewEx(def, closure, NULL);
+  }
+  if (decorator != NULL) {
+    /* Best effort: a failed store only costs the next factory call. */
+    if (PyDict_Size(table) >= CFG_DECORATOR_CACHE_MAX) {
+      PyDict_Clear(table);
+    }
+    if (CFG_ALLOC_TEST_FAIL() || PyDict_SetItem(table, key, decorator) < 0) {
+      PyErr_Clear();
+    }
+  }
+  Py_DECREF(key);
+  return decorator;
+}
+
+/* Wrapper function for the decorator */
+static PyObject *_cm_wrapper(PyObject *self, PyObject *func) {
+  /* Get the module and condition from the closure: `self` is the
+   * (module, condition) pair built by cm, or (module, condition, lazy, keys)
+   * for a lazy decoration or one with `depends_on=`.  Called through the
+   * module-table entry, `self` is the module itself and doubles as the
+   * condition. */
+  if (self == NULL) {
+    PyErr_SetString(PyExc_RuntimeError, "No condition found in closure");
+    return NULL;
+  }
+  PyObject *module = self;
+  PyObject *condition = self;
+  PyObject *keys = NULL;
+  int lazy = 0;
+  if (PyTuple_Check(self)) {
+    module = PyTuple_GetItem(self, 0);
+    condition = PyTuple_GetItem(self, 1);
+    if (module == NULL || condition == NULL) {
+      return NULL;
+    }
+    if (PyTuple_Size(self) == 4) {
+      keys = PyTuple_GetItem(self, 3);
+      keys = keys == Py_None ? NULL : keys;
+      lazy = PyTuple_GetItem(self, 2) == Py_True;
+    }
+  }
+  if (cfg_check_frozen(get_cfg_state(module), func) < 0) {
+    return NULL;
+  }
+  if (lazy) {
+    return cfg_lazy_add(module, func, condition, keys);
+  }
+
+  /* #1: call the fast inner directly — no Py_BuildValue tuple. */
+  CFG_ALLOC_FAIL_GUARD();
+  return _cm_inner_fast(module, func, condition, keys);
+}
+
+/* Index of the keyword `name` in `names` (interned), or -1.  Names from
+ * call sites are interned, so identity almost always decides; a name built
+ * at runtime (e.g. a ** dict) is compared by value. */
+static Py_ssize_t cfg_kw_index(PyObject *name, PyObject *const *names,
+                               Py_ssize_t count) {
+  for (Py_ssize_t i = 0; i < count; i++) {
+    if (name == names[i]) {
+      return i;
+    }
+  }
+  for (Py_ssize_t i = 0; i < count; i++) {
+    if (PyUnicode_Compare(name, names[i]) == 0) {
+      return i;
+    }
+  }
+  return -1;
+}
+
+/* The core conditional method implementation (METH_FASTCALL: the optional
+ * function, then `condition=`, `lazy=`, `depends_on=`, `pure=`; other
+ * keywords are ignored). */
+static PyObject *cm(PyObject *self, PyObject *const *args, Py_ssize_t nargs,
+                    PyObject *kwnames) {
+  if (nargs > 1) {
+    PyErr_Format(PyExc_TypeError,
+                 "cfg() takes at most 1 positional argument (%zd given)",
+                 nargs);
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self);
+  PyObject *func = nargs == 1 ? args[0] : NULL;
+  PyObject *condition = Py_None;
+  PyObject *depends_on = Py_None;
+  int lazy = 0;
+
+  if (kwnames != NULL) {
+    PyObject *names[] = {st->str_condition, st->str_lazy, st->str_depends_on,
+                         st->str_pure};
+    PyObject *values[] = {NULL, NULL, NULL, NULL};
+    Py_ssize_t nkw = PyTuple_Size(kwnames);
+    for (Py_ssize_t i = 0; i < nkw; i++) {
+      Py_ssize_t index = cfg_kw_index(PyTuple_GetItem(kwnames, i), names, 4);
+      if (index >= 0) {
+        values[index] = args[nargs + i];
+      }
+    }
+    if (values[0] != NULL) {
+      condition = values[0];
+    }
+    /* lazy=True defers the selection to first use (see cfg_lazy_add). */
+    if (values[1] != NULL) {
+      lazy = PyObject_IsTrue(values[1]);
+      if (lazy < 0) {
+        return NULL;
+      }
+    }
+    /* depends_on= names the inputs the condition reads (see reselect). */
+    if (values[2] != NULL) {
+      depends_on = values[2];
+    }
+    /* pure=True memoizes a callable condition (see pure_register). */
+    int pure = values[3] != NULL ? PyObject_IsTrue(values[3]) : 0;
+    if (pure < 0 ||
+        (pure && PyCallable_Check(condition) && !cfg_is_condition(condition) &&
+         pure_register(st, condition) < 0)) {
+      return NULL;
+    }
+  }
+
+  /* If no function is provided, return the inner decorator */
+  if (func == NULL || func == Py_None) {
+    if (condition == Py_None) {
+      PyErr_SetString(PyExc_TypeError,
+                      "`@cfg` must be used as a decorator and `condition` "
+                      "must be specified as an instance of type `bool`");
+      return NULL;
+    }
+
+    /* Create a wrapper function that will call _cm_inner with the captured
+     * module and condition */
+    PyObject *keys = depends_on != Py_None ? cfg_keys_from(depends_on) : NULL;
+    if (keys == NULL && depends_on != Py_None) {
+      return NULL;
+    }
+    PyObject *closure =
+        lazy || keys != NULL
+            ? PyTuple_Pack(4, self, condition, lazy ? Py_True : Py_False,
+                           keys != NULL ? keys : Py_None)
+            : PyTuple_Pack(2, self, condition);
+    if (closure == NULL || CFG_ALLOC_TEST_FAIL()) {
+      Py_XDECREF(keys);
+      Py_XDECREF(closure);
+      return NULL;
+    }
+    PyObject *wrapper =
+        lazy || keys != NULL
+            ? PyCFunction_NewEx(&cm_wrapper_def, closure, NULL)
+            : cfg_shared_decorator(st->cm_decorators, &cm_wrapper_def, closure);
+    Py_XDECREF(keys);
+    Py_DECREF(closure);
+    return wrapper;
+  }
+
+  /* If a function is provided but no condition, raise TypeError */
+  if (condition == Py_None) {
+    PyErr_SetString(PyExc_TypeError,
+                    "`@cfg` must be used as a decorator and `condition` "
+                    "must be specified as an instance of type `bool`");
+    return NULL;
+  }
+
+  if (cfg_check_frozen(st, func) < 0) {
+    return NULL;
+  }
+  PyObject *keys = NULL;
+  if (depends_on != Py_None && (keys = cfg_keys_from(depends_on)) == NULL) {
+    return NULL;
+  }
+  PyObject *result = lazy ? cfg_lazy_add(self, func, condition, keys)
+                          : _cm_inner_fast(self, func, condition, keys);
+  Py_XDECREF(keys);
+  return result;
+}
+
+/* Public METH_VARARGS entry (kept for compatibility): unpacks the 2-tuple
+ * then delegates to the fast path. */
+static PyObject *_cm_inner(PyObject *self, PyObject *args) {
+  PyObject *func = NULL;
+  PyObject *condition = NULL;
+
+  if (!PyArg_ParseTuple(args, "OO", &func, &condition)) {
+    return NULL;
+  }
+  if (cfg_check_frozen(get_cfg_state(self), func) < 0) {
+    return NULL;
+  }
+  return _cm_inner_fast(self, func, condition, NULL);
+}
+
+/* --- Build scopes ---
+ *
+ * A class whose qualname contains "<locals>" is defined inside a function,
+ * and every call of that function builds it again: a class factory.  The
+ * candidates of its methods are decorated while its class body executes,
+ * and their selection is only needed until the body completes.  They are
+ * selected in the body's build scope, a dict of qualname -> winner or
+ * raiser, instead of `_cm_cache`: a build leaves nothing in the cache, and
+ * its raisers do not reset it.
+ *
+ * The body is found from the qualname rather than from the decorating
+ * frame, since a helper (`def apply(c, f): return cfg(condition=c)(f)`) or
+ * a decorator factory may run the decoration: it is the innermost of the
+ * CFG_BUILD_DEPTH frames decorating whose code is the body of a class of
+ * the method's class name.  A name without one (a function defined inside
+ * a function, or a method decorated after its class was built) is selected
+ * in `_cm_cache`, as any other name.
+ *
+ * `build_scopes` (exposed as `_build_scopes`) lists the [frame, scope]
+ * pairs of those class bodies.  Holding the frame keeps it from being
+ * confused with a later one at the same address; a frame only the list
+ * still refers to has completed, and its entry is dropped by the next
+ * decoration (or freeze()).  A completed frame something else still refers
+ * to (a traceback) keeps its entry, so a scope holds its winners weakly, as
+ * the caches do.
+ *
+ * A call of a function that defines functions lazily (see cfg_lazy_add)
+ * gets an entry too, found the same way from the function's name: its
+ * scope holds their pending _LazySelectors, so that each call gathers its
+ * own candidates. */
+
+#define CFG_BUILD_DEPTH 8
+#define CFG_CO_OPTIMIZED 0x0001 /* code.co_flags of a function's code */
+
+/* Whether `f_qualname` may be selected in a build scope: 1, 0, or -1 with
+ * an exception set. */
+static int build_scoped(cfg_state *st, PyObject *f_qualname) {
+  return PyUnicode_Contains(f_qualname, st->str_locals);
+}
+
+/* Whether `frame` runs the body of the class `f_qualname[:end]` names (or
+ * with `function`, the function it names): 1, 0, or -1 with an exception
+ * set. */
+static int build_is_owner(cfg_state *st, PyObject *frame, PyObject *f_qualname,
+                          Py_ssize_t end, int function) {
+  PyObject *code = PyObject_GetAttr(frame, st->str_f_code);
+  if (code == NULL) {
+    return -1;
+  }
+  PyObject *co_name = PyObject_GetAttr(code, st->str_co_name);
+  Py_ssize_t start = co_name != NULL && PyUnicode_Check(co_name)
+                         ? end - PyUnicode_GetLength(co_name)
+                         : -1;
+  int rc = co_name == NULL ? -1
+           : start <= 0    ? 0
+           : PyUnicode_ReadChar(f_qualname, start - 1) != '.'
+               ? 0
+               : (int)PyUnicode_Tailmatch(f_qualname, co_name, start, end, 1);
+  Py_XDECREF(co_name);
+  if (rc > 0) {
+    PyObject *co_flags = PyObject_GetAttr(code, st->str_co_flags);
+    long flags = co_flags != NULL ? PyLong_AsLong(co_flags) : -1;
+    Py_XDECREF(co_flags);
+    rc = flags == -1 && PyErr_Occurred()
+             ? -1
+             : !(flags & CFG_CO_OPTIMIZED) == !function;
+  }
+  Py_DECREF(code);
+  return rc;
+}
+
+/* The frame of the class body building `f_qualname` (new reference), or
+ * with `function` the call of the function defining it; NULL with an
+ * exception set on error, without one when there is none. */
+static PyObject *build_owner(cfg_state *st, PyObject *f_qualname,
+                             int function) {
+  Py_ssize_t end = PyUnicode_FindChar(f_qualname, '.', 0,
+                                      PyUnicode_GetLength(f_qualname), -1);
+  if (end < 0) {
+    return NULL;
+  }
+  /* A function defined inside a function is not built by a class body, and
+   * a method is not defined by a function call. */
+  Py_ssize_t local = PyUnicode_Tailmatch(f_qualname, st->str_locals, 0, end, 1);
+  if (local < 0 || local != function) {
+    return NULL;
+  }
+  if (function) {
+    end -= PyUnicode_GetLength(st->str_locals) + 1;
+  }
+  PyObject *frame = (PyObject *)PyEval_GetFrame();
+  Py_XINCREF(frame);
+  for (int depth = 1; frame != NULL; depth++) {
+    int found = build_is_owner(st, frame, f_qualname, end, function);
+    if (found > 0) {
+      break;
+    }
+    PyObject *back = NULL;
+    if (found == 0 && depth < CFG_BUILD_DEPTH &&
+        (back = PyObject_GetAttr(frame, st->str_f_back)) == Py_None) {
+      Py_CLEAR(back);
+    }
+    Py_DECREF(frame);
+    frame = back;
+  }
+  return frame;
+}
+
+/* Drop the entries of completed frames from the list, and return one of
+ * them (new reference) or NULL.  Called with the list's lock held. */
+static PyObject *build_scopes_prune(cfg_state *st) {
+  Py_ssize_t n = PyList_Size(st->build_scopes);
+  PyObject *popped = NULL;
+  PyObject *live = NULL;
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *entry = PyList_GetItem(st->build_scopes, i);
+    /* Completed: only this entry refers to the frame. */
+    int done = Py_REFCNT(PyList_GetItem(entry, 0)) == 1;
+    if (done && popped == NULL) {
+      Py_INCREF(entry);
+      popped = entry;
+      if ((live = PyList_GetSlice(st->build_scopes, 0, i)) == NULL) {
+        goto error;
+      }
+    } else if (!done && live != NULL && PyList_Append(live, entry) < 0) {
+      goto error;
+    }
+  }
+  /* Replaced at once: dropping an entry may run arbitrary code. */
+  if (live != NULL && PyList_SetSlice(st->build_scopes, 0, n, live) < 0) {
+    goto error;
+  }
+  Py_XDECREF(live);
+  return popped;
+
+error:
+  Py_XDECREF(live);
+  Py_XDECREF(popped);
+  return NULL;
+}
+
+/* The build scope of the frame build_owner finds (new reference), created
+ * on first use; NULL without an exception when there is none.  A new
+ * frame's [frame, scope] entry is recycled from a completed one if it
+ * can. */
+static PyObject *build_scope(cfg_state *st, PyObject *f_qualname,
+                             int function) {
+  PyObject *frame = build_owner(st, f_qualname, function);
+  if (frame == NULL) {
+    return NULL;
+  }
+  PyObject *scope = NULL;
+  CFG_OBJECT_LOCK(st->build_scopes);
+  PyObject *entry = build_scopes_prune(st);
+  Py_ssize_t n = PyList_Size(st->build_scopes);
+  for (Py_ssize_t i = n - 1; i >= 0 && scope == NULL; i--) {
+    PyObject *live = PyList_GetItem(st->build_scopes, i);
+    if (PyList_GetItem(live, 0) == frame) {
+      scope = PyList_GetItem(live, 1);
+      Py_INCREF(scope);
+    }
+  }
+  if (scope == NULL && !PyErr_Occurred()) {
+    if (entry != NULL) {
+      Py_INCREF(frame);
+      PyList_SetItem(entry, 0, frame);
+      scope = PyList_GetItem(entry, 1);
+      Py_INCREF(scope);
+      PyDict_Clear(scope);
+    } else if ((scope = PyDict_New()) == NULL || CFG_ALLOC_TEST_FAIL() ||
+               (entry = PyList_New(2)) == NULL) {
+      Py_CLEAR(scope);
+    } else {
+      Py_INCREF(frame);
+      PyList_SetItem(entry, 0, frame);
+      Py_INCREF(scope);
+      PyList_SetItem(entry, 1, scope);
+    }
+    if (scope != NULL && PyList_Append(st->build_scopes, entry) < 0) {
+      Py_CLEAR(scope);
+    }
+  }
+  Py_XDECREF(entry);
+  CFG_OBJECT_UNLOCK();
+  Py_DECREF(frame);
+  return scope;
+}
+
+/* Select between the candidates of func's qualname.  `keys` is the
+ * frozenset from `depends_on=`, or NULL. */
+static PyObject *_cm_inner_fast(PyObject *self, PyObject *func,
+                                PyObject *condition, PyObject *keys) {
+  cfg_state *st = get_cfg_state(self);
+  /* The decoration and its condition are only timed while tracing. */
+  int tracing = CFG_TRACE_ON(st);
+  int64_t entered = tracing ? cfg_now_ns() : 0;
+
+  /* Get the fully qualified name of the function */
+  PyObject *f_qualname = _get_func_name(self, func);
+  if (f_qualname == NULL) {
+    return NULL;
+  }
+  /* #4: intern the qualname key so repeated decorations of the same name
+   * reuse a single string object (faster dict lookups + less memory). */
+  PyUnicode_InternInPlace(&f_qualname);
+  /* #5 constant-condition fast path: condition=True (the overwhelmingly
+   * common case) and condition=False are not evaluated; the bools a shared
+   * decorator carries are their own tag.  Static conditions only touch the
+   * candidate registry once their name is tracked (see registry_note). */
+  int64_t cost_ns = 0;
+  int cond_bool;
+  if (condition == Py_True || condition == Py_False) {
+    cond_bool = condition == Py_True;
+  } else if (!tracing) {
+    cond_bool = cfg_decide_condition(st, condition, func, f_qualname);
+  } else {
+    int64_t start = cfg_now_ns();
+    cond_bool = cfg_decide_condition(st, condition, func, f_qualname);
+    cost_ns = cfg_now_ns() - start;
+  }
+  if (cond_bool < 0) {
+    Py_DECREF(f_qualname);
+    return NULL;
+  }
+  /* Methods of classes defined inside a function are selected in their
+   * class body's build scope (see build_scope). */
+  PyObject *scope = NULL;
+  int scoped = build_scoped(st, f_qualname);
+  if (scoped > 0) {
+    scope = build_scope(st, f_qualname, 0);
+  }
+  if (scope == NULL && scoped >= 0 && !PyErr_Occurred() &&
+      PyList_Size(st->build_scopes) > 0) {
+    CFG_OBJECT_LOCK(st->build_scopes);
+    Py_XDECREF(build_scopes_prune(st));
+    CFG_OBJECT_UNLOCK();
+  }
+  if (scoped < 0 || PyErr_Occurred() ||
+      registry_note(st, scope, f_qualname, func, condition, keys, cond_bool) <
+          0) {
+    goto error;
+  }
+
+  /* If the condition is true, cache the winner (as a weakref) and return it */
+  if (cond_bool) {
+    if ((scope != NULL ? scope_set(st, scope, f_qualname, func)
+                       : cache_set_weak_or_strong(st, &st->cm_cache, f_qualname,
+                                                  func)) < 0 ||
+        CFG_ALLOC_TEST_FAIL()) {
+      goto error;
+    }
+    /* A true winner clears any recorded failure for this name. */
+    if (st->failed_qualnames != NULL) {
+      int discarded = PySet_Discard(st->failed_qualnames, f_qualname);
+      if (discarded < 0) {
+        goto error;
+      }
+    }
+    if (tracing) {
+      cfg_trace_record(st, CFG_TRACE_SELECT, f_qualname,
+                       cfg_trace_candidate(st, f_qualname), condition, 1,
+                       cost_ns, entered, 0);
+    }
+    Py_XDECREF(scope);
+    Py_DECREF(f_qualname);
+    Py_INCREF(func);
+    return func;
+  }
+
+  /* If the condition is false, check if the cache holds a live winner */
+  PyObject *cached_func = scope != NULL
+                              ? scope_get(st, scope, f_qualname)
+                              : cache_get_live(st, &st->cm_cache, f_qualname);
+  if (cached_func != NULL) {
+    if (tracing) {
+      cfg_trace_record(st, CFG_TRACE_CACHED, f_qualname,
+                       cfg_trace_candidate(st, f_qualname), condition, 0,
+                       cost_ns, entered, 0);
+    }
+    Py_XDECREF(scope);
+    Py_DECREF(f_qualname);
+    return cached_func; /* new reference */
+  }
+
+  /* If the function is not in the cache, use the name's TypeErrorRaiser
+   * (a build scope's raiser leaves the caches alone) */
+  PyObject *raiser = cfg_raiser_get(st, f_qualname, scope == NULL);
+  if (raiser == NULL) {
+    goto error;
+  }
+
+  /* Record the raiser in the module cache under the qualname (strong ref —
+   * TypeErrorRaiser is not weakly-referencable) so the eager validation
+   * helpers (assert_all_true/_get_failed) can find names whose condition is
+   * false.  A later `condition=True` winner for the same name overwrites
+   * this entry (the cache is keyed by qualname). */
+  if ((scope != NULL ? scope_set(st, scope, f_qualname, raiser)
+                     : cache_set_weak_or_strong(st, &st->cm_cache, f_qualname,
+                                                raiser)) < 0 ||
+      CFG_ALLOC_TEST_FAIL()) {
+    Py_DECREF(raiser);
+    goto error;
+  }
+  /* Record the failure in the dedicated set (survives TypeErrorRaiser_new's
+   * cache reset so multiple independent failures stay visible). */
+  if (st->failed_qualnames != NULL) {
+    if (PySet_Add(st->failed_qualnames, f_qualname) < 0 ||
+        CFG_ALLOC_TEST_FAIL()) {
+      Py_DECREF(raiser);
+      goto error;
+    }
+  }
+  if (tracing) {
+    cfg_trace_record(st, CFG_TRACE_RAISER, f_qualname,
+                     cfg_trace_candidate(st, f_qualname), condition, 0, cost_ns,
+                     entered, 0);
+  }
+
+  Py_XDECREF(scope);
+  Py_DECREF(f_qualname);
+  return raiser;
+
+error:
+  Py_XDECREF(scope);
+  Py_DECREF(f_qualname);
+  return NULL;
+}
+
+/* --- Lazy selection: @cfg(condition=..., lazy=True) ---
+ *
+ * Instead of evaluating the condition while the class body (or module)
+ * executes, a lazy decoration returns a _LazySelector that gathers every
+ * candidate decorated under the same qualname.  Nothing is evaluated until
+ * the name is first used: the first attribute access (descriptor __get__)
+ * or call runs the candidates through _cm_inner_fast in decoration order --
+ * exactly what the eager decorations would have done -- and the selector
+ * replaces itself with the winner, in the owning class's __dict__ (known
+ * from __set_name__) or, for module-level functions, in the module's
+ * globals.  From then on the name is the plain winner.
+ *
+ * Unsealed selectors (class body still executing, or module-level and not
+ * yet used) are registered in the module state's `lazy_pending` dict under
+ * their qualname, which is how a later lazy decoration of the same name
+ * finds the selector to add itself to.  __set_name__ and resolution drop the
+ * registration, so a class built again (e.g. from a factory) starts a fresh
+ * selector.  A function defined inside a function gets neither, so it is
+ * registered in the build scope of the call defining it instead (see
+ * build_scope): the next call starts a fresh selector. */
+typedef struct {
+  PyObject_HEAD PyObject *module; /* the _c module (selection state) */
+  PyObject *qualname;             /* interned "module.Qual.name" key */
+  PyObject *candidates;           /* list of (func, condition, keys) */
+  PyObject *owner;                /* class from __set_name__, or NULL */
+  PyObject *name;                 /* attribute / global name */
+  PyObject *winner;               /* resolved selection, or NULL */
+  PyObject *pending;              /* dict registered in, or NULL */
+} LazySelectorObject;
+
+static void LazySelector_dealloc(LazySelectorObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
+  PyObject_GC_UnTrack(self);
+  Py_CLEAR(self->module);
+  Py_CLEAR(self->qualname);
+  Py_CLEAR(self->candidates);
+  Py_CLEAR(self->owner);
+  Py_CLEAR(self->name);
+  Py_CLEAR(self->winner);
+  Py_CLEAR(self->pending);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp);
+}
+
+static int LazySelector_traverse(LazySelectorObject *self, visitproc visit,
+                                 void *arg) {
+  Py_VISIT(Py_TYPE(self));
+  Py_VISIT(self->module);
+  Py_VISIT(self->candidates);
+  Py_VISIT(self->owner);
+  Py_VISIT(self->winner);
+  Py_VISIT(self->pending);
+  return 0;
+}
+
+static int LazySelector_clear(LazySelectorObject *self) {
+  Py_CLEAR(self->candidates);
+  Py_CLEAR(self->owner);
+  Py_CLEAR(self->winner);
+  Py_CLEAR(self->pending);
+  return 0;
+}
+
+/* Drop `self` from the dict it is registered in if it is still the entry
+ * for its qualname. */
+static void lazy_unregister(LazySelectorObject *self) {
+  PyObject *pending;
+  CFG_OBJECT_LOCK(self);
+  pending = self->pending;
+  self->pending = NULL;
+  CFG_OBJECT_UNLOCK();
+  if (pending == NULL) {
+    return;
+  }
+  PyObject *entry = cfg_dict_get(pending, self->qualname);
+  if (entry == (PyObject *)self &&
+      PyDict_DelItem(pending, self->qualname) < 0) {
+    PyErr_Clear();
+  }
+  Py_XDECREF(entry);
+  Py_DECREF(pending);
+}
+
+/* Replace the selector with `winner` where it is bound: the owning class
+ * (after __set_name__) or the defining module's globals, the latter only
+ * if the global still refers to this selector. */
+static int lazy_install(LazySelectorObject *self, PyObject *winner) {
+  if (self->owner != NULL) {
+    /* If the winner's __set_name__ fails the selector stays in place. */
+    cfg_state *st = get_cfg_state(self->module);
+    return cfg_install(st, self->owner, self->name, winner) < 0 ||
+                   registry_set_owner(st, self->qualname, self->owner,
+                                      self->name) < 0
+               ? -1
+               : 0;
+  }
+  if (self->name == NULL) {
+    return 0;
+  }
+  /* Module-level: func.__module__ names the module to rebind in (a
+   * selector always holds at least one candidate). */
+  PyObject *func = PyTuple_GetItem(PyList_GetItem(self->candidates, 0), 0);
+  PyObject *modname = PyObject_GetAttrString(func, "__module__");
+  if (modname == NULL) {
+    PyErr_Clear();
+    return 0;
+  }
+  PyObject *modules = PyImport_GetModuleDict(); /* borrowed */
+  PyObject *mod =
+      PyUnicode_Check(modname) ? cfg_dict_get(modules, modname) : NULL;
+  Py_DECREF(modname);
+  if (mod == NULL) {
+    return 0;
+  }
+  int rc = 0;
+  PyObject *bound = PyObject_GetAttr(mod, self->name);
+  if (bound == NULL) {
+    PyErr_Clear();
+  } else if (bound == (PyObject *)self) {
+    rc = PyObject_SetAttr(mod, self->name, winner);
+  }
+  Py_XDECREF(bound);
+  Py_DECREF(mod);
+  return rc;
+}
+
+/* Evaluate the candidates once (new reference to the winner, or NULL with
+ * an exception).  A selection without a true condition resolves to the
+ * TypeErrorRaiser; it stays in place and fires on every use. */
+static PyObject *lazy_resolve(LazySelectorObject *self) {
+  if (self->winner != NULL) {
+    Py_INCREF(self->winner);
+    return self->winner;
+  }
+  cfg_state *st = get_cfg_state(self->module);
+  PyObject *winner = NULL;
+  /* Never empty (see cfg_lazy_add), so the loop always sets `winner`. */
+  Py_ssize_t n = PyList_Size(self->candidates);
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *candidate = PyList_GetItem(self->candidates, i);
+    PyObject *keys = PyTuple_GetItem(candidate, 2);
+    PyObject *selected = _cm_inner_fast(
+        self->module, PyTuple_GetItem(candidate, 0),
+        PyTuple_GetItem(candidate, 1), keys != Py_None ? keys : NULL);
+    Py_XDECREF(winner);
+    winner = selected;
+    if (winner == NULL) {
+      return NULL;
+    }
+  }
+  /* Conditions run arbitrary code (and may release the GIL), so another
+   * thread can finish first; the first published winner is the one used. */
+  CFG_OBJECT_LOCK(self);
+  if (self->winner == NULL) {
+    Py_INCREF(winner);
+    self->winner = winner;
+  } else {
+    Py_DECREF(winner);
+    winner = self->winner;
+    Py_INCREF(winner);
+  }
+  CFG_OBJECT_UNLOCK();
+  lazy_unregister(self);
+  if (!PyObject_TypeCheck(winner, (PyTypeObject *)st->TypeErrorRaiserType) &&
+      (lazy_install(self, winner) < 0 || CFG_ALLOC_TEST_FAIL())) {
+    Py_CLEAR(self->winner);
+    Py_DECREF(winner);
+    return NULL;
+  }
+  return winner;
+}
+
+/* Resolve, raising the TypeError for a selection without a winner. */
+static PyObject *lazy_winner(LazySelectorObject *self) {
+  PyObject *winner = lazy_resolve(self);
+  if (winner == NULL) {
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self->module);
+  if (PyObject_TypeCheck(winner, (PyTypeObject *)st->TypeErrorRaiserType)) {
+    _raise_typeerror((TypeErrorRaiserObject *)winner);
+    Py_DECREF(winner);
+    return NULL;
+  }
+  return winner;
+}
+
+static PyObject *LazySelector_descr_get(LazySelectorObject *self, PyObject *obj,
+                                        PyObject *type) {
+  PyObject *winner = lazy_winner(self);
+  if (winner == NULL) {
+    return NULL;
+  }
+  /* Bind like the winner would have: PyType_GetSlot cannot read the
+   * tp_descr_get of static types (functions) before 3.10, so go through
+   * __get__.  Only the first access pays for this. */
+  PyObject *get = PyObject_GetAttrString(winner, "__get__");
+  if (get == NULL) {
+    PyErr_Clear();
+    return winner;
+  }
+  Py_DECREF(winner);
+  PyObject *result = PyObject_CallFunctionObjArgs(
+      get, obj != NULL ? obj : Py_None, type != NULL ? type : Py_None, NULL);
+  Py_DECREF(get);
+  return result;
+}
+
+static PyObject *LazySelector_call(LazySelectorObject *self, PyObject *args,
+                                   PyObject *kwargs) {
+  PyObject *winner = lazy_winner(self);
+  if (winner == NULL) {
+    return NULL;
+  }
+  PyObject *result = PyObject_Call(winner, args, kwargs);
+  Py_DECREF(winner);
+  return result;
+}
+
+static PyObject *LazySelector_set_name(LazySelectorObject *self,
+                                       PyObject *args) {
+  PyObject *owner;
+  PyObject *name;
+  if (!PyArg_ParseTuple(args, "OO", &owner, &name)) {
+    return NULL;
+  }
+  Py_INCREF(owner);
+  Py_XDECREF(self->owner);
+  self->owner = owner;
+  Py_INCREF(name);
+  Py_XDECREF(self->name);
+  self->name = name;
+  lazy_unregister(self);
+  Py_RETURN_NONE;
+}
+
+static PyObject *LazySelector_repr(LazySelectorObject *self) {
+  return PyUnicode_FromFormat(
+      "<conditional_method._LazySelector %R (%zd candidates, %s)>",
+      self->qualname, PyList_Size(self->candidates),
+      self->winner != NULL ? "resolved" : "unresolved");
+}
+
+static PyObject *LazySelector_get_resolved(LazySelectorObject *self,
+                                           void *Py_UNUSED(closure)) {
+  return PyBool_FromLong(self->winner != NULL);
+}
+
+static PyMemberDef LazySelector_members[] = {
+    {"__qualname__", T_OBJECT_EX, offsetof(LazySelectorObject, qualname),
+     READONLY, "Fully qualified name the candidates were decorated under"},
+    {NULL} /* Sentinel */
+};
+
+static PyGetSetDef LazySelector_getset[] = {
+    {"resolved", (getter)LazySelector_get_resolved, NULL,
+     "Whether the candidates have been evaluated", NULL},
+    {NULL} /* Sentinel */
+};
+
+static PyMethodDef LazySelector_methods[] = {
+    {"__set_name__", (PyCFunction)LazySelector_set_name, METH_VARARGS,
+     "Record the owning class and attribute name."},
+    {NULL} /* Sentinel */
+};
+
+/* Instances only come from lazy decorations (see CfgCallable_new). */
+static PyObject *LazySelector_new(PyTypeObject *Py_UNUSED(type),
+                                  PyObject *Py_UNUSED(args),
+                                  PyObject *Py_UNUSED(kwargs)) {
+  PyErr_SetString(PyExc_TypeError,
+                  "cannot create 'conditional_method._LazySelector' instances");
+  return NULL;
+}
+
+static PyType_Slot LazySelector_slots[] = {
+    {Py_tp_doc, (void *)"Deferred @cfg selection (lazy=True)"},
+    {Py_tp_new, (void *)LazySelector_new},
+    {Py_tp_dealloc, (void *)LazySelector_dealloc},
+    {Py_tp_traverse, (void *)LazySelector_traverse},
+    {Py_tp_clear, (void *)LazySelector_clear},
+    {Py_tp_repr, (void *)LazySelector_repr},
+    {Py_tp_call, (void *)LazySelector_call},
+    {Py_tp_descr_get, (void *)LazySelector_descr_get},
+    {Py_tp_methods, LazySelector_methods},
+    {Py_tp_members, LazySelector_members},
+    {Py_tp_getset, LazySelector_getset},
+    {0, NULL},
+};
+
+static PyType_Spec LazySelector_spec = {
+    "conditional_method._LazySelector",      sizeof(LazySelectorObject), 0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, LazySelector_slots,
+};
+
+/* The lazy counterpart of _cm_inner_fast: add (func, condition, keys) to
+ * the pending selector for func's qualname, or start a new one. */
+static PyObject *cfg_lazy_add(PyObject *module, PyObject *func,
+                              PyObject *condition, PyObject *keys) {
+  cfg_state *st = get_cfg_state(module);
+  int64_t entered = CFG_TRACE_ON(st) ? cfg_now_ns() : 0;
+  PyObject *f_qualname = _get_func_name(module, func);
+  if (f_qualname == NULL) {
+    return NULL;
+  }
+  PyUnicode_InternInPlace(&f_qualname);
+
+  CFG_ALLOC_FAIL_GUARD();
+  PyObject *candidate =
+      PyTuple_Pack(3, func, condition, keys != NULL ? keys : Py_None);
+  if (candidate == NULL) {
+    Py_DECREF(f_qualname);
+    return NULL;
+  }
+
+  /* A function defined inside a function is pending in the build scope of
+   * the call defining it (see build_scope). */
+  LazySelectorObject *self = NULL;
+  PyObject *scope = NULL;
+  int scoped = build_scoped(st, f_qualname);
+  if (scoped > 0) {
+    scope = build_scope(st, f_qualname, 1);
+  }
+  if (scoped < 0 || PyErr_Occurred()) {
+    goto error;
+  }
+  PyObject *pending = scope != NULL ? scope : st->lazy_pending;
+  self = (LazySelectorObject *)cfg_dict_get(pending, f_qualname);
+  if (self == NULL) {
+    PyTypeObject *type = (PyTypeObject *)st->LazySelectorType;
+    allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+    self = (LazySelectorObject *)tp_alloc(type, 0);
+    if (self == NULL) {
+      goto error;
+    }
+    Py_INCREF(module);
+    self->module = module;
+    Py_INCREF(f_qualname);
+    self->qualname = f_qualname;
+    /* Module-level functions are rebound in their module's globals under
+     * __name__; class attributes learn their name from __set_name__. */
+    self->name = PyObject_GetAttrString(func, "__name__");
+    if (self->name == NULL) {
+      PyErr_Clear();
+    }
+    /* Registered only once it holds its first candidate: a selector is
+     * never empty. */
+    self->candidates = PyList_New(0);
+    if (self->candidates == NULL ||
+        PyList_Append(self->candidates, candidate) < 0 ||
+        CFG_ALLOC_TEST_FAIL() ||
+        PyDict_SetItem(pending, f_qualname, (PyObject *)self) < 0) {
+      goto error;
+    }
+    Py_INCREF(pending);
+    self->pending = pending;
+  } else if (PyList_Append(self->candidates, candidate) < 0 ||
+             CFG_ALLOC_TEST_FAIL()) {
+    goto error;
+  }
+  CFG_TRACE(st, CFG_TRACE_LAZY, f_qualname, PyList_Size(self->candidates) - 1,
+            condition, CFG_RESULT_PENDING, 0, entered, 0);
+  Py_XDECREF(scope);
+  Py_DECREF(candidate);
+  Py_DECREF(f_qualname);
+  return (PyObject *)self;
+
+error:
+  Py_XDECREF((PyObject *)self);
+  Py_XDECREF(scope);
+  Py_DECREF(candidate);
+  Py_DECREF(f_qualname);
+  return NULL;
+}
+
+/* --- Class-level resolution: @cfg.resolve_class ---
+ *
+ * Eager decorations select while the class body executes, one decoration at
+ * a time: every false candidate that precedes a true one allocates a
+ * TypeErrorRaiser, and every decoration writes the selection cache.  A class
+ * decorated with @cfg.resolve_class declares its candidates with lazy=True
+ * instead, so the body only collects them into _LazySelectors; once the
+ * class exists, resolve_class evaluates every selector the class owns in
+ * one pass, in decoration order (last true wins), and installs the winners.
+ * Losers leave nothing behind: no raiser, no cache entry.  A name without a
+ * true condition fails the class creation, as the eager raiser's
+ * __set_name__ does, naming every such name at once and installing nothing.
+ *
+ * `__init_subclass__ = classmethod(cfg.resolve_class)` in a base class does
+ * the same for every subclass. */
+
+/* Select `self`'s winner without side effects beyond the candidate
+ * registry: new reference, NULL without an exception when no condition is
+ * true, NULL with one on error. */
+static PyObject *resolve_selector(cfg_state *st, LazySelectorObject *self) {
+  PyObject *winner = NULL;
+  int tracked = 0;
+  Py_ssize_t n = PyList_Size(self->candidates);
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *candidate = PyList_GetItem(self->candidates, i);
+    PyObject *func = PyTuple_GetItem(candidate, 0);
+    PyObject *condition = PyTuple_GetItem(candidate, 1);
+    PyObject *keys = PyTuple_GetItem(candidate, 2);
+    keys = keys != Py_None ? keys : NULL;
+    int result = condition == Py_True
+                     ? 1
+                     : cfg_decide_condition(st, condition, func, self->qualname);
+    /* A name starting to be tracked part-way through keeps the winner so
+     * far as its fallback (see registry_note_locked), which the eager path
+     * finds in the cache: only then is the cache written. */
+    if (result >= 0 && !tracked && winner != NULL &&
+        (keys != NULL || PyCallable_Check(condition))) {
+      tracked = 1;
+      if (cache_set_weak_or_strong(st, &st->cm_cache, self->qualname, winner) <
+          0) {
+        result = -1;
+      }
+    }
+    if (result < 0 || registry_note(st, NULL, self->qualname, func, condition,
+                                    keys, result) < 0) {
+      Py_XDECREF(winner);
+      return NULL;
+    }
+    if (result) {
+      Py_INCREF(func);
+      Py_XDECREF(winner);
+      winner = func;
+    }
+  }
+  return winner;
+}
+
+static PyObject *cfg_resolve_class(PyObject *self, PyObject *cls) {
+  if (!PyType_Check(cls)) {
+    PyErr_Format(PyExc_TypeError,
+                 "`cfg.resolve_class` decorates classes, not %R", cls);
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self);
+  PyObject *ns = PyObject_GetAttrString(cls, "__dict__");
+  if (ns == NULL) {
+    return NULL;
+  }
+  /* A snapshot: installing the winners writes to the class namespace.  The
+   * selectors know their attribute name from __set_name__. */
+  PyObject *values = PyMapping_Values(ns);
+  Py_DECREF(ns);
+  if (values == NULL || CFG_ALLOC_TEST_FAIL()) {
+    Py_XDECREF(values);
+    return NULL;
+  }
+  PyObject *resolved = NULL; /* selectors whose winner is set */
+  PyObject *failed = NULL;   /* qualnames without a winner */
+  Py_ssize_t n = PyList_Size(values);
+  Py_ssize_t installed = 0;
+  for (Py_ssize_t i = 0; i < n; i++) {
+    LazySelectorObject *selector =
+        (LazySelectorObject *)PyList_GetItem(values, i);
+    if (Py_TYPE(selector) != (PyTypeObject *)st->LazySelectorType ||
+        selector->owner != cls || selector->winner != NULL) {
+      continue;
+    }
+    PyObject *winner = resolve_selector(st, selector);
+    if (winner == NULL) {
+      if (PyErr_Occurred() ||
+          (failed == NULL && (failed = PyList_New(0)) == NULL) ||
+          PyList_Append(failed, selector->qualname) < 0 ||
+          PySet_Add(st->failed_qualnames, selector->qualname) < 0) {
+        goto error;
+      }
+      continue;
+    }
+    CFG_OBJECT_LOCK(selector);
+    if (selector->winner == NULL) {
+      selector->winner = winner;
+      winner = NULL;
+    }
+    CFG_OBJECT_UNLOCK();
+    if (winner != NULL) {
+      /* Another thread resolved it first (see lazy_resolve). */
+      Py_DECREF(winner);
+      continue;
+    }
+    if ((resolved == NULL && (resolved = PyList_New(0)) == NULL) ||
+        CFG_ALLOC_TEST_FAIL() ||
+        PyList_Append(resolved, (PyObject *)selector) < 0) {
+      CFG_OBJECT_LOCK(selector);
+      Py_CLEAR(selector->winner);
+      CFG_OBJECT_UNLOCK();
+      goto error;
+    }
+  }
+  if (failed != NULL) {
+    PyObject *sep = PyUnicode_FromString("`, `");
+    PyObject *joined = sep != NULL ? PyUnicode_Join(sep, failed) : NULL;
+    Py_XDECREF(sep);
+    if (joined != NULL) {
+      PyErr_Format(PyExc_TypeError, "None of the conditions is true for `%U`",
+                   joined);
+      Py_DECREF(joined);
+    }
+    goto error;
+  }
+  /* Everything selected: install the winners. */
+  Py_ssize_t count = resolved != NULL ? PyList_Size(resolved) : 0;
+  for (; installed < count; installed++) {
+    LazySelectorObject *selector =
+        (LazySelectorObject *)PyList_GetItem(resolved, installed);
+    if (cfg_install(st, cls, selector->name, selector->winner) < 0 ||
+        registry_set_owner(st, selector->qualname, cls, selector->name) < 0 ||
+        PySet_Discard(st->failed_qualnames, selector->qualname) < 0 ||
+        CFG_ALLOC_TEST_FAIL()) {
+      goto error;
+    }
+  }
+  Py_DECREF(values);
+  Py_XDECREF(resolved);
+  Py_INCREF(cls);
+  return cls;
+
+error:
+  /* Selectors not installed yet go back to resolving on first use. */
+  if (resolved != NULL) {
+    Py_ssize_t count = PyList_Size(resolved);
+    for (Py_ssize_t i = installed; i < count; i++) {
+      LazySelectorObject *selector =
+          (LazySelectorObject *)PyList_GetItem(resolved, i);
+      CFG_OBJECT_LOCK(selector);
+      Py_CLEAR(selector->winner);
+      CFG_OBJECT_UNLOCK();
+    }
+  }
+  Py_DECREF(values);
+  Py_XDECREF(resolved);
+  Py_XDECREF(failed);
+  return NULL;
+}
+
+static PyObject *cfg_attr_impl(PyObject *self, PyObject *func,
+                               PyObject *condition, PyObject *decorators);
+
+/* Wrapper function for cfg_attr when used as a decorator */
+static PyObject *cfg_attr_wrapper(PyObject *self, PyObject *func) {
+  /* Get closure tuple containing module, condition and decorators */
+  PyObject *closure = self;
+  if (closure == NULL || !PyTuple_Check(closure) ||
+      PyTuple_Size(closure) != 3) {
+    PyErr_SetString(PyExc_RuntimeError, "Invalid closure in cfg_attr_wrapper");
+    return NULL;
+  }
+
+  /* Get condition and decorators from closure.
+   * Use the libpython function forms (PyTuple_GetItem / PyTuple_GetSize):
+   * the inline PyTuple_GET_ITEM/GET_SIZE macros read a stale PyTupleObject
+   * layout on CPython 3.14/wasm and corrupt memory there (same bug class as
+   * PyTuple_SET_ITEM; fixed throughout). These are real libpython functions
+   * (wasm-safe, Limited API). */
+  PyObject *module = PyTuple_GetItem(closure, 0);
+  PyObject *condition = PyTuple_GetItem(closure, 1);
+  PyObject *decorators = PyTuple_GetItem(closure, 2);
+  if (module == NULL || condition == NULL || decorators == NULL) {
+    return NULL;
+  }
+
+  /* Apply cfg_attr directly: no argument tuple or keyword dict. */
+  CFG_ALLOC_FAIL_GUARD();
+  return cfg_attr_impl(module, func, condition, decorators);
+}
+
+/* Helper: apply decorators to a function (true branch of cfg_attr).
+   decorators is a sequence; applied right-to-left so decorators[0] is
+   outermost. */
+static PyObject *cfg_attr_apply_decorators(cfg_state *st, PyObject *func,
+                                           PyObject *decorators,
+                                           PyObject *f_qualname) {
+  PyObject *result = NULL;
+  if (!PySequence_Check(decorators)) {
+    PyErr_SetString(PyExc_TypeError, "decorators must be a sequence");
+    goto error;
+  }
+  Py_ssize_t n = PySequence_Length(decorators);
+  if (n < 0) {
+    goto error;
+  }
+  if (n == 0) {
+    /* Cache the undecorated function just like any other true result, so a
+       later false condition for the same qualname reuses it (parity with
+       cm's cache semantics). */
+    Py_INCREF(func);
+    if (f_qualname != NULL && (cache_set_weak_or_strong(st, &st->cfg_attr_cache,
+                                                        f_qualname, func) < 0 ||
+                               CFG_ALLOC_TEST_FAIL())) {
+      Py_DECREF(func);
+      return NULL;
+    }
+    if (f_qualname != NULL && st->failed_qualnames != NULL) {
+      if (PySet_Discard(st->failed_qualnames, f_qualname) < 0) {
+        Py_DECREF(func);
+        return NULL;
+      }
+    }
+    return func;
+  }
+  result = func;
+  Py_INCREF(result);
+  for (Py_ssize_t i = n - 1; i >= 0; i--) {
+    CFG_ALLOC_FAIL_GUARD();
+    PyObject *decorator = PySequence_GetItem(decorators, i);
+    if (decorator == NULL) {
+      goto error;
+    }
+    CFG_ALLOC_FAIL_GUARD();
+    PyObject *decorated = PyObject_CallFunctionObjArgs(decorator, result, NULL);
+    Py_DECREF(result);
+    result = NULL;
+    Py_DECREF(decorator);
+    if (decorated == NULL) {
+      goto error;
+    }
+    result = decorated;
+  }
+  if (f_qualname != NULL) {
+    if (cache_set_weak_or_strong(st, &st->cfg_attr_cache, f_qualname, result) <
+            0 ||
+        CFG_ALLOC_TEST_FAIL()) {
+      goto error;
+    }
+    if (st->failed_qualnames != NULL) {
+      if (PySet_Discard(st->failed_qualnames, f_qualname) < 0) {
+        goto error;
+      }
+    }
+  }
+  return result;
+error:
+  Py_XDECREF(result);
+  return NULL;
+}
+
+/* Helper: the TypeErrorRaiser for a false-conditioned function (shared by
+   cm and cfg_attr). Adds f_qualname to the module-level _failed_qualnames
+   set (visible to assert_all_true). */
+static PyObject *cfg_make_raiser(PyObject *module, PyObject *f_qualname) {
+  cfg_state *st = get_cfg_state(module);
+  PyObject *raiser = cfg_raiser_get(st, f_qualname, 1);
+  if (raiser == NULL) {
+    return NULL;
+  }
+  /* Record the failure so assert_all_true/_get_failed can report it. */
+  if (st->failed_qualnames != NULL) {
+    if (PySet_Add(st->failed_qualnames, f_qualname) < 0 ||
+        CFG_ALLOC_TEST_FAIL()) {
+      Py_DECREF(raiser);
+      return NULL;
+    }
+  }
+  return raiser;
+}
+
+/* Helper: build the decorator-factory form of cfg_attr, a cfg_attr_wrapper
+   bound to a (module, condition, decorators) closure. */
+static PyObject *cfg_attr_make_wrapper(PyObject *module, PyObject *condition,
+                                       PyObject *decorators) {
+  CFG_ALLOC_FAIL_GUARD();
+  PyObject *closure = PyTuple_Pack(3, module, condition, decorators);
+  if (closure == NULL) {
+    return NULL;
+  }
+  PyObject *wrapper =
+      cfg_shared_decorator(get_cfg_state(module)->cfg_attr_decorators,
+                           &cfg_attr_wrapper_def, closure);
+  Py_DECREF(closure); /* the wrapper holds its own reference */
+  return wrapper;
+}
+
+/* Implementation of cfg_attr function */
+/* Call a callable `condition` with `func` for cfg_attr: 1 if true, 0 if
+ * false, -1 with an exception set (a TypeError names the function). */
+static int cfg_attr_call_condition(PyObject *module, PyObject *condition,
+                                   PyObject *func) {
+  int64_t start = cfg_now_ns();
+  PyObject *cond_result = PyObject_CallFunctionObjArgs(condition, func, NULL);
+  cfg_stat_condition(get_cfg_state(module), start);
+  if (cond_result == NULL) {
+    PyObject *error_type, *error_value, *error_traceback;
+    PyErr_Fetch(&error_type, &error_value, &error_traceback);
+    PyObject *fq = _get_func_name(module, func);
+    if (error_type != NULL &&
+        PyErr_GivenExceptionMatches(error_type, PyExc_TypeError) &&
+        fq != NULL) {
+      PyObject *error_msg = PyUnicode_FromFormat(
+          "Error calling `condition` for `%U`: %S", fq, error_value);
+      if (error_msg != NULL) {
+        PyErr_SetObject(PyExc_TypeError, error_msg);
+        Py_DECREF(error_msg);
+      }
+      Py_XDECREF(error_type);
+      Py_XDECREF(error_value);
+      Py_XDECREF(error_traceback);
+    } else {
+      PyErr_Restore(error_type, error_value, error_traceback);
+    }
+    Py_XDECREF(fq);
+    return -1;
+  }
+  int cond_bool = PyObject_IsTrue(cond_result);
+  Py_DECREF(cond_result);
+  return cond_bool;
+}
+
+/* cfg_attr(func=None, /, condition=None, decorators=None), METH_FASTCALL:
+ * parsed like PyArg_ParseTupleAndKeywords("|OOO") would. */
+static PyObject *cfg_attr(PyObject *self, PyObject *const *args,
+                          Py_ssize_t nargs, PyObject *kwnames) {
+  if (nargs > 3) {
+    PyErr_Format(PyExc_TypeError,
+                 "cfg_attr() takes at most 3 arguments (%zd given)", nargs);
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self);
+  PyObject *values[] = {NULL, NULL, NULL};
+  for (Py_ssize_t i = 0; i < nargs; i++) {
+    values[i] = args[i];
+  }
+  Py_ssize_t nkw = kwnames != NULL ? PyTuple_Size(kwnames) : 0;
+  PyObject *names[] = {st->str_condition, st->str_decorators};
+  for (Py_ssize_t i = 0; i < nkw; i++) {
+    PyObject *name = PyTuple_GetItem(kwnames, i);
+    Py_ssize_t index = cfg_kw_index(name, names, 2) + 1;
+    if (index == 0) {
+      PyErr_Format(PyExc_TypeError,
+                   "'%U' is an invalid keyword argument for cfg_attr()", name);
+      return NULL;
+    }
+    if (values[index] != NULL) {
+      PyErr_Format(PyExc_TypeError,
+                   "argument for cfg_attr() given by name ('%U') and "
+                   "position (%zd)",
+                   name, index + 1);
+      return NULL;
+    }
+    values[index] = args[nargs + i];
+  }
+  return cfg_attr_impl(self, values[0], values[1] != NULL ? values[1] : Py_None,
+                       values[2]);
+}
+
+/* The body of cfg_attr: `func` and `decorators` may be NULL (not given). */
+static PyObject *cfg_attr_impl(PyObject *self, PyObject *func,
+                               PyObject *condition, PyObject *decorators) {
+  cfg_state *st = get_cfg_state(self);
+
+  /* f is None and condition is None -> ValueError (decorator factory misuse) */
+  if ((func == NULL || func == Py_None) && condition == Py_None) {
+    PyErr_SetString(PyExc_ValueError,
+                    "`condition` is required and must be a bool or a callable "
+                    "that takes the decorated function and returns a bool");
+    return NULL;
+  }
+
+  /* condition is None (but f given) -> TypeError */
+  if (condition == Py_None) {
+    PyErr_SetString(PyExc_TypeError,
+                    "`condition` is required and must be a bool or a callable "
+                    "that takes the decorated function and returns a bool");
+    return NULL;
+  }
+  if (func != NULL && func != Py_None && cfg_check_frozen(st, func) < 0) {
+    return NULL;
+  }
+
+  /* Default decorators to an empty tuple */
+  if (decorators == NULL) {
+    CFG_ALLOC_FAIL_GUARD();
+    decorators = PyTuple_New(0);
+    if (decorators == NULL) {
+      return NULL;
+    }
+  } else {
+    Py_INCREF(decorators);
+  }
+
+  PyObject *wrapper = NULL;
+  int callable = PyCallable_Check(condition);
+  int tracing = CFG_TRACE_ON(st);
+  int64_t cost_ns = 0;
+  int cond_bool;
+
+  /* Factory form of a callable condition: return a wrapper that evaluates
+   * it per function.  A non-callable one is checked first. */
+  if (callable && (func == NULL || func == Py_None)) {
+    wrapper = cfg_attr_make_wrapper(self, condition, decorators);
+    Py_DECREF(decorators);
+    return wrapper;
+  }
+  /* Evaluate condition(func), a native condition in place, or the truth of
+   * a non-callable (timed, like the whole decoration, only while
+   * tracing). */
+  int64_t entered = tracing ? cfg_now_ns() : 0;
+  if (!callable) {
+    cond_bool = PyObject_IsTrue(condition);
+  } else if (cfg_is_condition(condition)) {
+    cond_bool = condition_eval((ConditionObject *)condition);
+  } else {
+    cond_bool = cfg_attr_call_condition(self, condition, func);
+  }
+  if (tracing) {
+    cost_ns = cfg_now_ns() - entered;
+  }
+  if (cond_bool == -1) {
+    goto error;
+  }
+  if (func == NULL || func == Py_None) {
+    wrapper = cfg_attr_make_wrapper(self, condition, decorators);
+    Py_DECREF(decorators);
+    return wrapper;
+  }
+
+  PyObject *fq = _get_func_name(self, func);
+  if (fq == NULL) {
+    goto error;
+  }
+  PyObject *result;
+  if (cond_bool) {
+    /* True: apply the decorators. */
+    int64_t chain_start = tracing ? cfg_now_ns() : 0;
+    result = cfg_attr_apply_decorators(st, func, decorators, fq);
+    if (result != NULL && tracing) {
+      cfg_trace_record(st, CFG_TRACE_ATTR_APPLY, fq, -1, condition, 1, cost_ns,
+                       entered, cfg_now_ns() - chain_start);
+    }
+  } else if ((result = cache_get_live(st, &st->cfg_attr_cache, fq)) != NULL) {
+    /* False, but a true winner for the name is cached. */
+    if (tracing) {
+      cfg_trace_record(st, CFG_TRACE_ATTR_CACHED, fq, -1, condition, 0, cost_ns,
+                       entered, 0);
+    }
+  } else {
+    /* False: raiser. */
+    result = cfg_make_raiser(self, fq);
+    if (result != NULL && tracing) {
+      cfg_trace_record(st, CFG_TRACE_ATTR_RAISER, fq, -1, condition, 0, cost_ns,
+                       entered, 0);
+    }
+  }
+  Py_DECREF(fq);
+  Py_DECREF(decorators);
+  return result;
+
+error:
+  Py_XDECREF(wrapper);
+  Py_XDECREF(decorators);
+  return NULL;
+}
+
+/* --- Eager validation: assert_all_true() -------------------------------
+ *
+ * Module-level ``@cfg(condition=False)`` decorations return a
+ * TypeErrorRaiser *immediately* (the function itself is replaced), but the
+ * error only fires when the name is *called*.  For config/flag-style
+ * modules you often want to fail at import time when a decorated name ended
+ * up with no true condition.  ``assert_all_true()`` scans the module-level
+ * cache and raises a TypeError naming every qualified function whose cached
+ * value is a TypeErrorRaiser (i.e. no ``condition=True`` winner).  It is a
+ * no-op (returns None) when everything is satisfied.
+ *
+ * ``_get_failed()`` returns the same list as a Python list of qualname
+ * strings (empty when all conditions are true) — used by tests and by
+ * ``assert_all_true`` itself.
+ */
+
+static PyObject *cfg_get_failed(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  CFG_ALLOC_FAIL_GUARD();
+  PyObject *result = PyList_New(0);
+  if (result == NULL) {
+    return NULL;
+  }
+  PyObject *iter = PyObject_GetIter(st->failed_qualnames);
+  if (iter == NULL) {
+    Py_DECREF(result);
+    return NULL;
+  }
+  PyObject *item;
+  while ((item = PyIter_Next(iter)) != NULL) {
+    if (PyList_Append(result, item) < 0) {
+      Py_DECREF(item);
+      Py_DECREF(iter);
+      Py_DECREF(result);
+      return NULL;
+    }
+    Py_DECREF(item);
+  }
+  Py_DECREF(iter);
+  if (PyErr_Occurred()) {
+    Py_DECREF(result);
+    return NULL;
+  }
+  return result;
+}
+
+static PyObject *cfg_assert_all_true(PyObject *self,
+                                     PyObject *Py_UNUSED(ignored)) {
+  CFG_ALLOC_FAIL_GUARD();
+  PyObject *failed = cfg_get_failed(self, NULL);
+  if (failed == NULL) {
+    return NULL;
+  }
+  Py_ssize_t n = PyList_GET_SIZE(failed);
+  if (n == 0) {
+    Py_DECREF(failed);
+    /* #2 (frozen cache): intentionally NOT implemented via PyDict_Freeze —
+     * it is not in the Limited API (abi3), so it cannot be used by this
+     * extension (which builds as cp39-abi3 for CPython 3.9-3.14 + wasm).
+     * The steady-state speedup is instead achieved by proposal #3: strong-ref
+     * cache values for module-level functions remove the per-lookup weakref
+     * type-check and deref, which is the dominant cost in cache_get_live. */
+    Py_RETURN_NONE;
+  }
+  PyObject *sep = PyUnicode_FromString(", ");
+  if (sep == NULL) {
+    Py_DECREF(failed);
+    return NULL;
+  }
+  PyObject *joined = PyUnicode_Join(sep, failed);
+  Py_DECREF(sep);
+  Py_DECREF(failed);
+  if (joined == NULL) {
+    return NULL;
+  }
+  PyErr_Format(PyExc_TypeError,
+               "No condition is true for %zd decorated name(s): %U", n, joined);
+  Py_DECREF(joined);
+  return NULL;
+}
+
+/* --- Freezing: freeze() ---
+ *
+ * _freeze(thaw) backs conditional_method.freeze(), which validates the
+ * registry first.  It returns a new dict of the live winners the registry
+ * still references (qualname -> winner): the last true candidate of every
+ * name in `_candidates`, the winners in the build scopes, and those in
+ * `_cm_cache`, stale generations included (a name keeps one entry, so a
+ * stale winner is still the last one selected for it) -- until a sweep
+ * reclaims them.  It then releases what only decorations and reselect()
+ * read: both caches' tables, the build scopes, the candidate registry and
+ * its key index, the qualname cache, the shared decorator tables and the
+ * pure-condition memo.  The dicts are emptied rather than dropped, so the
+ * module attributes exposing them stay valid.  `thaw` is the policy for
+ * later decorations (see "Frozen registry"). */
+
+/* Add the winners of the build scopes to `snapshot`.  Called with the
+ * stack's lock held. */
+static int freeze_snapshot_scopes(cfg_state *st, PyObject *snapshot) {
+  Py_ssize_t n = PyList_Size(st->build_scopes);
+  for (Py_ssize_t i = 0; i < n; i++) {
+    PyObject *scope = PyList_GetItem(PyList_GetItem(st->build_scopes, i), 1);
+    Py_ssize_t pos = 0;
+    PyObject *qualname, *value;
+    while (PyDict_Next(scope, &pos, &qualname, &value)) {
+      /* Raisers, and the pending selectors of a function call. */
+      if (PyObject_TypeCheck(value, (PyTypeObject *)st->TypeErrorRaiserType) ||
+          Py_TYPE(value) == (PyTypeObject *)st->LazySelectorType) {
+        continue;
+      }
+      PyObject *winner = scope_get(st, scope, qualname);
+      int rc = winner != NULL ? PyDict_SetItem(snapshot, qualname, winner) : 0;
+      Py_XDECREF(winner);
+      if (rc < 0) {
+        return -1;
+      }
+    }
+  }
+  return 0;
+}
+
+/* Add the last true candidate of each `_candidates` entry to `snapshot`.
+ * Called with the candidates lock held. */
+static int freeze_snapshot_candidates(cfg_state *st, PyObject *snapshot) {
+  Py_ssize_t pos = 0;
+  PyObject *qualname, *value;
+  while (PyDict_Next(st->candidates, &pos, &qualname, &value)) {
+    CandidatesObject *entry = (CandidatesObject *)value;
+    Py_ssize_t i = PyList_Size(entry->results) - 1;
+    while (i >= 0 && PyList_GetItem(entry->results, i) != Py_True) {
+      i--;
+    }
+    if (i >= 0 &&
+        PyDict_SetItem(
+            snapshot, qualname,
+            PyTuple_GetItem(PyList_GetItem(entry->candidates, i), 0)) < 0) {
+      return -1;
+    }
+  }
+  return 0;
+}
+
+static PyObject *cfg_freeze(PyObject *self, PyObject *arg) {
+  cfg_state *st = get_cfg_state(self);
+  int thaw = PyObject_IsTrue(arg);
+  if (thaw < 0) {
+    return NULL;
+  }
+  PyObject *snapshot = PyDict_New();
+  if (snapshot == NULL || CFG_ALLOC_TEST_FAIL()) {
+    Py_XDECREF(snapshot);
+    return NULL;
+  }
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &st->cm_cache.shards[i];
+    int rc = 0;
+    size_t pos = 0;
+    CfgSlot *slot;
+    CFG_SHARD_LOCK(shard);
+    while (rc == 0 && (slot = cfg_table_next(&shard->table, &pos)) != NULL) {
+      if (!(slot->value & CFG_SLOT_WEAK)) {
+        continue;
+      }
+      PyObject *key = slot->key;
+      Py_INCREF(key);
+      PyObject *winner = cfg_weakref_get(CFG_SLOT_OBJECT(slot));
+      if (winner != NULL) {
+        rc = PyDict_SetItem(snapshot, key, winner);
+        Py_DECREF(winner);
+      }
+      Py_DECREF(key);
+    }
+    CFG_SHARD_UNLOCK();
+    if (rc < 0) {
+      Py_DECREF(snapshot);
+      return NULL;
+    }
+  }
+  int rc;
+  CFG_OBJECT_LOCK(st->candidates);
+  rc = freeze_snapshot_candidates(st, snapshot);
+  CFG_OBJECT_UNLOCK();
+  if (rc == 0) {
+    CFG_OBJECT_LOCK(st->build_scopes);
+    rc = freeze_snapshot_scopes(st, snapshot);
+    if (rc == 0) {
+      rc = PyList_SetSlice(st->build_scopes, 0, PyList_Size(st->build_scopes),
+                           NULL);
+    }
+    CFG_OBJECT_UNLOCK();
+  }
+  if (rc < 0) {
+    Py_DECREF(snapshot);
+    return NULL;
+  }
+
+  CfgCache *caches[] = {&st->cm_cache, &st->cfg_attr_cache};
+  for (size_t c = 0; c < sizeof(caches) / sizeof(caches[0]); c++) {
+    for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+      CfgCacheShard *shard = &caches[c]->shards[i];
+      CFG_SHARD_LOCK(shard);
+      shard_clear(shard);
+      CFG_SHARD_UNLOCK();
+    }
+  }
+  CFG_OBJECT_LOCK(st->candidates);
+  PyDict_Clear(st->candidates);
+  PyDict_Clear(st->key_index);
+  CFG_OBJECT_UNLOCK();
+  CFG_OBJECT_LOCK(st->pure_memo);
+  PyDict_Clear(st->pure_memo);
+  CFG_OBJECT_UNLOCK();
+  CFG_OBJECT_LOCK(st->raisers);
+  PyDict_Clear(st->raisers);
+  st->raisers_prune_at = CFG_RAISERS_PRUNE_AT;
+  CFG_OBJECT_UNLOCK();
+  PyDict_Clear(st->qualname_cache);
+  PyDict_Clear(st->cm_decorators);
+  PyDict_Clear(st->cfg_attr_decorators);
+  CFG_FROZEN_SET(st, thaw ? CFG_FROZEN_THAW : CFG_FROZEN_RAISE);
+  return snapshot;
+}
+
+/* Whether the registry is frozen (see "Frozen registry"). */
+static PyObject *cfg_frozen(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  return PyBool_FromLong(CFG_FROZEN_LOAD(get_cfg_state(self)) != CFG_THAWED);
+}
+
+/* Test-only: leave the frozen state without a decoration. */
+static PyObject *cfg_thaw(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  CFG_FROZEN_SET(get_cfg_state(self), CFG_THAWED);
+  Py_RETURN_NONE;
+}
+
+/* Current cache generation (bumped by every TypeErrorRaiser reset). */
+static PyObject *cfg_cache_generation(PyObject *self,
+                                      PyObject *Py_UNUSED(ignored)) {
+  return PyLong_FromUnsignedLongLong(
+      (unsigned long long)CFG_GENERATION_LOAD(get_cfg_state(self)));
+}
+
+/* Sum the shard counters of `cache` into a dict (new reference). */
+static PyObject *cfg_cache_stats(CfgCache *cache) {
+  CfgCacheStats total = {0};
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &cache->shards[i];
+    CFG_SHARD_LOCK(shard);
+    total.hits += shard->stats.hits;
+    total.misses += shard->stats.misses;
+    total.writes += shard->stats.writes;
+    total.dead += shard->stats.dead;
+    total.stale += shard->stats.stale;
+    total.sweeps += shard->stats.sweeps;
+    total.swept += shard->stats.swept;
+    total.evicted += shard->stats.evicted;
+    CFG_SHARD_UNLOCK();
+  }
+  CFG_ALLOC_FAIL_GUARD();
+  return Py_BuildValue(
+      "{sKsKsKsKsKsKsKsK}", "hits", (unsigned long long)total.hits, "misses",
+      (unsigned long long)total.misses, "writes",
+      (unsigned long long)total.writes, "dead_weakrefs",
+      (unsigned long long)total.dead, "stale", (unsigned long long)total.stale,
+      "sweeps", (unsigned long long)total.sweeps, "swept",
+      (unsigned long long)total.swept, "evicted",
+      (unsigned long long)total.evicted);
+}
+
+/* stats() -> dict of the engine's counters (see "Statistics"). */
+static PyObject *cfg_stats(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  PyObject *cm_stats = cfg_cache_stats(&st->cm_cache);
+  if (cm_stats == NULL) {
+    return NULL;
+  }
+  PyObject *attr_stats = cfg_cache_stats(&st->cfg_attr_cache);
+  if (attr_stats == NULL) {
+    Py_DECREF(cm_stats);
+    return NULL;
+  }
+  if (CFG_ALLOC_TEST_FAIL()) {
+    Py_DECREF(cm_stats);
+    Py_DECREF(attr_stats);
+    return NULL;
+  }
+  /* "N" hands both dicts over, also when building the result fails. */
+  return Py_BuildValue(
+      "{sNsNsKsKsKsK}", "cm_cache", cm_stats, "cfg_attr_cache", attr_stats,
+      "raisers", (unsigned long long)CFG_STAT_LOAD(st, stat_raisers),
+      "condition_calls",
+      (unsigned long long)CFG_STAT_LOAD(st, stat_condition_calls),
+      "condition_ns", (unsigned long long)CFG_STAT_LOAD(st, stat_condition_ns),
+      "manifest_hits",
+      (unsigned long long)CFG_STAT_LOAD(st, stat_manifest_hits));
+}
+
+/* reset_stats(): zero every counter stats() reports. */
+static PyObject *cfg_reset_stats(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  CfgCache *caches[] = {&st->cm_cache, &st->cfg_attr_cache};
+  for (size_t c = 0; c < sizeof(caches) / sizeof(caches[0]); c++) {
+    for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+      CfgCacheShard *shard = &caches[c]->shards[i];
+      CFG_SHARD_LOCK(shard);
+      memset(&shard->stats, 0, sizeof(shard->stats));
+      CFG_SHARD_UNLOCK();
+    }
+  }
+  CFG_STAT_RESET(st, stat_raisers);
+  CFG_STAT_RESET(st, stat_condition_calls);
+  CFG_STAT_RESET(st, stat_condition_ns);
+  CFG_STAT_RESET(st, stat_manifest_hits);
+  Py_RETURN_NONE;
+}
+
+/* cache_policy() -> dict describing the caches' policy (see "Cache
+ * policy"). */
+static PyObject *cfg_cache_policy(PyObject *self,
+                                  PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  CfgCachePolicy policy;
+  CFG_OBJECT_LOCK(self);
+  policy = st->cache_policy;
+  CFG_OBJECT_UNLOCK();
+  PyObject *max_size;
+  if (policy.max_size > 0) {
+    max_size = PyLong_FromSsize_t(policy.max_size);
+    if (max_size == NULL) {
+      return NULL;
+    }
+  } else {
+    Py_INCREF(Py_None);
+    max_size = Py_None;
+  }
+  if (CFG_ALLOC_TEST_FAIL()) {
+    Py_DECREF(max_size);
+    return NULL;
+  }
+  /* "N" hands `max_size` over, also when building the result fails. */
+  return Py_BuildValue("{sssNsnsn}", "policy", cfg_policy_names[policy.policy],
+                       "max_size", max_size, "sweep_threshold",
+                       policy.sweep_threshold, "dead_sweep_threshold",
+                       policy.dead_sweep_threshold);
+}
+
+/* Parse the positive size `arg` of `name` into `*out`; None is 0 when
+ * `allow_none`.  Returns -1 with ValueError/TypeError set. */
+static int cfg_policy_size(PyObject *arg, const char *name, int allow_none,
+                           Py_ssize_t *out) {
+  if (allow_none && arg == Py_None) {
+    *out = 0;
+    return 0;
+  }
+  Py_ssize_t value = PyNumber_AsSsize_t(arg, PyExc_OverflowError);
+  if (value == -1 && PyErr_Occurred()) {
+    return -1;
+  }
+  if (value < 1) {
+    PyErr_Format(PyExc_ValueError, "%s must be a positive integer%s", name,
+                 allow_none ? " or None" : "");
+    return -1;
+  }
+  *out = value;
+  return 0;
+}
+
+/* set_cache_policy(*, policy=None, max_size=..., sweep_threshold=None,
+ * dead_sweep_threshold=None): change the caches' policy; arguments left
+ * out keep their current value. */
+static PyObject *cfg_set_cache_policy(PyObject *self, PyObject *args,
+                                      PyObject *kwargs) {
+  static char *kwlist[] = {"policy", "max_size", "sweep_threshold",
+                           "dead_sweep_threshold", NULL};
+  PyObject *policy_arg = NULL, *max_size_arg = NULL, *sweep_arg = NULL,
+           *dead_arg = NULL;
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|$OOOO:set_cache_policy",
+                                   kwlist, &policy_arg, &max_size_arg,
+                                   &sweep_arg, &dead_arg)) {
+    return NULL;
+  }
+  cfg_state *st = get_cfg_state(self);
+  CfgCachePolicy policy;
+  CFG_OBJECT_LOCK(self);
+  policy = st->cache_policy;
+  CFG_OBJECT_UNLOCK();
+
+  if (policy_arg != NULL) {
+    if (!PyUnicode_Check(policy_arg)) {
+      PyErr_Format(PyExc_TypeError, "policy must be a str, not %R", policy_arg);
+      return NULL;
+    }
+    int found = -1;
+    for (int i = 0; i < CFG_POLICY_COUNT; i++) {
+      if (PyUnicode_CompareWithASCIIString(policy_arg, cfg_policy_names[i]) ==
+          0) {
+        found = i;
+      }
+    }
+    if (found < 0) {
+      PyErr_Format(PyExc_ValueError,
+                   "policy must be 'sweep' or 'clock', not %R", policy_arg);
+      return NULL;
+    }
+    policy.policy = found;
+  }
+  if ((max_size_arg != NULL &&
+       cfg_policy_size(max_size_arg, "max_size", 1, &policy.max_size) < 0) ||
+      (sweep_arg != NULL && cfg_policy_size(sweep_arg, "sweep_threshold", 0,
+                                            &policy.sweep_threshold) < 0) ||
+      (dead_arg != NULL && cfg_policy_size(dead_arg, "dead_sweep_threshold", 0,
+                                           &policy.dead_sweep_threshold) < 0)) {
+    return NULL;
+  }
+
+  CFG_OBJECT_LOCK(self);
+  st->cache_policy = policy;
+  cfg_cache_apply_policy(&st->cm_cache, &policy);
+  cfg_cache_apply_policy(&st->cfg_attr_cache, &policy);
+  CFG_OBJECT_UNLOCK();
+  Py_RETURN_NONE;
+}
+
+/* _trace_enable(capacity=4096): start recording decisions into a ring of
+ * `capacity` events.  Changing the capacity drops the recorded events. */
+static PyObject *cfg_trace_enable(PyObject *self, PyObject *args) {
+  Py_ssize_t capacity = CFG_TRACE_DEFAULT_CAPACITY;
+  if (!PyArg_ParseTuple(args, "|n:_trace_enable", &capacity)) {
+    return NULL;
+  }
+  if (capacity < 1 ||
+      (size_t)capacity > (size_t)PY_SSIZE_T_MAX / sizeof(CfgDecision)) {
+    PyErr_Format(PyExc_ValueError,
+                 "trace capacity must be a positive size, not %zd", capacity);
+    return NULL;
+  }
+  if (cfg_trace_start(get_cfg_state(self), capacity) < 0) {
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+/* _trace_disable(): stop recording; the recorded events stay readable. */
+static PyObject *cfg_trace_disable(PyObject *self,
+                                   PyObject *Py_UNUSED(ignored)) {
+  CFG_TRACE_SET(get_cfg_state(self), 0);
+  Py_RETURN_NONE;
+}
+
+static PyObject *cfg_trace_enabled(PyObject *self,
+                                   PyObject *Py_UNUSED(ignored)) {
+  return PyBool_FromLong(CFG_TRACE_ON(get_cfg_state(self)));
+}
+
+/* _trace_clear(): drop the recorded events and the name table (sequence
+ * numbers keep counting up, so a reader can tell events were lost). */
+static PyObject *cfg_trace_clear(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  CFG_TRACE_LOCK(st);
+  if (st->trace_ring != NULL) {
+    memset(st->trace_ring, 0, (size_t)st->trace_capacity * sizeof(CfgDecision));
+  }
+  st->trace_start = st->trace_seq;
+  CFG_TRACE_UNLOCK(st);
+  int rc;
+  CFG_OBJECT_LOCK(st->trace_name_ids);
+  PyDict_Clear(st->trace_name_ids);
+  rc = PyList_SetSlice(st->trace_names, 0, PyList_Size(st->trace_names), NULL);
+  CFG_OBJECT_UNLOCK();
+  if (rc < 0) {
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+/* _trace_events() -> [(seq, time_ns, event, qualname, candidate, kind,
+ * result, cost_ns, total_ns, chain_ns), ...], oldest first.  The ring is copied
+ * under the lock and converted after releasing it: building the tuples can run
+ * the garbage collector, whose finalizers may decorate (and so record) in turn.
+ */
+static PyObject *cfg_trace_events(PyObject *self,
+                                  PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  CfgDecision *snapshot = NULL;
+  Py_ssize_t count = 0;
+  PyObject *result = NULL;
+
+  CFG_ALLOC_FAIL_GUARD();
+  /* Sized outside the lock: a ring that was enlarged in between (by a
+   * concurrent _trace_enable) is new and empty anyway. */
+  Py_ssize_t capacity = st->trace_capacity;
+  if (capacity > 0) {
+    snapshot =
+        (CfgDecision *)PyMem_Malloc((size_t)capacity * sizeof(CfgDecision));
+    if (snapshot == NULL) {
+      return PyErr_NoMemory();
+    }
+  }
+  CFG_TRACE_LOCK(st);
+  if (st->trace_ring != NULL && st->trace_capacity <= capacity) {
+    uint64_t ring_size = (uint64_t)st->trace_capacity;
+    uint64_t first = st->trace_seq - st->trace_start > ring_size
+                         ? st->trace_seq - ring_size
+                         : st->trace_start;
+    count = (Py_ssize_t)(st->trace_seq - first);
+    for (Py_ssize_t i = 0; i < count; i++) {
+      snapshot[i] = st->trace_ring[(first + (uint64_t)i) % ring_size];
+    }
+  }
+  CFG_TRACE_UNLOCK(st);
+
+  result = PyList_New(count);
+  for (Py_ssize_t i = 0; result != NULL && i < count; i++) {
+    CfgDecision *decision = &snapshot[i];
+    PyObject *qualname =
+        decision->name < (uint32_t)PyList_Size(st->trace_names)
+            ? PySequence_GetItem(st->trace_names, (Py_ssize_t)decision->name)
+            : NULL;
+    if (qualname == NULL) {
+      PyErr_Clear();
+      Py_INCREF(Py_None);
+      qualname = Py_None;
+    }
+    PyObject *outcome = decision->result == CFG_RESULT_PENDING ? Py_None
+                        : decision->result                     ? Py_True
+                                                               : Py_False;
+    PyObject *item = Py_BuildValue(
+        "(KLsNisOLLL)", (unsigned long long)decision->seq,
+        (long long)decision->time_ns, cfg_trace_event_names[decision->event],
+        qualname, (int)decision->candidate,
+        cfg_trace_kind_names[decision->kind], outcome,
+        (long long)decision->cost_ns, (long long)decision->total_ns,
+        (long long)decision->chain_ns);
+    if (item == NULL || CFG_ALLOC_TEST_FAIL()) {
+      Py_XDECREF(item);
+      Py_CLEAR(result);
+      break;
+    }
+    PyList_SetItem(result, i, item);
+  }
+  PyMem_Free(snapshot);
+  return result;
+}
+
+/* _trace_names() -> list of the qualnames records refer to, by index. */
+static PyObject *cfg_trace_names(PyObject *self, PyObject *Py_UNUSED(ignored)) {
+  cfg_state *st = get_cfg_state(self);
+  PyObject *names;
+  CFG_OBJECT_LOCK(st->trace_name_ids);
+  names = PyList_GetSlice(st->trace_names, 0, PyList_Size(st->trace_names));
+  CFG_OBJECT_UNLOCK();
+  return names;
+}
+
+/* --- _DecisionLog: the trace ring exported through the buffer protocol.
+ *
+ * A read-only, one-dimensional buffer of `capacity` CfgDecision records in
+ * ring order (CFG_DECISION_FORMAT, so memoryview / array / NumPy read the
+ * fields without a Python object per record).  Slots whose `event` is 0
+ * hold nothing; the others are ordered by `seq`.  The memory is the live
+ * ring: it keeps filling while tracing, and cannot be resized while a
+ * buffer over it is exported. */
+typedef struct {
+  PyObject_HEAD PyObject *module; /* keeps the module state alive */
+  Py_ssize_t shape;
+} DecisionLogObject;
+
+static int DecisionLog_getbuffer(DecisionLogObject *self, Py_buffer *view,
+                                 int flags) {
+  cfg_state *st = get_cfg_state(self->module);
+  if (flags & PyBUF_WRITABLE) {
+    PyErr_SetString(PyExc_BufferError, "the trace ring is read-only");
+    return -1;
+  }
+  CFG_TRACE_LOCK(st);
+  if (st->trace_ring == NULL) {
+    CFG_TRACE_UNLOCK(st);
+    PyErr_SetString(PyExc_BufferError,
+                    "there is no trace ring: enable tracing first");
+    return -1;
+  }
+  st->trace_exports++;
+  self->shape = st->trace_capacity;
+  view->buf = st->trace_ring;
+  CFG_TRACE_UNLOCK(st);
+  Py_INCREF(self);
+  view->obj = (PyObject *)self;
+  view->itemsize = (Py_ssize_t)sizeof(CfgDecision);
+  view->len = self->shape * view->itemsize;
+  view->readonly = 1;
+  view->ndim = 1;
+  view->format = (flags & PyBUF_FORMAT) ? CFG_DECISION_FORMAT : NULL;
+  view->shape = (flags & PyBUF_ND) ? &self->shape : NULL;
+  view->strides =
+      (flags & PyBUF_STRIDES) == PyBUF_STRIDES ? &view->itemsize : NULL;
+  view->suboffsets = NULL;
+  view->internal = NULL;
+  return 0;
+}
+
+static void DecisionLog_releasebuffer(DecisionLogObject *self,
+                                      Py_buffer *Py_UNUSED(view)) {
+  cfg_state *st = get_cfg_state(self->module);
+  CFG_TRACE_LOCK(st);
+  st->trace_exports--;
+  CFG_TRACE_UNLOCK(st);
+}
+
+static void DecisionLog_dealloc(DecisionLogObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
+  PyObject_GC_UnTrack(self);
+  Py_CLEAR(self->module);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp);
+}
+
+static int DecisionLog_traverse(DecisionLogObject *self, visitproc visit,
+                                void *arg) {
+  Py_VISIT(Py_TYPE(self));
+  Py_VISIT(self->module);
+  return 0;
+}
+
+/* Instances only come from _trace_buffer(). */
+static PyObject *DecisionLog_new(PyTypeObject *Py_UNUSED(type),
+                                 PyObject *Py_UNUSED(args),
+                                 PyObject *Py_UNUSED(kwargs)) {
+  PyErr_SetString(PyExc_TypeError,
+                  "cannot create 'conditional_method._DecisionLog' instances");
+  return NULL;
+}
+
+static PyType_Slot DecisionLog_slots[] = {
+    {Py_tp_doc, (void *)"The decision trace ring, exported as a buffer"},
+    {Py_tp_new, (void *)DecisionLog_new},
+    {Py_tp_dealloc, (void *)DecisionLog_dealloc},
+    {Py_tp_traverse, (void *)DecisionLog_traverse},
+    {Py_bf_getbuffer, (void *)DecisionLog_getbuffer},
+    {Py_bf_releasebuffer, (void *)DecisionLog_releasebuffer},
+    {0, NULL},
+};
+
+static PyType_Spec DecisionLog_spec = {
+    "conditional_method._DecisionLog",       sizeof(DecisionLogObject), 0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, DecisionLog_slots,
+};
+
+/* _trace_buffer() -> a _DecisionLog over this module's trace ring. */
+static PyObject *cfg_trace_buffer(PyObject *self,
+                                  PyObject *Py_UNUSED(ignored)) {
+  PyTypeObject *type = (PyTypeObject *)get_cfg_state(self)->DecisionLogType;
+  allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+  CFG_ALLOC_FAIL_GUARD();
+  DecisionLogObject *log = (DecisionLogObject *)tp_alloc(type, 0);
+  if (log == NULL) {
+    return NULL;
+  }
+  Py_INCREF(self);
+  log->module = self;
+  return (PyObject *)log;
+}
+
+/* Named method definitions (used for module aliases in cfg_module_exec). */
+static PyMethodDef cm_method_def = {
+    "cm", (PyCFunction)(void (*)(void))cm, METH_FASTCALL | METH_KEYWORDS,
+    "Conditionally select function implementations based on a runtime "
+    "condition."};
+
+static PyMethodDef cfg_attr_method_def = {
+    "cfg_attr", (PyCFunction)(void (*)(void))cfg_attr,
+    METH_FASTCALL | METH_KEYWORDS,
+    "Conditionally apply a chain of decorators to a function."};
+
+/* Define the methods of the module */
+static PyMethodDef ConditionalMethodMethods[] = {
+    {"_raise_exec", _raise_exec, METH_VARARGS,
+     "Create a TypeErrorRaiser instance."},
+    {"_get_func_name", _get_func_name, METH_O,
+     "Get the fully qualified name of a function."},
+    {"_get_mod_qual_func_name", _get_func_name, METH_O,
+     "Alias of _get_func_name (fully qualified function name)."},
+    {"cm", (PyCFunction)(void (*)(void))cm, METH_FASTCALL | METH_KEYWORDS,
+     "Conditionally select function implementations based on a runtime "
+     "condition."},
+    {"_cm_inner", _cm_inner, METH_VARARGS,
+     "Inner implementation of the conditional method decorator."},
+    {"cfg_attr", (PyCFunction)(void (*)(void))cfg_attr,
+     METH_FASTCALL | METH_KEYWORDS,
+     "Conditionally apply a chain of decorators to a function."},
+    {"debug", cfg_debug, METH_VARARGS,
+     "Log a debug message (noop unless enabled)."},
+    {"debug_enabled", cfg_debug_enabled, METH_NOARGS,
+     "Whether debug logging is enabled."},
+    {"assert_all_true", cfg_assert_all_true, METH_NOARGS,
+     "Raise TypeError if any @cfg-decorated name has no true condition; "
+     "otherwise return None."},
+    {"_freeze", cfg_freeze, METH_O,
+     "Snapshot the live winners and release the selection state; the "
+     "argument is true to thaw on the next decoration instead of raising."},
+    {"_frozen", cfg_frozen, METH_NOARGS,
+     "Return whether the selection registry is frozen."},
+    {"_thaw", cfg_thaw, METH_NOARGS, "Leave the frozen state (for tests)."},
+    {"_manifest_load", cfg_manifest_load, METH_VARARGS,
+     "Install the selection manifest: the callables reading a qualname's "
+     "(filename, winner line) and validating a file, or (None, None) to "
+     "drop it."},
+    {"_get_failed", cfg_get_failed, METH_NOARGS,
+     "Return the list of qualnames whose cached value is a TypeErrorRaiser."},
+    {"_cm_wrapper", _cm_wrapper, METH_O,
+     "Internal decorator wrapper (exposed for testing)."},
+    {"reselect", (PyCFunction)(void (*)(void))cfg_reselect,
+     METH_VARARGS | METH_KEYWORDS,
+     "Re-evaluate the conditions of tracked @cfg names (those reading "
+     "`changed_keys`, or all) and rebind the winners in place; returns the "
+     "rebound qualnames."},
+    {"stats", cfg_stats, METH_NOARGS,
+     "Return the selection engine's counters: per-cache hits, misses, "
+     "writes, reclaimed dead weakrefs and stale entries, sweeps; raisers "
+     "built; callable-condition calls and their time in ns; conditions the "
+     "selection manifest answered."},
+    {"reset_stats", cfg_reset_stats, METH_NOARGS,
+     "Zero the counters stats() reports."},
+    {"cache_policy", cfg_cache_policy, METH_NOARGS,
+     "Return the selection caches' policy: the reclaim policy, max size and "
+     "sweep thresholds."},
+    {"set_cache_policy", (PyCFunction)(void (*)(void))cfg_set_cache_policy,
+     METH_VARARGS | METH_KEYWORDS,
+     "Set the selection caches' policy (keyword-only: policy='sweep' or "
+     "'clock', max_size, sweep_threshold, dead_sweep_threshold)."},
+    {"_cache_generation", cfg_cache_generation, METH_NOARGS,
+     "Return the current cache generation (exposed for testing)."},
+    {"_trace_enable", cfg_trace_enable, METH_VARARGS,
+     "Start recording selection decisions into a ring of `capacity` events."},
+    {"_trace_disable", cfg_trace_disable, METH_NOARGS,
+     "Stop recording selection decisions."},
+    {"_trace_enabled", cfg_trace_enabled, METH_NOARGS,
+     "Whether selection decisions are being recorded."},
+    {"_trace_events", cfg_trace_events, METH_NOARGS,
+     "Return the recorded (seq, time_ns, event, qualname, candidate, kind, "
+     "result, cost_ns, total_ns, chain_ns) tuples, oldest first."},
+    {"_trace_clear", cfg_trace_clear, METH_NOARGS,
+     "Drop the recorded selection decisions."},
+    {"_trace_names", cfg_trace_names, METH_NOARGS,
+     "Return the qualnames trace records refer to, by index."},
+    {"_trace_buffer", cfg_trace_buffer, METH_NOARGS,
+     "Return a _DecisionLog exporting the trace ring as a buffer."},
+#ifdef PY_CFG_TESTING
+    {"set_alloc_fail_count", cfg_set_alloc_fail_count, METH_VARARGS,
+     "Test-only: make the next n guarded allocations fail."},
+    {"alloc_counts", cfg_alloc_counts, METH_NOARGS,
+     "Test-only: {path: (created, released)} objects since the last reset."},
+    {"reset_alloc_counts", cfg_reset_alloc_counts, METH_NOARGS,
+     "Test-only: zero the allocation counts."},
+#endif
+    {"cfg_attr_wrapper", cfg_attr_wrapper, METH_O,
+     "Internal cfg_attr wrapper (exposed for testing)."},
+    {NULL, NULL, 0, NULL} /* Sentinel */
+};
+
+/* --- _CacheView: the exposed `_cm_cache` / `cm._cache`.
+ *
+ * A live, read-only mapping over every shard of one CfgCache: item access,
+ * `in`, len(), iteration, keys()/values()/items(), get(), copy() and ==
+ * against a dict.  Values are what the table stores: a weakref to the
+ * winner or the raiser.  Entries from an older generation are absent, as
+ * they are to the selection itself, even before they are reclaimed.  clear() empties every shard, for tests and tooling that
+ * reset the caches.  Each operation takes the lock of the shard it
+ * touches; whole-cache reads work on a snapshot dict built shard by
+ * shard. */
+typedef struct {
+  PyObject_HEAD PyObject *module; /* keeps the module state alive */
+  CfgCache *cache;
+} CacheViewObject;
+
+static void CacheView_dealloc(CacheViewObject *self) {
+  PyTypeObject *tp = Py_TYPE(self);
+  PyObject_GC_UnTrack(self);
+  Py_CLEAR(self->module);
+  freefunc tp_free = (freefunc)PyType_GetSlot(tp, Py_tp_free);
+  tp_free(self);
+  Py_DECREF(tp);
+}
+
+static int CacheView_traverse(CacheViewObject *self, visitproc visit,
+                              void *arg) {
+  Py_VISIT(Py_TYPE(self));
+  Py_VISIT(self->module);
+  return 0;
+}
+
+/* New dict holding every shard's current entries. */
+static PyObject *CacheView_snapshot(CacheViewObject *self) {
+  cfg_state *st = get_cfg_state(self->module);
+  PyObject *snapshot = PyDict_New();
+  if (snapshot == NULL) {
+    return NULL;
+  }
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &self->cache->shards[i];
+    int rc = 0;
+    size_t pos = 0;
+    CfgSlot *slot;
+    CFG_SHARD_LOCK(shard);
+    while (rc == 0 && (slot = cfg_table_next(&shard->table, &pos)) != NULL) {
+      if (shard_entry_is_current(st, slot)) {
+        rc = PyDict_SetItem(snapshot, slot->key, CFG_SLOT_OBJECT(slot));
+      }
+    }
+    CFG_SHARD_UNLOCK();
+    if (rc < 0) {
+      Py_DECREF(snapshot);
+      return NULL;
+    }
+  }
+  return snapshot;
+}
+
+static Py_ssize_t CacheView_length(CacheViewObject *self) {
+  cfg_state *st = get_cfg_state(self->module);
+  Py_ssize_t n = 0;
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &self->cache->shards[i];
+    size_t pos = 0;
+    CfgSlot *slot;
+    CFG_SHARD_LOCK(shard);
+    while ((slot = cfg_table_next(&shard->table, &pos)) != NULL) {
+      n += shard_entry_is_current(st, slot);
+    }
+    CFG_SHARD_UNLOCK();
+  }
+  return n;
+}
+
+/* New reference to the current value stored under `key`, or NULL (no
+ * exception set) when absent or stale. */
+static PyObject *CacheView_lookup(CacheViewObject *self, PyObject *key) {
+  cfg_state *st = get_cfg_state(self->module);
+  CfgCacheShard *shard = cache_shard(self->cache, key);
+  PyObject *val = NULL;
+  CFG_SHARD_LOCK(shard);
+  CfgSlot *slot = shard_find(shard, key);
+  if (slot != NULL && shard_entry_is_current(st, slot)) {
+    val = CFG_SLOT_OBJECT(slot);
+    Py_INCREF(val);
+  }
+  CFG_SHARD_UNLOCK();
+  return val;
+}
+
+static PyObject *CacheView_subscript(CacheViewObject *self, PyObject *key) {
+  PyObject *val = CacheView_lookup(self, key);
+  if (val == NULL) {
+    PyErr_SetObject(PyExc_KeyError, key);
+  }
+  return val;
+}
+
+static int CacheView_contains(CacheViewObject *self, PyObject *key) {
+  PyObject *val = CacheView_lookup(self, key);
+  Py_XDECREF(val);
+  return val != NULL;
+}
+
+static PyObject *CacheView_iter(CacheViewObject *self) {
+  PyObject *snapshot = CacheView_snapshot(self);
+  if (snapshot == NULL) {
+    return NULL;
+  }
+  PyObject *keys = PyDict_Keys(snapshot);
+  Py_DECREF(snapshot);
+  if (keys == NULL) {
+    return NULL;
+  }
+  PyObject *it = PyObject_GetIter(keys);
+  Py_DECREF(keys);
+  return it;
+}
+
+/* keys()/values()/items() of a snapshot dict. */
+static PyObject *CacheView_snapshot_call(CacheViewObject *self,
+                                         const char *method) {
+  PyObject *snapshot = CacheView_snapshot(self);
+  if (snapshot == NULL) {
+    return NULL;
+  }
+  PyObject *result = PyObject_CallMethod(snapshot, method, NULL);
+  Py_DECREF(snapshot);
+  return result;
+}
+
+static PyObject *CacheView_keys(CacheViewObject *self,
+                                PyObject *Py_UNUSED(ignored)) {
+  return CacheView_snapshot_call(self, "keys");
+}
+
+static PyObject *CacheView_values(CacheViewObject *self,
+                                  PyObject *Py_UNUSED(ignored)) {
+  return CacheView_snapshot_call(self, "values");
+}
+
+static PyObject *CacheView_items(CacheViewObject *self,
+                                 PyObject *Py_UNUSED(ignored)) {
+  return CacheView_snapshot_call(self, "items");
+}
+
+static PyObject *CacheView_copy(CacheViewObject *self,
+                                PyObject *Py_UNUSED(ignored)) {
+  return CacheView_snapshot(self);
+}
+
+static PyObject *CacheView_get(CacheViewObject *self, PyObject *args) {
+  PyObject *key;
+  PyObject *dflt = Py_None;
+  if (!PyArg_ParseTuple(args, "O|O:get", &key, &dflt)) {
     return NULL;
   }
-  return result;
+  PyObject *val = CacheView_lookup(self, key);
+  if (val == NULL) {
+    Py_INCREF(dflt);
+    return dflt;
+  }
+  return val;
 }
 
-static PyObject *cfg_assert_all_true(PyObject *Py_UNUSED(self),
-                                     PyObject *Py_UNUSED(ignored)) {
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *failed = cfg_get_failed(NULL, NULL);
-  if (failed == NULL) {
-    return NULL;
+static PyObject *CacheView_clear(CacheViewObject *self,
+                                 PyObject *Py_UNUSED(ignored)) {
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &self->cache->shards[i];
+    CFG_SHARD_LOCK(shard);
+    shard_clear(shard);
+    CFG_SHARD_UNLOCK();
   }
-  Py_ssize_t n = PyList_GET_SIZE(failed);
-  if (n == 0) {
-    Py_DECREF(failed);
-    /* #2 (frozen cache): intentionally NOT implemented via PyDict_Freeze —
-     * it is not in the Limited API (abi3), so it cannot be used by this
-     * extension (which builds as cp39-abi3 for CPython 3.9-3.14 + wasm).
-     * The steady-state speedup is instead achieved by proposal #3: strong-ref
-     * cache values for module-level functions remove the per-lookup weakref
-     * type-check and deref, which is the dominant cost in cache_get_live. */
-    Py_RETURN_NONE;
+  Py_RETURN_NONE;
+}
+
+static PyObject *CacheView_richcompare(CacheViewObject *self, PyObject *other,
+                                       int op) {
+  if (op != Py_EQ && op != Py_NE) {
+    Py_RETURN_NOTIMPLEMENTED;
   }
-  PyObject *sep = PyUnicode_FromString(", ");
-  if (sep == NULL) {
-    Py_DECREF(failed);
+  PyObject *snapshot = CacheView_snapshot(self);
+  if (snapshot == NULL) {
     return NULL;
   }
-  PyObject *joined = PyUnicode_Join(sep, failed);
-  Py_DECREF(sep);
-  Py_DECREF(failed);
-  if (joined == NULL) {
+  PyObject *result = PyObject_RichCompare(snapshot, other, op);
+  Py_DECREF(snapshot);
+  return result;
+}
+
+static PyObject *CacheView_repr(CacheViewObject *self) {
+  PyObject *snapshot = CacheView_snapshot(self);
+  if (snapshot == NULL) {
     return NULL;
   }
-  PyErr_Format(PyExc_TypeError,
-               "No condition is true for %zd decorated name(s): %U", n, joined);
-  Py_DECREF(joined);
-  return NULL;
+  PyObject *r = PyUnicode_FromFormat("_CacheView(%R)", snapshot);
+  Py_DECREF(snapshot);
+  return r;
 }
 
-/* Named method definitions (used for module aliases in PyInit__c). */
-static PyMethodDef cm_method_def = {
-    "cm", (PyCFunction)(void (*)(void))cm, METH_VARARGS | METH_KEYWORDS,
-    "Conditionally select function implementations based on a runtime "
-    "condition."};
-
-static PyMethodDef cfg_attr_method_def = {
-    "cfg_attr", (PyCFunction)(void (*)(void))cfg_attr,
-    METH_VARARGS | METH_KEYWORDS,
-    "Conditionally apply a chain of decorators to a function."};
+static PyMethodDef CacheView_methods[] = {
+    {"keys", (PyCFunction)CacheView_keys, METH_NOARGS,
+     "Keys of a snapshot of the cache."},
+    {"values", (PyCFunction)CacheView_values, METH_NOARGS,
+     "Values of a snapshot of the cache."},
+    {"items", (PyCFunction)CacheView_items, METH_NOARGS,
+     "Items of a snapshot of the cache."},
+    {"copy", (PyCFunction)CacheView_copy, METH_NOARGS,
+     "Return a snapshot of the cache as a dict."},
+    {"get", (PyCFunction)CacheView_get, METH_VARARGS,
+     "Return the stored value for key, or default."},
+    {"clear", (PyCFunction)CacheView_clear, METH_NOARGS,
+     "Remove every entry from every shard."},
+    {NULL, NULL, 0, NULL},
+};
 
-/* Define the methods of the module */
-static PyMethodDef ConditionalMethodMethods[] = {
-    {"_raise_exec", _raise_exec, METH_VARARGS,
-     "Create a TypeErrorRaiser instance."},
-    {"_get_func_name", _get_func_name, METH_O,
-     "Get the fully qualified name of a function."},
-    {"_get_mod_qual_func_name", _get_func_name, METH_O,
-     "Alias of _get_func_name (fully qualified function name)."},
-    {"cm", (PyCFunction)(void (*)(void))cm, METH_VARARGS | METH_KEYWORDS,
-     "Conditionally select function implementations based on a runtime "
-     "condition."},
-    {"_cm_inner", _cm_inner, METH_VARARGS,
-     "Inner implementation of the conditional method decorator."},
-    {"cfg_attr", (PyCFunction)(void (*)(void))cfg_attr,
-     METH_VARARGS | METH_KEYWORDS,
-     "Conditionally apply a chain of decorators to a function."},
-    {"debug", cfg_debug, METH_VARARGS,
-     "Log a debug message (noop unless enabled)."},
-    {"debug_enabled", cfg_debug_enabled, METH_NOARGS,
-     "Whether debug logging is enabled."},
-    {"assert_all_true", cfg_assert_all_true, METH_NOARGS,
-     "Raise TypeError if any @cfg-decorated name has no true condition; "
-     "otherwise return None."},
-    {"_get_failed", cfg_get_failed, METH_NOARGS,
-     "Return the list of qualnames whose cached value is a TypeErrorRaiser."},
-    {"_cm_wrapper", (PyCFunction)(void (*)(void))_cm_wrapper, METH_VARARGS,
-     "Internal decorator wrapper (exposed for testing)."},
-#ifdef PY_CFG_TESTING
-    {"set_alloc_fail_count", cfg_set_alloc_fail_count, METH_VARARGS,
-     "Test-only: make the next n guarded allocations fail."},
-#endif
-    {"cfg_attr_wrapper", cfg_attr_wrapper, METH_VARARGS,
-     "Internal cfg_attr wrapper (exposed for testing)."},
-    {NULL, NULL, 0, NULL} /* Sentinel */
+static PyType_Slot CacheView_slots[] = {
+    {Py_tp_doc, (void *)"Read-only mapping view over a selection cache"},
+    {Py_tp_dealloc, (void *)CacheView_dealloc},
+    {Py_tp_traverse, (void *)CacheView_traverse},
+    {Py_tp_repr, (void *)CacheView_repr},
+    {Py_tp_iter, (void *)CacheView_iter},
+    {Py_tp_richcompare, (void *)CacheView_richcompare},
+    {Py_tp_methods, CacheView_methods},
+    {Py_mp_length, (void *)CacheView_length},
+    {Py_mp_subscript, (void *)CacheView_subscript},
+    {Py_sq_contains, (void *)CacheView_contains},
+    {0, NULL},
 };
 
-/* Module definition */
-static struct PyModuleDef conditionalmodule = {
-    PyModuleDef_HEAD_INIT,
-    "_c",                                  /* m_name */
-    "Conditional method decorator module", /* m_doc */
-    -1,                                    /* m_size */
-    ConditionalMethodMethods,              /* m_methods */
-    NULL,                                  /* m_slots */
-    NULL,                                  /* m_traverse */
-    NULL,                                  /* m_clear */
-    NULL                                   /* m_free */
+static PyType_Spec CacheView_spec = {
+    "conditional_method._CacheView",         sizeof(CacheViewObject), 0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, CacheView_slots,
 };
 
-/* Module initialization function */
-PyMODINIT_FUNC PyInit__c(void) {
-  /* Initialize the module */
-  CFG_ALLOC_FAIL_GUARD();
-  PyObject *m = PyModule_Create(&conditionalmodule);
-  if (m == NULL) {
+static PyObject *CacheView_new(PyObject *module, CfgCache *cache) {
+  PyTypeObject *type = (PyTypeObject *)get_cfg_state(module)->CacheViewType;
+  allocfunc tp_alloc = (allocfunc)PyType_GetSlot(type, Py_tp_alloc);
+  CacheViewObject *view = (CacheViewObject *)tp_alloc(type, 0);
+  if (view == NULL) {
     return NULL;
   }
+  Py_INCREF(module);
+  view->module = module;
+  view->cache = cache;
+  return (PyObject *)view;
+}
 
-  /* Add the TypeErrorRaiser type to the module */
-  if (PyType_Ready(&TypeErrorRaiserType) < 0) {
-    Py_DECREF(m);
-    return NULL;
+/* Add `value` to `module` as `name`, stealing the reference (also on
+ * failure, unlike PyModule_AddObject). */
+static int cfg_module_add(PyObject *module, const char *name, PyObject *value) {
+  if (value == NULL) {
+    return -1;
+  }
+  if (PyModule_AddObject(module, name, value) < 0) {
+    Py_DECREF(value);
+    return -1;
   }
+  return 0;
+}
 
-  Py_INCREF(&TypeErrorRaiserType);
-  if (PyModule_AddObject(m, "_TypeErrorRaiser",
-                         (PyObject *)&TypeErrorRaiserType) < 0) {
-    Py_DECREF(&TypeErrorRaiserType);
-    Py_DECREF(m);
-    return NULL;
+/* A tuple of str built from a C array of names (new reference). */
+static PyObject *cfg_names_tuple(const char *const *names, int count) {
+  PyObject *tuple = PyTuple_New(count);
+  for (int i = 0; tuple != NULL && i < count; i++) {
+    PyObject *name = PyUnicode_InternFromString(names[i]);
+    if (name == NULL) {
+      Py_CLEAR(tuple);
+      break;
+    }
+    PyTuple_SetItem(tuple, i, name);
   }
+  return tuple;
+}
 
-  /* Create the module-level caches */
-  _cm_cache = PyDict_New();
-  _cfg_attr_cache = PyDict_New();
-  _failed_qualnames = PySet_New(NULL);
-  if (_cm_cache == NULL || _cfg_attr_cache == NULL ||
-      _failed_qualnames == NULL) {
-    Py_XDECREF(_cm_cache);
-    Py_XDECREF(_cfg_attr_cache);
-    Py_XDECREF(_failed_qualnames);
-    _cm_cache = NULL;
-    _cfg_attr_cache = NULL;
-    _failed_qualnames = NULL;
-    Py_DECREF(m);
+/* Create a heap type from `spec` bound to `module` (see
+ * cfg_state_from_type) and add it to the module as `name`.  Returns a
+ * borrowed reference to the type (the state holds the strong one). */
+static PyObject *cfg_add_type(PyObject *module, PyType_Spec *spec,
+                              const char *name, PyObject **slot) {
+  *slot = PyType_FromSpec(spec);
+  if (*slot == NULL ||
+      PyObject_SetAttrString(*slot, "_cfg_module", module) < 0) {
     return NULL;
   }
-  if (PyModule_AddObject(m, "_cm_cache", _cm_cache) < 0) {
-    Py_DECREF(_cm_cache);
-    Py_DECREF(m);
+  Py_INCREF(*slot);
+  if (cfg_module_add(module, name, *slot) < 0) {
     return NULL;
   }
-  if (PyModule_AddObject(m, "_cfg_attr_cache", _cfg_attr_cache) < 0) {
-    Py_DECREF(_cfg_attr_cache);
-    Py_DECREF(m);
-    return NULL;
+  return *slot;
+}
+
+/* Capture os.environ and, where it has them, its backing dict and key /
+ * value encoders for the native environment conditions. */
+static int cfg_environ_init(cfg_state *st) {
+  PyObject *os_mod = PyImport_ImportModule("os");
+  if (os_mod == NULL) {
+    return -1;
   }
-  if (PyModule_AddObject(m, "_failed_qualnames", _failed_qualnames) < 0) {
-    Py_DECREF(_failed_qualnames);
-    Py_DECREF(m);
-    return NULL;
+  st->environ = PyObject_GetAttrString(os_mod, "environ");
+  Py_DECREF(os_mod);
+  if (st->environ == NULL) {
+    return -1;
+  }
+  PyObject *data = PyObject_GetAttrString(st->environ, "_data");
+  if (data != NULL && PyDict_Check(data) &&
+      (st->environ_encodekey =
+           PyObject_GetAttrString(st->environ, "encodekey")) != NULL &&
+      (st->environ_encodevalue =
+           PyObject_GetAttrString(st->environ, "encodevalue")) != NULL) {
+    st->environ_data = data;
+    return 0;
+  }
+  /* Not os._Environ: read through the mapping. */
+  PyErr_Clear();
+  Py_XDECREF(data);
+  Py_CLEAR(st->environ_encodekey);
+  return 0;
+}
+
+/* Py_mod_exec: populate a fresh module object and its state.  On failure the
+ * partially-initialised state is released by cfg_module_free. */
+/* Weakref callback of the winners stored in a cache shard: drop the entry
+ * of the winner that just died, found through the shard's reverse index.
+ * `self` is (module, shard number), the shards of `_cfg_attr_cache`
+ * numbered after those of `_cm_cache`. */
+static PyObject *cfg_cache_evict(PyObject *self, PyObject *wr) {
+  PyObject *module = PyTuple_GetItem(self, 0);
+  Py_ssize_t number = PyLong_AsSsize_t(PyTuple_GetItem(self, 1));
+  cfg_state *st = get_cfg_state(module);
+  CfgCache *cache =
+      number < CFG_CACHE_SHARDS ? &st->cm_cache : &st->cfg_attr_cache;
+  CfgCacheShard *shard = &cache->shards[number % CFG_CACHE_SHARDS];
+  if (shard->evict == NULL) {
+    Py_RETURN_NONE; /* the module was cleared */
+  }
+  CFG_SHARD_LOCK(shard);
+  uint32_t *ref = cfg_table_find_ref(&shard->table, wr);
+  if (ref != NULL) {
+    shard->stats.dead++;
+    shard_discard(shard, &shard->table.slots[*ref]);
+  }
+  CFG_SHARD_UNLOCK();
+  Py_RETURN_NONE;
+}
+
+static PyMethodDef cfg_cache_evict_def = {
+    "_cache_evict", cfg_cache_evict, METH_O,
+    "Drop the cache entry of a winner that died (weakref callback)."};
+
+/* Create every shard's weakref callback (the tables are allocated on the
+ * first write), and the `_CacheView` exposed as `_cm_cache` / `cm._cache`.
+ * `first` is the number of the cache's first shard (see
+ * cfg_cache_evict). */
+static int cfg_cache_init(PyObject *module, CfgCache *cache, int first) {
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    CfgCacheShard *shard = &cache->shards[i];
+    PyObject *self = Py_BuildValue("(Oi)", module, first + i);
+    if (self == NULL) {
+      return -1;
+    }
+    shard->evict = PyCFunction_NewEx(&cfg_cache_evict_def, self, NULL);
+    Py_DECREF(self);
+    if (shard->evict == NULL) {
+      return -1;
+    }
+  }
+  cache->exposed = CacheView_new(module, cache);
+  if (cache->exposed == NULL) {
+    return -1;
+  }
+  return 0;
+}
+
+static int cfg_cache_traverse(CfgCache *cache, visitproc visit, void *arg) {
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    size_t pos = 0;
+    CfgSlot *slot;
+    while ((slot = cfg_table_next(&cache->shards[i].table, &pos)) != NULL) {
+      Py_VISIT(slot->key);
+      Py_VISIT(CFG_SLOT_OBJECT(slot));
+    }
+    Py_VISIT(cache->shards[i].evict);
+  }
+  Py_VISIT(cache->exposed);
+  return 0;
+}
+
+static void cfg_cache_clear(CfgCache *cache) {
+  for (int i = 0; i < CFG_CACHE_SHARDS; i++) {
+    shard_clear(&cache->shards[i]);
+    Py_CLEAR(cache->shards[i].evict);
+  }
+  Py_CLEAR(cache->exposed);
+}
+
+static int cfg_module_exec(PyObject *m) {
+  cfg_state *st = get_cfg_state(m);
+
+  if (cfg_add_type(m, &TypeErrorRaiser_spec, "_TypeErrorRaiser",
+                   &st->TypeErrorRaiserType) == NULL ||
+      cfg_add_type(m, &CfgCallable_spec, "_CfgCallable",
+                   &st->CfgCallableType) == NULL ||
+      cfg_add_type(m, &LazySelector_spec, "_LazySelector",
+                   &st->LazySelectorType) == NULL ||
+      cfg_add_type(m, &Candidates_spec, "_Candidates", &st->CandidatesType) ==
+          NULL ||
+      cfg_add_type(m, &Condition_spec, "_Condition", &st->ConditionType) ==
+          NULL ||
+      cfg_add_type(m, &DecisionLog_spec, "_DecisionLog",
+                   &st->DecisionLogType) == NULL) {
+    return -1;
+  }
+  if (cfg_add_type(m, &CacheView_spec, "_CacheView", &st->CacheViewType) ==
+      NULL) {
+    return -1;
+  }
+
+  /* Create the selection caches */
+  if (cfg_cache_init(m, &st->cm_cache, 0) < 0 ||
+      cfg_cache_init(m, &st->cfg_attr_cache, CFG_CACHE_SHARDS) < 0) {
+    return -1;
+  }
+  st->cache_policy.policy = CFG_POLICY_SWEEP;
+  st->cache_policy.max_size = 0;
+  st->cache_policy.sweep_threshold = CFG_CACHE_SWEEP_THRESHOLD;
+  st->cache_policy.dead_sweep_threshold = CFG_CACHE_DEAD_SWEEP_THRESHOLD;
+  cfg_cache_apply_policy(&st->cm_cache, &st->cache_policy);
+  cfg_cache_apply_policy(&st->cfg_attr_cache, &st->cache_policy);
+  st->failed_qualnames = PySet_New(NULL);
+  st->lazy_pending = PyDict_New();
+  st->raisers = PyDict_New();
+  st->raisers_prune_at = CFG_RAISERS_PRUNE_AT;
+  st->build_scopes = PyList_New(0);
+  st->candidates = PyDict_New();
+  st->key_index = PyDict_New();
+  st->manifest = PyDict_New();
+  st->manifest_files = PyDict_New();
+  st->flags = PyDict_New();
+  st->pure_memo = PyDict_New();
+  st->pure_epoch = PyLong_FromLong(0);
+  st->qualname_cache = PyDict_New();
+  st->cm_decorators = PyDict_New();
+  st->cfg_attr_decorators = PyDict_New();
+  st->trace_names = PyList_New(0);
+  st->trace_name_ids = PyDict_New();
+  if (st->trace_names == NULL || st->trace_name_ids == NULL ||
+      st->failed_qualnames == NULL || st->lazy_pending == NULL ||
+      st->raisers == NULL || st->build_scopes == NULL ||
+      st->candidates == NULL || st->key_index == NULL ||
+      st->manifest == NULL || st->manifest_files == NULL || st->flags == NULL ||
+      st->pure_memo == NULL || st->pure_epoch == NULL ||
+      st->qualname_cache == NULL || st->cm_decorators == NULL ||
+      st->cfg_attr_decorators == NULL) {
+    return -1;
+  }
+  /* The generation dicts stay private; only the entries are exposed. */
+  Py_INCREF(st->cm_cache.exposed);
+  if (cfg_module_add(m, "_cm_cache", st->cm_cache.exposed) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->cfg_attr_cache.exposed);
+  if (cfg_module_add(m, "_cfg_attr_cache", st->cfg_attr_cache.exposed) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->failed_qualnames);
+  if (cfg_module_add(m, "_failed_qualnames", st->failed_qualnames) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->candidates);
+  if (cfg_module_add(m, "_candidates", st->candidates) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->build_scopes);
+  if (cfg_module_add(m, "_build_scopes", st->build_scopes) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->raisers);
+  if (cfg_module_add(m, "_raisers", st->raisers) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->flags);
+  if (cfg_module_add(m, "_flags", st->flags) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->pure_memo);
+  if (cfg_module_add(m, "_pure_memo", st->pure_memo) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->qualname_cache);
+  if (cfg_module_add(m, "_qualname_cache", st->qualname_cache) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->cm_decorators);
+  if (cfg_module_add(m, "_cm_decorators", st->cm_decorators) < 0) {
+    return -1;
+  }
+  Py_INCREF(st->cfg_attr_decorators);
+  if (cfg_module_add(m, "_cfg_attr_decorators", st->cfg_attr_decorators) < 0) {
+    return -1;
+  }
+  if (cfg_environ_init(st) < 0) {
+    return -1;
+  }
+  if (_debug_enabled() && cfg_trace_start(st, CFG_TRACE_DEFAULT_CAPACITY) < 0) {
+    return -1;
+  }
+  if (cfg_module_add(m, "_trace_event_names",
+                     cfg_names_tuple(cfg_trace_event_names, CFG_TRACE_EVENTS)) <
+          0 ||
+      cfg_module_add(m, "_trace_kind_names",
+                     cfg_names_tuple(cfg_trace_kind_names, CFG_KIND_COUNT)) <
+          0 ||
+      PyModule_AddStringConstant(m, "_trace_format", CFG_DECISION_FORMAT) < 0) {
+    return -1;
   }
 
   /* Grab the `weakref.ref` type for cache_get_live so it can tell weakref
    * cache values (true-condition winner functions) apart from strong ones
-   * (TypeErrorRaiser).  Held for the module lifetime. */
+   * (TypeErrorRaiser). */
   PyObject *wr_mod = PyImport_ImportModule("weakref");
   if (wr_mod == NULL) {
-    Py_DECREF(m);
-    return NULL;
+    return -1;
   }
-  CFG_weakref_ref_type = PyObject_GetAttrString(wr_mod, "ref");
+  st->weakref_ref_type = PyObject_GetAttrString(wr_mod, "ref");
   Py_DECREF(wr_mod);
-  if (CFG_weakref_ref_type == NULL) {
-    Py_DECREF(m);
-    return NULL;
+  if (st->weakref_ref_type == NULL) {
+    return -1;
+  }
+  PyObject *types_mod = PyImport_ImportModule("types");
+  if (types_mod == NULL) {
+    return -1;
+  }
+  st->function_type = PyObject_GetAttrString(types_mod, "FunctionType");
+  Py_DECREF(types_mod);
+  if (st->function_type == NULL ||
+      (st->str_code = PyUnicode_InternFromString("__code__")) == NULL ||
+      (st->str_module = PyUnicode_InternFromString("__module__")) == NULL ||
+      (st->str_name = PyUnicode_InternFromString("__name__")) == NULL ||
+      (st->str_qualname = PyUnicode_InternFromString("__qualname__")) == NULL ||
+      (st->str_condition = PyUnicode_InternFromString("condition")) == NULL ||
+      (st->str_decorators = PyUnicode_InternFromString("decorators")) == NULL ||
+      (st->str_depends_on = PyUnicode_InternFromString("depends_on")) == NULL ||
+      (st->str_lazy = PyUnicode_InternFromString("lazy")) == NULL ||
+      (st->str_pure = PyUnicode_InternFromString("pure")) == NULL ||
+      (st->str_locals = PyUnicode_InternFromString("<locals>")) == NULL ||
+      (st->str_f_back = PyUnicode_InternFromString("f_back")) == NULL ||
+      (st->str_f_code = PyUnicode_InternFromString("f_code")) == NULL ||
+      (st->str_co_name = PyUnicode_InternFromString("co_name")) == NULL ||
+      (st->str_co_flags = PyUnicode_InternFromString("co_flags")) == NULL) {
+    return -1;
   }
 
   /* Create global aliases for the cm function (callable heap objects so
-     cm._cache is settable) */
-  PyObject *cm_func = CfgCallable_new_wrapper(&cm_method_def);
+     cm._cache is settable).  The method-table entry "cm" is a plain
+     builtin; replace it with the callable heap object so `cfg.cm._cache`
+     works. */
+  PyObject *cm_func = CfgCallable_new_wrapper(m, &cm_method_def);
   if (cm_func == NULL) {
-    Py_DECREF(m);
-    return NULL;
+    return -1;
   }
-
-  if (PyModule_AddObject(m, "cfg", cm_func) < 0) {
+  /* Expose cm._cache (matches the pure-Python reference API) */
+  if (PyObject_SetAttrString(cm_func, "_cache", st->cm_cache.exposed) < 0) {
     Py_DECREF(cm_func);
-    Py_DECREF(m);
-    return NULL;
+    return -1;
   }
-
-  Py_INCREF(cm_func);
-  if (PyModule_AddObject(m, "if_", cm_func) < 0) {
-    Py_DECREF(cm_func);
-    Py_DECREF(m);
-    return NULL;
+  /* cfg.env / cfg.flag / cfg.set_flags (native conditions) */
+  for (PyMethodDef *def = cfg_condition_methods; def->ml_name != NULL; def++) {
+    PyObject *meth = PyCFunction_NewEx(def, m, NULL);
+    if (meth == NULL ||
+        PyObject_SetAttrString(cm_func, def->ml_name, meth) < 0) {
+      Py_XDECREF(meth);
+      Py_DECREF(cm_func);
+      return -1;
+    }
+    Py_DECREF(meth);
   }
-
-  /* Expose cm._cache (matches the pure-Python reference API) */
-  if (PyObject_SetAttrString(cm_func, "_cache", _cm_cache) < 0) {
-    Py_DECREF(m);
-    return NULL;
+  if (cfg_module_add(m, "cfg", cm_func) < 0) {
+    return -1;
   }
-  /* The method-table entry "cm" is a plain builtin; replace it with the
-     callable heap object so `cfg.cm._cache` works. */
   Py_INCREF(cm_func);
-  if (PyModule_AddObject(m, "cm", cm_func) < 0) {
-    Py_DECREF(cm_func);
-    Py_DECREF(m);
-    return NULL;
+  if (cfg_module_add(m, "if_", cm_func) < 0) {
+    return -1;
+  }
+  Py_INCREF(cm_func);
+  if (cfg_module_add(m, "cm", cm_func) < 0) {
+    return -1;
   }
 
   /* Create and add cfg_attr function */
-  PyObject *cfg_attr_func = CfgCallable_new_wrapper(&cfg_attr_method_def);
+  PyObject *cfg_attr_func = CfgCallable_new_wrapper(m, &cfg_attr_method_def);
   if (cfg_attr_func == NULL) {
-    Py_DECREF(m);
-    return NULL;
+    return -1;
   }
-
-  if (PyModule_AddObject(m, "cfg_attr", cfg_attr_func) < 0) {
+  /* Expose cfg_attr._cache (matches the pure-Python reference API) */
+  if (PyObject_SetAttrString(cfg_attr_func, "_cache",
+                             st->cfg_attr_cache.exposed) < 0) {
     Py_DECREF(cfg_attr_func);
-    Py_DECREF(m);
-    return NULL;
+    return -1;
+  }
+  if (cfg_module_add(m, "cfg_attr", cfg_attr_func) < 0) {
+    return -1;
   }
 
-  /* Expose cfg_attr._cache (matches the pure-Python reference API) */
-  if (PyObject_SetAttrString(cfg_attr_func, "_cache", _cfg_attr_cache) < 0) {
-    Py_DECREF(m);
-    return NULL;
+  return 0;
+}
+
+static int cfg_module_traverse(PyObject *m, visitproc visit, void *arg) {
+  cfg_state *st = get_cfg_state(m);
+  if (st == NULL) {
+    return 0;
   }
-  Py_INCREF(cfg_attr_func);
-  if (PyModule_AddObject(m, "cfg_attr", cfg_attr_func) < 0) {
-    Py_DECREF(cfg_attr_func);
-    Py_DECREF(m);
-    return NULL;
+  if (cfg_cache_traverse(&st->cm_cache, visit, arg) < 0 ||
+      cfg_cache_traverse(&st->cfg_attr_cache, visit, arg) < 0) {
+    return -1;
+  }
+  Py_VISIT(st->failed_qualnames);
+  Py_VISIT(st->weakref_ref_type);
+  Py_VISIT(st->function_type);
+  Py_VISIT(st->qualname_cache);
+  Py_VISIT(st->TypeErrorRaiserType);
+  Py_VISIT(st->CfgCallableType);
+  Py_VISIT(st->LazySelectorType);
+  Py_VISIT(st->lazy_pending);
+  Py_VISIT(st->raisers);
+  /* Raisers are not GC-tracked: report the reference each kept raiser
+   * holds to its type, or the type (and this module, through the type's
+   * `_cfg_module`) would look referenced from outside. */
+  if (st->raisers != NULL) {
+    Py_ssize_t pos = 0;
+    PyObject *key, *raiser;
+    while (PyDict_Next(st->raisers, &pos, &key, &raiser)) {
+      Py_VISIT(Py_TYPE(raiser));
+    }
   }
+  Py_VISIT(st->build_scopes);
+  Py_VISIT(st->CandidatesType);
+  Py_VISIT(st->candidates);
+  Py_VISIT(st->key_index);
+  Py_VISIT(st->manifest);
+  Py_VISIT(st->manifest_files);
+  Py_VISIT(st->manifest_lookup);
+  Py_VISIT(st->manifest_check);
+  Py_VISIT(st->ConditionType);
+  Py_VISIT(st->environ);
+  Py_VISIT(st->environ_data);
+  Py_VISIT(st->environ_encodekey);
+  Py_VISIT(st->environ_encodevalue);
+  Py_VISIT(st->flags);
+  Py_VISIT(st->pure_memo);
+  Py_VISIT(st->cm_decorators);
+  Py_VISIT(st->cfg_attr_decorators);
+  Py_VISIT(st->trace_names);
+  Py_VISIT(st->trace_name_ids);
+  Py_VISIT(st->DecisionLogType);
+  Py_VISIT(st->CacheViewType);
+  return 0;
+}
 
-  /* Register the CfgCallable heap type */
-  if (PyType_Ready(&CfgCallableType) < 0) {
-    Py_DECREF(m);
-    return NULL;
+static int cfg_module_clear(PyObject *m) {
+  cfg_state *st = get_cfg_state(m);
+  if (st == NULL) {
+    return 0;
   }
-  Py_INCREF(&CfgCallableType);
-  if (PyModule_AddObject(m, "_CfgCallable", (PyObject *)&CfgCallableType) < 0) {
-    Py_DECREF(&CfgCallableType);
-    Py_DECREF(m);
-    return NULL;
+  cfg_cache_clear(&st->cm_cache);
+  cfg_cache_clear(&st->cfg_attr_cache);
+  Py_CLEAR(st->failed_qualnames);
+  Py_CLEAR(st->weakref_ref_type);
+  Py_CLEAR(st->function_type);
+  Py_CLEAR(st->qualname_cache);
+  Py_CLEAR(st->str_code);
+  Py_CLEAR(st->str_module);
+  Py_CLEAR(st->str_name);
+  Py_CLEAR(st->str_qualname);
+  Py_CLEAR(st->str_condition);
+  Py_CLEAR(st->str_decorators);
+  Py_CLEAR(st->str_depends_on);
+  Py_CLEAR(st->str_lazy);
+  Py_CLEAR(st->str_pure);
+  Py_CLEAR(st->str_locals);
+  Py_CLEAR(st->str_f_back);
+  Py_CLEAR(st->str_f_code);
+  Py_CLEAR(st->str_co_name);
+  Py_CLEAR(st->str_co_flags);
+  Py_CLEAR(st->TypeErrorRaiserType);
+  Py_CLEAR(st->CfgCallableType);
+  Py_CLEAR(st->LazySelectorType);
+  Py_CLEAR(st->lazy_pending);
+  Py_CLEAR(st->raisers);
+  Py_CLEAR(st->build_scopes);
+  Py_CLEAR(st->CandidatesType);
+  Py_CLEAR(st->candidates);
+  Py_CLEAR(st->key_index);
+  Py_CLEAR(st->manifest);
+  Py_CLEAR(st->manifest_files);
+  Py_CLEAR(st->manifest_lookup);
+  Py_CLEAR(st->manifest_check);
+  Py_CLEAR(st->ConditionType);
+  Py_CLEAR(st->environ);
+  Py_CLEAR(st->environ_data);
+  Py_CLEAR(st->environ_encodekey);
+  Py_CLEAR(st->environ_encodevalue);
+  Py_CLEAR(st->flags);
+  Py_CLEAR(st->pure_memo);
+  Py_CLEAR(st->cm_decorators);
+  Py_CLEAR(st->cfg_attr_decorators);
+  Py_CLEAR(st->pure_epoch);
+  cfg_trace_clear_state(st);
+  Py_CLEAR(st->DecisionLogType);
+  Py_CLEAR(st->CacheViewType);
+  return 0;
+}
+
+static void cfg_module_free(void *m) { cfg_module_clear((PyObject *)m); }
+
+/* Module slots.  Multi-phase init (PEP 489): PyInit__c only returns the
+ * definition and every module object gets its own cfg_state, which is what
+ * makes the extension importable in sub-interpreters.
+ *
+ * The wheel is a cp39-abi3 build compiled against the 3.9 headers, which
+ * predate Py_mod_multiple_interpreters (3.12), and a runtime rejects slot
+ * IDs it does not know ("module uses unknown slot ID").  So the slot is
+ * declared by number and only handed to runtimes that understand it:
+ * PyInit__c picks the definition from the running interpreter's version.
+ * Without the slot, 3.12+ refuses the import in an interpreter with its own
+ * GIL (PEP 684).
+ *
+ * Py_mod_gil (3.13) follows the same scheme: declaring Py_MOD_GIL_NOT_USED
+ * tells a free-threaded runtime not to re-enable the GIL on import.  The
+ * caches are sharded behind per-shard critical sections on those builds
+ * (see CFG_CACHE_SHARDS) and everything else is per-call or immutable. */
+#define CFG_MOD_MULTIPLE_INTERPRETERS 3 /* Py_mod_multiple_interpreters */
+#define CFG_MOD_PER_INTERPRETER_GIL_SUPPORTED ((void *)2)
+#define CFG_MOD_GIL 4 /* Py_mod_gil */
+#define CFG_MOD_GIL_NOT_USED ((void *)1)
+
+static PyModuleDef_Slot cfg_module_slots[] = {
+    {Py_mod_exec, (void *)cfg_module_exec},
+    {0, NULL},
+};
+
+static PyModuleDef_Slot cfg_module_slots_312[] = {
+    {Py_mod_exec, (void *)cfg_module_exec},
+    {CFG_MOD_MULTIPLE_INTERPRETERS, CFG_MOD_PER_INTERPRETER_GIL_SUPPORTED},
+    {0, NULL},
+};
+
+static PyModuleDef_Slot cfg_module_slots_313[] = {
+    {Py_mod_exec, (void *)cfg_module_exec},
+    {CFG_MOD_MULTIPLE_INTERPRETERS, CFG_MOD_PER_INTERPRETER_GIL_SUPPORTED},
+    {CFG_MOD_GIL, CFG_MOD_GIL_NOT_USED},
+    {0, NULL},
+};
+
+/* Module definition (runtimes before 3.12) */
+static struct PyModuleDef conditionalmodule = {
+    PyModuleDef_HEAD_INIT,
+    "_c",                                  /* m_name */
+    "Conditional method decorator module", /* m_doc */
+    sizeof(cfg_state),                     /* m_size */
+    ConditionalMethodMethods,              /* m_methods */
+    cfg_module_slots,                      /* m_slots */
+    cfg_module_traverse,                   /* m_traverse */
+    cfg_module_clear,                      /* m_clear */
+    cfg_module_free                        /* m_free */
+};
+
+/* Module definition (3.12: also declares per-interpreter GIL support) */
+static struct PyModuleDef conditionalmodule_312 = {
+    PyModuleDef_HEAD_INIT,
+    "_c",                                  /* m_name */
+    "Conditional method decorator module", /* m_doc */
+    sizeof(cfg_state),                     /* m_size */
+    ConditionalMethodMethods,              /* m_methods */
+    cfg_module_slots_312,                  /* m_slots */
+    cfg_module_traverse,                   /* m_traverse */
+    cfg_module_clear,                      /* m_clear */
+    cfg_module_free                        /* m_free */
+};
+
+/* Module definition (3.13+: also declares that it runs without the GIL) */
+static struct PyModuleDef conditionalmodule_313 = {
+    PyModuleDef_HEAD_INIT,
+    "_c",                                  /* m_name */
+    "Conditional method decorator module", /* m_doc */
+    sizeof(cfg_state),                     /* m_size */
+    ConditionalMethodMethods,              /* m_methods */
+    cfg_module_slots_313,                  /* m_slots */
+    cfg_module_traverse,                   /* m_traverse */
+    cfg_module_clear,                      /* m_clear */
+    cfg_module_free                        /* m_free */
+};
+
+/* Minor version of the running 3.x interpreter.  Py_Version is 3.11+ only,
+ * so parse the (stable-ABI) version string instead. */
+static int cfg_runtime_minor(void) {
+  int major = 0, minor = 0;
+  if (sscanf(Py_GetVersion(), "%d.%d", &major, &minor) != 2) {
+    return 0;
   }
+  return major > 3 ? INT_MAX : minor;
+}
 
-  return m;
-}
\ No newline at end of file
+/* Module initialization function */
+PyMODINIT_FUNC PyInit__c(void) {
+  CFG_ALLOC_FAIL_GUARD();
+  int minor = cfg_runtime_minor();
+  if (minor >= 13) {
+    return PyModuleDef_Init(&conditionalmodule_313);
+  }
+  return PyModuleDef_Init(minor == 12 ? &conditionalmodule_312
+                                      : &conditionalmodule);
+}
@@ -0,0 +1,559 @@
+"""Import hook that drops statically losing ``@cfg`` candidates.
+
+A profile declares the values of the names conditions compare against::
+
+    import conditional_method
+
+    conditional_method.install_import_hook(
+        profile={"ENV": "production", "settings.REGION": "eu"},
+        packages=["myapp"],
+    )
+    import myapp
+
+Modules imported after that are rewritten before they are compiled: when
+every candidate of a name has a condition the profile resolves (literals,
+profile names, comparisons between them, ``not``/``and``/``or``), the
+losing candidates are removed from the module and the winner loses its
+``@cfg`` decorator (a ``@cfg_attr`` winner gets the decorators it names
+instead), so the dead variants are never compiled, built or decorated.
+Everything else is left for the extension to decide at import as usual:
+
+- conditions that read anything the profile does not declare (callables,
+  native ``cfg.env``/``cfg.flag`` conditions, which read their inputs when
+  they are evaluated, names bound in an enclosing function or class);
+- candidates with ``lazy``, ``depends_on`` or ``pure``, which ask for a
+  decision later than the import;
+- names also bound by anything other than their ``@cfg`` candidates, or
+  whose candidates are all false (the raiser is kept, and so is its error).
+
+The profile is trusted: a rewritten module behaves as the profile says,
+whatever the names it declares hold at run time.
+
+The rewritten bytecode is cached next to the regular one, in
+``__pycache__/<module>.<tag>.opt-cfg<hash>.pyc``, where the hash covers the
+profile, so each profile gets its own cache and the regular ``.pyc`` files
+are left alone.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import marshal
+import operator
+import sys
+import types
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+#: Changes whenever the rewrite does, so bytecode cached by an older
+#: rewrite is not picked up.
+REWRITE_VERSION = 2
+
+DECORATORS = frozenset({"cfg", "cm", "if_"})
+ATTR_DECORATORS = frozenset({"cfg_attr"})
+LITERALS = (bool, int, float, str, bytes, type(None))
+
+_UNKNOWN = object()
+_CAPTURES = tuple(
+    getattr(ast, name)
+    for name in ("MatchAs", "MatchStar", "MatchMapping")
+    if hasattr(ast, name)
+)
+_COMPARE: dict[type[ast.cmpop], Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+class Eliminated(NamedTuple):
+    """A candidate removed from a module.
+
+    Attributes:
+        qualname: the candidate's qualname within its module.
+        lineno: the first line of the candidate, decorators included.
+        end_lineno: its last line.
+    """
+
+    qualname: str
+    lineno: int
+    end_lineno: int
+
+
+def _dotted(node: ast.expr) -> str | None:
+    """``"a.b.c"`` for a ``Name`` or a chain of attributes on one."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _binds(node: ast.AST) -> Iterator[str]:
+    """The names `node` itself binds."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        yield node.name
+    elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+        yield node.id
+    elif isinstance(node, ast.alias):
+        yield (node.asname or node.name).partition(".")[0]
+    elif isinstance(node, (ast.Global, ast.Nonlocal)):
+        yield from node.names
+    elif isinstance(node, ast.ExceptHandler) and node.name:
+        yield node.name
+    elif isinstance(node, _CAPTURES):
+        # match patterns (3.10+): ``case x``, ``case [*rest]``,
+        # ``case {**rest}``.
+        captured = getattr(node, "name", None) or getattr(node, "rest", None)
+        if captured:
+            yield captured
+
+
+def _bindings(nodes: Iterable[ast.AST]) -> Counter[str]:
+    """How many times each name is bound by `nodes`, in their own scope
+    (nested functions, classes, lambdas and comprehensions are not
+    entered)."""
+    counts: Counter[str] = Counter()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        counts.update(_binds(node))
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            stack.extend(node.decorator_list)
+        elif not isinstance(
+            node,
+            (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp),
+        ):
+            stack.extend(ast.iter_child_nodes(node))
+    return counts
+
+
+def _blocks(stmt: ast.stmt) -> Iterator[list[ast.stmt]]:
+    """The statement lists of a compound statement."""
+    for field in ("body", "orelse", "finalbody"):
+        block = getattr(stmt, field, None)
+        if block:
+            yield block
+    for clause in (*getattr(stmt, "handlers", ()), *getattr(stmt, "cases", ())):
+        yield clause.body
+
+
+def _parameters(node: ast.FunctionDef | ast.AsyncFunctionDef) -> set[str]:
+    args = node.args
+    names = {a.arg for a in (*args.posonlyargs, *args.args, *args.kwonlyargs)}
+    names.update(a.arg for a in (args.vararg, args.kwarg) if a is not None)
+    return names
+
+
+class Undecorated(NamedTuple):
+    """A winner whose ``@cfg`` / ``@cfg_attr`` decorator was removed.
+
+    Attributes:
+        node: the winner's definition.
+        decorator: the removed decorator.
+        replacement: the decorators put in its place (those a ``cfg_attr``
+            winner names; empty for ``cfg``).
+    """
+
+    node: ast.FunctionDef | ast.AsyncFunctionDef
+    decorator: ast.expr
+    replacement: list[ast.expr]
+
+
+if TYPE_CHECKING:
+    _Candidate = tuple[ast.FunctionDef | ast.AsyncFunctionDef, Any, list[ast.expr]]
+
+
+class _Specializer:
+    def __init__(self, profile: Mapping[str, Any], tree: ast.Module) -> None:
+        self.profile = profile
+        self.eliminated: list[Eliminated] = []
+        self.undecorated: list[Undecorated] = []
+        self.eliminated_nodes: list[ast.FunctionDef | ast.AsyncFunctionDef] = []
+        # The names `cfg` and `cfg_attr` are reachable under: imported
+        # directly, or as attributes of the imported package, and not bound
+        # to anything else anywhere in the module.
+        self.direct: dict[str, str] = {}
+        self.packages: set[str] = set()
+        ours: Counter[str] = Counter()
+        bound: Counter[str] = Counter()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module == "conditional_method":
+                for alias in node.names:
+                    if alias.name == "*":
+                        for name in DECORATORS | ATTR_DECORATORS:
+                            self.direct[name] = name
+                            ours[name] += 1
+                            bound[name] += 1
+                    elif alias.name in DECORATORS | ATTR_DECORATORS:
+                        self.direct[alias.asname or alias.name] = alias.name
+                        ours[alias.asname or alias.name] += 1
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name == "conditional_method":
+                        self.packages.add(alias.asname or alias.name)
+                        ours[alias.asname or alias.name] += 1
+            elif isinstance(node, ast.arg):
+                bound[node.arg] += 1
+            bound.update(_binds(node))
+        self.direct = {
+            name: decorator
+            for name, decorator in self.direct.items()
+            if bound[name] == ours[name]
+        }
+        self.packages = {name for name in self.packages if bound[name] == ours[name]}
+
+    def decorator(
+        self, decorator: ast.expr
+    ) -> tuple[str, ast.expr, list[ast.expr]] | None:
+        """``("cfg", condition, [])`` for a ``@cfg(condition=...)``
+        decorator, ``("cfg_attr", condition, decorators)`` for a
+        ``@cfg_attr(condition=..., decorators=[...])`` one, and None for any
+        other decorator (or one with other arguments)."""
+        if not isinstance(decorator, ast.Call) or decorator.args:
+            return None
+        func = decorator.func
+        name = None
+        if isinstance(func, ast.Name):
+            name = self.direct.get(func.id)
+        elif (
+            isinstance(func, ast.Attribute)
+            and isinstance(func.value, ast.Name)
+            and func.value.id in self.packages
+        ):
+            name = func.attr
+        if name in DECORATORS:
+            kind, allowed = "cfg", {"condition"}
+        elif name in ATTR_DECORATORS:
+            kind, allowed = "cfg_attr", {"condition", "decorators"}
+        else:
+            return None
+        keywords = {keyword.arg: keyword.value for keyword in decorator.keywords}
+        if "condition" not in keywords or not keywords.keys() <= allowed:
+            return None
+        if len(keywords) != len(decorator.keywords):
+            return None
+        decorators = keywords.get("decorators")
+        if decorators is None:
+            return kind, keywords["condition"], []
+        if not isinstance(decorators, (ast.List, ast.Tuple)) or any(
+            isinstance(item, ast.Starred) for item in decorators.elts
+        ):
+            return None
+        return kind, keywords["condition"], list(decorators.elts)
+
+    def evaluate(self, node: ast.expr, shadowed: set[str]) -> Any:
+        """The value of `node` under the profile, or ``_UNKNOWN``."""
+        if isinstance(node, ast.Constant):
+            return node.value if isinstance(node.value, LITERALS) else _UNKNOWN
+        name = _dotted(node)
+        if name is not None:
+            if name.partition(".")[0] in shadowed or name not in self.profile:
+                return _UNKNOWN
+            return self.profile[name]
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            items = [self.evaluate(item, shadowed) for item in node.elts]
+            return _UNKNOWN if _UNKNOWN in items else tuple(items)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            value = self.evaluate(node.operand, shadowed)
+            return value if value is _UNKNOWN else not value
+        if isinstance(node, ast.BoolOp):
+            # Left to right, stopping where Python would.
+            stop = isinstance(node.op, ast.Or)
+            for operand in node.values:
+                value = self.evaluate(operand, shadowed)
+                if value is _UNKNOWN or bool(value) is stop:
+                    return value
+            return value
+        if isinstance(node, ast.Compare):
+            left = self.evaluate(node.left, shadowed)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self.evaluate(comparator, shadowed)
+                if left is _UNKNOWN or right is _UNKNOWN:
+                    return _UNKNOWN
+                try:
+                    if not _COMPARE[type(op)](left, right):
+                        return False
+                except TypeError:
+                    return _UNKNOWN
+                left = right
+            return True
+        return _UNKNOWN
+
+    def body(self, body: list[ast.stmt], prefix: str, shadowed: set[str]) -> None:
+        """Specialize the scope `body`, then the scopes nested in it."""
+        self.nested(body, prefix, shadowed)
+        groups: dict[tuple[str, str], list[_Candidate]] = {}
+        for stmt in body:
+            if (
+                isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and stmt.decorator_list
+            ):
+                found = self.decorator(stmt.decorator_list[0])
+                if found is not None:
+                    kind, condition, decorators = found
+                    value = self.evaluate(condition, shadowed)
+                    candidate = (stmt, value, decorators)
+                    groups.setdefault((kind, stmt.name), []).append(candidate)
+        if not groups:
+            return
+        bound = _bindings(body)
+        dropped = set()
+        for (_, name), candidates in groups.items():
+            # A name with both cfg and cfg_attr candidates is bound more
+            # times than either group has candidates, and is left alone.
+            if bound[name] != len(candidates):
+                continue
+            if any(value is _UNKNOWN for _, value, _ in candidates):
+                continue
+            winners = [(stmt, decos) for stmt, value, decos in candidates if value]
+            if not winners:
+                continue
+            winner, decorators = winners[-1]
+            removed = winner.decorator_list[0]
+            winner.decorator_list[0:1] = decorators
+            self.undecorated.append(Undecorated(winner, removed, decorators))
+            for stmt, _, _ in candidates:
+                if stmt is not winner:
+                    dropped.add(id(stmt))
+                    self.eliminated_nodes.append(stmt)
+                    start = min(d.lineno for d in [stmt, *stmt.decorator_list])
+                    end = stmt.end_lineno or stmt.lineno
+                    self.eliminated.append(Eliminated(prefix + name, start, end))
+        body[:] = [stmt for stmt in body if id(stmt) not in dropped]
+
+    def nested(self, body: list[ast.stmt], prefix: str, shadowed: set[str]) -> None:
+        for stmt in body:
+            if isinstance(stmt, ast.ClassDef):
+                inner = shadowed | set(_bindings(stmt.body))
+                self.body(stmt.body, f"{prefix}{stmt.name}.", inner)
+            elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                inner = shadowed | _parameters(stmt) | set(_bindings(stmt.body))
+                self.body(stmt.body, f"{prefix}{stmt.name}.<locals>.", inner)
+            else:
+                # Scopes defined in if/for/while/try/with/match blocks (whose
+                # own candidates are left alone).
+                for block in _blocks(stmt):
+                    self.nested(block, prefix, shadowed)
+
+
+def specialize(tree: ast.Module, profile: Mapping[str, Any]) -> list[Eliminated]:
+    """Remove from `tree`, in place, the ``@cfg`` candidates that lose under
+    `profile`, and return them in the order they were found.
+
+    `profile` maps names (``"ENV"``) and dotted names (``"settings.ENV"``)
+    to the literal values they hold.
+    """
+    specializer = _Specializer(profile, tree)
+    specializer.body(tree.body, "", set())
+    return specializer.eliminated
+
+
+def _starts_line(lines: list[str], decorator: ast.expr) -> bool:
+    """Whether `decorator` is written on lines of its own, from its ``@``."""
+    # AST column offsets count UTF-8 bytes.
+    first = lines[decorator.lineno - 1].encode()
+    last = lines[(decorator.end_lineno or decorator.lineno) - 1].encode()
+    rest = last[decorator.end_col_offset :].strip()
+    return first[: decorator.col_offset].strip() == b"@" and (
+        not rest or rest.startswith(b"#")
+    )
+
+
+def specialize_source(
+    source: str, profile: Mapping[str, Any], filename: str = "<unknown>"
+) -> tuple[str, list[Eliminated]]:
+    """The text of `source` specialized under `profile`, and the candidates
+    removed from it.
+
+    Unlike compiling the tree :func:`specialize` rewrites, this edits the
+    source lines, so the comments and layout of everything else are kept:
+    removed candidates lose their lines, and a winner's ``@cfg`` line is
+    dropped (or, for ``@cfg_attr``, replaced by one line per decorator it
+    names).  A module whose decorators do not sit on lines of their own is
+    unparsed from the specialized tree instead.  Raises :class:`SyntaxError`
+    for a source that does not parse.
+    """
+    tree = ast.parse(source, filename)
+    specializer = _Specializer(profile, tree)
+    specializer.body(tree.body, "", set())
+    if not specializer.eliminated:
+        return source, []
+    lines = source.splitlines(keepends=True)
+    decorators = [item.decorator for item in specializer.undecorated]
+    for node in specializer.eliminated_nodes:
+        decorators.extend(node.decorator_list)
+    if not all(_starts_line(lines, decorator) for decorator in decorators):
+        return ast.unparse(tree) + "\n", specializer.eliminated
+    edits: list[tuple[int, int, list[str]]] = [
+        (e.lineno - 1, e.end_lineno, []) for e in specializer.eliminated
+    ]
+    for item in specializer.undecorated:
+        start = item.decorator.lineno
+        line = lines[start - 1]
+        indent = line[: len(line) - len(line.lstrip())]
+        replacement = [
+            f"{indent}@{ast.get_source_segment(source, expr)}\n"
+            for expr in item.replacement
+        ]
+        edits.append((start - 1, item.decorator.end_lineno or start, replacement))
+    for start, end, replacement in sorted(edits, reverse=True):
+        lines[start:end] = replacement
+    return "".join(lines), specializer.eliminated
+
+
+def profile_hash(profile: Mapping[str, Any]) -> str:
+    """A digest of `profile` and the rewrite, for naming cached bytecode."""
+    for name, value in profile.items():
+        if not isinstance(name, str) or not isinstance(value, LITERALS):
+            raise TypeError(
+                "profile entries must map names to bool, int, float, str, "
+                f"bytes or None, not {name!r}: {value!r}"
+            )
+    key = repr((REWRITE_VERSION, sys.flags.optimize, sorted(profile.items())))
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+class SpecializingLoader(importlib.machinery.SourceFileLoader):
+    """Source loader that compiles the specialized module and caches it
+    under the profile's own bytecode name.  A module it does not specialize
+    keeps the regular bytecode, and the regular ``__cached__``."""
+
+    def __init__(self, fullname: str, path: str, finder: SpecializingFinder) -> None:
+        super().__init__(fullname, path)
+        self.finder = finder
+        #: The profile's bytecode path, once get_code used it.
+        self.specialized_cache: str | None = None
+
+    def exec_module(self, module: types.ModuleType) -> None:
+        code = self.get_code(module.__name__)
+        if code is None:
+            raise ImportError(f"cannot load {module.__name__!r}", name=module.__name__)
+        spec = module.__spec__
+        if (
+            self.specialized_cache is not None
+            and spec is not None
+            and spec.cached is not None
+        ):
+            spec.cached = self.specialized_cache
+            module.__dict__["__cached__"] = spec.cached
+        exec(code, module.__dict__)
+
+    def get_code(self, fullname: str) -> types.CodeType | None:
+        source_path = self.get_filename(fullname)
+        cache_path = importlib.util.cache_from_source(
+            source_path, optimization=self.finder.tag
+        )
+        stats = self.path_stats(source_path)
+        mtime = int(stats["mtime"]) & 0xFFFFFFFF
+        size = stats["size"] & 0xFFFFFFFF
+        header = (
+            importlib.util.MAGIC_NUMBER
+            + (0).to_bytes(4, "little")
+            + mtime.to_bytes(4, "little")
+            + size.to_bytes(4, "little")
+        )
+        try:
+            data = self.get_data(cache_path)
+        except OSError:
+            pass
+        else:
+            if data[:16] == header:
+                self.specialized_cache = cache_path
+                code: types.CodeType = marshal.loads(memoryview(data)[16:])
+                return code
+        source = self.get_data(source_path)
+        if b"conditional_method" not in source:
+            # Nothing to specialize: the regular bytecode will do.
+            return super().get_code(fullname)
+        tree = ast.parse(source, source_path)
+        specialize(tree, self.finder.profile)
+        code = compile(tree, source_path, "exec", dont_inherit=True)
+        if not sys.dont_write_bytecode:
+            self.set_data(cache_path, header + marshal.dumps(code))
+        self.specialized_cache = cache_path
+        return code
+
+
+class SpecializingFinder(importlib.abc.MetaPathFinder):
+    """Meta path finder that hands the source modules of `packages` (every
+    source module when None) to :class:`SpecializingLoader`."""
+
+    def __init__(
+        self, profile: Mapping[str, Any], packages: Iterable[str] | None = None
+    ) -> None:
+        self.profile = dict(profile)
+        self.tag = "cfg" + profile_hash(self.profile)
+        self.packages = None if packages is None else tuple(packages)
+
+    def wanted(self, fullname: str) -> bool:
+        if fullname.partition(".")[0] == "conditional_method":
+            return False
+        if self.packages is None:
+            return True
+        return any(
+            fullname == package or fullname.startswith(package + ".")
+            for package in self.packages
+        )
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Sequence[str] | None = None,
+        target: types.ModuleType | None = None,
+    ) -> importlib.machinery.ModuleSpec | None:
+        if not self.wanted(fullname):
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path, target)
+        if (
+            spec is None
+            or spec.origin is None
+            or type(spec.loader) is not importlib.machinery.SourceFileLoader
+        ):
+            return spec
+        # spec.cached names the profile's bytecode only once the loader has
+        # specialized the module (see SpecializingLoader.exec_module).
+        spec.loader = SpecializingLoader(fullname, spec.origin, self)
+        return spec
+
+
+def install_import_hook(
+    profile: Mapping[str, Any], *, packages: Iterable[str] | None = None
+) -> SpecializingFinder:
+    """Specialize the modules imported from now on under `profile`.
+
+    `profile` maps names and dotted names to the literal values conditions
+    compare them against.  Only the modules of `packages` (and their
+    submodules) are specialized when given; otherwise every module loaded
+    from source is read for ``@cfg`` candidates.  Installing again replaces
+    the previous hook; modules already imported are not touched.
+    """
+    finder = SpecializingFinder(profile, packages)
+    uninstall_import_hook()
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def uninstall_import_hook() -> bool:
+    """Remove the hook :func:`install_import_hook` installed, if any, and
+    return whether there was one."""
+    for finder in sys.meta_path:
+        if isinstance(finder, SpecializingFinder):
+            sys.meta_path.remove(finder)
+            return True
+    return False
@@ -0,0 +1,279 @@
+"""Import-time profile of ``@cfg`` / ``@cfg_attr`` decorations.
+
+Reports how much of an import is spent deciding and applying decorations,
+in a format modelled on ``python -X importtime``::
+
+    python -m conditional_method.importtime [-n TOP] myapp [other ...]
+
+or, around any block::
+
+    from conditional_method import profile_imports
+
+    with profile_imports() as profile:
+        import myapp
+    profile.report()
+
+The times come from the extension's decision trace (see
+:mod:`conditional_method.trace`), which the decoration paths fill from C:
+for each decoration the time spent in the whole decoration, in its
+condition, and, for ``cfg_attr``, in the decorator chain it applied.  Only
+decorations that run inside the block are seen, so modules imported before
+it are not profiled again.
+
+The report has four sections:
+
+- ``cfg decorations``: per module, the time spent in decorations in that
+  module (``self``) and in it and its submodules (``cumulative``), with
+  the number of decorations and of raisers among them.
+- ``cfg conditions``: the slowest conditions.
+- ``cfg_attr chains``: the decorator chains that took longest, per
+  qualname.
+- ``cfg total``: the totals.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NamedTuple, TextIO
+
+from . import trace
+from .trace import TraceEvent
+
+DEFAULT_CAPACITY = 1 << 16
+DEFAULT_TOP = 10
+
+RAISER_EVENTS = frozenset({"cm.raiser", "cfg_attr.raiser"})
+
+
+class ModuleTime(NamedTuple):
+    """Decoration time spent in one module.
+
+    Attributes:
+        module: the module's name.
+        self_ns: time spent in the module's own decorations, in nanoseconds.
+        cumulative_ns: the same for the module and its submodules.
+        decorations: how many decorations the module made.
+        raisers: how many of them installed a raiser.
+    """
+
+    module: str
+    self_ns: int
+    cumulative_ns: int
+    decorations: int
+    raisers: int
+
+
+class ChainTime(NamedTuple):
+    """Time spent in the decorators ``cfg_attr`` applied for one qualname.
+
+    Attributes:
+        qualname: the ``"module.qualname"`` the decorators were applied to.
+        chain_ns: total time spent in the decorators, in nanoseconds.
+        chains: how many times a chain was applied for the name.
+    """
+
+    qualname: str
+    chain_ns: int
+    chains: int
+
+
+def _module_of(qualname: str) -> str:
+    """The longest imported module `qualname` ("module.qualname") is in."""
+    head = qualname
+    while "." in head:
+        head = head.rpartition(".")[0]
+        if head in sys.modules:
+            return head
+    return qualname.rpartition(".")[0]
+
+
+class ImportProfile:
+    """The decorations recorded by :func:`profile_imports`.
+
+    Attributes:
+        events: the decisions made in the block, oldest first.
+        complete: False when the trace ring overflowed and the oldest
+            decisions of the block were lost (profile again with a larger
+            `capacity`).
+    """
+
+    def __init__(self) -> None:
+        self.events: list[TraceEvent] = []
+        self.complete = True
+
+    @property
+    def decorations(self) -> list[TraceEvent]:
+        """The decisions that were decorations (not ``reselect`` rebinds)."""
+        return [event for event in self.events if event.event != "reselect.rebind"]
+
+    @property
+    def total_ns(self) -> int:
+        """Time spent in decorations, in nanoseconds."""
+        return sum(event.total_ns for event in self.decorations)
+
+    @property
+    def raisers(self) -> int:
+        """How many decorations installed a raiser."""
+        return sum(event.event in RAISER_EVENTS for event in self.events)
+
+    def modules(self) -> list[ModuleTime]:
+        """Decoration time per module, parents before their submodules.
+
+        Packages that only decorate through their submodules are listed
+        too, with their cumulative time.
+        """
+        own: dict[str, list[int]] = {}
+        for event in self.decorations:
+            module = _module_of(event.qualname or "")
+            totals = own.setdefault(module, [0, 0, 0])
+            totals[0] += event.total_ns
+            totals[1] += 1
+            totals[2] += event.event in RAISER_EVENTS
+        names = set(own)
+        for module in own:
+            parts = module.split(".")
+            names.update(".".join(parts[:i]) for i in range(1, len(parts)))
+        rows = []
+        for name in sorted(names, key=lambda name: name.split(".")):
+            self_ns, decorations, raisers = own.get(name, (0, 0, 0))
+            cumulative_ns = sum(
+                totals[0]
+                for module, totals in own.items()
+                if module == name or module.startswith(name + ".")
+            )
+            rows.append(ModuleTime(name, self_ns, cumulative_ns, decorations, raisers))
+        return rows
+
+    def conditions(self, top: int = DEFAULT_TOP) -> list[TraceEvent]:
+        """The `top` decisions whose condition took longest, slowest first
+        (bools and other static conditions are left out)."""
+        timed = [event for event in self.decorations if event.kind != "static"]
+        return sorted(timed, key=lambda event: event.cost_ns, reverse=True)[:top]
+
+    def chains(self, top: int = DEFAULT_TOP) -> list[ChainTime]:
+        """The `top` qualnames whose ``cfg_attr`` decorator chains took
+        longest, slowest first."""
+        chains: dict[str, list[int]] = {}
+        for event in self.events:
+            if event.event == "cfg_attr.apply":
+                totals = chains.setdefault(event.qualname or "", [0, 0])
+                totals[0] += event.chain_ns
+                totals[1] += 1
+        rows = [ChainTime(name, *totals) for name, totals in chains.items()]
+        return sorted(rows, key=lambda row: row.chain_ns, reverse=True)[:top]
+
+    def report(self, file: TextIO | None = None, top: int = DEFAULT_TOP) -> None:
+        """Write the profile to `file` (stderr by default), times in µs."""
+        if file is None:
+            file = sys.stderr
+
+        def line(section: str, *columns: object) -> None:
+            print(f"{section}: " + " | ".join(map(str, columns)), file=file)
+
+        if not self.complete:
+            print(
+                "conditional_method: the trace ring overflowed; the oldest "
+                "decorations are missing (raise `capacity`)",
+                file=file,
+            )
+        line("cfg decorations", "self [us]", "cumulative", "count", "raisers", "module")
+        for module in self.modules():
+            depth = module.module.count(".")
+            line(
+                "cfg decorations",
+                f"{module.self_ns // 1000:>9}",
+                f"{module.cumulative_ns // 1000:>10}",
+                f"{module.decorations:>5}",
+                f"{module.raisers:>7}",
+                "  " * depth + module.module,
+            )
+        line("cfg conditions", "cost [us]", "kind    ", "result", "qualname")
+        for event in self.conditions(top):
+            line(
+                "cfg conditions",
+                f"{event.cost_ns // 1000:>9}",
+                f"{event.kind:<8}",
+                f"{event.result!s:<6}",
+                event.qualname,
+            )
+        line("cfg_attr chains", "chain [us]", "count", "qualname")
+        for chain in self.chains(top):
+            line(
+                "cfg_attr chains",
+                f"{chain.chain_ns // 1000:>10}",
+                f"{chain.chains:>5}",
+                chain.qualname,
+            )
+        line(
+            "cfg total",
+            f"{self.total_ns // 1000} us",
+            f"{len(self.decorations)} decorations",
+            f"{self.raisers} raisers",
+        )
+
+
+@contextmanager
+def profile_imports(capacity: int = DEFAULT_CAPACITY) -> Iterator[ImportProfile]:
+    """Record the decorations made inside the block.
+
+    Tracing is turned on for the block, with a ring of `capacity` decisions
+    unless it already was on, and turned off again afterwards.  The
+    yielded :class:`ImportProfile` is filled when the block exits.
+    """
+    was_enabled = trace.enabled()
+    if not was_enabled:
+        trace.enable(capacity)
+    with trace.buffer() as ring:
+        ring_size = len(ring)
+    before = trace.events()
+    start = before[-1].seq + 1 if before else None
+    profile = ImportProfile()
+    try:
+        yield profile
+    finally:
+        events = trace.events()
+        if start is not None:
+            events = [event for event in events if event.seq >= start]
+        if not was_enabled:
+            trace.disable()
+        profile.events = events
+        profile.complete = len(events) < ring_size or (
+            start is not None and events[0].seq == start
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m conditional_method.importtime",
+        description="Import modules and report the time their @cfg / "
+        "@cfg_attr decorations take.",
+    )
+    parser.add_argument("modules", nargs="+", metavar="module")
+    parser.add_argument(
+        "-n",
+        "--top",
+        type=int,
+        default=DEFAULT_TOP,
+        help="how many conditions and decorator chains to list (default: "
+        f"{DEFAULT_TOP})",
+    )
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        default=DEFAULT_CAPACITY,
+        help="decisions the trace ring holds (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    with profile_imports(args.capacity) as profile:
+        for module in args.modules:
+            importlib.import_module(module)
+    profile.report(sys.stdout, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
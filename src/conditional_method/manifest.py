@@ -0,0 +1,403 @@
+"""Persistent selection manifest: skip condition calls on a warm start.
+
+A process that decorates many names with expensive callable conditions can
+record which candidate each of them selected, and have the next start read
+the record instead of calling the conditions again::
+
+    from conditional_method.manifest import use_manifest
+
+    use_manifest(".cfg-selection", fingerprint=f"{platform.node()}:{ENV}")
+    import app                      # conditions answered from the manifest
+
+The manifest is a small binary file: a header, the source files the
+winners were defined in (with their SHA-256, size and mtime), and per
+tracked qualname the file and the first line of its winner (0 when no
+condition was true), sorted by qualname.  It is memory-mapped, and a name
+is looked up in the mapping (by bisection) when it is first decorated, so
+a start reads only the names it decorates.  While it is installed, the
+decoration of a recorded name answers each callable condition from it --
+true for the candidate defined on the recorded line, false for the others
+-- and ``stats()["manifest_hits"]`` counts these answers.  Native
+conditions (``cfg.env`` and the like) and constant ones are evaluated as
+usual, and :func:`~conditional_method.reselect` always calls the
+conditions.
+
+The record is only as good as its keys.  A file whose content changed
+since it was recorded is detected the first time one of its names is
+decorated (its size and mtime, else its hash, no longer match) and all its
+names are selected live.  Anything else a condition reads -- the
+environment, the host, the configuration -- must be in `fingerprint`: a
+manifest recorded under another fingerprint is ignored as a whole.
+
+The manifest is written by :meth:`SelectionManifest.save`: by default at
+:func:`~conditional_method.freeze` (the end of startup) or else at exit.
+Names recorded earlier and not decorated in this run are kept, unless
+their file changed.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import mmap
+import os
+import struct
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from . import _c
+
+MAGIC = b"CFGM"
+VERSION = 1
+# magic, version, reserved, SHA-256 of the fingerprint, files, entries,
+# string bytes
+_HEADER = struct.Struct("<4sHH32sIII")
+# path offset, path length, SHA-256, size, mtime (ns)
+_FILE = struct.Struct("<II32sQq")
+# qualname offset, qualname length, file index, winner line
+_ENTRY = struct.Struct("<IIII")
+# Strings are stored as UTF-8, offsets counting from the end of the entries,
+# which are sorted by qualname.
+_ERRORS = "surrogatepass"
+
+
+class FileRecord(NamedTuple):
+    """A source file as it was when its winners were recorded."""
+
+    digest: bytes
+    size: int
+    mtime_ns: int
+
+
+def _digest(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).digest()
+
+
+def _code_of(func: Any) -> Any:
+    """The code object `func` was defined from, looking through
+    staticmethod / classmethod / property / ``functools.wraps`` layers (as
+    the extension does), or None."""
+    for _ in range(4):
+        code = getattr(func, "__code__", None)
+        if code is not None:
+            return code
+        for attr in ("__func__", "fget", "__wrapped__"):
+            inner = getattr(func, attr, None)
+            if inner is not None:
+                break
+        else:
+            return None
+        func = inner
+    return None
+
+
+def _recorded() -> dict[str, tuple[str, int]]:
+    """qualname -> (filename, winner line) for the names the registry
+    tracks with a callable condition."""
+    entries = {}
+    for qualname, entry in list(_c._candidates.items()):
+        candidates = list(entry.candidates)
+        if not any(
+            callable(condition) and not isinstance(condition, _c._Condition)
+            for _, condition, _ in candidates
+        ):
+            continue
+        winner = None
+        for (func, _, _), result in zip(candidates, entry.results):
+            if result:
+                winner = func
+        code = _code_of(winner if winner is not None else candidates[-1][0])
+        if code is not None:
+            line = code.co_firstlineno if winner is not None else 0
+            entries[qualname] = (code.co_filename, line)
+    return entries
+
+
+class _Table:
+    """The entries of a manifest file, read from its mapping in place:
+    qualnames are sorted (as UTF-8) and found by bisection, so a start only
+    reads the names it decorates.  Raises :class:`ValueError` for a file
+    that is not a complete manifest for `fingerprint`."""
+
+    def __init__(self, data: mmap.mmap, fingerprint: bytes) -> None:
+        magic, version, _, digest, nfiles, count, size = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or digest != fingerprint:
+            raise ValueError("not a manifest for this fingerprint")
+        self._data = data
+        self._entries = _HEADER.size + nfiles * _FILE.size
+        self._strings = self._entries + count * _ENTRY.size
+        if self._strings + size != len(data):
+            raise ValueError("truncated manifest")
+        self.count = count
+        self.names: list[str] = []
+        self.files: dict[str, FileRecord] = {}
+        for index in range(nfiles):
+            start, length, sha, size, mtime_ns = _FILE.unpack_from(
+                data, _HEADER.size + index * _FILE.size
+            )
+            name = self._text(start, length).decode("utf-8", _ERRORS)
+            self.names.append(name)
+            self.files[name] = FileRecord(sha, size, mtime_ns)
+
+    def _text(self, start: int, length: int) -> bytes:
+        start += self._strings
+        if start + length > len(self._data):
+            raise ValueError("truncated manifest")
+        return self._data[start : start + length]
+
+    def _entry(self, index: int) -> tuple[bytes, str, int]:
+        start, length, file, line = _ENTRY.unpack_from(
+            self._data, self._entries + index * _ENTRY.size
+        )
+        return self._text(start, length), self.names[file], line
+
+    def get(self, qualname: str) -> tuple[str, int] | None:
+        key = qualname.encode("utf-8", _ERRORS)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            name, filename, line = self._entry(middle)
+            if name < key:
+                low = middle + 1
+            elif name > key:
+                high = middle
+            else:
+                return filename, line
+        return None
+
+    def items(self) -> Iterator[tuple[str, tuple[str, int]]]:
+        for index in range(self.count):
+            name, filename, line = self._entry(index)
+            yield name.decode("utf-8", _ERRORS), (filename, line)
+
+    def close(self) -> None:
+        self._data.close()
+
+
+def _open(path: Path, fingerprint: bytes) -> _Table | None:
+    """The manifest at `path`; None when it is missing, damaged or recorded
+    under another fingerprint."""
+    try:
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return _Table(data, fingerprint)
+    except (ValueError, IndexError, struct.error):
+        data.close()
+        return None
+
+
+def _write(
+    path: Path,
+    fingerprint: bytes,
+    files: dict[str, FileRecord],
+    entries: dict[str, tuple[str, int]],
+) -> None:
+    strings = bytearray()
+
+    def add(text: str) -> tuple[int, int]:
+        data = text.encode("utf-8", _ERRORS)
+        strings.extend(data)
+        return len(strings) - len(data), len(data)
+
+    index = {name: i for i, name in enumerate(files)}
+    parts = [_FILE.pack(*add(name), *record) for name, record in files.items()]
+    for key, (filename, line) in sorted(
+        (qualname.encode("utf-8", _ERRORS), entry)
+        for qualname, entry in entries.items()
+    ):
+        strings.extend(key)
+        parts.append(
+            _ENTRY.pack(len(strings) - len(key), len(key), index[filename], line)
+        )
+    header = _HEADER.pack(
+        MAGIC, VERSION, 0, fingerprint, len(files), len(entries), len(strings)
+    )
+    parts.insert(0, header)
+    parts.append(bytes(strings))
+    # Replaced in one step: another process may have the old one mapped.
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        temporary.write_bytes(b"".join(parts))
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+class SelectionManifest:
+    """A selection manifest read from (and saved to) `path`.
+
+    Attributes:
+        path: the manifest file.
+        loaded: how many names the manifest held when it was read (0 when
+            there was none for this fingerprint).
+        autosave: whether it is saved at :func:`~conditional_method.freeze`
+            or at exit.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], fingerprint: str | bytes = b""
+    ) -> None:
+        if isinstance(fingerprint, str):
+            fingerprint = fingerprint.encode()
+        self.path = Path(path)
+        self.autosave = False
+        self._fingerprint = hashlib.sha256(fingerprint).digest()
+        self._started = time.time_ns()
+        self._table = _open(self.path, self._fingerprint)
+        self._checked: dict[str, bool] = {}
+        self.loaded = self._table.count if self._table is not None else 0
+
+    def __repr__(self) -> str:
+        return f"<SelectionManifest {str(self.path)!r}: {self.loaded} names>"
+
+    @property
+    def stale(self) -> list[str]:
+        """The recorded files found changed so far, whose names were
+        selected live."""
+        return sorted(name for name, same in self._checked.items() if not same)
+
+    def _lookup(self, qualname: str) -> tuple[str, int] | None:
+        """The recorded (filename, winner line) of `qualname` (called by the
+        extension the first time the name is decorated)."""
+        try:
+            return self._table.get(qualname) if self._table is not None else None
+        except (ValueError, IndexError, struct.error):
+            return None
+
+    def _check(self, filename: str) -> bool:
+        """Whether `filename` is the file recorded (called by the extension
+        the first time a name of that file is decorated)."""
+        files = self._table.files if self._table is not None else {}
+        record = files.get(filename)
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            same = False
+        else:
+            same = (
+                record is not None
+                and stat.st_size == record.size
+                and (
+                    stat.st_mtime_ns == record.mtime_ns
+                    or _digest(filename) == record.digest
+                )
+            )
+        self._checked[filename] = same
+        return same
+
+    def _previous(self) -> dict[str, tuple[str, int]]:
+        """The entries read, but those of the files found changed."""
+        if self._table is None:
+            return {}
+        try:
+            return {
+                qualname: entry
+                for qualname, entry in self._table.items()
+                if self._checked.get(entry[0], True)
+            }
+        except (ValueError, IndexError, struct.error):
+            return {}
+
+    def save(self) -> int:
+        """Record the winners of the names decorated so far and write the
+        manifest; returns how many names it holds.
+
+        Raises :class:`RuntimeError` once the registry is frozen: it no
+        longer knows the candidates.
+        """
+        if _c._frozen():
+            raise RuntimeError(
+                "the selection registry is frozen; save the manifest before freeze()"
+            )
+        recorded = self._table.files if self._table is not None else {}
+        entries = self._previous()
+        entries.update(_recorded())
+        files = {}
+        for filename in sorted({filename for filename, _ in entries.values()}):
+            try:
+                stat = os.stat(filename)
+                record = recorded.get(filename)
+                if record is None or (stat.st_size, stat.st_mtime_ns) != (
+                    record.size,
+                    record.mtime_ns,
+                ):
+                    # A file edited while this process ran may not be the
+                    # one its names were decorated from.
+                    if stat.st_mtime_ns >= self._started:
+                        continue
+                    record = FileRecord(
+                        _digest(filename), stat.st_size, stat.st_mtime_ns
+                    )
+            except OSError:
+                continue
+            files[filename] = record
+        entries = {
+            qualname: entry for qualname, entry in entries.items() if entry[0] in files
+        }
+        # Not replaced while mapped (which Windows refuses); the new file is
+        # mapped instead, and answers the names not decorated yet.
+        if self._table is not None:
+            self._table.close()
+        try:
+            _write(self.path, self._fingerprint, files, entries)
+        finally:
+            self._table = _open(self.path, self._fingerprint)
+        return len(entries)
+
+    def close(self) -> None:
+        """Uninstall the manifest: conditions are called again."""
+        global _active
+        self.autosave = False
+        if _active is self:
+            _active = None
+            _c._manifest_load(None, None)
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+
+
+_active: SelectionManifest | None = None
+
+
+def use_manifest(
+    path: str | os.PathLike[str],
+    fingerprint: str | bytes = b"",
+    *,
+    save: bool = True,
+) -> SelectionManifest:
+    """Read the selection manifest at `path` and answer the callable
+    conditions of later decorations from it.
+
+    `fingerprint` identifies everything the conditions depend on besides
+    the source files; a manifest recorded under another one is not used.
+    With `save`, the manifest is rewritten at
+    :func:`~conditional_method.freeze`, or at exit when the registry is not
+    frozen then.  Replaces the manifest installed before, if any.
+    """
+    global _active
+    if _active is not None:
+        _active.close()
+    manifest = SelectionManifest(path, fingerprint)
+    if manifest.loaded:
+        _c._manifest_load(manifest._lookup, manifest._check)
+    manifest.autosave = save
+    _active = manifest
+    return manifest
+
+
+def _save_before_freeze() -> None:
+    # Called by freeze(), while the registry still knows the candidates.
+    if _active is not None and _active.autosave:
+        _active.save()
+
+
+@atexit.register
+def _save_at_exit() -> None:
+    if _active is not None and _active.autosave and not _c._frozen():
+        _active.save()
@@ -0,0 +1,375 @@
+"""Offline specialization of source trees under a profile.
+
+Writes a copy of a source tree in which the ``@cfg`` / ``@cfg_attr``
+conditions the profile decides have been applied: the losing candidates are
+gone and the winners carry no ``@cfg`` decorator (a ``@cfg_attr`` winner
+carries the decorators it names instead)::
+
+    python -m conditional_method.specialize --profile prod src/ out/
+
+What can be decided, and what is left for the extension to select at
+import, is the same as for :func:`~conditional_method.install_import_hook`
+(see :mod:`conditional_method.importhook`), but the output is source: the
+rest of each file, comments included, is copied as written, and so are the
+files that are not Python sources.
+
+``--profile`` names a profile of the ``[tool.conditional-method.profiles]``
+table of ``pyproject.toml``, or a ``.toml`` / ``.json`` file holding one::
+
+    [tool.conditional-method.profiles.prod]
+    ENV = "production"
+    settings = { REGION = "eu" }      # the dotted name "settings.REGION"
+
+``-D NAME=VALUE`` adds or overrides entries (the value is read as a Python
+literal, or taken as a string).  Files are specialized in a process pool
+(``--jobs``); a file whose content and profile are those of the previous
+run into the same output directory is not read again, as recorded in
+``.cfg-specialize.json`` there.  The report lists the candidates removed
+and the bytes saved.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tokenize
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, NamedTuple, TextIO
+
+from .importhook import Eliminated, profile_hash, specialize_source
+
+MANIFEST = ".cfg-specialize.json"
+PYPROJECT_TABLE = ("tool", "conditional-method", "profiles")
+SKIPPED_DIRS = frozenset({"__pycache__", ".git"})
+
+
+class FileReport(NamedTuple):
+    """What specializing one file did.
+
+    Attributes:
+        path: the file, relative to the source and output roots.
+        digest: the SHA-256 of the source file.
+        eliminated: the candidates removed from it.
+        bytes_in: the size of the source file.
+        bytes_out: the size of the file written.
+        error: why a Python file was copied as it was (it did not parse),
+            else None.
+        unchanged: whether the previous run's output was kept.
+    """
+
+    path: str
+    digest: str
+    eliminated: list[Eliminated]
+    bytes_in: int
+    bytes_out: int
+    error: str | None = None
+    unchanged: bool = False
+
+
+class SpecializeReport:
+    """The files :func:`specialize_tree` wrote or kept, sorted by path."""
+
+    def __init__(self, files: list[FileReport]) -> None:
+        self.files = files
+
+    @property
+    def eliminated(self) -> int:
+        """How many candidates were removed."""
+        return sum(len(file.eliminated) for file in self.files)
+
+    @property
+    def bytes_saved(self) -> int:
+        """The bytes the output tree is smaller by."""
+        return sum(file.bytes_in - file.bytes_out for file in self.files)
+
+    @property
+    def unchanged(self) -> int:
+        """How many files were kept from the previous run."""
+        return sum(file.unchanged for file in self.files)
+
+    def report(self, file: TextIO | None = None) -> None:
+        """Write the report to `file` (stderr by default)."""
+        if file is None:
+            file = sys.stderr
+
+        def line(section: str, *columns: object) -> None:
+            print(f"{section}: " + " | ".join(map(str, columns)), file=file)
+
+        line("cfg specialized", "saved [B]", "removed", "file")
+        for row in self.files:
+            if row.eliminated:
+                line(
+                    "cfg specialized",
+                    f"{row.bytes_in - row.bytes_out:>9}",
+                    f"{len(row.eliminated):>7}",
+                    row.path,
+                )
+        line("cfg eliminated", "lines    ", "qualname")
+        for row in self.files:
+            for candidate in row.eliminated:
+                lines = f"{candidate.lineno}-{candidate.end_lineno}"
+                line(
+                    "cfg eliminated",
+                    f"{lines:<9}",
+                    f"{row.path}:{candidate.qualname}",
+                )
+        for row in self.files:
+            if row.error is not None:
+                line("cfg copied", row.path, row.error)
+        line(
+            "cfg total",
+            f"{len(self.files)} files ({self.unchanged} unchanged)",
+            f"{self.eliminated} candidates eliminated",
+            f"{self.bytes_saved} bytes saved",
+        )
+
+
+def _flatten(table: Mapping[str, Any], prefix: str = "") -> dict[str, Any]:
+    profile = {}
+    for name, value in table.items():
+        if isinstance(value, Mapping):
+            profile.update(_flatten(value, f"{prefix}{name}."))
+        else:
+            profile[prefix + name] = value
+    return profile
+
+
+def _read_toml(path: Path) -> dict[str, Any]:
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:  # pragma: no cover - Python < 3.11
+        try:
+            import tomli as tomllib  # type: ignore[import-not-found]
+        except ImportError:
+            raise RuntimeError(
+                f"reading {path} needs Python 3.11+ or the tomli package"
+            ) from None
+    with open(path, "rb") as file:
+        config: dict[str, Any] = tomllib.load(file)
+    return config
+
+
+def load_profile(
+    name: str, config: str | os.PathLike[str] = "pyproject.toml"
+) -> dict[str, Any]:
+    """The profile `name`: a ``.json`` or ``.toml`` file if there is one at
+    that path, else the ``[tool.conditional-method.profiles.<name>]`` table
+    of `config`.  Nested tables give dotted names.  Raises
+    :class:`LookupError` for a profile `config` does not define."""
+    path = Path(name)
+    if path.suffix in (".json", ".toml") and path.is_file():
+        if path.suffix == ".json":
+            table = json.loads(path.read_text(encoding="utf-8"))
+        else:
+            table = _read_toml(path)
+    else:
+        table = _read_toml(Path(config))
+        for key in (*PYPROJECT_TABLE, name):
+            if not isinstance(table, Mapping) or key not in table:
+                table_name = ".".join((*PYPROJECT_TABLE, name))
+                raise LookupError(f"{config} defines no [{table_name}] profile")
+            table = table[key]
+    if not isinstance(table, Mapping):
+        raise TypeError(f"profile {name!r} is not a table")
+    return _flatten(table)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _specialize_file(
+    source: str, target: str, path: str, profile: Mapping[str, Any]
+) -> FileReport:
+    """Specialize (or, for other files, copy) `source` to `target`."""
+    data = Path(source).read_bytes()
+    Path(target).parent.mkdir(parents=True, exist_ok=True)
+    eliminated: list[Eliminated] = []
+    error = None
+    output = data
+    if path.endswith(".py") and b"conditional_method" in data:
+        try:
+            encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+            text, eliminated = specialize_source(data.decode(encoding), profile, source)
+        except (SyntaxError, UnicodeDecodeError) as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        else:
+            if eliminated:
+                output = text.encode(encoding)
+    if output is data:
+        shutil.copyfile(source, target)
+    else:
+        Path(target).write_bytes(output)
+    return FileReport(path, _digest(data), eliminated, len(data), len(output), error)
+
+
+def _walk(root: Path, skip: Path) -> Iterable[str]:
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(
+            name
+            for name in dirs
+            if name not in SKIPPED_DIRS and Path(directory, name).resolve() != skip
+        )
+        for name in sorted(files):
+            yield Path(directory, name).relative_to(root).as_posix()
+
+
+def _read_manifest(path: Path, tag: str) -> dict[str, FileReport]:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("profile") != tag:
+        return {}
+    return {
+        entry["path"]: FileReport(
+            entry["path"],
+            entry["digest"],
+            [Eliminated(*item) for item in entry["eliminated"]],
+            entry["bytes_in"],
+            entry["bytes_out"],
+            entry["error"],
+            True,
+        )
+        for entry in manifest.get("files", [])
+    }
+
+
+def specialize_tree(
+    source: str | os.PathLike[str],
+    output: str | os.PathLike[str],
+    profile: Mapping[str, Any],
+    *,
+    jobs: int | None = None,
+) -> SpecializeReport:
+    """Write `source` specialized under `profile` to `output`.
+
+    Every file under `source` (but ``__pycache__`` and ``.git``
+    directories, and `output` itself) gets its counterpart under `output`.
+    Files unchanged since the last run with the same profile are kept as
+    they are; files of that run that no longer exist are removed.  `jobs`
+    worker processes specialize the rest (``os.cpu_count()`` when None; 1
+    works in this process).
+    """
+    root = Path(source)
+    out = Path(output)
+    if not root.is_dir():
+        raise NotADirectoryError(f"{root} is not a directory")
+    tag = profile_hash(profile)
+    manifest = out / MANIFEST
+    previous = _read_manifest(manifest, tag)
+    rows: dict[str, FileReport] = {}
+    pending = []
+    for path in _walk(root, out.resolve()):
+        kept = previous.get(path)
+        if (
+            kept is not None
+            and (out / path).is_file()
+            and kept.digest == _digest((root / path).read_bytes())
+        ):
+            rows[path] = kept
+            continue
+        pending.append(path)
+    arguments = (
+        [str(root / path) for path in pending],
+        [str(out / path) for path in pending],
+        pending,
+        [profile] * len(pending),
+    )
+    if jobs == 1 or len(pending) < 2:
+        results = list(map(_specialize_file, *arguments))
+    else:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(_specialize_file, *arguments, chunksize=16))
+    rows.update((row.path, row) for row in results)
+    for path in previous.keys() - rows.keys():
+        (out / path).unlink(missing_ok=True)
+    files = [rows[path] for path in sorted(rows)]
+    out.mkdir(parents=True, exist_ok=True)
+    entries = [
+        {
+            "path": row.path,
+            "digest": row.digest,
+            "eliminated": [list(item) for item in row.eliminated],
+            "bytes_in": row.bytes_in,
+            "bytes_out": row.bytes_out,
+            "error": row.error,
+        }
+        for row in files
+    ]
+    manifest.write_text(
+        json.dumps({"profile": tag, "files": entries}, indent=1), encoding="utf-8"
+    )
+    return SpecializeReport(files)
+
+
+def _definition(text: str) -> tuple[str, Any]:
+    name, sep, value = text.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, not {text!r}")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m conditional_method.specialize",
+        description="Write a copy of a source tree with the @cfg / @cfg_attr "
+        "candidates a profile rules out removed.",
+    )
+    parser.add_argument("source", help="the source tree")
+    parser.add_argument("output", help="where to write the specialized tree")
+    parser.add_argument(
+        "-p",
+        "--profile",
+        help="a profile of pyproject.toml's [tool.conditional-method.profiles], "
+        "or a .toml / .json file",
+    )
+    parser.add_argument(
+        "-D",
+        dest="definitions",
+        action="append",
+        default=[],
+        type=_definition,
+        metavar="NAME=VALUE",
+        help="add or override a profile entry",
+    )
+    parser.add_argument(
+        "--config",
+        default="pyproject.toml",
+        help="the pyproject.toml the profile is read from (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="worker processes (default: the number of CPUs)",
+    )
+    args = parser.parse_args(argv)
+    profile = {}
+    if args.profile is not None:
+        try:
+            profile = load_profile(args.profile, args.config)
+        except (OSError, LookupError, TypeError, ValueError, RuntimeError) as exc:
+            parser.error(str(exc))
+    profile.update(args.definitions)
+    try:
+        report = specialize_tree(args.source, args.output, profile, jobs=args.jobs)
+    except (OSError, TypeError) as exc:
+        parser.error(str(exc))
+    report.report(sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
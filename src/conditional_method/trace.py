@@ -0,0 +1,171 @@
+"""Decision tracing for ``@cfg`` / ``@cfg_attr``.
+
+The extension can record every selection decision into a fixed-size ring
+buffer held in memory::
+
+    from conditional_method import trace
+
+    trace.enable()
+    import myapp  # decorations are recorded
+    trace.dump()  # or inspect trace.events()
+
+With tracing off (the default) the decoration path does no extra work.
+Tracing starts enabled when ``__conditional_method_debug__`` is set at
+import, and the recorded events are then dumped to stderr at exit.
+
+Events are named after the path that produced them:
+
+- ``cm.select``: a true condition stored the winner for a name.
+- ``cm.cached``: a false condition reused the name's cached winner (or
+  the raiser an earlier false condition installed).
+- ``cm.raiser``: a false condition with no winner installed a raiser.
+- ``cm.lazy``: a ``lazy=True`` candidate was queued.
+- ``cfg_attr.apply`` / ``cfg_attr.cached`` / ``cfg_attr.raiser``: the same
+  for ``cfg_attr``.
+- ``reselect.rebind``: ``reselect()`` rebound a name to another winner.
+
+Each event is a fixed-layout 56-byte record (:data:`FORMAT`, fields
+:data:`FIELDS`) naming its qualname by index into :func:`names`.
+:func:`buffer` exports the ring itself, so thousands of events can be read
+without a Python object per event::
+
+    import struct
+
+    names = trace.names()
+    for record in struct.iter_unpack(trace.FORMAT, trace.buffer()):
+        fields = dict(zip(trace.FIELDS, record))
+        if fields["event"]:
+            print(names[fields["name"]], trace.EVENTS[fields["event"]])
+
+or ``numpy.frombuffer(trace.buffer(), dtype=...)``.  Empty slots have
+``event == 0``; the others are in ring order, ordered by ``seq``.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import NamedTuple, TextIO
+
+from . import _c
+
+DEFAULT_CAPACITY = 4096
+
+#: ``struct`` format of one record in :func:`buffer`.
+FORMAT: str = _c._trace_format
+#: Field names of a record, in :data:`FORMAT` order.
+FIELDS = (
+    "seq",
+    "time_ns",
+    "cost_ns",
+    "total_ns",
+    "chain_ns",
+    "name",
+    "candidate",
+    "event",
+    "kind",
+    "result",
+)
+#: Event names by record ``event`` code (code 0 marks an empty slot).
+EVENTS: tuple[str, ...] = _c._trace_event_names
+#: Condition kinds by record ``kind`` code.
+KINDS: tuple[str, ...] = _c._trace_kind_names
+#: Record ``result`` code of a decision whose condition was not evaluated.
+PENDING = 2
+
+
+class TraceEvent(NamedTuple):
+    """One recorded decision.
+
+    Attributes:
+        seq: position in the stream of every event recorded so far; a gap
+            between consecutive events means older ones were overwritten.
+        time_ns: monotonic clock reading, in nanoseconds.
+        event: the decision, e.g. ``"cm.select"``.
+        qualname: the ``"module.qualname"`` the decision was made for.
+        candidate: index of the candidate among the name's candidates, or
+            -1 where it is not known (names only decorated with bools, and
+            ``cfg_attr``).
+        kind: the condition kind: ``"static"``, ``"callable"``, ``"pure"``
+            or ``"native"``.
+        result: the condition's result, or None when it was not evaluated
+            (a queued lazy candidate).
+        cost_ns: time spent evaluating the condition, in nanoseconds (0 for
+            ``True``/``False``, which are not evaluated).
+        total_ns: time spent in the whole decoration, condition and
+            decorators included, in nanoseconds (0 for ``reselect.rebind``).
+        chain_ns: time spent in the decorators ``cfg_attr.apply`` applied,
+            in nanoseconds (0 for the other events).
+    """
+
+    seq: int
+    time_ns: int
+    event: str
+    qualname: str | None
+    candidate: int
+    kind: str
+    result: bool | None
+    cost_ns: int
+    total_ns: int
+    chain_ns: int
+
+
+def enable(capacity: int = DEFAULT_CAPACITY) -> None:
+    """Start recording decisions into a ring of the last `capacity` events.
+
+    Enabling again with another capacity drops the recorded events.
+    """
+    _c._trace_enable(capacity)
+
+
+def disable() -> None:
+    """Stop recording; the events recorded so far stay readable."""
+    _c._trace_disable()
+
+
+def enabled() -> bool:
+    """Whether decisions are being recorded."""
+    return bool(_c._trace_enabled())
+
+
+def events() -> list[TraceEvent]:
+    """Return the recorded events, oldest first."""
+    return [TraceEvent(*event) for event in _c._trace_events()]
+
+
+def names() -> list[str]:
+    """Return the qualnames the records in :func:`buffer` refer to, by
+    their ``name`` field."""
+    return list(_c._trace_names())
+
+
+def buffer() -> memoryview:
+    """Return a read-only memoryview over the trace ring.
+
+    The view is live: it keeps filling while tracing is enabled, and the
+    ring cannot be resized (``enable()`` with another capacity raises
+    :class:`BufferError`) until the view is released.
+    """
+    return memoryview(_c._trace_buffer())
+
+
+def clear() -> None:
+    """Drop the recorded events and the name table."""
+    _c._trace_clear()
+
+
+def dump(file: TextIO | None = None) -> None:
+    """Write the recorded events to `file` (stderr by default), one per
+    line, with times relative to the first event."""
+    if file is None:
+        file = sys.stderr
+    recorded = _c._trace_events()
+    if not recorded:
+        return
+    start = recorded[0][1]
+    for seq, time_ns, event, qualname, _, kind, result, cost_ns, *_ in recorded:
+        elapsed = (time_ns - start) / 1000
+        print(
+            f"conditional_method - TRACE - #{seq} +{elapsed:.1f}us {event} {qualname}"
+            f" ({kind} -> {result}, {cost_ns}ns)",
+            file=file,
+        )
@@ -18,6 +18,9 @@ CPython changed two observable behaviors across the supported range
 
 These helpers return the appropriate ``pytest.raises`` context manager so a
 single test body is correct on every supported interpreter.
+
+The module also holds :func:`named`, the stand-in function the cache tests
+decorate under a chosen qualname.
 """
 
 import sys
@@ -40,3 +43,15 @@ def raises_missing_context_manager():
     if _IS_311_PLUS:
         return pytest.raises(TypeError, match="context manager protocol")
     return pytest.raises(AttributeError)
+
+
+def named(qualname, module, result=None):
+    """A function that reports itself as ``module.qualname`` and returns
+    `result` (its qualname by default)."""
+
+    def f():
+        return qualname if result is None else result
+
+    f.__qualname__ = qualname
+    f.__module__ = module
+    return f
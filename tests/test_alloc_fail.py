@@ -58,12 +58,9 @@ def _run_sweep(ops, max_idx=60):
 
 
 def test_sweep_raiser_with_qualnames():
-    """_raise_typeerror with a populated f_qualnames set (non-empty message).
-
-    A raiser produced by ``cm(f, condition=False)`` carries the function's
-    qualname in f_qualnames, so the PyIter_Next/PyList_Append branches of
-    _raise_typeerror run (and their allocation-failure branches fire).
-    """
+    """_raise_typeerror for a raiser produced by ``cm(f, condition=False)``
+    (non-empty message): the allocation-failure branches of building the
+    message when the raiser fires."""
 
     def scenario():
         raiser = c.cm(lambda: 1, condition=False)
@@ -426,3 +423,382 @@ def test_set_name_wrong_args():
     raiser = c._raise_exec("q")
     with pytest.raises(TypeError):
         raiser.__set_name__("x")
+
+
+def test_sweep_lazy_selection():
+    """Allocation failures while collecting and resolving lazy candidates."""
+
+    def scenario():
+        class Worker:
+            @c.cm(condition=False, lazy=True)
+            def work(self):
+                return "dev"
+
+            @c.cm(condition=True, lazy=True)
+            def work(self):
+                return "prod"
+
+        Worker().work()
+
+    _run_sweep([scenario], max_idx=40)
+
+
+def test_lazy_broken_flag_and_names():
+    """lazy= with a broken __bool__, and selectors for unnamed callables."""
+
+    class BrokenBool:
+        def __bool__(self):
+            raise RuntimeError("lazy-bool")
+
+    with pytest.raises(RuntimeError, match="lazy-bool"):
+        c.cm(lambda: 1, condition=True, lazy=BrokenBool())
+    with pytest.raises(TypeError):
+        c.cm(42, condition=True, lazy=True)
+    with pytest.raises(TypeError):
+        c.cm(condition=True, lazy=True)(42)
+
+    # A callable without a __name__ resolves in place.
+    class Named:
+        def __init__(self):
+            self.__qualname__ = "lazy_unnamed"
+
+        def __call__(self):
+            return "called"
+
+    selector = c.cm(Named(), condition=True, lazy=True)
+    assert selector() == "called"
+    with pytest.raises(TypeError):
+        selector.__set_name__("x")
+
+
+def _drop_candidates(prefix):
+    for qualname in list(c._candidates):
+        if qualname.startswith(prefix):
+            del c._candidates[qualname]
+
+
+def test_sweep_reselect():
+    """Allocation failures while recording candidates and re-selecting."""
+    import types
+
+    module = types.ModuleType("reselect_sweep")
+    sys.modules[module.__name__] = module
+    source = (
+        "import conditional_method._c as c\n"
+        "FLAGS = {'ON': True}\n"
+        "class Worker:\n"
+        "    @c.cm(condition=True)\n"
+        "    def work(self):\n"
+        "        return 'default'\n"
+        "    @c.cm(condition=lambda f: FLAGS['ON'], depends_on='ON')\n"
+        "    def work(self):\n"
+        "        return 'on'\n"
+        "    @c.cm(condition=lambda f: FLAGS['ON'], depends_on='ON', lazy=True)\n"
+        "    def lazy(self):\n"
+        "        return 'lazy'\n"
+        "Worker().lazy()\n"
+    )
+
+    def scenario():
+        exec(source, module.__dict__)
+        module.FLAGS["ON"] = False
+        c.reselect(changed_keys="ON")
+        module.FLAGS["ON"] = True
+        c.reselect()
+
+    try:
+        _run_sweep([scenario], max_idx=80)
+    finally:
+        del sys.modules[module.__name__]
+        _drop_candidates("reselect_sweep.")
+
+
+def test_sweep_conditions():
+    """Allocation failures while building native conditions and setting flags."""
+
+    def scenario():
+        condition = (c.cfg.env("CM_SWEEP") == "x") | ~c.cfg.flag("sweep")
+        condition = True & condition
+        condition()
+        c.cfg.set_flags(sweep=True)
+
+    try:
+        _run_sweep([scenario], max_idx=20)
+    finally:
+        c._flags.clear()
+
+
+def test_sweep_pure_conditions():
+    """Allocation failures while memoizing and invalidating pure conditions."""
+
+    def condition(func):
+        return True
+
+    def work():
+        return 1
+
+    def scenario():
+        c.cfg.invalidate_conditions()
+        c.cm(work, condition=condition, pure=True)
+        c.cm(work, condition=condition, pure=True)
+        c.cfg.invalidate_conditions(condition)
+
+    try:
+        _run_sweep([scenario], max_idx=20)
+    finally:
+        c._pure_memo.pop(id(condition), None)
+
+
+def test_sweep_resolve_class():
+    """Allocation failures while resolving a class in one pass."""
+
+    def scenario():
+        @c.cfg.resolve_class
+        class Worker:
+            @c.cm(condition=True, lazy=True)
+            def work(self):
+                return "default"
+
+            @c.cm(condition=lambda f: False, depends_on="on", lazy=True)
+            def work(self):
+                return "on"
+
+            @c.cm(condition=True, lazy=True)
+            def other(self):
+                return "other"
+
+    def failing():
+        @c.cfg.resolve_class
+        class Worker:
+            @c.cm(condition=False, lazy=True)
+            def work(self):
+                return "never"
+
+    try:
+        _run_sweep([scenario, failing], max_idx=40)
+    finally:
+        for qualname in list(c._candidates):
+            if "<locals>" in qualname:
+                del c._candidates[qualname]
+
+
+def test_sweep_qualname_cache():
+    """Allocation failures while building and caching qualified names."""
+
+    def make():
+        def work():
+            return 1
+
+        return work
+
+    def scenario():
+        c._qualname_cache.clear()
+        c._get_mod_qual_func_name(make())
+        c._get_mod_qual_func_name(make())
+        c.cm(make(), condition=True)
+
+    _run_sweep([scenario], max_idx=20)
+
+
+def test_sweep_shared_decorators():
+    """Allocation failures while building and sharing decorator objects."""
+
+    def condition(func):
+        return True
+
+    def work():
+        return 1
+
+    def scenario():
+        c._cm_decorators.clear()
+        c._cfg_attr_decorators.clear()
+        c.cm(condition=condition)(work)
+        c.cm(condition=condition)(work)
+        c.cm(condition=False)
+        c.cfg_attr(condition=condition)(work)
+        c.cfg_attr(condition=condition)
+
+    _run_sweep([scenario], max_idx=20)
+
+
+def test_sweep_trace():
+    """Allocation failures while (re)allocating and reading the trace ring."""
+
+    def work():
+        return 1
+
+    def scenario():
+        c._trace_enable(4)
+        c.cm(work, condition=True)
+        c._trace_events()
+        c._trace_enable(8)
+        c.cm(work, condition=True)
+        c._trace_events()
+        c._trace_names()
+        memoryview(c._trace_buffer()).release()
+        c._trace_disable()
+        c._trace_clear()
+
+    _run_sweep([scenario], max_idx=10)
+    c._trace_disable()
+
+
+def test_sweep_stats():
+    """Allocation failures while building the stats() dicts."""
+
+    def scenario():
+        c.stats()
+        c.reset_stats()
+
+    _run_sweep([scenario], max_idx=4)
+
+
+def test_sweep_cache_policy():
+    """Allocation failures under a bounded "clock" cache policy."""
+
+    def scenario():
+        c.set_cache_policy(policy="clock", max_size=16)
+        try:
+            c.cache_policy()
+            keep = []
+            for i in range(40):
+
+                def f():
+                    pass
+
+                f.__qualname__ = f"Policy{i}.work"
+                keep.append(c.cm(f, condition=True))
+            c.cm(keep[-1], condition=False)
+        finally:
+            c.set_cache_policy(policy="sweep", max_size=None)
+            c._cm_cache.clear()
+
+    _run_sweep([scenario], max_idx=6)
+
+
+def test_sweep_cache_tables():
+    """Allocation failures while the shard tables and their reverse
+    indexes grow."""
+
+    def scenario():
+        c._cm_cache.clear()
+        keep = []
+        for i in range(30):
+
+            def f():
+                pass
+
+            f.__qualname__ = f"Table{i}.work"
+            keep.append(c.cm(f, condition=True))
+        assert c.cm(keep[-1], condition=False) is keep[-1]
+        del keep
+        c._cm_cache.clear()
+
+    _run_sweep([scenario], max_idx=12)
+
+
+def test_sweep_build_scopes():
+    """Allocation failures while a factory's class body gets its build
+    scope."""
+
+    def build():
+        class Worker:
+            def work(self):
+                pass
+
+            c.cm(work, condition=False)
+            work = c.cm(work, condition=True)
+
+        return Worker
+
+    def scenario():
+        build()
+        build()
+
+    _run_sweep([scenario], max_idx=8)
+
+
+def test_sweep_freeze():
+    """Allocation failures while freezing and thawing a registry (a fresh
+    module instance: freezing this one would drop its candidates)."""
+    import importlib.util
+
+    spec = importlib.util.find_spec("conditional_method._c")
+    other = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(other)
+
+    def scenario():
+        other._thaw()
+        keep = []
+        for i in range(5):
+
+            def f():
+                pass
+
+            f.__qualname__ = f"Frozen{i}.work"
+            keep.append(other.cm(f, condition=True))
+        other._freeze(True)
+        other.cm(keep[0], condition=True)
+        del keep
+
+    _run_sweep([scenario], max_idx=12)
+
+
+def test_sweep_raisers():
+    """Allocation failures while making and storing the raiser of a name
+    seen for the first time."""
+    names = iter(range(1_000_000))
+
+    def scenario():
+        def f():
+            pass
+
+        f.__qualname__ = f"Raiser{next(names)}.work"
+        c.cm(f, condition=False)
+        c.cfg_attr(f, condition=False)
+
+    _run_sweep([scenario], max_idx=8)
+
+
+def test_reselect_edge_cases():
+    """Unreachable owners, unhashable keys and odd candidates."""
+
+    def orphan():
+        return "orphan"
+
+    orphan.__module__ = "no.such.module"
+    c.cm(orphan, condition=lambda f: True, depends_on=b"raw")
+    (entry,) = [e for q, e in c._candidates.items() if q.endswith("orphan")]
+    assert "orphan" in repr(entry)
+    assert entry.keys == {b"raw"}
+    assert c.reselect(changed_keys=[b"raw"]) == []
+
+    with pytest.raises(TypeError):
+        c.reselect(changed_keys=[[]])
+    with pytest.raises(TypeError):
+        c.cm(condition=True, depends_on=[{}])
+
+    class Nameless:
+        """Candidate whose names are only reachable through fget."""
+
+        def __init__(self, fget):
+            self.fget = fget
+
+        def __call__(self):
+            return "nameless"
+
+    def named():
+        return "named"
+
+    named.__module__ = "no.such.module"
+    c.cm(Nameless(named), condition=lambda f: True)
+    c.reselect()
+
+    # Candidates without a code object are told apart by identity.
+    codeless = Nameless(None)
+    codeless.__qualname__ = "codeless"
+    codeless.__module__ = "no.such.module"
+    for _ in range(2):
+        c.cm(codeless, condition=lambda f: True)
+    assert len(c._candidates["no.such.module.codeless"].candidates) == 1
+    _drop_candidates("no.such.module.")
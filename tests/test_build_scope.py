@@ -0,0 +1,205 @@
+"""Build scopes: methods of classes defined inside a function are selected
+in their class body's scope, and nothing of a build is left in
+``_cm_cache``."""
+
+import gc
+import weakref
+
+import pytest
+
+from _compat import raises_set_name_error
+from conditional_method import _c, _get_failed, cfg, reset_stats, stats
+
+PROD = "production"
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    _c._cm_cache.clear()
+    reset_stats()
+    yield
+    _c._failed_qualnames.clear()
+    for qualname in list(_c._candidates):
+        if "<locals>" in qualname:
+            del _c._candidates[qualname]
+
+
+def _factory(env):
+    class Worker:
+        @cfg(condition=env != PROD)
+        def work(self):
+            return "dev"
+
+        @cfg(condition=env == PROD)
+        def work(self):  # noqa: F811
+            return "prod"
+
+        @cfg(condition=lambda f: env == PROD)
+        def other(self):
+            return "prod"
+
+        @cfg(condition=False)
+        def other(self):  # noqa: F811
+            return "dev"
+
+    return Worker
+
+
+def test_factory_leaves_no_global_state():
+    generation = _c._cache_generation()
+    for _ in range(50):
+        worker = _factory(PROD)()
+        assert (worker.work(), worker.other()) == ("prod", "prod")
+    assert len(_c._cm_cache) == 0
+    # The raisers of the false-first candidates do not reset the caches.
+    assert _c._cache_generation() == generation
+    assert stats()["cm_cache"]["writes"] == 0
+    assert _get_failed() == []
+
+
+def _flagged(enabled):
+    class Worker:
+        @cfg(condition=enabled)
+        def work(self):
+            return "work"
+
+    return Worker
+
+
+def test_builds_do_not_share_winners():
+    kept = _flagged(True)
+    # The same definition, false this time: the live winner of the earlier
+    # build is not reused.
+    with raises_set_name_error():
+        _flagged(False)
+    assert kept().work() == "work"
+
+
+def _apply(condition, func):
+    return cfg(condition=condition)(func)
+
+
+def _when(condition):
+    def decorate(func):
+        return cfg(condition=condition)(func)
+
+    return decorate
+
+
+def _helped(env):
+    class Worker:
+        @_when(env != PROD)
+        def work(self):
+            return "dev"
+
+        @_when(env == PROD)
+        def work(self):  # noqa: F811
+            return "prod"
+
+        @lambda func: _apply(env == PROD, func)
+        def other(self):
+            return "prod"
+
+        @lambda func: _apply(env != PROD, func)
+        def other(self):  # noqa: F811
+            return "dev"
+
+    return Worker
+
+
+def test_helper_decorates_in_the_class_body_scope():
+    for env in (PROD, "dev", PROD):
+        worker = _helped(env)()
+        expected = "prod" if env == PROD else "dev"
+        assert (worker.work(), worker.other()) == (expected, expected)
+    assert len(_c._cm_cache) == 0
+    assert _get_failed() == []
+
+
+def _make(apply, enabled):
+    @lambda func: apply(enabled, func)
+    def work():
+        return "on"
+
+    @lambda func: apply(not enabled, func)
+    def work():  # noqa: F811
+        return "off"
+
+    return work
+
+
+def test_functions_use_the_shared_cache():
+    # A function defined inside a function has no class body: it is
+    # selected in `_cm_cache`, through a helper or not.
+    assert _make(_apply, False)() == "off"
+    kept = _make(lambda condition, func: _when(condition)(func), True)
+    assert kept() == "on"
+    assert f"{__name__}._make.<locals>.work" in _c._cm_cache
+
+
+def test_nested_frames_keep_their_scope():
+    def make():
+        @cfg(condition=True)
+        def helper(self):
+            return "helper"
+
+        return helper
+
+    class Worker:
+        @cfg(condition=True)
+        def work(self):
+            return "first"
+
+        helper = make()
+
+        @cfg(condition=False)
+        def work(self):  # noqa: F811
+            return "second"
+
+    assert Worker().work() == "first"
+    assert Worker().helper() == "helper"
+
+
+def test_scope_dropped_when_frame_completes():
+    ref = weakref.ref(_factory(PROD))
+    # The next decoration pops the completed class body's scope.
+    cfg(condition=True)(lambda: None)
+    gc.collect()
+    assert ref() is None
+    assert all(entry[0].f_code.co_name != "Worker" for entry in _c._build_scopes)
+
+
+def test_scope_is_the_class_body():
+    class Worker:
+        @cfg(condition=True)
+        def work(self):
+            return "work"
+
+        entries = [entry for entry in _c._build_scopes if entry[1]]
+
+    [[frame, scope]] = Worker.entries
+    assert frame.f_code.co_name == "Worker"
+    [(qualname, ref)] = scope.items()
+    assert qualname == f"{__name__}.{Worker.work.__qualname__}"
+    assert ref() is Worker.__dict__["work"]
+
+
+def test_completed_frame_holds_winners_weakly():
+    def build():
+        class Worker:
+            @cfg(condition=True)
+            def work(self):
+                return "work"
+
+            ref = weakref.ref(work)
+            del work
+            raise RuntimeError(ref)
+
+    with pytest.raises(RuntimeError) as info:
+        build()
+    # The traceback keeps the class body's frame, and so its entry.
+    [ref] = info.value.args
+    gc.collect()
+    assert ref() is None
+    frame = info.tb.tb_next.tb_next.tb_frame
+    assert any(entry[0] is frame for entry in _c._build_scopes)
@@ -374,12 +374,12 @@ def test_cfg_callable_gc_clear():
 
 
 def test_debug_log_wired_into_cm():
-    """With debug enabled, cm decoration writes a log line to stderr."""
+    """With debug enabled at import, cm decisions are traced and dumped to
+    stderr at exit."""
     import subprocess
 
     code = (
-        "import conditional_method, os\n"
-        "os.environ['__conditional_method_debug__'] = 'true'\n"
+        "import conditional_method\n"
         "from conditional_method import cfg\n"
         "@cfg(condition=True)\n"
         "def f(): return 1\n"
@@ -389,9 +389,9 @@ def test_debug_log_wired_into_cm():
         [sys.executable, "-c", code],
         capture_output=True,
         text=True,
-        env={**os.environ, "PYTHONPATH": "src"},
+        env={**os.environ, "PYTHONPATH": "src", "__conditional_method_debug__": "1"},
     )
-    assert "cm: decorating" in proc.stderr
+    assert "cm.select __main__.f" in proc.stderr
     assert proc.stdout.strip() == "1"
 
 
@@ -465,3 +465,45 @@ def test_cfg_callable_clear_gc():
         del d, f
     _gc.collect()
     _gc.collect()
+
+
+def test_fastcall_argument_parsing():
+    """cfg/cfg_attr parse their vectorcall arguments like the old
+    PyArg_ParseTuple* forms: keyword names built at runtime, positional
+    condition/decorators for cfg_attr, and the argument errors."""
+
+    def f():
+        return "f"
+
+    def shout(func):
+        return lambda: func().upper()
+
+    # A keyword name that is not interned is matched by value.
+    name = "".join(["cond", "ition"])
+    assert cfg(f, **{name: True}) is f
+    assert cfg(**{name: True}) is cfg(condition=True)
+    # Unknown keywords are ignored by cfg, as before.
+    assert cfg(f, condition=True, unknown=1) is f
+    with pytest.raises(TypeError, match="at most 1 positional"):
+        cfg(f, True)
+
+    assert cfg_attr(f, True, [shout])() == "F"
+    assert cfg_attr(f, True, decorators=[shout])() == "F"
+    assert cfg_attr(f, **{name: True})() == "f"
+    with pytest.raises(TypeError, match="given by name \\('condition'\\)"):
+        cfg_attr(f, True, condition=True)
+    with pytest.raises(TypeError, match="'foo' is an invalid keyword"):
+        cfg_attr(f, condition=True, foo=1)
+    with pytest.raises(TypeError, match="at most 3 arguments"):
+        cfg_attr(f, True, [], None)
+
+
+def test_cfg_callable_tp_call():
+    """Calling the aliases through type(...).__call__ takes tp_call rather
+    than vectorcall; both reach the same function."""
+
+    def f():
+        return 1
+
+    assert type(cfg).__call__(cfg, f, condition=True) is f
+    assert type(cfg_attr).__call__(cfg_attr, f, condition=True)() == 1
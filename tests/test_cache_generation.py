@@ -0,0 +1,168 @@
+"""Generation-counter cache invalidation.
+
+A new ``TypeErrorRaiser`` (or one firing) resets the selection state.  The
+reset is an O(1) bump of a cache generation instead of a ``PyDict_Clear`` of
+both caches: entries written before the bump read as absent and are reclaimed
+lazily, on the lookup that finds them or by the next sweep.
+"""
+
+import functools
+
+import pytest
+
+from _compat import named
+from conditional_method import _c, cfg, cfg_attr, stats
+
+
+@pytest.fixture(autouse=True)
+def _clean_caches():
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+    yield
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+_named = functools.partial(named, module="gentest")
+
+
+def test_new_raiser_bumps_generation_without_clearing():
+    winner = _named("A.work")
+    before = _c._cache_generation()
+    swept = stats()["cm_cache"]["swept"]
+
+    assert cfg(condition=True)(winner) is winner
+    raiser = cfg(condition=False)(_named("B.work"))
+
+    assert isinstance(raiser, _c._TypeErrorRaiser)
+    assert _c._cache_generation() == before + 1
+    # No eager clear: the older winner is still stored, just stale, and
+    # reads as absent as it does to the selection.
+    assert set(_c._cm_cache) == {"gentest.B.work"}
+    assert "gentest.A.work" not in _c._cm_cache
+    assert _c._cm_cache.get("gentest.A.work") is None
+    assert stats()["cm_cache"]["swept"] == swept
+
+
+def test_stale_winner_is_not_reused_after_reset():
+    winner = _named("A.work")
+    cfg(condition=True)(winner)
+    cfg(condition=False)(_named("B.work"))  # reset
+
+    result = cfg(condition=False)(_named("A.work"))
+
+    assert isinstance(result, _c._TypeErrorRaiser)
+    assert _c._cm_cache["gentest.A.work"] is result
+
+
+def test_current_generation_winner_is_reused():
+    winner = _named("A.work")
+    cfg(condition=True)(winner)
+
+    assert cfg(condition=False)(_named("A.work")) is winner
+
+
+def test_raiser_call_bumps_generation():
+    raiser = cfg(condition=False)(_named("A.work"))
+    before = _c._cache_generation()
+
+    with pytest.raises(TypeError, match="gentest.A.work"):
+        raiser()
+
+    assert _c._cache_generation() == before + 1
+    # The cached raiser is stale now, but a later false decoration still
+    # gets the name's shared raiser, opening another generation.
+    assert cfg(condition=False)(_named("A.work")) is raiser
+    assert _c._cache_generation() == before + 2
+
+
+def test_reset_applies_to_cfg_attr_cache():
+    winner = _named("A.work")
+    assert cfg_attr(winner, condition=True) is winner
+    cfg(condition=False)(_named("B.work"))  # reset
+
+    result = cfg_attr(_named("A.work"), condition=False)
+
+    assert isinstance(result, _c._TypeErrorRaiser)
+
+
+def test_sweep_reclaims_stale_generations():
+    keep = []
+    for i in range(600):
+        fn = _named(f"Stale{i}.work")
+        keep.append(fn)
+        cfg(condition=(i % 2 == 0))(fn)
+
+    # Every other decoration reset the generation; stale winners and raisers
+    # are reclaimed by the high-water sweep instead of piling up.
+    assert len(_c._cm_cache) < 200
+
+
+def test_dead_winner_in_current_generation_reads_as_absent():
+    import gc
+
+    winner = _named("A.work")
+    cfg(condition=True)(winner)
+    del winner
+    gc.collect()
+
+    result = cfg(condition=False)(_named("A.work"))
+
+    assert isinstance(result, _c._TypeErrorRaiser)
+
+
+def test_cache_is_read_only():
+    winner = _named("Never.work")
+    with pytest.raises(TypeError):
+        _c._cm_cache["gentest.Never.work"] = winner
+    with pytest.raises(TypeError):
+        del _c._cm_cache["gentest.Never.work"]
+
+    result = cfg(condition=False)(_named("Never.work"))
+
+    assert isinstance(result, _c._TypeErrorRaiser)
+    assert _c._cm_cache["gentest.Never.work"] is result
+
+
+def test_sweep_drops_generations_of_externally_cleared_entries():
+    keep = [_named(f"Gone{i}.work") for i in range(100)]
+    for fn in keep:
+        cfg(condition=True)(fn)
+    _c._cm_cache.clear()
+
+    fresh = [_named(f"Kept{i}.work") for i in range(100)]
+    for fn in fresh:
+        cfg(condition=True)(fn)
+
+    # Clearing from outside left nothing behind; live winners of the
+    # current generation all survive the sweeps.
+    assert set(_c._cm_cache) == {f"gentest.Kept{i}.work" for i in range(100)}
+
+
+@pytest.mark.skipif(
+    not hasattr(_c, "set_alloc_fail_count"),
+    reason="extension not built with PY_CFG_TESTING",
+)
+def test_sweep_and_generation_alloc_failures():
+    """A failure to allocate a shard's table fails the decoration with
+    MemoryError; the cache is left as it was."""
+    keep = [_named(f"Fail{i}.work") for i in range(300)]
+    last = _named("Last.work")
+    raised = False
+    try:
+        for n in range(0, 8):
+            for fn in keep:
+                cfg(fn, condition=True)
+            _c._cm_cache.clear()  # free the tables: the next write allocates
+            _c._TypeErrorRaiser()  # new generation, nothing written in it yet
+            _c.set_alloc_fail_count(n)
+            try:
+                assert cfg(last, condition=True) is last
+            except MemoryError:
+                raised = True
+            _c.set_alloc_fail_count(-1)
+    finally:
+        _c.set_alloc_fail_count(-1)
+    assert raised
@@ -0,0 +1,200 @@
+"""Selection cache policy: ``cache_policy()`` / ``set_cache_policy()``.
+
+Writes stay amortized O(1) at any cache size, and a winner's entry leaves
+the cache when the winner dies.  The "clock" policy reclaims stale entries
+as writes go, and ``max_size`` bounds the caches by reclaiming the entries
+that hold no live winner.
+"""
+
+import functools
+import gc
+
+import pytest
+
+import conditional_method
+from _compat import named
+from conditional_method import (
+    _c,
+    cache_policy,
+    cfg,
+    cfg_attr,
+    reset_stats,
+    set_cache_policy,
+    stats,
+)
+
+DEFAULT = {
+    "policy": "sweep",
+    "max_size": None,
+    "sweep_threshold": 128,
+    "dead_sweep_threshold": 32,
+}
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    reset_stats()
+    yield
+    set_cache_policy(**DEFAULT)
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+_named = functools.partial(named, module="policytest")
+
+
+def test_round_trip():
+    assert cache_policy() == DEFAULT
+    assert conditional_method.set_cache_policy is set_cache_policy
+
+    set_cache_policy(policy="clock", max_size=1024)
+    assert cache_policy() == {**DEFAULT, "policy": "clock", "max_size": 1024}
+    # Arguments left out keep their value.
+    set_cache_policy(sweep_threshold=256)
+    assert cache_policy() == {
+        **DEFAULT,
+        "policy": "clock",
+        "max_size": 1024,
+        "sweep_threshold": 256,
+    }
+    set_cache_policy(max_size=None)
+    assert cache_policy()["max_size"] is None
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "error"),
+    [
+        ({"policy": "lru"}, ValueError),
+        ({"policy": 1}, TypeError),
+        ({"max_size": 0}, ValueError),
+        ({"max_size": "10"}, TypeError),
+        ({"sweep_threshold": None}, TypeError),
+        ({"dead_sweep_threshold": -1}, ValueError),
+    ],
+)
+def test_invalid(kwargs, error):
+    with pytest.raises(error):
+        set_cache_policy(**kwargs)
+    assert cache_policy() == DEFAULT
+
+
+def test_positional_rejected():
+    with pytest.raises(TypeError):
+        set_cache_policy("clock")
+
+
+def test_sweeps_are_amortized():
+    # Every winner stays alive: a sweep reclaims nothing, so sweeps must
+    # become rarer as the cache grows instead of running on every write.
+    winners = [cfg(condition=True)(_named(f"L{i}.work")) for i in range(5000)]
+    assert len(_c._cm_cache) == len(winners)
+    counters = stats()["cm_cache"]
+    assert counters["swept"] == 0
+    assert counters["sweeps"] < 500
+
+
+def test_dead_winners_leave_at_once():
+    # Each winner's weakref callback drops its entry: no lookup or sweep.
+    set_cache_policy(sweep_threshold=10**6)
+    dead = [cfg(condition=True)(_named(f"D{i}.work")) for i in range(200)]
+    dead.append(cfg_attr(_named("Attr.work"), condition=True))
+    assert len(_c._cm_cache) == 200
+    assert len(_c._cfg_attr_cache) == 1
+    del dead
+    gc.collect()
+    assert len(_c._cm_cache) == len(_c._cfg_attr_cache) == 0
+    counters = stats()
+    assert counters["cm_cache"]["dead_weakrefs"] == 200
+    assert counters["cfg_attr_cache"]["dead_weakrefs"] == 1
+    assert counters["cm_cache"]["sweeps"] == 0
+
+
+@pytest.mark.parametrize("policy", ["sweep", "clock"])
+def test_clock_reclaims_stale(policy):
+    # No sweeps: only the clock hand reclaims.
+    set_cache_policy(policy=policy, sweep_threshold=10**6)
+    old = [cfg(condition=True)(_named(f"O{i}.work")) for i in range(200)]
+    # A raiser resets the caches: the old winners become stale.
+    cfg(condition=False)(_named("Raiser.work"))
+    live = [cfg(condition=True)(_named(f"L{i}.work")) for i in range(400)]
+
+    counters = stats()["cm_cache"]
+    assert counters["sweeps"] == 0
+    # Stale entries read as absent whether or not they were reclaimed.
+    assert len(_c._cm_cache) == len(live) + 1
+    assert counters["stale"] == (len(old) if policy == "clock" else 0)
+
+
+def test_max_size_keeps_live_winners():
+    set_cache_policy(max_size=64)
+    hot = cfg(condition=True)(_named("Hot.work"))
+    live = []
+    for i in range(500):
+        live.append(cfg(condition=True)(_named(f"L{i}.work")))
+        # A false decoration of the name reuses its winner.
+        assert cfg(condition=False)(_named("Hot.work")) is hot
+
+    # The bound is smaller than the live names: none of them is evicted.
+    assert len(_c._cm_cache) == len(live) + 1
+    assert stats()["cm_cache"]["evicted"] == 0
+    assert all(
+        cfg(condition=False)(_named(f"L{i}.work")) is winner
+        for i, winner in enumerate(live)
+    )
+
+
+def test_max_size_reclaims_stale():
+    set_cache_policy(max_size=64, sweep_threshold=10**6)
+    old = [cfg(condition=True)(_named(f"O{i}.work")) for i in range(200)]
+    # A raiser resets the caches: the old winners become stale, and the
+    # writes over the bound reclaim them.
+    cfg(condition=False)(_named("Raiser.work"))
+    live = [cfg(condition=True)(_named(f"L{i}.work")) for i in range(100)]
+
+    counters = stats()["cm_cache"]
+    assert counters["stale"] == len(old)
+    assert counters["sweeps"] == 0
+    assert len(_c._cm_cache) <= len(live) + 1
+
+
+def test_max_size_class_with_overrides():
+    # Every default stays in the cache until its override is decorated.
+    set_cache_policy(policy="clock", max_size=8)
+    source = "class Big:\n"
+    for variant, condition in (("default", True), ("override", False)):
+        for i in range(40):
+            source += f"    @cfg(condition={condition})\n"
+            source += f"    def m{i}(self):\n        return {variant!r}\n"
+    namespace = {"__name__": "policytest", "cfg": cfg}
+    exec(source, namespace)
+    big = namespace["Big"]()
+    assert [getattr(big, f"m{i}")() for i in range(40)] == ["default"] * 40
+    assert stats()["cm_cache"]["evicted"] == 0
+
+
+def test_lookup_by_value():
+    winner = cfg(condition=True)(_named("Value.work"))
+    # An equal str that is not the interned key finds the entry too.
+    key = "".join(["policytest.", "Value", ".work"])
+    assert key in _c._cm_cache
+    assert _c._cm_cache[key]() is winner
+    assert _c._cm_cache.get(key)() is winner
+    assert 42 not in _c._cm_cache
+    with pytest.raises(KeyError):
+        _c._cm_cache[["unhashable"]]
+
+
+def test_churn_reuses_removed_slots():
+    # Winners dying and names coming back leave removed slots behind; the
+    # table keeps working through them and across its resizes.
+    for _ in range(20):
+        winners = [cfg(condition=True)(_named(f"C{i}.work")) for i in range(300)]
+        assert len(_c._cm_cache) == 300
+        assert cfg(condition=False)(_named("C7.work")) is winners[7]
+        del winners
+        gc.collect()
+        assert len(_c._cm_cache) == 0
+    assert stats()["cm_cache"]["dead_weakrefs"] == 20 * 300
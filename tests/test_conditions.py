@@ -0,0 +1,206 @@
+"""Native conditions: ``cfg.env(...)``, ``cfg.flag(...)``, ``&``, ``|``, ``~``.
+
+A ``_Condition`` is an expression tree the extension evaluates itself,
+against the live environment and the flags set with ``cfg.set_flags``,
+instead of calling back into a Python condition.
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+from conditional_method import _c, cfg, cfg_attr, reselect
+
+ENV = "CM_TEST_ENVIRONMENT"
+
+_TESTS = __name__.rpartition(".")[0] + "."
+
+
+@pytest.fixture(autouse=True)
+def _clean_state(monkeypatch):
+    monkeypatch.delenv(ENV, raising=False)
+    # Module-level test classes are decorated at import; keep their entries
+    # and drop whatever tests defined locally (or outside the test package).
+    for qualname in list(_c._candidates):
+        if "<locals>" in qualname or not qualname.startswith(_TESTS):
+            del _c._candidates[qualname]
+    yield
+    _c._flags.clear()
+    _c._failed_qualnames.clear()
+
+
+def test_env_reads_the_live_environment(monkeypatch):
+    is_set = cfg.env(ENV)
+    is_prod = cfg.env(ENV) == "production"
+    not_prod = cfg.env(ENV) != "production"
+
+    assert (is_set(), is_prod(), not_prod()) == (False, False, True)
+    monkeypatch.setenv(ENV, "")
+    assert (is_set(), is_prod(), not_prod()) == (False, False, True)
+    monkeypatch.setenv(ENV, "production")
+    assert (is_set(), is_prod(), not_prod()) == (True, True, False)
+    monkeypatch.setenv(ENV, "staging")
+    assert (is_set(), is_prod(), not_prod()) == (True, False, True)
+
+
+def test_composition(monkeypatch):
+    monkeypatch.setenv(ENV, "production")
+    prod = cfg.env(ENV) == "production"
+    beta = cfg.flag("beta")
+
+    assert (prod & ~beta)()
+    assert not (prod & beta)()
+    assert (beta | prod)()
+    assert not (~prod | beta)()
+    # bools are accepted on either side.
+    assert (True & prod)() and (prod | False)()
+    assert not (prod & False)() and (False | ~beta)()
+    assert (prod & beta).keys == {ENV, "beta"}
+    assert (True & beta).keys == {"beta"}
+
+
+def test_short_circuit_and_repr():
+    missing = cfg.env(ENV)
+    condition = (missing == "a") & ~cfg.flag("x") | (missing != "b")
+    assert repr(condition) == (
+        f"((cfg.env('{ENV}') == 'a') & ~cfg.flag('x')) | (cfg.env('{ENV}') != 'b')"
+    )
+    assert repr(~(missing == "a")) == f"~(cfg.env('{ENV}') == 'a')"
+    assert repr(True & missing) == f"True & cfg.env('{ENV}')"
+    assert condition("any", key="args") is True
+
+
+def test_flags():
+    new_ui = cfg.flag("new_ui")
+    assert new_ui() is False
+    assert cfg.set_flags(new_ui=True) == []
+    assert new_ui() is True
+    cfg.set_flags({"new_ui": 0})
+    assert new_ui() is False
+    assert _c._flags == {"new_ui": 0}
+
+
+def test_misuse_raises():
+    condition = cfg.env(ENV) == "production"
+    with pytest.raises(TypeError, match="combine conditions with `&`"):
+        bool(condition)
+    with pytest.raises(TypeError, match="combine conditions"):
+        condition and cfg.flag("x")  # noqa: B018
+    with pytest.raises(TypeError, match="environment variables are str"):
+        cfg.env(ENV) == 1  # noqa: B015
+    with pytest.raises(TypeError, match="unsupported operand"):
+        condition & 1  # noqa: B018
+    with pytest.raises(TypeError, match=r"`cfg.env` expects a str name"):
+        cfg.env(1)
+    with pytest.raises(TypeError, match=r"`cfg.flag` expects a str name"):
+        cfg.flag(b"x")
+    with pytest.raises(TypeError, match="flag names must be str"):
+        cfg.set_flags({1: True})
+    with pytest.raises(TypeError, match="cannot create"):
+        _c._Condition()
+
+
+def test_identity_semantics():
+    flag = cfg.flag("x")
+    # Only environment leaves compare into conditions; others by identity.
+    assert flag == flag and flag != cfg.flag("x")
+    assert len({flag, flag, cfg.flag("x")}) == 2
+    with pytest.raises(TypeError):
+        cfg.env(ENV) < "a"  # noqa: B015
+
+
+PROD = cfg.env(ENV) == "production"
+
+
+class Service:
+    @cfg(condition=~PROD)
+    def work(self):
+        return "dev"
+
+    @cfg(condition=PROD)
+    def work(self):
+        return "prod"
+
+
+def test_selection_tracks_the_names_read(monkeypatch):
+    assert Service().work() == "dev"
+    entry = _c._candidates[f"{__name__}.Service.work"]
+    assert entry.keys == {ENV}
+
+    monkeypatch.setenv(ENV, "production")
+    assert reselect(changed_keys=ENV) == [f"{__name__}.Service.work"]
+    assert Service().work() == "prod"
+    monkeypatch.delenv(ENV)
+    reselect(changed_keys=[ENV])
+    assert Service().work() == "dev"
+
+
+class Flagged:
+    @cfg(condition=True)
+    def render(self):
+        return "old"
+
+    @cfg(condition=cfg.flag("new_renderer"))
+    def render(self):
+        return "new"
+
+    @cfg(condition=True)
+    def declared(self):
+        return "default"
+
+    @cfg(condition=cfg.flag("new_renderer"), depends_on="renderer")
+    def declared(self):
+        return "declared"
+
+
+def test_set_flags_reselects():
+    assert Flagged().render() == "old"
+    assert cfg.set_flags(new_renderer=True) == [f"{__name__}.Flagged.render"]
+    assert Flagged().render() == "new"
+    assert cfg.set_flags(new_renderer=False) == [f"{__name__}.Flagged.render"]
+    assert Flagged().render() == "old"
+    # An explicit depends_on= replaces the names the condition reads.
+    assert _c._candidates[f"{__name__}.Flagged.declared"].keys == {"renderer"}
+
+
+def test_direct_form(monkeypatch):
+    monkeypatch.setenv(ENV, "production")
+
+    def kept():
+        return "kept"
+
+    def dropped():
+        return "dropped"
+
+    assert cfg(kept, condition=PROD | False) is kept
+    assert isinstance(cfg(dropped, condition=~PROD), _c._TypeErrorRaiser)
+
+
+def test_cfg_attr(monkeypatch):
+    def shout(func):
+        return lambda: func().upper()
+
+    def greet():
+        return "hi"
+
+    with pytest.raises(TypeError):
+        cfg_attr(greet, condition=cfg.env(ENV), decorators=[shout])()
+    monkeypatch.setenv(ENV, "x")
+    assert cfg_attr(greet, condition=cfg.env(ENV), decorators=[shout])() == "HI"
+    wrap = cfg_attr(condition=cfg.env(ENV) == "x", decorators=[shout])
+    assert wrap(greet)() == "HI"
+
+
+def test_environ_without_a_backing_dict(monkeypatch):
+    # A module instance created while os.environ is a plain mapping reads
+    # through the mapping instead of os.environ._data.
+    monkeypatch.setattr(os, "environ", {ENV: "production"})
+    spec = importlib.util.find_spec("conditional_method._c")
+    other = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(other)
+
+    assert (other.cfg.env(ENV) == "production")()
+    assert not other.cfg.env("CM_TEST_UNSET")()
+    os.environ[ENV] = "staging"
+    assert (other.cfg.env(ENV) != "production")()
@@ -0,0 +1,187 @@
+"""Frozen registry: ``freeze()`` / ``frozen()``.
+
+Freezing releases the selection caches and the candidate registry; a later
+decoration raises or thaws the registry, per ``on_decorate``.  The state
+belongs to the module object, so most tests freeze a fresh instance of the
+extension instead of the one the other test modules decorate with.
+"""
+
+import functools
+import importlib.util
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from _compat import named
+
+
+def _fresh_instance():
+    spec = importlib.util.find_spec("conditional_method._c")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_named = functools.partial(named, module="freezetest")
+
+
+def test_freeze_releases_the_registry():
+    c = _fresh_instance()
+
+    class Service:
+        @c.cfg(condition=lambda f: True)
+        def work(self):
+            return "fast"
+
+        @c.cfg(condition=False)
+        def work(self):  # noqa: F811
+            return "slow"
+
+    attr = c.cfg_attr(_named("B.work"), condition=True)
+    early = c.cfg(_named("A.work"), condition=True)
+    assert len(c._cfg_attr_cache) == 1
+    # A raiser opens a new cache generation: winners selected before it
+    # are still in the snapshot.
+    c.cfg(_named("C.work"), condition=False)
+    qualname = f"{__name__}.{Service.work.__qualname__}"
+    assert qualname in c._candidates
+
+    snapshot = c._freeze(False)
+
+    assert snapshot == {qualname: Service.work, "freezetest.A.work": early}
+    assert c._frozen()
+    assert len(c._cm_cache) == len(c._cfg_attr_cache) == 0
+    assert len(c._candidates) == 0
+    assert Service().work() == "fast"
+    assert attr() == "B.work"
+
+
+def test_decorating_a_frozen_registry_raises():
+    c = _fresh_instance()
+    factory = c.cfg(condition=True)
+    c._freeze(False)
+
+    with pytest.raises(RuntimeError, match="frozen"):
+        c.cfg(_named("A.work"), condition=True)
+    with pytest.raises(RuntimeError, match="frozen"):
+        factory(_named("A.work"))
+    with pytest.raises(RuntimeError, match="frozen"):
+        c.cfg(condition=False, lazy=True)(_named("A.work"))
+    with pytest.raises(RuntimeError, match="frozen"):
+        c.cfg_attr(_named("A.work"), condition=True)
+    with pytest.raises(RuntimeError, match="frozen"):
+        c.reselect()
+    # Building a decorator is not a decoration.
+    assert callable(c.cfg(condition=True))
+    assert c._frozen()
+    assert len(c._cm_cache) == 0
+
+
+def test_thaw_opens_a_new_generation():
+    c = _fresh_instance()
+    c._freeze(True)
+    generation = c._cache_generation()
+
+    winner = c.cfg(_named("A.work"), condition=True)
+
+    assert not c._frozen()
+    assert c._cache_generation() == generation + 1
+    assert c.cfg(_named("A.work"), condition=False) is winner
+
+
+def test_lazy_names_resolve_after_freeze():
+    c = _fresh_instance()
+
+    class Service:
+        @c.cfg(condition=lambda f: False, lazy=True)
+        def work(self):
+            return "slow"
+
+        @c.cfg(condition=lambda f: True, lazy=True)
+        def work(self):  # noqa: F811
+            return "fast"
+
+    c._freeze(False)
+    assert Service().work() == "fast"
+    assert c._frozen()
+
+
+SCRIPT = """
+import conditional_method as cm
+from conditional_method import cfg
+
+assert cm.frozen() is None
+try:
+    cm.freeze(on_decorate="later")
+except ValueError:
+    pass
+else:
+    raise AssertionError("bad policy accepted")
+
+@cfg(condition=False)
+def broken():
+    pass
+
+try:
+    cm.freeze()
+except cm.ConditionFailureError as exc:
+    assert exc.failed == ["__main__.broken"]
+else:
+    raise AssertionError("freeze() did not validate")
+assert cm.frozen() is None
+cm._c._failed_qualnames.clear()
+
+@cfg(condition=True)
+def ok():
+    return "ok"
+
+def make():
+    class Local:
+        @cfg(condition=True)
+        def m(self):
+            return "local"
+
+    return Local
+
+Local = make()
+local = "__main__.make.<locals>.Local.m"
+
+snapshot = cm.freeze(on_decorate="thaw")
+assert cm.frozen() is snapshot
+assert snapshot["__main__.ok"] is ok
+assert snapshot[local] is Local.__dict__["m"]
+# The snapshot does not keep winners alive.
+del Local
+import gc
+gc.collect()
+assert local not in snapshot and local not in list(snapshot)
+assert len(snapshot) == len(list(snapshot))
+try:
+    snapshot["__main__.ok"] = None
+except TypeError:
+    pass
+else:
+    raise AssertionError("snapshot is writable")
+
+@cfg(condition=True)
+def later():
+    return "later"
+
+assert later() == "later"
+assert cm.frozen() is None
+print("done")
+"""
+
+
+def test_freeze_api():
+    proc = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(SCRIPT)],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        check=True,
+    )
+    assert proc.stdout == "done\n"
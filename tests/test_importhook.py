@@ -0,0 +1,399 @@
+"""Import hook: ``install_import_hook(profile=...)`` drops the ``@cfg``
+candidates the profile rules out before modules are compiled."""
+
+import ast
+import importlib.util
+import os
+import sys
+import textwrap
+
+import pytest
+
+import conditional_method
+from conditional_method import _c, trace
+from conditional_method.importhook import (
+    Eliminated,
+    install_import_hook,
+    profile_hash,
+    specialize,
+    specialize_source,
+    uninstall_import_hook,
+)
+
+MODELS = """
+import conditional_method
+from conditional_method import cfg, cm as pick
+
+ENV = "development"
+REGION = "eu"
+
+
+class Service:
+    @cfg(condition=ENV == "production")
+    def work(self):
+        return "prod"
+
+    @cfg(condition=ENV != "production")
+    def work(self):
+        return "dev"
+
+    @pick(condition=REGION in ("eu", "uk"))
+    def region(self):
+        return "europe"
+
+    @conditional_method.if_(condition=not REGION in ("eu", "uk"))
+    def region(self):
+        return "elsewhere"
+
+    @cfg(condition=ENV == "production")
+    def dynamic(self):
+        return "prod"
+
+    @cfg(condition=lambda f: True)
+    def dynamic(self):
+        return "live"
+"""
+
+
+def _specialized(source, profile):
+    tree = ast.parse(textwrap.dedent(source))
+    eliminated = specialize(tree, profile)
+    return ast.unparse(tree), eliminated
+
+
+def test_specialize_drops_the_losers():
+    source, eliminated = _specialized(MODELS, {"ENV": "production", "REGION": "us"})
+
+    assert eliminated == [
+        Eliminated("Service.work", 14, 16),
+        Eliminated("Service.region", 18, 20),
+    ]
+    assert "return 'dev'" not in source
+    assert "return 'europe'" not in source
+    # The winners lose their @cfg; the undecidable group is left alone.
+    assert "@cfg(condition=ENV == 'production')\n    def work" not in source
+    assert "def work(self):\n        return 'prod'" in source
+    assert source.count("def dynamic") == 2
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        # Another binding of the name.
+        """
+        @cfg(condition=True)
+        def f(): ...
+
+        f = None
+        """,
+        # No winner: the raiser and its error are kept.
+        """
+        @cfg(condition=ENV == "dev")
+        def f(): ...
+        """,
+        # A name the profile does not declare.
+        """
+        @cfg(condition=ENV == OTHER)
+        def f(): ...
+        """,
+        # Options that defer the decision.
+        """
+        @cfg(condition=True, lazy=True)
+        def f(): ...
+
+        @cfg(condition=False, lazy=True)
+        def f(): ...
+        """,
+        # Not the decorator outermost.
+        """
+        @staticmethod
+        @cfg(condition=False)
+        def f(): ...
+
+        @cfg(condition=True)
+        def f(): ...
+        """,
+        # Shadowed by a parameter.
+        """
+        def make(ENV):
+            @cfg(condition=ENV == "prod")
+            def f(): ...
+
+            @cfg(condition=ENV != "prod")
+            def f(): ...
+        """,
+        # A `cfg` that is not conditional_method's.
+        """
+        from elsewhere import cfg
+
+        @cfg(condition=True)
+        def f(): ...
+
+        @cfg(condition=False)
+        def f(): ...
+        """,
+    ],
+)
+def test_specialize_leaves_undecidable_groups(source):
+    source = "from conditional_method import cfg\n" + textwrap.dedent(source)
+    expected = ast.unparse(ast.parse(source))
+
+    assert _specialized(source, {"ENV": "prod"}) == (expected, [])
+
+
+def test_specialize_nested_scopes():
+    source, eliminated = _specialized(
+        """
+        from conditional_method import *
+
+        def make():
+            class Local:
+                @cfg(condition=settings.DEBUG and ENV == "prod")
+                def work(self):
+                    return 1
+
+                @cfg(condition=True)
+                def work(self):
+                    return 2
+
+            return Local
+
+        if True:
+            class Guarded:
+                @cm(condition=ENV == "prod")
+                def work(self):
+                    return 3
+
+                @cm(condition=ENV < "prod")
+                def work(self):
+                    return 4
+        """,
+        {"ENV": "prod", "settings.DEBUG": False},
+    )
+
+    assert [e.qualname for e in eliminated] == [
+        "make.<locals>.Local.work",
+        "Guarded.work",
+    ]
+    assert "return 1" not in source
+    assert "return 4" not in source
+
+
+def test_specialize_cfg_attr():
+    source, eliminated = _specialized(
+        """
+        from conditional_method import cfg, cfg_attr
+
+        @cfg_attr(condition=ENV == "prod", decorators=[staticmethod, log])
+        def view(): ...
+
+        @cfg_attr(condition=ENV != "prod")
+        def view(): ...
+
+        @cfg_attr(condition=ENV == "prod", decorators=DECORATORS)
+        def other(): ...
+
+        @cfg_attr(condition=ENV != "prod")
+        def other(): ...
+
+        @cfg(condition=True)
+        def mixed(): ...
+
+        @cfg_attr(condition=False)
+        def mixed(): ...
+        """,
+        {"ENV": "prod"},
+    )
+
+    # The winner gets the decorators it names; a decorators list that is
+    # not written out, and a name with both kinds, are left alone.
+    assert [e.qualname for e in eliminated] == ["view"]
+    assert "@staticmethod\n@log\ndef view():\n    ..." in source
+    assert source.count("def other") == 2
+    assert source.count("def mixed") == 2
+
+
+def test_specialize_source_keeps_the_layout():
+    source = textwrap.dedent(
+        """\
+        from conditional_method import cfg_attr, cm
+
+        ENV = "dev"  # set at deploy time
+
+
+        class Service:
+            # The production client.
+            @cm(condition=ENV == "prod")  # fast path
+            def client(self):
+                return "prod"
+
+            @cm(
+                condition=ENV != "prod",
+            )
+            def client(self):
+                return "dev"
+
+            @cfg_attr(condition=ENV == "prod", decorators=[
+                property,
+            ])
+            def name(self):
+                return "é"
+        """
+    )
+    text, eliminated = specialize_source(source, {"ENV": "dev"})
+
+    assert eliminated == [Eliminated("Service.client", 8, 10)]
+    assert text == textwrap.dedent(
+        """\
+        from conditional_method import cfg_attr, cm
+
+        ENV = "dev"  # set at deploy time
+
+
+        class Service:
+            # The production client.
+
+            def client(self):
+                return "dev"
+
+            @cfg_attr(condition=ENV == "prod", decorators=[
+                property,
+            ])
+            def name(self):
+                return "é"
+        """
+    )
+    text, eliminated = specialize_source(source, {"ENV": "prod"})
+    assert [e.qualname for e in eliminated] == ["Service.client"]
+    assert "@property\n    def name(self):" in text
+    assert 'return "dev"' not in text
+    assert "# fast path" not in text
+    # Unchanged sources are returned as they are.
+    assert specialize_source(source, {}) == (source, [])
+
+
+def test_specialize_source_unparses_shared_lines():
+    source = "from conditional_method import cfg\n" + textwrap.dedent(
+        """
+        @cfg(condition=True)
+        def f(): ...
+
+        @(
+            cfg(condition=False)
+        )
+        def f(): ...
+        """
+    )
+    text, eliminated = specialize_source(source, {})
+    assert len(eliminated) == 1
+    assert text == ast.unparse(ast.parse(text)) + "\n"
+
+
+def test_profile_hash():
+    assert profile_hash({"ENV": "prod"}) == profile_hash({"ENV": "prod"})
+    assert profile_hash({"ENV": "prod"}) != profile_hash({"ENV": "dev"})
+    with pytest.raises(TypeError, match="profile entries"):
+        profile_hash({"ENV": object()})
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """A fresh ``cmhook_<n>`` package with the models above."""
+    name = f"cmhook_{len(sys.modules)}"
+    root = tmp_path / name
+    root.mkdir()
+    (root / "__init__.py").write_text("")
+    (root / "models.py").write_text(textwrap.dedent(MODELS))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    yield name
+    uninstall_import_hook()
+    trace.clear()
+    for module in [m for m in sys.modules if m.split(".")[0] == name]:
+        del sys.modules[module]
+    _c._failed_qualnames.clear()
+    for qualname in list(_c._candidates):
+        if qualname.startswith(name):
+            del _c._candidates[qualname]
+
+
+def _import(name):
+    for module in [m for m in sys.modules if m.split(".")[0] == name]:
+        del sys.modules[module]
+    return importlib.import_module(f"{name}.models")
+
+
+def test_hook(package):
+    assert conditional_method.install_import_hook is install_import_hook
+    finder = install_import_hook(
+        {"ENV": "production", "REGION": "eu"}, packages=[package]
+    )
+    assert sys.meta_path[0] is finder
+    trace.enable()
+    try:
+        models = _import(package)
+    finally:
+        trace.disable()
+
+    service = models.Service()
+    assert (service.work(), service.region(), service.dynamic()) == (
+        "prod",
+        "europe",
+        "live",
+    )
+    # Only the undecidable name was decorated.
+    decorated = [e.qualname for e in trace.events() if e.qualname.startswith(package)]
+    assert decorated == [f"{package}.models.Service.dynamic"] * 2
+    cached = importlib.util.cache_from_source(models.__file__, optimization=finder.tag)
+    assert models.__cached__ == cached
+    assert os.path.exists(cached)
+
+
+def test_hook_caches_per_profile(package, monkeypatch):
+    specialized = []
+
+    def counting(tree, profile):
+        specialized.append(profile)
+        return specialize(tree, profile)
+
+    monkeypatch.setattr("conditional_method.importhook.specialize", counting)
+    install_import_hook({"ENV": "production", "REGION": "eu"}, packages=[package])
+    _import(package)
+    # The second import loads the cached bytecode.
+    assert _import(package).Service().work() == "prod"
+    assert len(specialized) == 1
+
+    install_import_hook({"ENV": "staging", "REGION": "us"}, packages=[package])
+    service = _import(package).Service()
+    assert (service.work(), service.region()) == ("dev", "elsewhere")
+    assert len(specialized) == 2
+
+    # Without the hook the module is imported as written.
+    assert uninstall_import_hook()
+    assert not uninstall_import_hook()
+    assert _import(package).Service().work() == "dev"
+
+
+def test_hook_other_modules(package, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    (tmp_path / package / "plain.py").write_text("VALUE = 1\n")
+    finder = install_import_hook({"ENV": "production"})
+
+    models = _import(package)
+    plain = importlib.import_module(f"{package}.plain")
+
+    assert models.Service().work() == "prod"
+    assert plain.VALUE == 1
+    # Only the specialized module points at the profile's bytecode.
+    assert plain.__cached__ == importlib.util.cache_from_source(plain.__file__)
+    assert plain.__spec__.cached == plain.__cached__
+    assert models.__cached__ == importlib.util.cache_from_source(
+        models.__file__, optimization=finder.tag
+    )
+    assert not os.path.exists(
+        importlib.util.cache_from_source(models.__file__, optimization=finder.tag)
+    )
+    # The extension itself is never specialized.
+    assert finder.find_spec("conditional_method.trace") is None
+    assert install_import_hook({}, packages=["other"]).find_spec(package) is None
+    assert sys.meta_path.count(finder) == 0
@@ -0,0 +1,176 @@
+"""Import-time profile: ``profile_imports()`` and
+``python -m conditional_method.importtime``.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import conditional_method
+from conditional_method import _c, trace
+from conditional_method.importtime import main, profile_imports
+
+MODELS = """
+import time
+
+from conditional_method import cfg, cfg_attr
+
+
+def slow(func):
+    time.sleep(0.002)
+    return False
+
+
+def wrap(func):
+    time.sleep(0.002)
+    return func
+
+
+class Service:
+    @cfg(condition=slow)
+    def work(self):
+        return "slow"
+
+    @cfg(condition=True)
+    def work(self):
+        return "fast"
+
+
+@cfg(condition=False)
+def never():
+    return "never"
+
+
+@cfg_attr(condition=True, decorators=[wrap, wrap])
+def view():
+    return "view"
+"""
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """A fresh ``cmprof_<n>`` package whose ``sub.models`` decorates."""
+    name = f"cmprof_{len(sys.modules)}"
+    root = tmp_path / name
+    (root / "sub").mkdir(parents=True)
+    (root / "__init__.py").write_text("from .sub import models\n")
+    (root / "sub" / "__init__.py").write_text("")
+    (root / "sub" / "models.py").write_text(textwrap.dedent(MODELS))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    for module in [m for m in sys.modules if m.split(".")[0] == name]:
+        del sys.modules[module]
+    _c._failed_qualnames.clear()
+    trace.clear()
+
+
+def test_profile(package):
+    assert conditional_method.profile_imports is profile_imports
+    assert not trace.enabled()
+    with profile_imports() as profile:
+        __import__(package)
+    assert not trace.enabled()
+    assert profile.complete
+
+    models = f"{package}.sub.models"
+    assert [event.event for event in profile.events] == [
+        "cm.raiser",
+        "cm.select",
+        "cm.raiser",
+        "cfg_attr.apply",
+    ]
+    assert profile.raisers == 2
+
+    rows = {row.module: row for row in profile.modules()}
+    assert list(rows) == [package, f"{package}.sub", models]
+    assert (rows[models].decorations, rows[models].raisers) == (4, 2)
+    assert rows[package].self_ns == 0
+    assert rows[package].cumulative_ns == rows[models].self_ns == profile.total_ns
+    assert profile.total_ns >= 6_000_000
+
+    [condition] = profile.conditions()
+    assert condition.qualname == f"{models}.Service.work"
+    assert condition.kind == "callable"
+    assert condition.cost_ns >= 2_000_000
+
+    [chain] = profile.chains()
+    assert (chain.qualname, chain.chains) == (f"{models}.view", 1)
+    assert chain.chain_ns >= 4_000_000
+
+    out = io.StringIO()
+    profile.report(out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == (
+        "cfg decorations: self [us] | cumulative | count | raisers | module"
+    )
+    assert lines[3].endswith(f"|     4 |       2 |     {models}")
+    assert f"| callable | False  | {models}.Service.work" in lines[5]
+    assert lines[-1].startswith("cfg total: ")
+    assert lines[-1].endswith(" us | 4 decorations | 2 raisers")
+
+
+def test_keeps_tracing_on(package):
+    trace.enable()
+    try:
+        with profile_imports() as profile:
+            __import__(package)
+        assert trace.enabled()
+        # Only the block's decisions are profiled.
+        assert len(profile.events) == 4
+        assert len(trace.events()) >= 4
+    finally:
+        trace.disable()
+
+
+def test_overflow(package):
+    with profile_imports(capacity=2) as profile:
+        __import__(package)
+    assert not profile.complete
+    assert len(profile.events) == 2
+    out = io.StringIO()
+    profile.report(out)
+    assert "overflowed" in out.getvalue()
+
+
+def test_main(package, capsys):
+    assert main(["-n", "1", package]) == 0
+    out = capsys.readouterr().out
+    assert "cfg_attr chains: " in out
+    assert out.count("cfg conditions: ") == 2
+
+
+def test_star_import_stays_lazy():
+    script = textwrap.dedent(
+        """
+        import sys
+        from conditional_method import *
+        import cfg
+        lazy = ("trace", "importtime", "importhook", "manifest")
+        print(sorted(n for n in lazy if f"conditional_method.{n}" in sys.modules))
+        print(cfg.profile_imports.__module__)
+        """
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        check=True,
+    )
+    assert proc.stdout.split("\n")[:2] == ["[]", "conditional_method.importtime"]
+
+
+def test_cli(package):
+    proc = subprocess.run(
+        [sys.executable, "-m", "conditional_method.importtime", package],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        check=True,
+    )
+    assert proc.stdout.startswith("cfg decorations: self [us] | cumulative")
+    assert "cfg total: " in proc.stdout
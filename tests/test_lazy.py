@@ -0,0 +1,317 @@
+"""Lazy selection: ``@cfg(condition=..., lazy=True)``.
+
+Lazy decorations collect every candidate for a name in a ``_LazySelector``
+and evaluate nothing until the name is first used; the selector then
+replaces itself with the winner, so steady-state access is a plain lookup.
+"""
+
+import sys
+import types
+
+import pytest
+
+from conditional_method import _c, cfg
+
+
+@pytest.fixture(autouse=True)
+def _clean_caches():
+    _c._cm_cache.clear()
+    _c._failed_qualnames.clear()
+    yield
+    _c._cm_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+def _recording(calls, value):
+    def condition(func):
+        calls.append((func.__name__, value))
+        return value
+
+    return condition
+
+
+def test_conditions_run_on_first_access_only():
+    calls = []
+
+    class Worker:
+        @cfg(condition=_recording(calls, False), lazy=True)
+        def work(self):
+            return "dev"
+
+        @cfg(condition=_recording(calls, True), lazy=True)
+        def work(self):
+            return "prod"
+
+    selector = Worker.__dict__["work"]
+    assert isinstance(selector, _c._LazySelector)
+    assert not selector.resolved
+    assert selector.__qualname__.endswith("Worker.work")
+    assert calls == []
+
+    assert Worker().work() == "prod"
+    assert calls == [("work", False), ("work", True)]
+    assert selector.resolved
+
+    # The selector replaced itself: later accesses never evaluate again.
+    assert isinstance(Worker.__dict__["work"], types.FunctionType)
+    assert Worker().work() == "prod"
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        (True, False),
+        (False, True),
+        (True, True),
+        (False, False, True),
+        (True, False, False),
+    ],
+)
+def test_same_winner_as_eager(conditions):
+    def build(lazy):
+        namespace = {}
+        for index, condition in enumerate(conditions):
+
+            def work(self, index=index):
+                return index
+
+            work.__qualname__ = f"Parity{lazy}.work"
+            namespace["work"] = cfg(condition=condition, lazy=lazy)(work)
+        return type(f"Parity{lazy}", (), namespace)
+
+    eager = build(False)().work()
+    _c._cm_cache.clear()
+    assert build(True)().work() == eager
+
+
+def test_no_winner_raises_on_every_use():
+    class Worker:
+        @cfg(condition=False, lazy=True)
+        def work(self):
+            return "dev"
+
+    for _ in range(2):
+        with pytest.raises(TypeError, match="None of the conditions is true"):
+            Worker().work  # noqa: B018
+
+    assert isinstance(Worker.__dict__["work"], _c._LazySelector)
+    assert any(name.endswith("Worker.work") for name in _c._get_failed())
+
+
+def test_class_access_and_subclass_resolve_on_owner():
+    class Base:
+        @cfg(condition=True, lazy=True)
+        def work(self):
+            return "base"
+
+    class Child(Base):
+        pass
+
+    assert Child.work(Child()) == "base"
+    assert isinstance(Base.__dict__["work"], types.FunctionType)
+    assert "work" not in Child.__dict__
+
+
+class _NameAware:
+    """Descriptor that needs __set_name__, like functools.cached_property."""
+
+    def __init__(self, func):
+        self.__wrapped__ = func
+
+    def __set_name__(self, owner, name):
+        self.owner_name = (owner.__name__, name)
+
+    def __get__(self, obj, objtype=None):
+        return self.owner_name
+
+
+def test_descriptor_winners_bind_like_eager():
+    class Worker:
+        @cfg(condition=True, lazy=True)
+        @staticmethod
+        def static():
+            return "static"
+
+        @cfg(condition=True, lazy=True)
+        @classmethod
+        def klass(cls):
+            return cls.__name__
+
+        @cfg(condition=True, lazy=True)
+        @_NameAware
+        def named(self):
+            return None
+
+    worker = Worker()
+    assert worker.static() == "static"
+    assert Worker.klass() == "Worker"
+    # __set_name__ reached the winner once it was installed.
+    assert worker.named == ("Worker", "named")
+
+
+def test_each_class_build_gets_its_own_selector():
+    def make(prod):
+        class Worker:
+            @cfg(condition=not prod, lazy=True)
+            def work(self):
+                return "dev"
+
+            @cfg(condition=prod, lazy=True)
+            def work(self):
+                return "prod"
+
+        return Worker
+
+    prod, dev = make(True), make(False)
+    assert prod.__dict__["work"] is not dev.__dict__["work"]
+    assert dev().work() == "dev"
+    assert prod().work() == "prod"
+
+
+def _local(value):
+    @cfg(condition=value % 2 == 1, lazy=True)
+    def work():
+        return "odd", value
+
+    @cfg(condition=value % 2 == 0, lazy=True)
+    def work():
+        return "even", value
+
+    return work
+
+
+def test_each_call_gets_its_own_selector():
+    first, second = _local(1), _local(2)
+    assert first is not second
+    assert "(2 candidates, unresolved)" in repr(second)
+    assert first() == ("odd", 1)
+    assert second() == ("even", 2)
+
+    selectors = [_local(value) for value in range(1000)]
+    assert len(set(map(id, selectors))) == 1000
+    assert all("(2 candidates" in repr(selector) for selector in selectors)
+    assert selectors[-1]() == ("odd", 999)
+    # The completed calls' scopes are dropped by later decorations.
+    assert len(_c._build_scopes) < 3
+
+
+def test_module_level_function_rebinds_global():
+    module = types.ModuleType("lazytest_mod")
+    sys.modules[module.__name__] = module
+    try:
+        exec(
+            "from conditional_method import cfg\n"
+            "@cfg(condition=False, lazy=True)\n"
+            "def handler():\n"
+            "    return 'dev'\n"
+            "@cfg(condition=True, lazy=True)\n"
+            "def handler():\n"
+            "    return 'prod'\n",
+            module.__dict__,
+        )
+        selector = module.handler
+        assert isinstance(selector, _c._LazySelector)
+
+        assert selector() == "prod"
+        assert isinstance(module.handler, types.FunctionType)
+        assert module.handler() == "prod"
+        # A reference taken before resolution keeps forwarding.
+        assert selector() == "prod"
+    finally:
+        del sys.modules[module.__name__]
+
+
+def test_direct_form_and_lazy_false():
+    def work():
+        return "x"
+
+    selector = cfg(work, condition=True, lazy=True)
+    assert isinstance(selector, _c._LazySelector)
+    assert selector() == "x"
+    assert cfg(work, condition=True, lazy=False) is work
+
+
+def test_condition_error_surfaces_on_access_and_retries():
+    state = {"fail": True}
+
+    def flaky(func):
+        if state["fail"]:
+            raise ValueError("not ready")
+        return True
+
+    class Worker:
+        @cfg(condition=flaky, lazy=True)
+        def work(self):
+            return "ok"
+
+    with pytest.raises(ValueError, match="not ready"):
+        Worker().work()
+    assert not Worker.__dict__["work"].resolved
+
+    state["fail"] = False
+    assert Worker().work() == "ok"
+
+
+def test_repr_and_unusual_winners():
+    class Plain:
+        """Callable winner that is not a descriptor."""
+
+        def __init__(self, value):
+            self.__qualname__ = "Unusual.attr"
+            self.value = value
+
+        def __call__(self):
+            return self.value
+
+    class Unusual:
+        attr = cfg(condition=True, lazy=True)(Plain("plain"))
+
+    selector = Unusual.__dict__["attr"]
+    assert "'" in repr(selector) and "unresolved" in repr(selector)
+    assert Unusual().attr() == "plain"
+    assert "resolved" in repr(selector)
+
+
+def test_winner_set_name_error_propagates():
+    class Broken(_NameAware):
+        def __set_name__(self, owner, name):
+            raise LookupError("no owner for you")
+
+    class Worker:
+        @cfg(condition=True, lazy=True)
+        @Broken
+        def named(self):
+            return None
+
+    with pytest.raises(LookupError, match="no owner"):
+        Worker().named  # noqa: B018
+    assert not Worker.__dict__["named"].resolved
+
+
+def test_module_level_without_a_bound_global():
+    def orphan():
+        return "orphan"
+
+    orphan.__module__ = "no.such.module"
+    selector = cfg(orphan, condition=True, lazy=True)
+    assert selector() == "orphan"
+
+    def unbound():
+        return "unbound"
+
+    unbound.__module__ = __name__
+    selector = cfg(unbound, condition=True, lazy=True)
+    assert selector() == "unbound"
+    assert "unbound" not in globals()
+
+    def gone():
+        return "gone"
+
+    del gone.__module__
+    assert cfg(gone, condition=True, lazy=True)() == "gone"
+
+
+def test_lazy_selector_is_not_instantiable():
+    with pytest.raises(TypeError, match="cannot create"):
+        _c._LazySelector()
@@ -0,0 +1,267 @@
+"""Selection manifest: ``conditional_method.manifest.use_manifest``.
+
+A manifest records the winner of every name selected by a callable
+condition; a later start with the same fingerprint answers those
+conditions from it instead of calling them, as long as the file each name
+was defined in is unchanged.
+"""
+
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import conditional_method
+from conditional_method import _c, reselect, reset_stats, stats
+from conditional_method.manifest import SelectionManifest, use_manifest
+
+MODULE = "manifestcase"
+
+SOURCE = """\
+from conditional_method import cfg
+
+CALLS = []
+
+
+def check(name, value):
+    def condition(func):
+        CALLS.append(name)
+        return value
+
+    return condition
+
+
+@cfg(condition=check("a", False))
+def work():
+    return "a"
+
+
+@cfg(condition=check("b", True))
+def work():
+    return "b"
+
+
+@cfg(condition=check("c", False))
+def work():
+    return "c"
+
+
+class Service:
+    @cfg(condition=check("static", True))
+    @staticmethod
+    def build():
+        return "static"
+
+
+
+@cfg(condition=check("none", False))
+def missing():
+    return "missing"
+"""
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    reset_stats()
+    yield
+    manifest = sys.modules["conditional_method.manifest"]
+    if manifest._active is not None:
+        manifest._active.close()
+    for qualname in list(_c._candidates):
+        if qualname.startswith(MODULE):
+            del _c._candidates[qualname]
+    _c._cm_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+def _names(path, fingerprint=b""):
+    """The names of this module the manifest at `path` holds."""
+    manifest = SelectionManifest(path, fingerprint)
+    names = [name for name, _ in manifest._table.items() if name.startswith(MODULE)]
+    manifest.close()
+    return names
+
+
+NAMES = [f"{MODULE}.Service.build", f"{MODULE}.missing", f"{MODULE}.work"]
+
+
+def _run(path):
+    """Execute the module at `path` as a fresh start would."""
+    for qualname in list(_c._candidates):
+        if qualname.startswith(MODULE):
+            del _c._candidates[qualname]
+    _c._cm_cache.clear()
+    namespace = {"__name__": MODULE}
+    exec(compile(path.read_text(), str(path), "exec"), namespace)
+    return namespace
+
+
+@pytest.fixture
+def module(tmp_path):
+    path = tmp_path / "case.py"
+    path.write_text(SOURCE)
+    return path
+
+
+def test_warm_start_answers_conditions(module, tmp_path):
+    manifest = use_manifest(tmp_path / "selection", "prod")
+    assert manifest.loaded == 0
+    assert conditional_method.use_manifest is use_manifest
+    cold = _run(module)
+    assert cold["CALLS"] == ["a", "b", "c", "static", "none"]
+    assert manifest.save() >= 3
+    assert _names(manifest.path, "prod") == NAMES
+    manifest.close()
+
+    reset_stats()
+    manifest = use_manifest(tmp_path / "selection", "prod")
+    assert manifest.loaded >= 3
+    warm = _run(module)
+    assert warm["CALLS"] == []
+    assert stats()["manifest_hits"] == 5
+    assert stats()["condition_calls"] == 0
+    assert warm["work"]() == "b"
+    assert warm["Service"].build() == "static"
+    with pytest.raises(TypeError):
+        warm["missing"]()
+    # The registry records the same results, so saving again keeps them.
+    assert [bool(r) for r in _c._candidates[f"{MODULE}.work"].results] == [
+        False,
+        True,
+        False,
+    ]
+    manifest.save()
+    assert _names(manifest.path, "prod") == NAMES
+    assert manifest.stale == []
+
+
+def test_changed_file_is_selected_live(module, tmp_path):
+    use_manifest(tmp_path / "selection")
+    _run(module)
+    conditional_method.manifest._active.save()
+
+    module.write_text(SOURCE.replace('check("b", True)', 'check("b", False)'))
+    manifest = use_manifest(tmp_path / "selection")
+    assert _names(manifest.path) == NAMES
+    namespace = _run(module)
+    assert namespace["CALLS"] == ["a", "b", "c", "static", "none"]
+    assert stats()["manifest_hits"] == 0
+    assert manifest.stale == [str(module)]
+    with pytest.raises(TypeError):
+        namespace["work"]()
+
+    # Saved with the file as it is now, the record answers again.
+    module.write_text(SOURCE)
+    use_manifest(tmp_path / "selection")
+    _run(module)
+    conditional_method.manifest._active.save()
+    use_manifest(tmp_path / "selection")
+    assert _run(module)["CALLS"] == []
+
+
+def test_other_fingerprint_or_damaged_manifest(module, tmp_path):
+    path = tmp_path / "selection"
+    use_manifest(path, "prod")
+    _run(module)
+    conditional_method.manifest._active.save()
+
+    assert use_manifest(path, b"staging").loaded == 0
+    assert _run(module)["CALLS"] == ["a", "b", "c", "static", "none"]
+
+    data = path.read_bytes()
+    for damaged in (b"", data[:20], b"XXXX" + data[4:], data[:-8]):
+        path.write_bytes(damaged)
+        assert SelectionManifest(path, "prod").loaded == 0
+
+
+def test_names_not_decorated_are_kept(module, tmp_path):
+    use_manifest(tmp_path / "selection")
+    _run(module)
+    conditional_method.manifest._active.save()
+
+    manifest = use_manifest(tmp_path / "selection")
+    for qualname in list(_c._candidates):
+        if qualname.startswith(MODULE):
+            del _c._candidates[qualname]
+    manifest.save()
+    assert _names(manifest.path) == NAMES
+
+
+def test_reselect_calls_conditions(module, tmp_path):
+    use_manifest(tmp_path / "selection")
+    _run(module)
+    conditional_method.manifest._active.save()
+
+    use_manifest(tmp_path / "selection")
+    namespace = _run(module)
+    assert namespace["CALLS"] == []
+    with pytest.raises(TypeError, match=f"{MODULE}.missing"):
+        reselect()
+    assert {"b", "none"} <= set(namespace["CALLS"])
+
+
+def test_lookup_reads_the_mapping(module, tmp_path):
+    use_manifest(tmp_path / "selection")
+    _run(module)
+    conditional_method.manifest._active.save()
+
+    manifest = use_manifest(tmp_path / "selection")
+    table = manifest._table
+    names = [name for name, _ in table.items()]
+    assert names == sorted(names, key=lambda name: name.encode())
+    line = SOURCE.splitlines().index('@cfg(condition=check("b", True))') + 1
+    assert table.get(f"{MODULE}.work") == (str(module), line)
+    assert table.get(f"{MODULE}.missing") == (str(module), 0)
+    assert table.get(f"{MODULE}.nothing") is None
+
+    # Lookups answer from the mapping without decoding the other entries.
+    calls = []
+    lookup = manifest._lookup
+    _c._manifest_load(lambda name: calls.append(name) or lookup(name), manifest._check)
+    _run(module)
+    assert sorted(calls) == NAMES
+    # A record of another shape reads as none.
+    _c._manifest_load(lambda name: ("file.py",), manifest._check)
+    assert _run(module)["CALLS"] == ["a", "b", "c", "static", "none"]
+
+
+def test_load_validates_callables():
+    with pytest.raises(TypeError, match="callable"):
+        _c._manifest_load(None, len)
+    with pytest.raises(TypeError, match="callable"):
+        _c._manifest_load(1, len)
+
+
+def test_saved_at_freeze_or_exit(tmp_path):
+    # Without `missing` every name has a true condition.
+    (tmp_path / "case.py").write_text(
+        SOURCE[: SOURCE.index('\n\n@cfg(condition=check("none"')]
+    )
+    script = textwrap.dedent(
+        f"""
+        import sys
+        sys.path.insert(0, {str(tmp_path)!r})
+        import conditional_method
+        manifest = conditional_method.use_manifest(
+            {str(tmp_path / "selection")!r}, "prod", save=sys.argv[1] == "save"
+        )
+        import case
+        conditional_method.freeze()
+        print(manifest.loaded, case.CALLS)
+        """
+    )
+
+    def run(save="save"):
+        return subprocess.run(
+            [sys.executable, "-c", script, save],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+
+    assert run() == "0 ['a', 'b', 'c', 'static']"
+    assert run("nosave") == "2 []"
+    (tmp_path / "selection").unlink()
+    assert run("nosave") == "0 ['a', 'b', 'c', 'static']"
+    assert not (tmp_path / "selection").exists()
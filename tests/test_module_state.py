@@ -0,0 +1,137 @@
+"""Per-module state (multi-phase init).
+
+Every ``conditional_method._c`` module object owns its caches, failure set,
+cache generation and heap types, so a second instance of the extension (or
+one imported in a sub-interpreter) never sees the first one's selections.
+"""
+
+import functools
+import gc
+import importlib.util
+import sys
+import weakref
+
+import pytest
+
+from _compat import named
+from conditional_method import _c
+
+
+@pytest.fixture(autouse=True)
+def _clean_caches():
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+    yield
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+def _fresh_instance():
+    spec = importlib.util.find_spec("conditional_method._c")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_named = functools.partial(named, module="statetest")
+
+
+def test_instances_do_not_share_state():
+    other = _fresh_instance()
+
+    assert other is not _c
+    assert other._cm_cache is not _c._cm_cache
+    assert other._cfg_attr_cache is not _c._cfg_attr_cache
+    assert other._failed_qualnames is not _c._failed_qualnames
+    assert other._TypeErrorRaiser is not _c._TypeErrorRaiser
+    assert other._CfgCallable is not _c._CfgCallable
+    assert other.cfg._cache is other._cm_cache
+
+
+def test_selection_is_per_instance():
+    other = _fresh_instance()
+    winner = _named("A.work")
+
+    assert other.cfg(condition=True)(winner) is winner
+    assert set(other._cm_cache) == {"statetest.A.work"}
+    assert other.cfg_attr(_named("B.work"), condition=False) is not None
+
+    assert set(other._failed_qualnames) == {"statetest.B.work"}
+    assert _c._cm_cache == {}
+    assert _c._get_failed() == []
+    # The winner lives in the other instance only.
+    raiser = _c.cfg(_named("A.work"), condition=False)
+    assert isinstance(raiser, _c._TypeErrorRaiser)
+    assert not isinstance(raiser, other._TypeErrorRaiser)
+
+
+def test_raiser_resets_its_own_instance():
+    other = _fresh_instance()
+    before = _c._cache_generation()
+    raiser = other.cfg(_named("A.work"), condition=False)
+
+    with pytest.raises(TypeError, match="statetest.A.work"):
+        raiser()
+    other._TypeErrorRaiser()
+
+    assert _c._cache_generation() == before
+
+
+def test_instance_is_collected():
+    other = _fresh_instance()
+    other.cfg(_named("A.work"), condition=False)
+    ref = weakref.ref(other)
+
+    del other
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_raiser_subclass_without_module_is_rejected():
+    class Unbound(_c._TypeErrorRaiser):
+        _cfg_module = None
+
+    with pytest.raises(TypeError, match="not bound"):
+        Unbound()
+
+
+def test_cfg_callable_is_not_instantiable():
+    with pytest.raises(TypeError, match="cannot create"):
+        _c._CfgCallable()
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 13), reason="_interpreters needs CPython 3.13+"
+)
+def test_isolated_subinterpreter():
+    _interpreters = pytest.importorskip("_interpreters")
+    interp = _interpreters.create("isolated")
+    try:
+        err = _interpreters.run_string(
+            interp,
+            f"""
+import sys
+sys.path[:] = {sys.path!r}
+from conditional_method import _c, cfg
+
+class Worker:
+    @cfg(condition=False)
+    def work(self):
+        return "dev"
+
+    @cfg(condition=True)
+    def work(self):
+        return "prod"
+
+assert Worker().work() == "prod"
+assert set(_c._cm_cache) == {{"__main__.Worker.work"}}
+""",
+        )
+    finally:
+        _interpreters.destroy(interp)
+
+    assert err is None, err.formatted
+    assert _c._cm_cache == {}
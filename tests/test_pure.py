@@ -0,0 +1,189 @@
+"""Pure conditions: ``@cfg(condition=..., pure=True)``.
+
+A pure condition ignores the decorated function, so its result is memoized
+per condition object until the config epoch changes (``reselect``,
+``cfg.set_flags``, ``cfg.invalidate_conditions()``).
+"""
+
+import pytest
+
+from conditional_method import _c, cfg, reselect
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    cfg.invalidate_conditions()
+    yield
+    _c._failed_qualnames.clear()
+    for qualname in list(_c._candidates):
+        if "<locals>" in qualname:
+            del _c._candidates[qualname]
+
+
+def _counting(state):
+    def condition(func):
+        state["calls"] += 1
+        return state["value"]
+
+    return condition
+
+
+def _functions(count):
+    funcs = []
+    for i in range(count):
+
+        def f():
+            return i
+
+        f.__qualname__ = f"Pure.m{i}"
+        f.__module__ = "puretest"
+        funcs.append(f)
+    return funcs
+
+
+def test_evaluated_once_per_epoch():
+    state = {"calls": 0, "value": True}
+    condition = _counting(state)
+
+    for f in _functions(100):
+        assert cfg(f, condition=condition, pure=True) is f
+    assert state["calls"] == 1
+
+    # Other conditions are called as usual; purity belongs to the condition,
+    # so a later decoration without pure=True still uses the memo.
+    impure = _counting(state)
+    for f in _functions(3):
+        cfg(f, condition=impure)
+    assert state["calls"] == 4
+    cfg(_functions(1)[0], condition=condition)
+    assert state["calls"] == 4
+
+
+def test_invalidation():
+    state = {"calls": 0, "value": True}
+    condition = _counting(state)
+    other = _counting(state)
+    f = _functions(1)[0]
+
+    cfg(f, condition=condition, pure=True)
+    cfg(f, condition=other, pure=True)
+    assert state["calls"] == 2
+
+    cfg.invalidate_conditions(condition)
+    cfg(f, condition=condition, pure=True)
+    cfg(f, condition=other, pure=True)
+    assert state["calls"] == 3
+
+    cfg.invalidate_conditions()
+    cfg(f, condition=condition, pure=True)
+    cfg(f, condition=other, pure=True)
+    assert state["calls"] == 5
+
+    # Conditions that were never declared pure are ignored.
+    cfg.invalidate_conditions(lambda f: True, None)
+
+
+def test_class_build_and_lazy():
+    state = {"calls": 0, "value": False}
+    is_development = _counting(state)
+
+    def build(lazy):
+        class Service:
+            @cfg(condition=True, lazy=lazy)
+            def a(self):
+                return "a-prod"
+
+            @cfg(condition=is_development, pure=True, lazy=lazy)
+            def a(self):
+                return "a-dev"
+
+            @cfg(condition=True, lazy=lazy)
+            def b(self):
+                return "b-prod"
+
+            @cfg(condition=is_development, pure=True, lazy=lazy)
+            def b(self):
+                return "b-dev"
+
+        return Service
+
+    eager = build(False)
+    assert (eager().a(), eager().b()) == ("a-prod", "b-prod")
+    assert state["calls"] == 1
+
+    lazy = build(True)
+    assert (lazy().a(), lazy().b()) == ("a-prod", "b-prod")
+    assert state["calls"] == 1
+
+
+FLAGS = {"calls": 0, "value": False}
+IS_DEVELOPMENT = _counting(FLAGS)
+
+
+class Service:
+    @cfg(condition=True)
+    def a(self):
+        return "a-prod"
+
+    @cfg(condition=IS_DEVELOPMENT, pure=True, depends_on="dev")
+    def a(self):
+        return "a-dev"
+
+    @cfg(condition=True)
+    def b(self):
+        return "b-prod"
+
+    @cfg(condition=IS_DEVELOPMENT, pure=True, depends_on="dev")
+    def b(self):
+        return "b-dev"
+
+
+def test_reselect_starts_a_new_epoch():
+    FLAGS.update(calls=0, value=True)
+    rebound = reselect(changed_keys="dev")
+    assert rebound == [f"{__name__}.Service.a", f"{__name__}.Service.b"]
+    assert FLAGS["calls"] == 1
+    assert (Service().a(), Service().b()) == ("a-dev", "b-dev")
+
+    FLAGS["value"] = False
+    reselect(changed_keys="dev")
+    assert FLAGS["calls"] == 2
+    assert Service().a() == "a-prod"
+
+
+def test_errors_are_not_memoized():
+    state = {"fail": True, "calls": 0}
+
+    def flaky(func):
+        state["calls"] += 1
+        if state["fail"]:
+            raise ValueError("config not loaded")
+        return True
+
+    f = _functions(1)[0]
+    with pytest.raises(ValueError):
+        cfg(f, condition=flaky, pure=True)
+    state["fail"] = False
+    assert cfg(f, condition=flaky, pure=True) is f
+    assert cfg(f, condition=flaky, pure=True) is f
+    assert state["calls"] == 2
+
+
+def test_static_and_native_conditions_are_not_memoized():
+    size = len(_c._pure_memo)
+    f = _functions(1)[0]
+    cfg(f, condition=True, pure=True)
+    cfg(f, condition=cfg.flag("pure_test") | True, pure=True)
+    assert len(_c._pure_memo) == size
+
+
+def test_memo_is_bounded():
+    conditions = [lambda f: True for _ in range(1500)]
+    f = _functions(1)[0]
+    for condition in conditions:
+        cfg(f, condition=condition, pure=True)
+    assert 0 < len(_c._pure_memo) <= 1024
+
+    # Overflowing empties the memo; the factory form declares purity again.
+    cfg(condition=IS_DEVELOPMENT, pure=True)
+    assert id(IS_DEVELOPMENT) in _c._pure_memo
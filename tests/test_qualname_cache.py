@@ -0,0 +1,94 @@
+"""The qualified-name cache behind every decoration.
+
+Functions made from the same code (class factories, closures) share their
+``"module.qualname"`` key, so the extension builds it once per code object
+and reuses it while the function still carries the same ``__qualname__``
+and ``__module__``.
+"""
+
+import pytest
+
+from conditional_method import _c, _get_mod_qual_func_name, cfg
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    _c._qualname_cache.clear()
+    yield
+    _c._qualname_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+def _factory():
+    def work(self):
+        return 1
+
+    return work
+
+
+def test_functions_from_one_code_object_share_the_key():
+    first = _get_mod_qual_func_name(_factory())
+    assert first == f"{__name__}._factory.<locals>.work"
+    assert len(_c._qualname_cache) == 1
+
+    for _ in range(100):
+        assert _get_mod_qual_func_name(_factory()) is first
+    assert len(_c._qualname_cache) == 1
+
+
+def test_renamed_functions_get_their_own_name():
+    plain = _get_mod_qual_func_name(_factory())
+
+    renamed = _factory()
+    renamed.__qualname__ = "Renamed.work"
+    assert _get_mod_qual_func_name(renamed) == f"{__name__}.Renamed.work"
+
+    moved = _factory()
+    moved.__module__ = "elsewhere"
+    assert _get_mod_qual_func_name(moved) == "elsewhere._factory.<locals>.work"
+
+    orphan = _factory()
+    orphan.__module__ = None
+    assert _get_mod_qual_func_name(orphan) == "_factory.<locals>.work"
+
+    assert _get_mod_qual_func_name(_factory()) == plain
+
+
+def test_class_factory_decorations_hit_the_cache():
+    def make():
+        class Worker:
+            @cfg(condition=False)
+            def work(self):
+                return "dev"
+
+            @cfg(condition=True)
+            def work(self):
+                return "prod"
+
+        return Worker
+
+    for _ in range(20):
+        assert make()().work() == "prod"
+    # One entry per code object: the two `work` definitions.
+    assert len(_c._qualname_cache) == 2
+
+
+def test_cache_is_bounded():
+    namespace = {"__name__": "qualname_bound"}
+    for i in range(5000):
+        exec(f"def f{i}(): pass", namespace)
+        _get_mod_qual_func_name(namespace[f"f{i}"])
+    assert 0 < len(_c._qualname_cache) <= 4096
+
+
+def test_objects_that_are_not_functions_are_not_cached():
+    class Wrapper:
+        def __init__(self, func):
+            self.__wrapped__ = func
+
+    assert _get_mod_qual_func_name(Wrapper(_factory())).endswith("<locals>.work")
+    # The wrapper itself is not cached; the function it wraps is.
+    assert len(_c._qualname_cache) == 1
+
+    with pytest.raises(TypeError, match="Cannot get fully qualified"):
+        _get_mod_qual_func_name(42)
@@ -0,0 +1,105 @@
+"""Shared raisers: every false decoration of a name gets the one
+``_TypeErrorRaiser`` kept for it, an untracked object holding just the name.
+"""
+
+import functools
+import gc
+import importlib.util
+import weakref
+
+import pytest
+
+from _compat import named
+
+
+def _fresh_instance():
+    spec = importlib.util.find_spec("conditional_method._c")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_named = functools.partial(named, module="raisertest")
+
+
+def test_one_raiser_per_name():
+    c = _fresh_instance()
+    raiser = c.cfg(_named("A.work"), condition=False)
+
+    assert c.cfg(_named("A.work"), condition=lambda f: False) is raiser
+    assert c.cfg_attr(_named("A.work"), condition=False) is raiser
+    assert c._raise_exec("raisertest.A.work") is raiser
+    assert c.cfg(_named("B.work"), condition=False) is not raiser
+    assert c._raisers == {
+        "raisertest.A.work": raiser,
+        "raisertest.B.work": c._raise_exec("raisertest.B.work"),
+    }
+    assert c._TypeErrorRaiser() is c._raise_exec() is c._raisers[""]
+
+
+def test_raiser_holds_just_the_name():
+    c = _fresh_instance()
+    raiser = c.cfg(_named("A.work"), condition=False)
+
+    assert not gc.is_tracked(raiser)
+    assert raiser.__qualname__ == "raisertest.A.work"
+    with pytest.raises(AttributeError):
+        raiser.__qualname__ = "raisertest.B.work"
+    with pytest.raises(AttributeError):
+        raiser.f_qualnames  # noqa: B018
+    with pytest.raises(TypeError, match="^None of the conditions is true for "):
+        raiser()
+
+
+def test_subclass_instances_are_not_shared():
+    c = _fresh_instance()
+
+    class Raiser(c._TypeErrorRaiser):
+        pass
+
+    assert Raiser() is not Raiser()
+    assert c._raisers == {}
+
+
+def test_freeze_releases_the_raisers():
+    c = _fresh_instance()
+    ref = weakref.ref(c)
+    c.cfg(_named("A.work"), condition=False)
+
+    c._freeze(False)
+
+    assert c._raisers == {}
+    del c
+    gc.collect()
+    assert ref() is None
+
+
+def test_raiser_outlives_its_instance():
+    c = _fresh_instance()
+    raiser = c.cfg(_named("A.work"), condition=False)
+    ref = weakref.ref(c)
+
+    del c
+    gc.collect()
+
+    assert ref() is None
+    with pytest.raises(TypeError, match="raisertest.A.work"):
+        raiser()
+
+
+def test_unused_raisers_are_pruned():
+    c = _fresh_instance()
+    held = c.cfg(_named("Held.work"), condition=False)
+    for i in range(3000):
+        c._raise_exec(f"raisertest.Dropped{i}.work")
+
+    # Pruned at 1024 and then at twice the raisers left: the ones only the
+    # dict refers to never pile up past that.
+    assert len(c._raisers) <= 1024
+    assert c._raisers["raisertest.Held.work"] is held
+    assert c.cfg(_named("Held.work"), condition=False) is held
+    keep = [c._raise_exec(f"raisertest.Kept{i}.work") for i in range(1000)]
+    for i in range(3000):
+        c._raise_exec(f"raisertest.Dropped{i}.work")
+    assert len(c._raisers) <= 2 * (len(keep) + 1)
+    assert all(c._raisers[r.__qualname__] is r for r in keep)
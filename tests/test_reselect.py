@@ -0,0 +1,347 @@
+"""Runtime re-selection: ``reselect(changed_keys=...)``.
+
+Names whose selection can change at runtime (a callable condition, or
+``depends_on=`` keys) keep every candidate in ``_c._candidates``;
+``reselect`` re-evaluates the affected conditions and swaps the new winner
+into the owning class or module namespace in place.
+"""
+
+import sys
+import types
+
+import pytest
+
+from conditional_method import _c, cfg, reselect
+
+_TESTS = __name__.rpartition(".")[0] + "."
+
+
+@pytest.fixture(autouse=True)
+def _clean_caches():
+    # Module-level test classes are decorated at import; keep their entries
+    # and drop whatever tests defined locally (or outside the test package).
+    for qualname in list(_c._candidates):
+        if "<locals>" in qualname or not qualname.startswith(_TESTS):
+            del _c._candidates[qualname]
+    yield
+    _c._failed_qualnames.clear()
+
+
+def _flag(flags, key, expected=True, calls=None):
+    def condition(func):
+        if calls is not None:
+            calls.append(key)
+        return flags[key] is expected
+
+    return condition
+
+
+# Eager decorations find their class again through the module, so the
+# classes re-selected at runtime live at module level (as long-lived worker
+# classes do).
+FLIP = {"FAST": False}
+
+
+class Flip:
+    @cfg(condition=_flag(FLIP, "FAST", False), depends_on="FAST")
+    def work(self):
+        return "slow"
+
+    @cfg(condition=_flag(FLIP, "FAST"), depends_on="FAST")
+    def work(self):
+        return "fast"
+
+
+def test_flag_flip_rebinds_class_attribute():
+    worker = Flip()
+    assert worker.work() == "slow"
+
+    FLIP["FAST"] = True
+    assert reselect(changed_keys=["FAST"]) == [f"{__name__}.Flip.work"]
+    assert worker.work() == "fast"
+
+    # Nothing changed: nothing to rebind.
+    assert reselect(changed_keys="FAST") == []
+    FLIP["FAST"] = False
+    reselect(changed_keys={"FAST"})
+    assert worker.work() == "slow"
+
+
+TARGETED = {"A": True, "B": True}
+TARGETED_CALLS = []
+
+
+class Targeted:
+    @cfg(condition=_flag(TARGETED, "A", calls=TARGETED_CALLS), depends_on="A")
+    def a(self):
+        return "a"
+
+    @cfg(condition=_flag(TARGETED, "B", calls=TARGETED_CALLS), depends_on=("B",))
+    def b(self):
+        return "b"
+
+    @cfg(condition=_flag(TARGETED, "A", calls=TARGETED_CALLS))
+    def undeclared(self):
+        return "undeclared"
+
+
+def test_only_conditions_reading_the_changed_keys_run():
+    TARGETED_CALLS.clear()
+    reselect(changed_keys=["A"])
+    assert TARGETED_CALLS == ["A"]
+
+    # A full reselect re-evaluates every tracked condition, declared or not.
+    TARGETED_CALLS.clear()
+    reselect()
+    assert sorted(TARGETED_CALLS) == ["A", "A", "B"]
+
+    assert reselect(changed_keys=["unknown"]) == []
+
+
+FALLBACK = {"NEW": False}
+
+
+class Fallback:
+    @cfg(condition=False)
+    def work(self):
+        return "never"
+
+    @cfg(condition=True)
+    def work(self):
+        return "default"
+
+    @cfg(condition=_flag(FALLBACK, "NEW"), depends_on="NEW")
+    def work(self):
+        return "new"
+
+
+def test_static_candidates_before_tracking_stay_as_fallback():
+    assert Fallback().work() == "default"
+    entry = _c._candidates[f"{__name__}.Fallback.work"]
+    assert len(entry.candidates) == 2
+    assert entry.results == [True, False]
+    assert entry.keys == {"NEW"}
+
+    FALLBACK["NEW"] = True
+    reselect(changed_keys="NEW")
+    assert Fallback().work() == "new"
+    FALLBACK["NEW"] = False
+    reselect(changed_keys="NEW")
+    assert Fallback().work() == "default"
+
+
+def test_static_conditions_are_not_tracked():
+    class Worker:
+        @cfg(condition=False)
+        def work(self):
+            return "dev"
+
+        @cfg(condition=True)
+        def work(self):
+            return "prod"
+
+    assert not any("Worker" in qualname for qualname in _c._candidates)
+
+
+ALL_OR_NOTHING = {"X": True, "Y": False}
+
+
+class AllOrNothing:
+    @cfg(condition=_flag(ALL_OR_NOTHING, "X"), depends_on="X")
+    def x(self):
+        return "x"
+
+    @cfg(condition=True)
+    def y(self):
+        return "y0"
+
+    @cfg(condition=_flag(ALL_OR_NOTHING, "Y"), depends_on="Y")
+    def y(self):
+        return "y1"
+
+
+def test_no_true_condition_raises_and_rebinds_nothing():
+    ALL_OR_NOTHING.update(X=False, Y=True)
+    try:
+        with pytest.raises(
+            TypeError, match=r"None of the conditions is true for .*\.x`"
+        ):
+            reselect(changed_keys=["X", "Y"])
+        assert AllOrNothing().x() == "x"
+        assert AllOrNothing().y() == "y0"
+    finally:
+        ALL_OR_NOTHING["X"] = True
+
+
+PATCHED = {"ON": True}
+
+
+class Patched:
+    @cfg(condition=_flag(PATCHED, "ON", False), depends_on="ON")
+    def work(self):
+        return "off"
+
+    @cfg(condition=_flag(PATCHED, "ON"), depends_on="ON")
+    def work(self):
+        return "on"
+
+
+def test_bindings_replaced_by_hand_are_left_alone():
+    Patched.work = lambda self: "patched"
+    PATCHED["ON"] = False
+    assert reselect(changed_keys="ON") == []
+    assert Patched().work() == "patched"
+
+
+DESCRIPTORS = {"ON": False}
+
+
+class Descriptors:
+    @cfg(condition=True)
+    @staticmethod
+    def static():
+        return "default"
+
+    @cfg(condition=_flag(DESCRIPTORS, "ON"), depends_on="ON")
+    @staticmethod
+    def static():
+        return "on"
+
+    @cfg(condition=True)
+    @classmethod
+    def klass(cls):
+        return "default"
+
+    @cfg(condition=_flag(DESCRIPTORS, "ON"), depends_on="ON")
+    @classmethod
+    def klass(cls):
+        return "on"
+
+
+def test_descriptor_candidates():
+    DESCRIPTORS["ON"] = True
+    assert len(reselect(changed_keys="ON")) == 2
+    assert Descriptors.static() == "on"
+    assert Descriptors.klass() == "on"
+
+
+def test_module_level_function_is_rebound():
+    module = types.ModuleType("reselect_mod")
+    sys.modules[module.__name__] = module
+    try:
+        exec(
+            "from conditional_method import cfg\n"
+            "FLAGS = {'V2': False}\n"
+            "@cfg(condition=True)\n"
+            "def handler():\n"
+            "    return 'v1'\n"
+            "@cfg(condition=lambda f: FLAGS['V2'], depends_on='V2')\n"
+            "def handler():\n"
+            "    return 'v2'\n"
+            "@cfg(condition=lambda f: FLAGS['V2'], depends_on='V2')\n"
+            "def beta():\n"
+            "    return 'beta'\n",
+            module.__dict__,
+        )
+        assert module.handler() == "v1"
+        # No true condition yet: the name is bound to the raiser.
+        assert isinstance(module.beta, _c._TypeErrorRaiser)
+        assert "reselect_mod.beta" in _c._get_failed()
+
+        module.FLAGS["V2"] = True
+        assert reselect(changed_keys="V2") == [
+            "reselect_mod.beta",
+            "reselect_mod.handler",
+        ]
+        assert module.handler() == "v2"
+        assert module.beta() == "beta"
+        assert "reselect_mod.beta" not in _c._get_failed()
+    finally:
+        del sys.modules[module.__name__]
+
+
+def test_class_factory_keeps_one_entry_per_name():
+    flags = {"ON": True}
+
+    def make():
+        class Worker:
+            @cfg(condition=_flag(flags, "ON"), depends_on="ON")
+            def work(self):
+                return "on"
+
+            @cfg(condition=_flag(flags, "ON", False), depends_on="ON")
+            def work(self):
+                return "off"
+
+        return Worker
+
+    for _ in range(50):
+        make()
+    entries = [q for q in _c._candidates if q.endswith("<locals>.Worker.work")]
+    assert len(entries) == 1
+    assert len(_c._candidates[entries[0]].candidates) == 2
+
+
+def test_local_classes_need_a_known_owner():
+    flags = {"ON": False}
+
+    def build(lazy):
+        class Worker:
+            @cfg(condition=True, lazy=lazy)
+            def work(self):
+                return "default"
+
+            @cfg(condition=_flag(flags, "ON"), depends_on="ON", lazy=lazy)
+            def work(self):
+                return "on"
+
+        return Worker
+
+    eager = build(False)
+    flags["ON"] = True
+    # `<locals>` is not reachable from sys.modules: the cache is updated, the
+    # class is not.
+    assert reselect(changed_keys="ON") == []
+    assert eager().work() == "default"
+
+    flags["ON"] = False
+    lazy = build(True)
+    assert lazy().work() == "default"
+    flags["ON"] = True
+    # The lazy install recorded the owning class.
+    assert reselect(changed_keys="ON") == [f"{__name__}.{lazy.work.__qualname__}"]
+    assert lazy().work() == "on"
+
+
+def test_condition_errors_propagate():
+    state = {"fail": False}
+
+    def flaky(func):
+        if state["fail"]:
+            raise ValueError("flag store down")
+        return True
+
+    class Worker:
+        @cfg(condition=flaky)
+        def work(self):
+            return "ok"
+
+    state["fail"] = True
+    with pytest.raises(ValueError, match="flag store down"):
+        reselect()
+    state["fail"] = False
+
+
+@pytest.mark.parametrize(
+    "depends_on", [[[]], type("Unhashable", (), {"__hash__": None})()]
+)
+def test_depends_on_must_be_keys(depends_on):
+    with pytest.raises(TypeError, match="depends_on"):
+        cfg(condition=True, depends_on=depends_on)
+    with pytest.raises(TypeError, match="depends_on"):
+        reselect(changed_keys=depends_on)
+
+
+def test_candidates_are_not_instantiable():
+    with pytest.raises(TypeError, match="cannot create"):
+        _c._Candidates()
@@ -0,0 +1,261 @@
+"""Class-level resolution: ``@cfg.resolve_class``.
+
+The class body collects its ``lazy=True`` candidates; ``resolve_class``
+selects every name in one pass once the class exists, so losing candidates
+leave no ``_TypeErrorRaiser`` or cache entry behind.
+"""
+
+import types
+
+import pytest
+
+from conditional_method import _c, cfg, reselect
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    _c._cm_cache.clear()
+    _c._failed_qualnames.clear()
+    yield
+    _c._cm_cache.clear()
+    _c._failed_qualnames.clear()
+    for qualname in list(_c._candidates):
+        if "<locals>" in qualname:
+            del _c._candidates[qualname]
+
+
+def _recording(calls, value):
+    def condition(func):
+        calls.append((func.__name__, value))
+        return value
+
+    return condition
+
+
+def test_resolves_every_name_at_class_creation():
+    calls = []
+
+    @cfg.resolve_class
+    class Service:
+        @cfg(condition=_recording(calls, False), lazy=True)
+        def work(self):
+            return "dev"
+
+        @cfg(condition=_recording(calls, True), lazy=True)
+        def work(self):
+            return "prod"
+
+        @cfg(condition=_recording(calls, True), lazy=True)
+        def other(self):
+            return "other-on"
+
+        @cfg(condition=False, lazy=True)
+        def other(self):
+            return "other-off"
+
+        def plain(self):
+            return "plain"
+
+    assert calls == [("work", False), ("work", True), ("other", True)]
+    for name in ("work", "other", "plain"):
+        assert isinstance(Service.__dict__[name], types.FunctionType)
+    service = Service()
+    assert (service.work(), service.other(), service.plain()) == (
+        "prod",
+        "other-on",
+        "plain",
+    )
+    # Losers left nothing behind.
+    assert not any("Service" in qualname for qualname in _c._cm_cache)
+    assert _c._get_failed() == []
+
+
+@pytest.mark.parametrize(
+    "conditions",
+    [(True, False), (False, True), (True, True), (False, False, True)],
+)
+def test_same_winner_as_eager(conditions):
+    def build(lazy):
+        namespace = {}
+        for index, condition in enumerate(conditions):
+
+            def work(self, index=index):
+                return index
+
+            work.__qualname__ = f"Parity{lazy}.work"
+            namespace["work"] = cfg(condition=condition, lazy=lazy)(work)
+        return type(f"Parity{lazy}", (), namespace)
+
+    eager = build(False)().work()
+    _c._cm_cache.clear()
+    assert cfg.resolve_class(build(True))().work() == eager
+
+
+def test_no_winner_fails_the_class_and_installs_nothing():
+    with pytest.raises(
+        TypeError, match=r"None of the conditions is true for `.*\.a`, `.*\.b`"
+    ):
+
+        @cfg.resolve_class
+        class Broken:
+            @cfg(condition=False, lazy=True)
+            def a(self):
+                return "a"
+
+            @cfg(condition=False, lazy=True)
+            def b(self):
+                return "b"
+
+            @cfg(condition=True, lazy=True)
+            def c(self):
+                return "c"
+
+    assert sorted(name.rpartition(".")[2] for name in _c._get_failed()) == [
+        "a",
+        "b",
+    ]
+
+    class Later:
+        @cfg(condition=False, lazy=True)
+        def a(self):
+            return "a"
+
+        @cfg(condition=True, lazy=True)
+        def c(self):
+            return "c"
+
+    with pytest.raises(TypeError):
+        cfg.resolve_class(Later)
+    # Nothing was installed; `c` still resolves on first use.
+    assert isinstance(Later.__dict__["c"], _c._LazySelector)
+    assert not Later.__dict__["c"].resolved
+    assert Later().c() == "c"
+
+
+def test_init_subclass_hook():
+    class Base:
+        __init_subclass__ = classmethod(cfg.resolve_class)
+
+        @cfg(condition=True, lazy=True)
+        def work(self):
+            return "base"
+
+    class Child(Base):
+        @cfg(condition=False, lazy=True)
+        def work(self):
+            return "child-dev"
+
+        @cfg(condition=True, lazy=True)
+        def work(self):
+            return "child-prod"
+
+    assert isinstance(Child.__dict__["work"], types.FunctionType)
+    assert Child().work() == "child-prod"
+    # The hook runs for subclasses only: the base resolves on first use.
+    assert isinstance(Base.__dict__["work"], _c._LazySelector)
+    assert Base().work() == "base"
+
+
+def test_eager_and_resolved_names_are_left_alone():
+    @cfg.resolve_class
+    class Mixed:
+        @cfg(condition=True)
+        def eager(self):
+            return "eager"
+
+        @cfg(condition=True, lazy=True)
+        def lazy(self):
+            return "lazy"
+
+    selector = Mixed.__dict__["lazy"]
+    assert Mixed().lazy() == "lazy"
+    assert cfg.resolve_class(Mixed) is Mixed
+    assert Mixed().eager() == "eager"
+
+    # A selector bound under a second class is resolved by its owner only.
+    Alias = type("Alias", (), {"lazy": selector})
+    assert cfg.resolve_class(Alias).__dict__["lazy"] is selector
+
+
+def test_descriptor_winners_get_set_name():
+    class NameAware:
+        def __init__(self, func):
+            self.__wrapped__ = func
+
+        def __set_name__(self, owner, name):
+            self.owner_name = (owner.__name__, name)
+
+        def __get__(self, obj, objtype=None):
+            return self.owner_name
+
+    @cfg.resolve_class
+    class Service:
+        @cfg(condition=True, lazy=True)
+        @staticmethod
+        def static():
+            return "static"
+
+        @cfg(condition=True, lazy=True)
+        @classmethod
+        def klass(cls):
+            return cls.__name__
+
+        @cfg(condition=True, lazy=True)
+        @NameAware
+        def named(self):
+            return None
+
+    assert Service.static() == "static"
+    assert Service.klass() == "Service"
+    assert Service().named == ("Service", "named")
+
+
+FLAGS = {"NEW": False}
+
+
+@cfg.resolve_class
+class Tracked:
+    @cfg(condition=False, lazy=True)
+    def work(self):
+        return "never"
+
+    @cfg(condition=True, lazy=True)
+    def work(self):
+        return "default"
+
+    @cfg(condition=lambda f: FLAGS["NEW"], depends_on="NEW", lazy=True)
+    def work(self):
+        return "new"
+
+
+def test_tracked_names_stay_reselectable():
+    assert Tracked().work() == "default"
+    entry = _c._candidates[f"{__name__}.Tracked.work"]
+    # The winner before tracking started stays in as the fallback.
+    assert entry.results == [True, False]
+
+    FLAGS["NEW"] = True
+    assert reselect(changed_keys="NEW") == [f"{__name__}.Tracked.work"]
+    assert Tracked().work() == "new"
+    FLAGS["NEW"] = False
+    reselect(changed_keys="NEW")
+    assert Tracked().work() == "default"
+
+
+def test_condition_errors_propagate():
+    def broken(func):
+        raise ValueError("flag store down")
+
+    class Service:
+        @cfg(condition=broken, lazy=True)
+        def work(self):
+            return "work"
+
+    with pytest.raises(ValueError, match="flag store down"):
+        cfg.resolve_class(Service)
+    assert not Service.__dict__["work"].resolved
+
+
+def test_rejects_non_classes():
+    with pytest.raises(TypeError, match="decorates classes"):
+        cfg.resolve_class(lambda: None)
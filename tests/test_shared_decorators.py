@@ -0,0 +1,108 @@
+"""Shared decorator objects for repeated conditions.
+
+``@cfg(condition=X)`` and ``@cfg_attr(condition=X, decorators=D)`` return
+the same decorator for the same condition object (and ``decorators``
+object), instead of building a new one per decorated function.
+"""
+
+import pytest
+
+from _compat import raises_set_name_error
+from conditional_method import _c, cfg, cfg_attr, cm, if_
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    _c._cm_decorators.clear()
+    _c._cfg_attr_decorators.clear()
+    yield
+    _c._cm_decorators.clear()
+    _c._cfg_attr_decorators.clear()
+    _c._failed_qualnames.clear()
+
+
+def is_production(func):
+    return False
+
+
+def test_same_condition_same_decorator():
+    assert cfg(condition=True) is cfg(condition=True) is cm(condition=True)
+    assert if_(condition=False) is cfg(condition=False)
+    assert cfg(condition=True) is not cfg(condition=False)
+    assert cfg(condition=is_production) is cfg(condition=is_production)
+    native = cfg.env("CM_TEST_SHARED")
+    assert cfg(condition=native) is cfg(condition=native)
+    # pure=True only registers the condition; the decorator is the same.
+    assert cfg(condition=is_production, pure=True) is cfg(condition=is_production)
+
+
+def test_identity_not_equality():
+    # 1 == True, but the decorators are keyed by identity.
+    assert cfg(condition=1) is not cfg(condition=True)
+    # Unhashable conditions are fine.
+    flags = [1]
+    assert cfg(condition=flags) is cfg(condition=flags)
+    assert cfg(condition=[1]) is not cfg(condition=flags)
+
+
+def test_lazy_and_depends_on_are_not_shared():
+    assert cfg(condition=True, lazy=True) is not cfg(condition=True, lazy=True)
+    assert cfg(condition=True, depends_on="x") is not cfg(
+        condition=True, depends_on="x"
+    )
+
+
+def test_shared_decorator_selects_per_function():
+    keep, drop = cfg(condition=True), cfg(condition=False)
+
+    class Worker:
+        @drop
+        def work(self):
+            return "dev"
+
+        @keep
+        def work(self):
+            return "prod"
+
+        @keep
+        def other(self):
+            return "other"
+
+    assert (Worker().work(), Worker().other()) == ("prod", "other")
+
+    with raises_set_name_error():
+
+        class Broken:
+            @drop
+            def work(self):
+                return "never"
+
+
+def test_cfg_attr_needs_the_same_decorators():
+    def shout(func):
+        return lambda: func().upper()
+
+    decorators = [shout]
+    first = cfg_attr(condition=True, decorators=decorators)
+    assert cfg_attr(condition=True, decorators=decorators) is first
+    assert cfg_attr(condition=True) is cfg_attr(condition=True)
+
+    # Another decorators object replaces the entry.
+    other = cfg_attr(condition=True, decorators=[shout])
+    assert other is not first
+    assert cfg_attr(condition=True, decorators=decorators) is not first
+
+    def greet():
+        return "hi"
+
+    assert first(greet)() == "HI"
+    assert cfg_attr(condition=True)(greet)() == "hi"
+
+
+def test_tables_are_bounded():
+    conditions = [lambda f: True for _ in range(300)]
+    for condition in conditions:
+        cfg(condition=condition)
+        cfg_attr(condition=condition)
+    assert 0 < len(_c._cm_decorators) <= 256
+    assert 0 < len(_c._cfg_attr_decorators) <= 256
@@ -0,0 +1,114 @@
+"""Soak test: a million mixed ``cfg`` / ``cfg_attr`` decorations over a fixed
+set of names leave memory, reference counts and (in ``PY_CFG_TESTING``
+builds) the extension's allocation counts flat."""
+
+import gc
+import itertools
+import sys
+import tracemalloc
+
+import pytest
+
+from _compat import named
+from conditional_method import _c, cfg, cfg_attr
+
+DECORATIONS = 1_000_000
+WARMUP = 50_000
+NAMES = 125
+
+
+def _named(i, prefix="Soak"):
+    return named(f"{prefix}{i}.work", "soaktest", result=i)
+
+
+def _is_even(func):
+    return func() % 2 == 0
+
+
+def _chain(func):
+    return func
+
+
+def _ops(funcs):
+    decorators = [_chain]
+    ops = []
+    for f, off in funcs:
+        ops += [
+            (cfg, f, {"condition": True}),
+            (cfg, f, {"condition": False}),
+            (cfg, f, {"condition": _is_even}),
+            (cfg_attr, f, {"condition": False}),
+            (cfg_attr, f, {"condition": _is_even, "decorators": decorators}),
+            (cfg_attr, f, {"condition": True}),
+            # Always disabled: the previous op reset the caches, so these
+            # take the raiser path every turn.
+            (cfg, off, {"condition": False}),
+            (cfg_attr, off, {"condition": False}),
+        ]
+    return ops
+
+
+def _run(ops, count):
+    # Whole turns, so every checkpoint sees the names in the same state.
+    assert count % len(ops) == 0
+    for decorate, f, kwargs in itertools.islice(itertools.cycle(ops), count):
+        decorate(f, **kwargs)
+
+
+def _refcounts(objects):
+    return [sys.getrefcount(obj) for obj in objects]
+
+
+@pytest.fixture
+def _clean():
+    yield
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+    for qualname in list(_c._candidates):
+        if qualname.startswith("soaktest."):
+            del _c._candidates[qualname]
+
+
+def test_million_decorations_stay_flat(_clean):
+    funcs = [(_named(i), _named(i, "Off")) for i in range(NAMES)]
+    ops = _ops(funcs)
+    _run(ops, WARMUP)
+    raisers = [r for name, r in _c._raisers.items() if name.startswith("soaktest.")]
+    watched = [*itertools.chain(*funcs), *raisers, _is_even, _chain, *_c._raisers]
+    counting = hasattr(_c, "alloc_counts")
+    if counting:
+        _c.reset_alloc_counts()
+    gc.collect()
+    refcounts = _refcounts(watched)
+    total = getattr(sys, "gettotalrefcount", lambda: 0)()
+
+    tracemalloc.start()
+    try:
+        _run(ops, DECORATIONS // 2)
+        gc.collect()
+        middle = tracemalloc.get_traced_memory()[0]
+        _run(ops, DECORATIONS - DECORATIONS // 2)
+        gc.collect()
+        end = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # The second half allocates nothing the first did not give back.
+    assert end - middle < 16 * 1024
+    # A cache entry more or less (a stale one not yet reclaimed) is not a
+    # leak; a leak would grow with the half million decorations.
+    assert all(abs(a - b) <= 2 for a, b in zip(_refcounts(watched), refcounts))
+    if total:
+        assert abs(sys.gettotalrefcount() - total) < 1000
+    if counting:
+        counts = _c.alloc_counts()
+        # Every name already has its raiser.
+        assert counts["raiser"] == (0, 0)
+        # Each store replaces or follows the reclaiming of an entry of the
+        # same name: the caches hold at most one entry per name each.
+        created, released = counts["cache_entry"]
+        assert created > 0
+        assert abs(created - released) <= 2 * NAMES
+        created, released = counts["qualname_key"]
+        assert created == released > 0
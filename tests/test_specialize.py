@@ -0,0 +1,202 @@
+"""Offline specialization: ``python -m conditional_method.specialize``."""
+
+import importlib.util
+import io
+import json
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from conditional_method.importhook import Eliminated
+from conditional_method.specialize import (
+    MANIFEST,
+    load_profile,
+    main,
+    specialize_tree,
+)
+
+needs_toml = pytest.mark.skipif(
+    sys.version_info < (3, 11) and importlib.util.find_spec("tomli") is None,
+    reason="reading TOML needs Python 3.11+ or tomli",
+)
+
+SERVICE = """\
+# The service.
+from conditional_method import cfg, cfg_attr
+
+ENV = "development"
+
+
+class Service:
+    @cfg(condition=ENV == "production")
+    def work(self):
+        return "prod"
+
+    @cfg(condition=ENV != "production")
+    def work(self):
+        return "dev"
+
+    @cfg(condition=lambda f: True)
+    def live(self):
+        return "live"
+
+    @cfg_attr(condition=ENV == "production", decorators=[staticmethod])
+    def build():
+        return "static"
+"""
+
+
+@pytest.fixture
+def tree(tmp_path):
+    source = tmp_path / "src"
+    (source / "app" / "__pycache__").mkdir(parents=True)
+    (source / "app" / "__init__.py").write_text("")
+    (source / "app" / "service.py").write_text(SERVICE)
+    (source / "app" / "broken.py").write_text("import conditional_method\ndef (:\n")
+    (source / "app" / "data.txt").write_text("payload")
+    (source / "app" / "__pycache__" / "service.cpython-313.pyc").write_bytes(b"")
+    return source, tmp_path / "out"
+
+
+def test_specialize_tree(tree):
+    source, out = tree
+    report = specialize_tree(source, out, {"ENV": "production"}, jobs=1)
+
+    assert [row.path for row in report.files] == [
+        "app/__init__.py",
+        "app/broken.py",
+        "app/data.txt",
+        "app/service.py",
+    ]
+    assert not (out / "app" / "__pycache__").exists()
+    assert (out / "app" / "data.txt").read_text() == "payload"
+    assert (out / "app" / "broken.py").read_text() == (
+        source / "app" / "broken.py"
+    ).read_text()
+    assert report.files[1].error.startswith("SyntaxError")
+
+    written = (out / "app" / "service.py").read_text()
+    assert report.files[3].eliminated == [Eliminated("Service.work", 12, 14)]
+    assert report.eliminated == 1
+    assert report.bytes_saved == len(SERVICE) - len(written) > 0
+    assert written.startswith("# The service.\n")
+    assert 'return "dev"' not in written
+    assert '    def work(self):\n        return "prod"' in written
+    assert "@staticmethod\n    def build():" in written
+    # Unresolvable conditions are left intact.
+    assert "@cfg(condition=lambda f: True)" in written
+
+    namespace = {}
+    exec(compile(written, "service.py", "exec"), namespace)
+    service = namespace["Service"]()
+    assert (service.work(), service.live(), service.build()) == (
+        "prod",
+        "live",
+        "static",
+    )
+
+
+def test_specialize_tree_skips_unchanged_files(tree):
+    source, out = tree
+    first = specialize_tree(source, out, {"ENV": "production"}, jobs=1)
+    assert first.unchanged == 0
+
+    (source / "app" / "data.txt").write_text("changed")
+    (source / "app" / "__init__.py").unlink()
+    again = specialize_tree(source, out, {"ENV": "production"}, jobs=1)
+    assert [row.path for row in again.files if not row.unchanged] == ["app/data.txt"]
+    assert again.eliminated == first.eliminated
+    assert (out / "app" / "data.txt").read_text() == "changed"
+    assert not (out / "app" / "__init__.py").exists()
+
+    # Another profile specializes everything again.
+    other = specialize_tree(source, out, {"ENV": "staging"}, jobs=1)
+    assert other.unchanged == 0
+    assert 'return "prod"' not in (out / "app" / "service.py").read_text()
+    assert json.loads((out / MANIFEST).read_text())["files"][0]["path"] == (
+        "app/broken.py"
+    )
+
+
+def test_specialize_tree_in_processes(tree):
+    source, out = tree
+    for index in range(8):
+        (source / "app" / f"copy{index}.py").write_text(SERVICE)
+
+    report = specialize_tree(source, out, {"ENV": "production"}, jobs=2)
+
+    assert report.eliminated == 9
+    assert (out / "app" / "copy7.py").read_text() == (
+        out / "app" / "service.py"
+    ).read_text()
+
+
+@needs_toml
+def test_load_profile(tmp_path):
+    config = tmp_path / "pyproject.toml"
+    config.write_text(
+        textwrap.dedent(
+            """
+            [tool.conditional-method.profiles.prod]
+            ENV = "production"
+            settings = { REGION = "eu", WORKERS = 8 }
+            """
+        )
+    )
+    assert load_profile("prod", config) == {
+        "ENV": "production",
+        "settings.REGION": "eu",
+        "settings.WORKERS": 8,
+    }
+    with pytest.raises(LookupError, match="profiles.dev"):
+        load_profile("dev", config)
+
+    profile = tmp_path / "prod.json"
+    profile.write_text('{"ENV": "production", "flags": {"FAST": true}}')
+    assert load_profile(str(profile)) == {"ENV": "production", "flags.FAST": True}
+
+
+@needs_toml
+def test_main(tree, tmp_path, monkeypatch, capsys):
+    source, out = tree
+    (tmp_path / "pyproject.toml").write_text(
+        '[tool.conditional-method.profiles.prod]\nENV = "staging"\n'
+    )
+    monkeypatch.chdir(tmp_path)
+
+    assert main(["--profile", "prod", "-D", "ENV=production", "-j1", "src", "out"]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "cfg specialized: saved [B] | removed | file"
+    assert lines[1].endswith("|       1 | app/service.py")
+    assert lines[3] == "cfg eliminated: 12-14     | app/service.py:Service.work"
+    assert lines[4].startswith("cfg copied: app/broken.py | SyntaxError")
+    assert lines[5].startswith("cfg total: 4 files (0 unchanged) | 1 candidates")
+    assert 'return "dev"' not in (out / "app" / "service.py").read_text()
+
+    with pytest.raises(SystemExit):
+        main(["--profile", "missing", "src", "out"])
+    assert "defines no" in capsys.readouterr().err
+
+
+def test_module_entry_point(tree):
+    source, out = tree
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "conditional_method.specialize",
+            "-D",
+            "ENV='production'",
+            str(source),
+            str(out),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "1 candidates eliminated" in result.stdout
+    report = io.StringIO(result.stdout).readlines()
+    assert report[-1].startswith("cfg total: 4 files")
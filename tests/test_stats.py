@@ -0,0 +1,130 @@
+"""Runtime statistics: ``stats()`` / ``reset_stats()``.
+
+The extension counts cache hits, misses, writes, reclaimed dead weakrefs
+and stale entries, sweeps and evictions per cache, the raisers it builds
+and the calls into callable conditions with their time.
+"""
+
+import functools
+import gc
+
+import pytest
+
+import conditional_method
+from _compat import named
+from conditional_method import _c, cfg, cfg_attr, reset_stats, stats
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    reset_stats()
+    yield
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+_named = functools.partial(named, module="statstest")
+
+
+def test_shape_and_reset():
+    counters = stats()
+    assert set(counters) == {
+        "cm_cache",
+        "cfg_attr_cache",
+        "raisers",
+        "condition_calls",
+        "condition_ns",
+        "manifest_hits",
+    }
+    for cache in ("cm_cache", "cfg_attr_cache"):
+        assert counters[cache] == {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "dead_weakrefs": 0,
+            "stale": 0,
+            "sweeps": 0,
+            "swept": 0,
+            "evicted": 0,
+        }
+    assert conditional_method.stats is stats
+
+    cfg(condition=False)(_named("A.work"))
+    assert stats()["raisers"] == 1
+    reset_stats()
+    assert stats()["raisers"] == 0
+    assert stats()["cm_cache"]["misses"] == 0
+
+
+def test_cm_cache_hits_and_misses():
+    winner = _named("A.work")
+    cfg(condition=True)(winner)
+    assert cfg(condition=False)(_named("A.work")) is winner
+    raiser = cfg(condition=False)(_named("B.work"))
+
+    counters = stats()
+    # The raiser's own entry is a write too.
+    assert counters["cm_cache"]["writes"] == 2
+    assert counters["cm_cache"]["hits"] == 1
+    assert counters["cm_cache"]["misses"] == 1
+    assert counters["raisers"] == 1
+    assert counters["cfg_attr_cache"]["writes"] == 0
+
+    # The raiser bumped the generation: A's winner is now stale.
+    assert cfg(condition=False)(_named("A.work")) is not raiser
+    counters = stats()["cm_cache"]
+    assert (counters["misses"], counters["stale"]) == (2, 1)
+
+
+def test_dead_weakrefs():
+    cfg(condition=True)(_named("A.work"))
+    gc.collect()
+    cfg(condition=False)(_named("A.work"))
+    counters = stats()["cm_cache"]
+    assert (counters["dead_weakrefs"], counters["misses"]) == (1, 1)
+
+
+def test_sweeps():
+    # A raiser makes the live winners stale; the writes that follow push the
+    # shards past their high-water mark, and sweeps reclaim them.
+    winners = [cfg(condition=True)(_named(f"W{i}.work")) for i in range(400)]
+    cfg(condition=False)(_named("Raiser.work"))
+    for i in range(400):
+        cfg(condition=True)(_named(f"X{i}.work"))
+    counters = stats()["cm_cache"]
+    assert counters["sweeps"] > 0
+    assert 0 < counters["swept"] <= counters["dead_weakrefs"] + counters["stale"]
+    assert len(winners) == 400
+
+
+def test_cfg_attr_cache():
+    winner = _named("A.work")
+    cfg_attr(winner, condition=True)
+    assert cfg_attr(_named("A.work"), condition=False) is winner
+    counters = stats()
+    assert counters["cfg_attr_cache"]["hits"] == 1
+    assert counters["cm_cache"]["hits"] == 0
+
+
+def test_callable_conditions_are_timed():
+    def is_production(func):
+        return False
+
+    cfg(condition=True)(_named("A.work"))
+    assert stats()["condition_calls"] == 0
+
+    cfg(condition=is_production)(_named("A.work"))
+    cfg_attr(_named("B.work"), condition=is_production)
+    # Native conditions are not calls.
+    cfg(condition=cfg.env("CM_STATS_TEST"))(_named("C.work"))
+    counters = stats()
+    assert counters["condition_calls"] == 2
+    assert counters["condition_ns"] > 0
+
+    # A memoized pure condition is called once.
+    cfg(condition=is_production, pure=True)(_named("D.work"))
+    cfg(condition=is_production, pure=True)(_named("D.work"))
+    assert stats()["condition_calls"] == 3
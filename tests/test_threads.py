@@ -0,0 +1,135 @@
+"""Concurrent decoration.
+
+The selection caches are shared by every thread of an interpreter.  With the
+GIL these tests pin down that interleaved decorations, raiser resets and
+cache reads stay consistent; on a free-threaded build (3.13t+) they run
+truly in parallel against the sharded caches.
+"""
+
+import functools
+import sys
+import sysconfig
+import threading
+
+import pytest
+
+from _compat import named
+from conditional_method import _c, cfg, cfg_attr
+
+THREADS = 8
+ROUNDS = 200
+
+
+@pytest.fixture(autouse=True)
+def _clean_caches():
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+    yield
+    _c._cm_cache.clear()
+    _c._cfg_attr_cache.clear()
+    _c._failed_qualnames.clear()
+
+
+def _run(target):
+    """Run ``target(index)`` in THREADS threads released together."""
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+_named = functools.partial(named, module="threadtest")
+
+
+def test_distinct_qualnames_in_parallel():
+    winners = {}
+
+    def target(index):
+        for i in range(ROUNDS):
+            winner = _named(f"T{index}.m{i}")
+            winners[winner.__qualname__] = winner
+            assert cfg(winner, condition=True) is winner
+
+    _run(target)
+
+    assert len(_c._cm_cache) == THREADS * ROUNDS
+    for qualname, winner in winners.items():
+        assert _c._cm_cache[f"threadtest.{qualname}"]() is winner
+
+
+def test_shared_class_builds_in_parallel():
+    def target(index):
+        for i in range(ROUNDS):
+            prod = (index + i) % 2 == 0
+
+            class Worker:
+                @cfg(condition=not prod)
+                def work(self):
+                    return "dev"
+
+                @cfg(condition=prod)
+                def work(self):
+                    return "prod"
+
+            # Every thread shares the qualname's cache entry, so a build
+            # interleaved with another thread's may pick up that thread's
+            # winner; it must still be one of the candidates.
+            assert Worker().work() in ("prod", "dev")
+
+    _run(target)
+
+
+def test_raiser_resets_race_with_selection():
+    def target(index):
+        for i in range(ROUNDS):
+            if index % 2:
+                raiser = cfg(_named(f"Gone{index}.m{i}"), condition=False)
+                with pytest.raises(TypeError):
+                    raiser()
+            else:
+                winner = _named(f"Kept{index}.m{i}")
+                assert cfg(winner, condition=True) is winner
+                # Whole-cache reads while other threads mutate it.
+                dict(_c._cm_cache.items())
+
+    _run(target)
+
+
+def test_cfg_attr_in_parallel():
+    def shout(func):
+        return lambda: func().upper()
+
+    kept = []
+
+    def target(index):
+        for i in range(ROUNDS):
+            wrapped = cfg_attr(
+                _named(f"Attr{index}.m{i}"), condition=True, decorators=[shout]
+            )
+            assert wrapped() == f"ATTR{index}.M{i}"
+            kept.append(wrapped)
+
+    _run(target)
+
+    assert len(_c._cfg_attr_cache) == THREADS * ROUNDS
+
+
+@pytest.mark.skipif(
+    not sysconfig.get_config_var("Py_GIL_DISABLED"),
+    reason="needs a free-threaded CPython build",
+)
+def test_import_keeps_gil_disabled():
+    assert sys._is_gil_enabled() is False
@@ -0,0 +1,305 @@
+"""Decision tracing: ``conditional_method.trace``.
+
+Selection decisions are recorded into a fixed-size in-memory ring while
+tracing is enabled, and cost nothing beyond a flag check while it is off.
+"""
+
+import io
+
+import pytest
+
+import conditional_method
+from conditional_method import _c, cfg, cfg_attr, reselect, trace
+
+
+@pytest.fixture(autouse=True)
+def _clean_trace():
+    trace.disable()
+    trace.clear()
+    yield
+    trace.disable()
+    trace.clear()
+    _c._failed_qualnames.clear()
+    for qualname in list(_c._candidates):
+        if "<locals>" in qualname:
+            del _c._candidates[qualname]
+
+
+def _events():
+    return [
+        (event.event, event.qualname.rpartition(".")[2]) for event in trace.events()
+    ]
+
+
+def test_off_records_nothing():
+    assert not trace.enabled()
+
+    @cfg(condition=True)
+    def work():
+        return 1
+
+    assert trace.events() == []
+
+
+def test_cm_decisions():
+    trace.enable()
+    assert trace.enabled()
+
+    class Service:
+        @cfg(condition=True)
+        def work(self):
+            return "prod"
+
+        @cfg(condition=False)
+        def work(self):
+            return "dev"
+
+        @cfg(condition=True, lazy=True)
+        def later(self):
+            return "later"
+
+    @cfg(condition=lambda f: False)
+    def missing():
+        return "never"
+
+    assert _events() == [
+        ("cm.select", "work"),
+        ("cm.cached", "work"),
+        ("cm.lazy", "later"),
+        ("cm.raiser", "missing"),
+    ]
+    recorded = trace.events()
+    assert recorded[0].qualname == f"{__name__}.{Service.__qualname__}.work"
+    first = recorded[0].seq
+    assert [event.seq for event in recorded] == [first, first + 1, first + 2, first + 3]
+    assert recorded[0].time_ns <= recorded[-1].time_ns
+
+
+def test_cfg_attr_decisions():
+    trace.enable()
+
+    def greet():
+        return "hi"
+
+    cfg_attr(greet, condition=True, decorators=[])
+    cfg_attr(greet, condition=False)
+    cfg_attr(lambda: None, condition=False)
+    assert [event for event, _ in _events()] == [
+        "cfg_attr.apply",
+        "cfg_attr.cached",
+        "cfg_attr.raiser",
+    ]
+
+
+FLAGS = {"value": False}
+
+
+class Flagged:
+    @cfg(condition=True)
+    def render(self):
+        return "old"
+
+    @cfg(condition=lambda f: FLAGS["value"], depends_on="trace_test")
+    def render(self):
+        return "new"
+
+
+def test_reselect_rebind():
+    trace.enable()
+    FLAGS["value"] = True
+    try:
+        assert reselect(changed_keys="trace_test") == [f"{__name__}.Flagged.render"]
+    finally:
+        FLAGS["value"] = False
+        reselect(changed_keys="trace_test")
+    assert ("reselect.rebind", "render") in _events()
+
+
+def test_ring_keeps_the_latest_events():
+    trace.enable(4)
+
+    def work():
+        return 1
+
+    cfg(work, condition=True)
+    first = trace.events()[0].seq
+    for _ in range(9):
+        cfg(work, condition=True)
+    latest = [first + 6, first + 7, first + 8, first + 9]
+    assert [event.seq for event in trace.events()] == latest
+
+    # disable() stops recording but keeps what was recorded.
+    trace.disable()
+    cfg(work, condition=True)
+    assert [event.seq for event in trace.events()] == latest
+
+    # Sequence numbers keep counting across clear().
+    trace.clear()
+    assert trace.events() == []
+    trace.enable(4)
+    cfg(work, condition=True)
+    assert [event.seq for event in trace.events()] == [first + 10]
+
+    # Another capacity starts a new ring.
+    trace.enable(8)
+    assert trace.events() == []
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError, match="trace capacity"):
+        trace.enable(0)
+    with pytest.raises(TypeError):
+        trace.enable("big")
+    assert not trace.enabled()
+
+
+def test_dump():
+    out = io.StringIO()
+    trace.dump(out)
+    assert out.getvalue() == ""
+
+    trace.enable()
+
+    def work():
+        return 1
+
+    cfg(work, condition=True)
+    trace.dump(out)
+    assert out.getvalue().startswith("conditional_method - TRACE - #")
+    assert f"cm.select {__name__}.test_dump.<locals>.work" in out.getvalue()
+
+
+def test_lazy_attribute():
+    assert conditional_method.trace is trace
+    with pytest.raises(AttributeError):
+        conditional_method.no_such_attribute  # noqa: B018
+
+
+def test_decision_records():
+    trace.enable()
+    state = {"calls": 0}
+
+    def is_production(func):
+        state["calls"] += 1
+        return False
+
+    def is_development(func):
+        return True
+
+    class Service:
+        @cfg(condition=is_production)
+        def work(self):
+            return "prod"
+
+        @cfg(condition=cfg.flag("trace_dev"))
+        def work(self):
+            return "flag"
+
+        @cfg(condition=is_development)
+        def work(self):
+            return "dev"
+
+        @cfg(condition=True)
+        def other(self):
+            return "other"
+
+    @cfg(condition=True, lazy=True)
+    def later():
+        return "later"
+
+    assert Service().work() == "dev"
+    recorded = trace.events()
+    assert [(e.event, e.candidate, e.kind, e.result) for e in recorded] == [
+        ("cm.raiser", 0, "callable", False),
+        # The raiser for the name is cached too.
+        ("cm.cached", 1, "native", False),
+        ("cm.select", 2, "callable", True),
+        ("cm.select", -1, "static", True),
+        ("cm.lazy", 0, "static", None),
+    ]
+    assert recorded[0].cost_ns > 0
+    assert recorded[3].cost_ns == 0
+
+    trace.clear()
+    cfg(_fresh(), condition=is_development, pure=True)
+    assert [(e.kind, e.result) for e in trace.events()] == [("pure", True)]
+
+
+def test_decoration_times():
+    trace.enable()
+
+    def is_production(func):
+        return False
+
+    def chain(func):
+        return func
+
+    cfg(_fresh(), condition=is_production)
+    cfg_attr(_fresh(), condition=True, decorators=[chain])
+    raiser, apply = trace.events()
+    assert raiser.total_ns >= raiser.cost_ns > 0
+    assert raiser.chain_ns == 0
+    assert apply.chain_ns > 0
+    assert apply.total_ns >= apply.cost_ns + apply.chain_ns
+
+
+def _fresh():
+    def work():
+        return 1
+
+    return work
+
+
+EVENT = trace.FIELDS.index("event")
+
+
+def test_buffer_exports_the_ring():
+    import struct
+
+    trace.enable(8)
+    for condition in (True, False, True):
+        cfg_attr(_fresh(), condition=condition)
+
+    view = trace.buffer()
+    assert view.readonly
+    assert (view.format, view.itemsize, view.nbytes) == (trace.FORMAT, 56, 448)
+    assert struct.calcsize(trace.FORMAT) == view.itemsize
+    names = trace.names()
+    # Slots are filled at seq % capacity, so the ring may wrap between them.
+    records = sorted(
+        (
+            dict(zip(trace.FIELDS, record))
+            for record in struct.iter_unpack(trace.FORMAT, view.cast("B"))
+            if record[EVENT]
+        ),
+        key=lambda r: r["seq"],
+    )
+    assert [(r["seq"], trace.EVENTS[r["event"]]) for r in records] == [
+        (e.seq, e.event) for e in trace.events()
+    ]
+    assert {names[r["name"]] for r in records} == {f"{__name__}._fresh.<locals>.work"}
+    assert [trace.KINDS[r["kind"]] for r in records] == ["static"] * 3
+
+    # The view is live, and pins the ring's size.
+    cfg_attr(_fresh(), condition=True)
+    assert any(record[EVENT] for record in struct.iter_unpack(trace.FORMAT, view))
+    with pytest.raises(BufferError):
+        trace.enable(16)
+    trace.enable(8)
+    with pytest.raises(TypeError, match="read-write"):
+        struct.pack_into("B", _c._trace_buffer(), 0, 1)
+    view.release()
+    trace.enable(16)
+    assert trace.buffer().nbytes == 896
+
+
+def test_buffer_needs_a_ring():
+    import importlib.util
+
+    spec = importlib.util.find_spec("conditional_method._c")
+    other = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(other)
+    with pytest.raises(BufferError, match="enable tracing"):
+        memoryview(other._trace_buffer())
+    with pytest.raises(TypeError):
+        type(other._trace_buffer())()